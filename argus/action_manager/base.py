@@ -78,8 +78,13 @@ class BaseActionManager(object):
         pass
 
     @abc.abstractmethod
-    def wait_cbinit_service(self):
-        """Wait if the Cloudbase-Init Service to stop."""
+    def wait_cbinit_service(self, searched_paths=None):
+        """Wait if the Cloudbase-Init Service to stop.
+
+        :param searched_paths:
+            Paths to files that should exist before the service stops,
+            if the heartbeat patch is applied.
+        """
         pass
 
     @abc.abstractmethod
@@ -0,0 +1,137 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Keep the Argus resources in a cache on the instance.
+
+Every resource is written in the cache directory of the instance under
+its SHA-256 digest, e.g. ``C:\\argus\\cache\\<sha256>\\network_details.ps1``,
+so a resource found there is known to be the right one. The resources
+which are missing are sent from the local package with a single upload,
+instead of being downloaded by the instance from the web every time
+they are used.
+"""
+
+import ntpath
+import posixpath
+import threading
+
+from argus.client import transfer
+from argus import config as argus_config
+from argus import log as argus_log
+from argus import resource_registry
+from argus import util
+
+LOG = argus_log.LOG
+CONFIG = argus_config.CONFIG
+
+# The resources sent to an instance when it is prepared, the scripts
+# being small and used by most of the scenarios.
+SCRIPT_EXTENSIONS = (".ps1", ".psm1", ".py", ".cmd", ".bat")
+
+LIST_SCRIPT = """
+$ErrorActionPreference = "Stop"
+$cache = '{cache}'
+New-Item -ItemType Directory -Force -Path $cache | Out-Null
+Get-ChildItem -LiteralPath $cache -Recurse |
+    Where-Object {{ -not $_.PSIsContainer }} |
+    ForEach-Object {{ $_.FullName.Substring($cache.Length).Trim('\\') }}
+"""
+
+
+def get_scripts(registry=None):
+    """Get the names of the resources which are scripts."""
+    registry = registry or resource_registry.REGISTRY
+    return [name for name in registry.names()
+            if name.endswith(SCRIPT_EXTENSIONS)]
+
+
+class ResourceStage(object):
+    """The cache of the Argus resources on an instance.
+
+    What the cache holds is remembered in the facts of the client, so
+    it is listed once and again only after the facts are invalidated,
+    e.g. after a reboot.
+
+    :param client:
+        A client connected to the instance.
+    :param cache_dir:
+        The cache directory on the instance, by default the one from
+        the `resources_cache` option.
+    :param registry:
+        The :class:`argus.resource_registry.ResourceRegistry` from
+        which the resources are read.
+    """
+
+    def __init__(self, client, cache_dir=None, registry=None):
+        self._client = client
+        self._cache_dir = cache_dir or CONFIG.argus.resources_cache
+        self._registry = registry or resource_registry.REGISTRY
+        self._lock = threading.Lock()
+
+    def _key(self, name):
+        resource = self._registry.get(name)
+        return ntpath.join(resource.sha256,
+                           posixpath.basename(resource.name)).lower()
+
+    def path(self, name):
+        """Get the path of the given resource in the cache."""
+        resource = self._registry.get(name)
+        return ntpath.join(self._cache_dir, resource.sha256,
+                           posixpath.basename(resource.name))
+
+    def _list(self):
+        stdout = self._client.run_command_with_retry(
+            LIST_SCRIPT.format(cache=transfer.quote(self._cache_dir)),
+            command_type=util.POWERSHELL)[0]
+        return frozenset(line.strip().lower() for line in stdout.splitlines()
+                         if line.strip())
+
+    def present(self):
+        """Get the resources found in the cache, by their relative paths."""
+        return self._client.facts.get(("staged_resources", self._cache_dir),
+                                      self._list)
+
+    def stage(self, names):
+        """Make sure the given resources are in the cache.
+
+        The missing resources are sent with a single upload and
+        checked on the instance against their digests.
+
+        :returns: The paths of the resources in the cache.
+        :raises:
+            :class:`ArgusTransferError` if the resources written
+            don't match the local ones.
+        """
+        with self._lock:
+            present = self.present()
+            missing = []
+            for name in names:
+                key = self._key(name)
+                if key not in present and name not in missing:
+                    missing.append(name)
+            if missing:
+                self._upload(missing)
+                self._client.facts.set(
+                    ("staged_resources", self._cache_dir),
+                    present | frozenset(self._key(name) for name in missing))
+        return [self.path(name) for name in names]
+
+    def _upload(self, names):
+        LOG.debug("Staging the resources %s in '%s'.", names,
+                  self._cache_dir)
+        transfer.write_bundle(
+            self._client,
+            [(self.path(name), self._registry.data(name)) for name in names],
+            ntpath.join(self._cache_dir, util.rand_name("argus-resources")))
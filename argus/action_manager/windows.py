@@ -25,10 +25,12 @@ from six.moves import urllib_parse as urlparse
 from winrm import exceptions as winrm_exceptions
 
 from argus.action_manager import base
+from argus.action_manager import staging
 from argus import config as argus_config
 from argus import exceptions
 from argus.introspection.cloud import windows as introspection
 from argus import log as argus_log
+from argus import retry
 from argus import util
 
 LOG = argus_log.LOG
@@ -55,9 +57,25 @@ class WindowsActionManager(base.BaseActionManager):
     WINDOWS_MANAGEMENT_CMDLET = "Get-WmiObject"
     _INSTALL_SCRIPT = r"C:\installCBinit.ps1"
     _ARGUS_AGENT_SCRIPT = r"C:\argusagent.py"
+    _WAIT_CBINIT_SCRIPT = "windows/wait_cbinit_service.ps1"
 
     def __init__(self, client, os_type=util.WINDOWS):
         super(WindowsActionManager, self).__init__(client, os_type)
+        self._stage = staging.ResourceStage(client)
+
+    def get_cbinit_dir(self):
+        """Get the Cloudbase-Init installation directory of the instance.
+
+        The result is cached on the client until the installation changes.
+        """
+        return self._client.facts.get(
+            "cbinit_dir", lambda: introspection.get_cbinit_dir(self._execute))
+
+    def get_python_dir(self):
+        """Get the Python directory of the Cloudbase-Init installation."""
+        return self._client.facts.get(
+            "python_dir", lambda: introspection.get_python_dir(
+                self._execute, self.get_cbinit_dir()))
 
     def get_agent_command(self, agent_action,
                           agent_path=None, **kwargs):
@@ -67,7 +85,7 @@ class WindowsActionManager(base.BaseActionManager):
         required arguments.
         """
         agent_path = agent_path or self._ARGUS_AGENT_SCRIPT
-        python_dir = introspection.get_python_dir(self._execute)
+        python_dir = self.get_python_dir()
         cmd = (r'& "{pydir}\python.exe" {agent_path} --{agent_action} '
                ' "{source}" "{location}"'.format(
                    pydir=python_dir, agent_path=agent_path,
@@ -89,17 +107,6 @@ class WindowsActionManager(base.BaseActionManager):
             LOG.debug("Could not archive %s: %s", file_path, exc)
             return file_path
 
-    def encode_file_to_base64_str(self, file_path):
-        """Returns a base64 encoded string resulted from the given file."""
-        LOG.debug("Encoding %s to base64.", file_path)
-        encode_cmd = self.get_agent_command(agent_action="encode",
-                                            source=file_path)
-        try:
-            return self._client.run_remote_cmd(cmd=encode_cmd,
-                                               command_type=util.POWERSHELL)
-        except exceptions.ArgusError as exc:
-            LOG.debug("Could not encode %s: %s", file_path, exc)
-
     def download(self, uri, location):
         """Download the resource located at a specific URI in the location.
 
@@ -121,11 +128,25 @@ class WindowsActionManager(base.BaseActionManager):
     def download_resource(self, resource_location, location):
         """Download the resource in the specified location
 
+        If the resources are staged, the resource is copied from the
+        cache of the instance instead.
+
         :param resource_script:
             Is relative to the /argus/resources/ directory.
         :param location:
             The location on the instance.
         """
+        if CONFIG.argus.stage_resources:
+            staged_location = self._stage.stage([resource_location])[0]
+            LOG.debug("Copying the staged %s to %s", resource_location,
+                      location)
+            cmd = ("Copy-Item -Force -LiteralPath '{path}' "
+                   "-Destination '{location}'".format(
+                       path=staged_location, location=location))
+            self._client.run_command_with_retry(
+                cmd, command_type=util.POWERSHELL)
+            return
+
         base_resource = CONFIG.argus.resources
         if not base_resource.endswith("/"):
             base_resource = urlparse.urljoin(CONFIG.argus.resources,
@@ -133,6 +154,30 @@ class WindowsActionManager(base.BaseActionManager):
         uri = urlparse.urljoin(base_resource, resource_location)
         self.download(uri, location)
 
+    def get_resource_location(self, resource_location):
+        """Get the resource on the instance and return its location.
+
+        A staged resource is used from the cache, otherwise it is
+        downloaded in the root of the system drive.
+
+        :param resource_location:
+            Is relative to the /argus/resources/ directory.
+        """
+        if CONFIG.argus.stage_resources:
+            return self._stage.stage([resource_location])[0]
+
+        location = r"C:\{}".format(resource_location.split('/')[-1])
+        self.download_resource(resource_location, location)
+        return location
+
+    def stage_resources(self, resource_locations):
+        """Send the given resources to the cache of the instance at once.
+
+        Nothing is done if the resources aren't staged.
+        """
+        if CONFIG.argus.stage_resources:
+            self._stage.stage(resource_locations)
+
     def _execute_resource_script(self, resource_location, parameters,
                                  script_type,
                                  upper_timeout=CONFIG.argus.upper_timeout):
@@ -143,8 +188,7 @@ class WindowsActionManager(base.BaseActionManager):
         if script_type == util.BAT_SCRIPT:
             script_type = util.CMD
 
-        instance_location = r"C:\{}".format(resource_location.split('/')[-1])
-        self.download_resource(resource_location, instance_location)
+        instance_location = self.get_resource_location(resource_location)
         cmd = '"{}" {}'.format(instance_location, parameters)
         self._client.run_command_with_retry(
             cmd, count=CONFIG.argus.retry_count,
@@ -180,7 +224,7 @@ class WindowsActionManager(base.BaseActionManager):
         LOG.info("Checking Cloudbase-Init installation.")
 
         try:
-            python_dir = introspection.get_python_dir(self._execute)
+            python_dir = self.get_python_dir()
         except exceptions.ArgusError as exc:
             LOG.warning("Could not check Cloudbase-Init installation: %s", exc)
             return False
@@ -200,8 +244,11 @@ class WindowsActionManager(base.BaseActionManager):
     def cbinit_cleanup(self):
         """Cleans up Cloudbase-Init if the installation failed."""
         LOG.debug("Cleaning up Cloudbase-Init from the instance.")
+        # The configs go away along with the installation.
+        self._client.facts.invalidate("deployed_configs")
         try:
-            cbinit_dir = introspection.get_cbinit_dir(self._execute)
+            cbinit_dir = self.get_cbinit_dir()
+            self._client.facts.invalidate("cbinit_dir", "python_dir")
             self.rmdir(ntpath.dirname(cbinit_dir))
         except exceptions.ArgusError as exc:
             LOG.warning("Could not cleanup Cloudbase-Init: %s", exc)
@@ -212,7 +259,7 @@ class WindowsActionManager(base.BaseActionManager):
     @staticmethod
     def _get_installer_name():
         """Get Cloudbase-Init installer name."""
-        return "CloudbaseInitSetup_{build}_{arch}.msi".format(
+        return util.CBINIT_INSTALLER.format(
             build=CONFIG.argus.build, arch=CONFIG.argus.arch)
 
     def install_cbinit(self):
@@ -223,6 +270,10 @@ class WindowsActionManager(base.BaseActionManager):
         for _ in range(CONFIG.argus.retry_count):
             for install_method in (self._run_installation_script,
                                    self._deploy_using_scheduled_task):
+                # The installation is about to change, so forget
+                # where the previous one was found and its configs.
+                self._client.facts.invalidate("cbinit_dir", "python_dir",
+                                              "deployed_configs")
                 try:
                     install_method(installer)
                 except exceptions.ArgusError as exc:
@@ -247,13 +298,12 @@ class WindowsActionManager(base.BaseActionManager):
         """Deploy Cloudbase-Init using a scheduled task."""
         LOG.info("Deploying Cloudbase-Init using a scheduled task.")
         resource_script = 'windows/schedule_installer.ps1'
-        self.execute_powershell_resource_script(resource_script, installer)
+        parameters = '-installer {} -MsiWebLocation {}'.format(
+            installer, CONFIG.argus.installer_root_url)
+        self.execute_powershell_resource_script(resource_script, parameters)
 
     def sysprep(self):
-        resource_location = "windows/sysprep.ps1"
-
-        cmd = r"C:\{}".format(resource_location.split('/')[-1])
-        self.download_resource(resource_location, cmd)
+        cmd = self.get_resource_location("windows/sysprep.ps1")
         LOG.debug("Running %s ", cmd)
         try:
             self._client.run_remote_cmd(
@@ -268,6 +318,10 @@ class WindowsActionManager(base.BaseActionManager):
             # This fixes errors that stops scenarios from getting
             # created on different windows images.
             LOG.debug("Currently rebooting...")
+        # The shells opened before the reboot are gone for good
+        # and the facts known about the instance might change.
+        self._client.reset_sessions()
+        self._client.facts.invalidate()
         LOG.info("Wait for the machine to finish rebooting ...")
         self.wait_boot_completion()
 
@@ -291,34 +345,65 @@ class WindowsActionManager(base.BaseActionManager):
         cmd = "git clone '{repo}' '{location}'".format(repo=repo_url,
                                                        location=location)
 
-        while count > 0:
+        def cleanup(_):
+            if self.exists(location):
+                rem = self.rmdir if self.is_dir(location) else self.remove
+                rem(location)
+
+        if count > 0:
             try:
-                self._client.run_command(cmd)
-            except exceptions.ArgusError as exc:
-                LOG.debug("Cloning failed with %r.", exc)
-                if self.exists(location):
-                    rem = self.rmdir if self.is_dir(location) else self.remove
-                    rem(location)
-                count -= 1
-                if count:
-                    LOG.debug('Retrying...')
-                    time.sleep(delay)
+                retry.call(lambda: self._client.run_command(cmd),
+                           "git_clone", count=count, delay=delay,
+                           retryable=(exceptions.ArgusError, ),
+                           on_failure=cleanup)
+            except exceptions.ArgusTimeoutError:
+                pass
             else:
                 return True
 
         LOG.debug('Could not clone %s', repo_url)
         return False
 
-    def wait_cbinit_service(self):
-        """Wait if the Cloudbase-Init Service to stop."""
-        wait_cmd = ('(Get-Service | where {$_.Name '
-                    '-match "cloudbase-init"}).Status')
-        self._client.run_command_until_condition(
-            wait_cmd,
-            lambda out: out.strip() == 'Stopped',
-            retry_count=CONFIG.argus.retry_count,
-            delay=CONFIG.argus.retry_delay,
-            command_type=util.POWERSHELL)
+    def _wait_cbinit_ready(self, searched_paths=None, service_status=None):
+        """Wait until the given paths exist and the service has a status.
+
+        Everything is waited for on the instance, by a single command,
+        which is retried only if it fails or the connection is lost.
+        """
+        script = util.get_resource(self._WAIT_CBINIT_SCRIPT)
+        if isinstance(script, bytes):
+            script = script.decode()
+        paths = ", ".join("'{}'".format(path.replace("'", "''"))
+                          for path in searched_paths or [])
+        timeout = CONFIG.argus.cbinit_ready_timeout
+        deadline = time.time() + timeout
+
+        def watch():
+            remaining = max(int(deadline - time.time()), 1)
+            variables = ("$paths = @({paths})\n"
+                         "$serviceName = 'cloudbase-init'\n"
+                         "$serviceStatus = '{status}'\n"
+                         "$timeout = {timeout}\n").format(
+                             paths=paths, status=service_status or "",
+                             timeout=remaining)
+            # Give the command some time to report that it timed out.
+            self._client.run_command(
+                variables + script, command_type=util.POWERSHELL,
+                upper_timeout=remaining + 60)
+
+        retry.call(watch, "wait_cbinit_ready",
+                   delay=CONFIG.argus.retry_delay, deadline=timeout,
+                   error="Cloudbase-Init wasn't ready in {} seconds."
+                   .format(timeout))
+
+    def wait_cbinit_service(self, searched_paths=None):
+        """Wait if the Cloudbase-Init Service to stop.
+
+        :param searched_paths:
+            Paths to files that should exist before the service stops,
+            if the heartbeat patch is applied.
+        """
+        self._wait_cbinit_ready(searched_paths, service_status="Stopped")
 
     def check_cbinit_service(self, searched_paths=None):
         """Check if the Cloudbase-Init service started.
@@ -327,15 +412,8 @@ class WindowsActionManager(base.BaseActionManager):
             Paths to files that should exist if the heartbeat patch is
             applied.
         """
-        test_cmd = 'Test-Path "{}"'
-        check_cmds = [test_cmd.format(path) for path in searched_paths or []]
-        for check_cmd in check_cmds:
-            self._client.run_command_until_condition(
-                check_cmd,
-                lambda out: out.strip() == 'True',
-                retry_count=CONFIG.argus.retry_count,
-                delay=CONFIG.argus.retry_delay,
-                command_type=util.POWERSHELL)
+        if searched_paths:
+            self._wait_cbinit_ready(searched_paths)
 
     def wait_boot_completion(self):
         """Wait for a reasonable amount of time the instance to boot."""
@@ -345,6 +423,8 @@ class WindowsActionManager(base.BaseActionManager):
 
     def specific_prepare(self):
         """Prepare some OS specific resources."""
+        # Most of the scripts are needed later, send them together.
+        self.stage_resources(staging.get_scripts())
         self.download_resource("windows/argusagent.py",
                                self._ARGUS_AGENT_SCRIPT)
         LOG.debug("Prepare something specific for OS Type %s", self._os_type)
@@ -738,6 +818,10 @@ class WindowsNanoActionManager(WindowsSever2016ActionManager):
             # This fixes errors that stop scenarios from getting
             # created on different windows images.
             LOG.debug("Currently rebooting...")
+        # The shells opened before the reboot are gone for good
+        # and the facts known about the instance might change.
+        self._client.reset_sessions()
+        self._client.facts.invalidate()
         LOG.info("Wait for the machine to finish rebooting ...")
         self.wait_boot_completion()
 
@@ -753,9 +837,8 @@ class WindowsNanoActionManager(WindowsSever2016ActionManager):
             super(WindowsNanoActionManager, self)._execute_resource_script(
                 resource_location, parameters, script_type)
         else:
-            instance_location = r"C:\{}".format(
-                resource_location.split('/')[-1])
-            self.download_resource(resource_location, instance_location)
+            instance_location = self.get_resource_location(
+                resource_location)
             cmd = '& "{}" {}'.format(instance_location, parameters)
             self._client.run_command_with_retry(
                 cmd, count=CONFIG.argus.retry_count,
@@ -799,53 +882,6 @@ WindowsActionManagers = {
 }
 
 
-def _is_nanoserver(client):
-    """Returns True if the client is connected to a NanoServer machine.
-
-       Using the powershell code from here: https://goo.gl/UD27SK
-    """
-    server_level_key = (r'HKLM:\Software\Microsoft\Windows NT\CurrentVersion'
-                        r'\Server\ServerLevels')
-
-    cmd = r'Test-Path "{}"'.format(server_level_key)
-    path_exists, _, _ = client.run_command_with_retry(
-        cmd, count=CONFIG.argus.retry_count, delay=CONFIG.argus.retry_delay,
-        command_type=util.POWERSHELL)
-
-    if path_exists == "False":
-        return False
-
-    cmd = r'(Get-ItemProperty "{}").NanoServer'.format(server_level_key)
-    nanoserver_property, _, _ = client.run_command_with_retry(
-        cmd, count=CONFIG.argus.retry_count, delay=CONFIG.argus.retry_delay,
-        command_type=util.POWERSHELL)
-
-    return len(nanoserver_property) > 0 and nanoserver_property[0] == "1"
-
-
-def _get_product_type(client, major_version):
-    """Return the minor version of the OS.
-
-    :param client:
-        A Windows Client.
-    :param  major_version:
-        Windows Major version according to
-        https://msdn.microsoft.com/en-us/library/aa394239(v=vs.85).aspx
-    """
-    # NOTE(mmicu): For Windows 10, Windows Server 2016 and Windows Nano
-    # we use Common Information Model (Cim) and for the others we use
-    # Windows Management Instrumentation (Wmi)
-    cmdlet = Windows8ActionManager.WINDOWS_MANAGEMENT_CMDLET
-    if major_version == 10:
-        cmdlet = Windows10ActionManager.WINDOWS_MANAGEMENT_CMDLET
-    cmd = r"({} -Class Win32_OperatingSystem).producttype".format(cmdlet)
-
-    product_type, _, _ = client.run_command_with_retry(
-        cmd, count=CONFIG.argus.retry_count, delay=CONFIG.argus.retry_delay,
-        command_type=util.POWERSHELL)
-    return util.get_int_from_str(product_type.strip())
-
-
 def get_windows_action_manager(client):
     """Get the OS specific Action Manager."""
     LOG.info("Waiting for boot completion in order to select an "
@@ -855,19 +891,18 @@ def get_windows_action_manager(client):
     wait_boot_completion(client, username)
 
     # get OS type
-    major_version = introspection.get_os_version(client, 'Major')
-    minor_version = introspection.get_os_version(client, 'Minor')
-    product_type = _get_product_type(client, major_version)
-    windows_type = util.WINDOWS_VERSION.get((major_version, minor_version,
-                                             product_type), util.WINDOWS)
-    is_nanoserver = _is_nanoserver(client)
+    fingerprint = introspection.get_os_fingerprint(client)
+    windows_type = util.WINDOWS_VERSION.get(
+        (fingerprint.major, fingerprint.minor, fingerprint.product_type),
+        util.WINDOWS)
 
     if isinstance(windows_type, dict):
-        windows_type = windows_type[is_nanoserver]
+        windows_type = windows_type[fingerprint.nano_server]
     LOG.debug(("We got the OS type %s because we have the major Version : %d,"
                " the minor version %d, the product Type : %d, and"
-               " IsNanoserver: %s"), windows_type, major_version,
-              minor_version, product_type, is_nanoserver)
+               " IsNanoserver: %s"), windows_type, fingerprint.major,
+              fingerprint.minor, fingerprint.product_type,
+              fingerprint.nano_server)
 
     action_manager = WindowsActionManagers[windows_type]
     return action_manager(client=client)
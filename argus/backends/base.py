@@ -18,8 +18,10 @@ import os
 
 import six
 
+from argus.backends import console
 from argus import config as argus_config
 from argus import log as argus_log
+from argus import retry
 
 
 CONFIG = argus_config.CONFIG
@@ -77,6 +79,8 @@ class BaseBackend(object):
 class CloudBackend(BaseBackend):
     """Base back-end for cloud related tasks."""
 
+    _console_tailer = None
+
     @abc.abstractmethod
     def get_remote_client(self, username=None, password=None, **kwargs):
         """Get a remote client
@@ -94,19 +98,41 @@ class CloudBackend(BaseBackend):
         template = "{}{}.log".format("{}", "-" + suffix if suffix else "")
         return template
 
+    def _get_console_log_path(self, suffix=None):
+        template = self._get_log_template(suffix)
+        return os.path.join(CONFIG.argus.output_directory,
+                            argus_log.get_log_extra_item(LOG, 'scenario') +
+                            "-serial-logging-" + template.format(
+                                self.internal_instance_id()))
+
     def save_instance_output(self, suffix=None):
         """Retrieve and save all data written through the COM port.
 
         If a `suffix` is provided, then the log name is preceded by it.
+        When the back-end has a console reader, only the new output is
+        downloaded and the file is written from the output read so far.
         """
         if not CONFIG.argus.output_directory:
             return
 
-        template = self._get_log_template(suffix)
-        path = os.path.join(CONFIG.argus.output_directory,
-                            argus_log.get_log_extra_item(LOG, 'scenario') +
-                            "-serial-logging-" + template.format(
-                                self.internal_instance_id()))
+        path = self._get_console_log_path(suffix)
+        if suffix is None and self._console_tailer is not None:
+            # The tailer writes the same file.
+            self._console_tailer.poll()
+            return
+
+        reader = self.console_reader()
+        if reader is not None:
+            reader.read()
+            if reader.is_empty():
+                LOG.warning("Empty console output; nothing to save.")
+                return
+
+            LOG.info("Saving instance console output to: %s", path)
+            with open(path, "wb") as stream:
+                reader.copy(stream)
+            return
+
         content = self.instance_output()
         if not content.strip():
             LOG.warning("Empty console output; nothing to save.")
@@ -116,6 +142,59 @@ class CloudBackend(BaseBackend):
         with open(path, "wb") as stream:
             stream.write(content)
 
+    def console_reader(self):
+        """Get a reader of the console output, which fetches only new lines.
+
+        :returns:
+            A :class:`argus.backends.console.ConsoleReader` or
+            ``None``, if the back-end can only give the whole output.
+        """
+        return None
+
+    def start_console_tailer(self):
+        """Start following the console output of the instance.
+
+        The output is written to the console log of the scenario as it
+        comes and the waits of the scenario fail as soon as it shows a
+        known failure.
+
+        :returns:
+            The :class:`argus.backends.console.ConsoleTailer`
+            or ``None``, if the output can't or shouldn't be followed.
+        """
+        reader = self.console_reader()
+        if reader is None or CONFIG.argus.console_tail_interval <= 0:
+            return None
+
+        path = None
+        if CONFIG.argus.output_directory:
+            path = self._get_console_log_path()
+        self._console_tailer = console.ConsoleTailer(reader, path)
+        self._console_tailer.start()
+        retry.set_abort_check(self._console_tailer.check)
+        return self._console_tailer
+
+    def stop_console_tailer(self):
+        """Stop following the console output of the instance."""
+        tailer, self._console_tailer = self._console_tailer, None
+        if tailer is not None:
+            retry.set_abort_check(None)
+            tailer.stop()
+
+    def booted_from_snapshot(self):
+        """Check if the instance was booted from a prepared snapshot.
+
+        Such an instance has Cloudbase-Init already installed and
+        patched, so that these steps can be skipped.
+        """
+        return False
+
+    def snapshot_instance(self):
+        """Snapshot the prepared instance, for booting the next ones.
+
+        Back-ends which don't cache the prepared instances do nothing.
+        """
+
     @abc.abstractmethod
     def instance_output(self, limit=None):
         """Get the underlying instance output, if any.
@@ -0,0 +1,264 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Read the console output of an instance incrementally.
+
+The cloud APIs, like the compute API, give only the last lines of the
+console output, the reader being given a function which fetches them.
+The reader remembers the last lines it has seen and asks for a small
+window at the end of the output, which usually contains them, so that
+only the new lines are downloaded. The window grows only when the
+remembered lines are not in it.
+
+The output can also be followed while the instance is being prepared,
+failing early when it shows that something went wrong.
+"""
+
+import re
+import shutil
+import tempfile
+import threading
+
+import six
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+OUTPUT_SIZE = 128
+OUTPUT_EPSILON = int(OUTPUT_SIZE / 10)
+# The number of lines remembered for finding the new ones.
+TAIL_SIZE = 16
+# The size of the output kept in memory, before using a file.
+SPOOL_SIZE = 1024 * 1024
+
+
+def _find_tail(lines, tail):
+    """Get the index after the last occurrence of `tail` in `lines`."""
+    size = len(tail)
+    for index in range(len(lines) - size, -1, -1):
+        if lines[index:index + size] == tail:
+            return index + size
+    return None
+
+
+class ConsoleReader(object):
+    """Keep the console output of an instance, fetching only new lines.
+
+    The output read so far is kept in a temporary file once it gets
+    large, only the last lines being kept in memory.
+
+    :param fetch:
+        A callable which receives a number of lines and returns the
+        last lines of the console output, as text.
+    :param limit:
+        The number of lines asked for first.
+    """
+
+    def __init__(self, fetch, limit=OUTPUT_SIZE, tail_size=TAIL_SIZE):
+        self._fetch = fetch
+        self._limit = max(limit, OUTPUT_EPSILON + 1)
+        self._tail_size = tail_size
+        self._tail = []
+        # The last line, which may be continued later.
+        self._partial = u""
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        self._empty = True
+        self._lock = threading.Lock()
+        self.lines = 0
+
+    def _new_lines(self, lines, whole):
+        if not self._tail:
+            # Nothing was read yet, so all the output is needed.
+            return lines if whole else None
+
+        index = _find_tail(lines, self._tail)
+        if index is not None:
+            return lines[index:]
+        if whole:
+            # The remembered lines are gone, the output was reset.
+            LOG.debug("The console output was reset, reading it again.")
+            return lines
+        return None
+
+    def read(self):
+        """Fetch the lines added since the last call.
+
+        :returns: The new complete lines, as text.
+        """
+        with self._lock:
+            limit = self._limit
+            while True:
+                output = self._fetch(limit) or u""
+                if isinstance(output, six.binary_type):
+                    output = output.decode("utf-8", "replace")
+                lines = output.splitlines(True)
+                whole = len(lines) < limit - OUTPUT_EPSILON
+                partial = u""
+                if lines and not lines[-1].endswith(("\n", "\r")):
+                    partial = lines.pop()
+                new = self._new_lines(lines, whole)
+                if new is not None:
+                    break
+                limit *= 2
+
+            self._partial = partial
+            self._tail = (self._tail + new)[-self._tail_size:]
+            self.lines += len(new)
+            content = u"".join(new)
+            if content.strip():
+                self._empty = False
+            self._spool.seek(0, 2)
+            self._spool.write(content.encode("utf-8"))
+            return content
+
+    def is_empty(self):
+        """Check if nothing but whitespace was read so far."""
+        with self._lock:
+            return self._empty and not self._partial.strip()
+
+    def copy(self, stream, start=0, partial=True):
+        """Write the output read so far to the given binary stream.
+
+        :param start:
+            The offset in the output, in bytes, to start from.
+        :param partial:
+            Whether the last line is written if it is not complete.
+        :returns: The offset of the end of the complete lines.
+        """
+        with self._lock:
+            self._spool.seek(start)
+            shutil.copyfileobj(self._spool, stream)
+            end = self._spool.tell()
+            if partial:
+                stream.write(self._partial.encode("utf-8"))
+            return end
+
+    def getvalue(self):
+        """Get the output read so far, as text."""
+        stream = six.BytesIO()
+        self.copy(stream)
+        return stream.getvalue().decode("utf-8")
+
+    def close(self):
+        """Forget the output read so far."""
+        with self._lock:
+            self._spool.close()
+
+
+class ConsoleTailer(object):
+    """Follow the console output of an instance in a background thread.
+
+    The new output is appended to a file and searched for the patterns
+    of known failures, such as a blue screen or an unhandled error of
+    Cloudbase-Init. The failure found is raised by :meth:`check`, which
+    can be given to :func:`argus.retry.set_abort_check` for ending the
+    waits of the scenario right away.
+
+    :param reader:
+        The :class:`ConsoleReader` of the instance.
+    :param path:
+        The file written with the output, if any.
+    :param interval:
+        The number of seconds between two reads of the output.
+    :param patterns:
+        The regular expressions of the failures.
+    """
+
+    def __init__(self, reader, path=None, interval=None, patterns=None):
+        if interval is None:
+            interval = CONFIG.argus.console_tail_interval
+        if patterns is None:
+            patterns = CONFIG.argus.console_failure_patterns
+
+        self._reader = reader
+        self._path = path
+        self._interval = interval
+        self._patterns = [re.compile(pattern) for pattern in patterns]
+        # The part of the output which was already followed.
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._scenario = None
+        self.failure = None
+
+    def start(self):
+        """Start following the output in a background thread."""
+        self._scenario = argus_log.get_thread_scenario_name()
+        self._thread = threading.Thread(target=self._run,
+                                        name="console-tailer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop following the output and wait for the thread to end."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        argus_log.set_thread_scenario_name(self._scenario)
+        while not self._stopped.wait(self._interval):
+            try:
+                self.poll()
+            except Exception as exc:    # pylint: disable=broad-except
+                LOG.debug("Following the console output failed with %r.",
+                          exc)
+
+    def _search(self, output):
+        for line in output.splitlines():
+            for pattern in self._patterns:
+                if pattern.search(line):
+                    self.failure = line.strip()
+                    LOG.error("The console output shows a failure: %s",
+                              self.failure)
+                    return
+
+    def poll(self):
+        """Read the new output, write it to the file and search it.
+
+        Only the complete lines are followed, the last line being
+        written when it ends.
+        """
+        with self._lock:
+            self._reader.read()
+            stream = six.BytesIO()
+            start = self._offset
+            self._offset = self._reader.copy(stream, start=start,
+                                             partial=False)
+            output = stream.getvalue()
+            if not output:
+                return
+
+            if self._path:
+                with open(self._path, "ab" if start else "wb") as handle:
+                    handle.write(output)
+            if self.failure is None:
+                self._search(output.decode("utf-8", "replace"))
+
+    def check(self):
+        """Raise if a failure was found in the output.
+
+        :raises: :class:`argus.exceptions.ArgusConsoleFailure`
+        """
+        if self.failure is not None:
+            raise exceptions.ArgusConsoleFailure(
+                "The console output of the instance shows a failure: "
+                "{!r}".format(self.failure))
@@ -14,13 +14,12 @@
 #    under the License.
 
 import abc
-import time
 
-from heatclient import exc
 import six
 
 from argus.backends import base
 from argus.backends.heat import client
+from argus.backends.heat import watcher
 from argus.backends.tempest import manager as api_manager
 from argus.backends import windows
 from argus import config as argus_config
@@ -32,9 +31,11 @@ CONFIG = argus_config.CONFIG
 OS_NOVA_RESOURCE = 'OS::Nova::Server'
 OS_NEUTRON_FLOATING_IP = "OS::Neutron::FloatingIP"
 RESOURCE_COMPLETED_STATUS = "CREATE_COMPLETE"
-RESOURCE_DELETED_STATUS = "DELETE_CREATE"
+RESOURCE_DELETED_STATUS = "DELETE_COMPLETE"
 HEAT_RESOURCE_LIMIT = 10
 HEAT_RESOURCE_TIMEOUT = 0.5
+# The number of seconds to wait for a resource of the stack.
+HEAT_RESOURCE_DEADLINE = 600
 
 RETRY_COUNT = 50
 RETRY_DELAY = 10
@@ -51,10 +52,11 @@ class BaseHeatBackend(base.CloudBackend):
             name=name, userdata=userdata, metadata=metadata,
             availability_zone=availability_zone)
 
-        self._manager = api_manager.APIManager()
+        self._manager = api_manager.get_manager()
         self._heat_client = client.heat_client(
             self._manager.primary_credentials())
         self._keypair = None
+        self._watcher = None
 
     @staticmethod
     def _build_template(instance_name, key,
@@ -130,9 +132,9 @@ class BaseHeatBackend(base.CloudBackend):
         super(BaseHeatBackend, self).setup_instance()
 
         # Get the image and the flavor name
-        image_name = self._manager.image_client.get_image_meta(
+        image_name = self._manager.get_image_meta(
             CONFIG.openstack.image_ref)['name']
-        flavor_name = self._manager.flavors_client.show_flavor(
+        flavor_name = self._manager.show_flavor(
             CONFIG.openstack.flavor_ref)['flavor']['name']
         self._keypair = self._manager.create_keypair(
             name=self.__class__.__name__)
@@ -157,42 +159,36 @@ class BaseHeatBackend(base.CloudBackend):
             'environment': {},
         }
 
-        self._heat_client.stacks.create(**fields)
+        stack = self._heat_client.stacks.create(**fields)["stack"]
+        self._watcher = watcher.StackWatcher(
+            self._heat_client,
+            watcher.stack_identifier(self._name, stack["id"]))
 
     def cleanup(self):
         if self._keypair:
             self._keypair.destroy()
 
         # if no stack was created
-        if not six.functools.reduce(lambda a, b: a + 1,
-                                    self._heat_client.stacks.list(), 0):
+        if self._watcher is None:
             return
         try:
             self._delete_floating_ip()
-            self._heat_client.stacks.delete(stack_id=self._name)
+            self._heat_client.stacks.delete(
+                stack_id=self._watcher.identifier)
             self._wait_stacks()
         finally:
             self._manager.cleanup_credentials()
 
-    def _get_stacks(self):
-        """Return the number of heat stacks."""
-        iterator = self._heat_client.stacks.list()
-        return six.functools.reduce(lambda acc, e: acc + 1, iterator, 0)
-
     def _wait_stacks(self, retry_count=RETRY_COUNT,
                      retry_delay=RETRY_DELAY):
-        """We are going to wait until all stacks are deleted."""
-        stacks = self._get_stacks()
-        retry_count = stacks * retry_count
-        retry_delay = stacks * retry_delay
-        while retry_count > 0:
-            if not self._get_stacks():
-                return
-            else:
-                retry_count -= 1
-            time.sleep(retry_delay)
-        raise exceptions.ArgusHeatTeardown(
-            "All stacks failed to be deleted in time!")
+        """Wait until the stack of the back-end is deleted.
+
+        The stack is polled often at first and then every
+        `retry_delay` seconds, for at most `retry_count` times
+        `retry_delay` seconds.
+        """
+        self._watcher.wait_deleted(delay=retry_delay,
+                                   deadline=retry_count * retry_delay)
 
     def _delete_floating_ip(self):
         # The floating IP in the new version is deleted when the
@@ -202,40 +198,32 @@ class BaseHeatBackend(base.CloudBackend):
         # needed
         self._manager.floating_ips_client.delete_floating_ip(
             self._floating_ip_resource['id'])
+        # Heat may not notice the deletion, since it wasn't done
+        # through the stack, so the wait is short and best-effort.
+        # The deletion of the stack which follows waits for it anyway.
         try:
-            self._search_resource_until_status(OS_NEUTRON_FLOATING_IP,
-                                               status=RESOURCE_DELETED_STATUS)
+            self._search_resource_until_status(
+                OS_NEUTRON_FLOATING_IP, status=RESOURCE_DELETED_STATUS,
+                deadline=HEAT_RESOURCE_LIMIT * HEAT_RESOURCE_TIMEOUT)
         except exceptions.ArgusError:
             # Can't find it, just quit.
             return
 
     def _search_resource_until_status(self, resource_name,
-                                      limit=HEAT_RESOURCE_LIMIT,
+                                      deadline=HEAT_RESOURCE_DEADLINE,
                                       status=RESOURCE_COMPLETED_STATUS):
-        fields = {
-            'stack_id': self._name,
-            'nested_depth': 1,
-        }
-        while limit > 0:
-            try:
-                resources = self._heat_client.resources.list(**fields)
-            except exc.HTTPNotFound:
-                raise exceptions.ArgusError('Stack not found: %s' % self._name)
-            else:
-                for resource in resources:
-                    if resource.resource_type == resource_name:
-                        # Found the resource we were needing
-                        if resource.resource_status == status:
-                            return resource.physical_resource_id
-                        else:
-                            limit -= 1
-                            time.sleep(HEAT_RESOURCE_TIMEOUT)
-                            break
-                else:
-                    break
-
-        raise exceptions.ArgusError("No resource %s found with name %s"
-                                    % (resource_name, self._name))
+        """Wait for a resource of the given type to reach `status`.
+
+        The resources are polled every `HEAT_RESOURCE_TIMEOUT` seconds
+        at most, for at most `deadline` seconds.
+
+        :returns: The physical id of the resource.
+        """
+        if self._watcher is None:
+            raise exceptions.ArgusError('Stack not found: %s' % self._name)
+        return self._watcher.wait_resource(resource_name, status,
+                                           deadline=deadline,
+                                           delay=HEAT_RESOURCE_TIMEOUT)
 
     @util.cached_property
     def _internal_id(self):
@@ -265,6 +253,10 @@ class BaseHeatBackend(base.CloudBackend):
             self.internal_instance_id(),
             limit)
 
+    def console_reader(self):
+        """Get the reader of the console output of the instance."""
+        return self._manager.console_reader(self.internal_instance_id())
+
     def reboot_instance(self):
         """Reboot the underlying instance."""
         return self._manager.reboot_instance(self.internal_instance_id())
@@ -288,8 +280,7 @@ class BaseHeatBackend(base.CloudBackend):
 
     def get_image_by_ref(self):
         """Get the image object by its reference id."""
-        return self._manager.compute_images_client.show_image(
-            CONFIG.openstack.image_ref)
+        return self._manager.show_image(CONFIG.openstack.image_ref)
 
     def get_mtu(self):
         return self._manager.get_mtu()
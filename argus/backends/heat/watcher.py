@@ -0,0 +1,181 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Follow the status of a Heat stack and of its resources.
+
+Only the stack created by a back-end is queried, by its full
+identifier, so that the client doesn't have to look it up first. The
+status of the resources is taken from the events of the stack, which
+are fetched incrementally, every request asking only for the events
+after the last one seen.
+"""
+
+from heatclient import exc
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+from argus import retry
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+DELETE_COMPLETE = "DELETE_COMPLETE"
+FAILED_SUFFIX = "_FAILED"
+
+
+def stack_identifier(name, stack_id=None):
+    """Get the identifier of a stack, as used in the Heat API.
+
+    The ``name/id`` form is used as is by the client, while a name or
+    an id alone is looked up with an additional request.
+    """
+    if stack_id is None:
+        return name
+    return "{}/{}".format(name, stack_id)
+
+
+class StackWatcher(object):
+    """Keep track of a stack and of the status of its resources.
+
+    :param heat_client:
+        The Heat client of the credentials which created the stack.
+    :param identifier:
+        The identifier of the stack, see :func:`stack_identifier`.
+    """
+
+    def __init__(self, heat_client, identifier):
+        self._client = heat_client
+        self.identifier = identifier
+        self._marker = None
+        # The names of the resources of every type.
+        self._names = {}
+        # The last event of every resource.
+        self.resources = {}
+
+    def _not_found(self):
+        return exceptions.ArgusError(
+            'Stack not found: %s' % self.identifier)
+
+    def poll(self):
+        """Fetch the events which happened since the last call.
+
+        :returns: The new events, oldest first.
+        """
+        try:
+            events = self._client.events.list(
+                self.identifier, marker=self._marker, sort_dir="asc",
+                nested_depth=1)
+        except exc.HTTPNotFound:
+            raise self._not_found()
+
+        for event in events:
+            self.resources[event.resource_name] = event
+            self._marker = event.id
+        return events
+
+    def resource_names(self, resource_type):
+        """Get the names of the resources of the given type."""
+        if resource_type not in self._names:
+            try:
+                resources = self._client.resources.list(
+                    self.identifier, nested_depth=1)
+            except exc.HTTPNotFound:
+                raise self._not_found()
+            names = {}
+            for resource in resources:
+                names.setdefault(resource.resource_type, []).append(
+                    resource.resource_name)
+            if resource_type not in names:
+                # The resource might not be created yet.
+                return []
+            self._names = names
+        return self._names[resource_type]
+
+    def resource_status(self, resource_type, status):
+        """Check if a resource of the given type reached `status`.
+
+        :returns:
+            The physical id of the resource or ``None``, if no
+            resource of this type has the status yet.
+        :raises:
+            `ArgusError` if the resource failed.
+        """
+        self.poll()
+        for name in self.resource_names(resource_type):
+            event = self.resources.get(name)
+            if event is None:
+                continue
+            if event.resource_status == status:
+                return event.physical_resource_id
+            if event.resource_status.endswith(FAILED_SUFFIX):
+                raise exceptions.ArgusError(
+                    "The resource {} of the stack {} failed: {}".format(
+                        name, self.identifier,
+                        event.resource_status_reason))
+        return None
+
+    def wait_resource(self, resource_type, status, deadline, delay=None):
+        """Wait for a resource of the given type to reach `status`.
+
+        :param deadline:
+            The number of seconds after which the wait gives up.
+        :param delay:
+            The maximum number of seconds between two checks, by
+            default the `retry_delay` option.
+        :returns: The physical id of the resource.
+        """
+        if delay is None:
+            delay = CONFIG.argus.retry_delay
+        return retry.poll(
+            lambda: self.resource_status(resource_type, status),
+            "heat_wait_resource", delay=delay,
+            deadline=deadline,
+            error="No resource %s found with name %s"
+                  % (resource_type, self.identifier))
+
+    def is_deleted(self):
+        """Check if the stack was deleted.
+
+        :raises:
+            `ArgusHeatTeardown` if the deletion failed.
+        """
+        try:
+            stack = self._client.stacks.get(self.identifier)
+        except exc.HTTPNotFound:
+            return True
+        if stack.stack_status == DELETE_COMPLETE:
+            return True
+        if stack.stack_status.endswith(FAILED_SUFFIX):
+            raise exceptions.ArgusHeatTeardown(
+                "The stack {} failed to be deleted: {}".format(
+                    self.identifier, stack.stack_status_reason))
+        return False
+
+    def wait_deleted(self, delay, deadline):
+        """Wait for the stack to be deleted.
+
+        :param delay:
+            The maximum number of seconds between two checks.
+        :param deadline:
+            The number of seconds after which the wait gives up.
+        """
+        try:
+            retry.poll(self.is_deleted, "heat_wait_stacks",
+                       delay=delay, deadline=deadline)
+        except exceptions.ArgusTimeoutError:
+            raise exceptions.ArgusHeatTeardown(
+                "All stacks failed to be deleted in time!")
+        LOG.debug("The stack %s was deleted.", self.identifier)
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from argus.backends.tempest import tempest_backend
 from argus import config as argus_config
 from argus import exceptions
@@ -35,6 +37,10 @@ class NetworkWindowsBackend(tempest_backend.BaseWindowsTempestBackend):
     bound explicitly with the new created instance.
     """
 
+    # The network is created with the credentials of the back-end.
+    use_instance_pool = False
+    isolated_credentials = True
+
     def _get_isolated_network(self):
         """Returns the network itself from the isolated network resources.
 
@@ -130,25 +136,41 @@ class NetworkWindowsBackend(tempest_backend.BaseWindowsTempestBackend):
 
         super(NetworkWindowsBackend, self).setup_instance()
 
-    @staticmethod
-    def _find_ip_address(port, subnet_id):
-        for fixed_ip in port["fixed_ips"]:
-            if fixed_ip["subnet_id"] == subnet_id:
-                return fixed_ip["ip_address"]
+    @util.cached_property
+    def _network_details(self):
+        """Get the subnets of the networks and the ports of the instance.
+
+        They are fetched once, with a request for each kind, and
+        indexed by the subnet ID.
+        """
+        network_ids = [network["uuid"] for network in self._networks or []]
+        subnets = collections.defaultdict(list)
+        if network_ids:
+            for subnet in self._manager.subnets_client.list_subnets(
+                    network_id=network_ids)["subnets"]:
+                subnets[subnet["network_id"]].append(subnet)
+
+        addresses = {}
+        ports = self._manager.ports_client.list_ports(
+            device_id=self.internal_instance_id())["ports"]
+        for port in ports:
+            if "compute" not in port["device_owner"]:
+                continue
+            for fixed_ip in port["fixed_ips"]:
+                addresses.setdefault(
+                    fixed_ip["subnet_id"],
+                    (port["mac_address"], fixed_ip["ip_address"]))
+        return subnets, addresses
 
     def get_network_interfaces(self):
         """Retrieve and parse network details from the compute node."""
-        ports_client = self._manager.ports_client
-        networks_client = self._manager.networks_client
-        subnets_client = self._manager.subnets_client
+        subnets, addresses = self._network_details
         guest_nics = []
         for network in self._networks or []:
-            network_id = network["uuid"]
-            net_details = networks_client.show_network(network_id)["network"]
             nic = dict.fromkeys(util.NETWORK_KEYS)
-            for subnet_id in net_details["subnets"]:
-                details = subnets_client.show_subnet(subnet_id)["subnet"]
-
+            # The IPv6 subnets are added after the IPv4 ones.
+            for details in sorted(subnets[network["uuid"]],
+                                  key=lambda subnet: subnet["ip_version"]):
                 # The network interface should follow the format found under
                 # `windows.InstanceIntrospection.get_network_interfaces`
                 # method or `argus.util.NETWORK_KEYS` model.
@@ -161,22 +183,14 @@ class NetworkWindowsBackend(tempest_backend.BaseWindowsTempestBackend):
                     details["cidr"].split("/")[1] if v6switch
                     else util.cidr2netmask(details["cidr"]))
 
-                # Find rest of the details under the ports using this subnet.
+                # Find rest of the details under the port using this subnet.
                 # There should be no conflicts because on the current
                 # architecture every instance is using its own router,
                 # subnet and network accessible only to it.
-                ports = ports_client.list_ports()["ports"]
-                for port in ports:
-                    # Select instance related ports only, with the
-                    # corresponding subnet ID.
-                    if "compute" not in port["device_owner"]:
-                        continue
-                    ip_address = self._find_ip_address(port, subnet_id)
-                    if not ip_address:
-                        continue
-                    nic["mac"] = port["mac_address"].upper()
+                if details["id"] in addresses:
+                    mac_address, ip_address = addresses[details["id"]]
+                    nic["mac"] = mac_address.upper()
                     nic["address" + v6suffix] = ip_address
-                    break
 
             guest_nics.append(nic)
         return guest_nics
@@ -13,6 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import atexit
+import functools
+import threading
+
+from argus.backends import console
+from argus import config as argus_config
 from argus import exceptions
 from argus import log as argus_log
 from argus import util
@@ -24,18 +30,31 @@ with util.restore_excepthook():
 
 
 OUTPUT_STATUS_OK = 200
-OUTPUT_SIZE = 128
-OUTPUT_EPSILON = int(OUTPUT_SIZE / 10)
+OUTPUT_SIZE = console.OUTPUT_SIZE
+OUTPUT_EPSILON = console.OUTPUT_EPSILON
+CONFIG = argus_config.CONFIG
 LOG = argus_log.LOG
 
+_SHARED_MANAGER = None
+_SHARED_MANAGER_LOCK = threading.Lock()
+# The lookups which don't change while argus runs, the flavors and the
+# availability zones, by project. The images aren't cached, since the
+# snapshots come and go.
+_LOOKUPS = util.FactCache()
+
 
 class APIManager(object):
     """The APIManager for interacting between modules.
 
     Manager which uses tempest modules for interacting with the OpenStack API.
+
+    :param shared:
+        Whether the manager and its credentials are shared by the
+        back-ends of the process, see :func:`get_manager`.
     """
 
-    def __init__(self):
+    def __init__(self, shared=False):
+        self.shared = shared
         self.isolated_creds = credentials.get_credentials_provider(
             self.__class__.__name__, network_resources={})
         primary_credentials = self.primary_credentials()
@@ -73,8 +92,17 @@ class APIManager(object):
         # Heat client
         self.orchestration_client = self._manager.orchestration_client
 
-    def cleanup_credentials(self):
-        """Cleanup any credentials created during the initialization."""
+        self._console_readers = {}
+        self._console_lock = threading.Lock()
+
+    def cleanup_credentials(self, force=False):
+        """Cleanup any credentials created during the initialization.
+
+        The credentials of a shared manager are kept until the process
+        exits, unless `force` is given.
+        """
+        if self.shared and not force:
+            return
         self.isolated_creds.clear_creds()
 
     def primary_credentials(self):
@@ -92,6 +120,10 @@ class APIManager(object):
         as well as a method for destroying the key-pair if needed.
         """
 
+        if self.shared:
+            # The key-pairs of the back-ends sharing the credentials
+            # need distinct names.
+            name = util.rand_name(name)
         keypair = self.keypairs_client.create_keypair(
             name=name + "-key")['keypair']
         return Keypair(public_key=keypair['public_key'],
@@ -123,28 +155,79 @@ class APIManager(object):
         return self.servers_client.get_console_output(
             server_id=instance_id, length=limit)['output']
 
+    def console_reader(self, instance_id, limit=OUTPUT_SIZE):
+        """Get the reader of the console output of the given instance.
+
+        The same reader is returned for an instance, so that the
+        output is downloaded only once.
+
+        :param limit:
+            Number of lines to fetch from the end of console log,
+            the first time.
+        :rtype: :class:`argus.backends.console.ConsoleReader`
+        """
+        with self._console_lock:
+            reader = self._console_readers.get(instance_id)
+            if reader is None:
+                reader = console.ConsoleReader(
+                    functools.partial(self._instance_output, instance_id),
+                    limit=limit)
+                self._console_readers[instance_id] = reader
+            return reader
+
     def instance_output(self, instance_id, limit):
         """Get the console output, sent from the instance.
 
+        Only the lines which weren't seen before are downloaded.
+
         :param instance_id:
             The id of the instance for which the output will
             be retrieved.
         :param limit:
-            Number of lines to fetch from the end of console log.
+            Number of lines to fetch from the end of console log,
+            the first time.
         """
-        content = None
-        while True:
-            content = self._instance_output(instance_id, limit)
-            if len(content.splitlines()) >= (limit - OUTPUT_EPSILON):
-                limit *= 2
-            else:
-                break
-        return content
+        reader = self.console_reader(instance_id, limit)
+        reader.read()
+        return reader.getvalue()
 
     def instance_server(self, instance_id):
         """Get more details about the given instance id."""
         return self.servers_client.show_server(instance_id)['server']
 
+    def _lookup(self, key, compute):
+        # The flavors and the zones seen by a project may be private.
+        credentials = self.primary_credentials()
+        project = (getattr(credentials, "project_id", None) or
+                   getattr(credentials, "tenant_id", None))
+        return _LOOKUPS.get((project, ) + key, compute)
+
+    def list_images(self):
+        """List the images."""
+        return self.image_client.list_images()["images"]
+
+    def get_image_meta(self, image_ref):
+        """Get the metadata of an image from Glance."""
+        return self.image_client.get_image_meta(image_ref)
+
+    def show_image(self, image_ref):
+        """Get an image from the compute API."""
+        return self.compute_images_client.show_image(image_ref)
+
+    def show_flavor(self, flavor_ref):
+        """Get a flavor, cached for the project."""
+        return self._lookup(
+            ("flavor", flavor_ref),
+            lambda: self.flavors_client.show_flavor(flavor_ref))
+
+    def availability_zones(self):
+        """Get the names of the availability zones, cached for the project."""
+        def list_zones():
+            zones = self.availability_zone_client.list_availability_zones()
+            return {zone['zoneName']
+                    for zone in zones['availabilityZoneInfo']}
+        return self._lookup(("availability_zones", ), list_zones)
+
     def get_mtu(self):
         """Get the MTU value, from the back-end."""
         try:
@@ -154,6 +237,27 @@ class APIManager(object):
                                         'tempest backend: %s' % exc)
 
 
+def get_manager(isolated=False):
+    """Get an API manager for a back-end or a lookup.
+
+    If the ``share_credentials`` option is set, the same manager, with
+    the same credentials, is returned to all the callers of the
+    process, its credentials being removed at exit. Otherwise, or if
+    `isolated` is given, a new manager with its own credentials is
+    created. Either way, :meth:`APIManager.cleanup_credentials` should
+    be called when the manager is no longer needed.
+    """
+    global _SHARED_MANAGER    # pylint: disable=global-statement
+    if isolated or not CONFIG.openstack.share_credentials:
+        return APIManager()
+
+    with _SHARED_MANAGER_LOCK:
+        if _SHARED_MANAGER is None:
+            _SHARED_MANAGER = APIManager(shared=True)
+            atexit.register(_SHARED_MANAGER.cleanup_credentials, force=True)
+        return _SHARED_MANAGER
+
+
 class Keypair(object):
     """A key-pair container."""
 
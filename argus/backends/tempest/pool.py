@@ -0,0 +1,332 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A pool of instances booted ahead of the scenarios which need them.
+
+Booting an instance takes most of the time of setting up a back-end.
+The pool keeps booted instances for the specifications which were
+requested before, an instance being described by the arguments given
+for creating it, and hands them out to the back-ends. The instances
+kept idle for too long are deleted.
+"""
+
+import atexit
+import collections
+import threading
+import time
+
+import six
+
+from argus.backends.tempest import manager as api_manager
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+from argus import retry
+from argus import util
+
+with util.restore_excepthook():
+    from tempest.lib import exceptions as lib_exceptions
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+# The number of seconds the shutdown waits for the instances which
+# are still booting, before deleting them by itself.
+SHUTDOWN_TIMEOUT = 60
+
+
+def _freeze(value):
+    """Get a hashable version of the given arguments."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item))
+                            for key, item in six.iteritems(value)))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class InstancePool(object):
+    """Boot instances ahead of demand and hand them out.
+
+    Every specification gets up to `size` idle instances, but only
+    after it was requested more than once, so that the instances
+    which are unlikely to be used again are not booted for nothing.
+
+    :param manager:
+        The :class:`argus.backends.tempest.manager.APIManager` used
+        for booting the instances. The back-ends which use the pool
+        share it.
+    :param size:
+        The maximum number of idle instances for a specification.
+    :param max_idle:
+        The number of seconds after which an idle instance is deleted.
+    """
+
+    def __init__(self, manager, size=None, max_idle=None):
+        self.manager = manager
+        self._client = manager.servers_client
+        self._size = max(CONFIG.openstack.instance_pool_size
+                         if size is None else size, 0)
+        self._max_idle = (CONFIG.openstack.instance_pool_max_idle
+                          if max_idle is None else max_idle)
+        self._lock = threading.Lock()
+        self._keypair = None
+        self._closed = False
+        # The idle instances and the time they were booted at.
+        self._idle = collections.defaultdict(collections.deque)
+        self._booting = collections.Counter()
+        self._requests = collections.Counter()
+        self._specs = {}
+        self._busy = {}
+        self._counters = collections.Counter()
+        # The threads booting the idle instances and the servers they
+        # created, until they are active.
+        self._threads = set()
+        self._starting = set()
+
+    @property
+    def keypair(self):
+        """The key-pair of the instances booted by the pool."""
+        with self._lock:
+            if self._keypair is None:
+                self._keypair = self.manager.create_keypair(
+                    name=util.rand_name("argus-pool"))
+            return self._keypair
+
+    def _wait_active(self, server_id, until_closed=False):
+        def active():
+            if until_closed and self._closed:
+                raise exceptions.ArgusError(
+                    "The pool was shut down while booting the server "
+                    "{}.".format(server_id))
+            server = self._client.show_server(server_id)["server"]
+            if server["status"] == "ERROR":
+                raise exceptions.ArgusError(
+                    "The server {} failed to boot.".format(server_id))
+            return server["status"] == "ACTIVE"
+
+        retry.poll(active, "instance_pool.boot",
+                   delay=CONFIG.argus.retry_delay,
+                   deadline=CONFIG.openstack.instance_pool_boot_timeout,
+                   error="The server {} is not active.".format(server_id))
+
+    def _wait_deleted(self, server_id):
+        def deleted():
+            try:
+                self._client.show_server(server_id)
+            except lib_exceptions.NotFound:
+                return True
+            return False
+
+        retry.poll(deleted, "instance_pool.delete",
+                   delay=CONFIG.argus.retry_delay,
+                   deadline=CONFIG.openstack.instance_pool_boot_timeout,
+                   error="The server {} was not deleted.".format(server_id))
+
+    def _boot(self, name, kwargs, idle=False):
+        server = self._client.create_server(
+            name=util.rand_name(name) + "-instance", **kwargs)["server"]
+        if idle:
+            with self._lock:
+                self._starting.add(server["id"])
+        try:
+            # Nobody waits for an idle instance once the pool is closed.
+            self._wait_active(server["id"], until_closed=idle)
+        except exceptions.ArgusError:
+            self._destroy(server["id"])
+            raise
+        with self._lock:
+            self._counters["created"] += 1
+        return server
+
+    def _destroy(self, server_id, wait=False):
+        with self._lock:
+            self._starting.discard(server_id)
+            self._counters["destroyed"] += 1
+        try:
+            self._client.delete_server(server_id)
+        except lib_exceptions.NotFound:
+            # Already deleted by the shutdown.
+            return
+        if wait:
+            self._wait_deleted(server_id)
+
+    def _boot_idle(self, key):
+        name, kwargs = self._specs[key]
+        try:
+            server = self._boot(name, kwargs, idle=True)
+        except Exception as exc:    # pylint: disable=broad-except
+            LOG.warning("Booting an idle instance failed with %r.", exc)
+            with self._lock:
+                self._booting[key] -= 1
+                self._counters["failed"] += 1
+            return
+        finally:
+            with self._lock:
+                self._threads.discard(threading.current_thread())
+
+        with self._lock:
+            self._booting[key] -= 1
+            self._starting.discard(server["id"])
+            closed = self._closed
+            if not closed:
+                self._idle[key].append((server, time.time()))
+        if closed:
+            self._destroy(server["id"])
+
+    def _refill(self, key, target):
+        with self._lock:
+            if self._closed:
+                return
+            missing = target - len(self._idle[key]) - self._booting[key]
+            self._booting[key] += max(missing, 0)
+
+            for _ in range(missing):
+                thread = threading.Thread(target=self._boot_idle,
+                                          args=(key, ))
+                thread.daemon = True
+                self._threads.add(thread)
+                thread.start()
+
+    def prewarm(self, count, name, **kwargs):
+        """Start booting `count` idle instances for the given arguments."""
+        key = _freeze(kwargs)
+        with self._lock:
+            self._specs.setdefault(key, (name, kwargs))
+        self._refill(key, min(count, self._size))
+
+    def acquire(self, name, **kwargs):
+        """Get an active instance created with the given arguments.
+
+        An idle instance is handed out if there is one, otherwise a
+        new one is booted. The arguments are the ones accepted by the
+        ``create_server`` method of the servers client.
+
+        :returns: The server, as given by the servers client.
+        """
+        self.reap()
+        key = _freeze(kwargs)
+        with self._lock:
+            self._specs.setdefault(key, (name, kwargs))
+            self._requests[key] += 1
+            requests = self._requests[key]
+            idle = self._idle[key]
+            server = idle.popleft()[0] if idle else None
+            self._counters["hits" if server else "misses"] += 1
+
+        if server is None:
+            server = self._boot(name, kwargs)
+        with self._lock:
+            self._busy[server["id"]] = (key, server)
+
+        # The specifications requested again will probably be
+        # requested once more.
+        self._refill(key, min(requests - 1, self._size))
+        LOG.debug("Instance pool: %s", self.stats())
+        return server
+
+    def release(self, server_id):
+        """Give back an instance handed out by :meth:`acquire`.
+
+        The instance was changed by the scenario which used it, so it
+        is deleted and the call returns after the deletion.
+        """
+        with self._lock:
+            self._busy.pop(server_id, None)
+        self._destroy(server_id, wait=True)
+
+    def reap(self):
+        """Delete the instances which were idle for too long."""
+        expired = []
+        now = time.time()
+        with self._lock:
+            for idle in self._idle.values():
+                while idle and now - idle[0][1] > self._max_idle:
+                    expired.append(idle.popleft()[0])
+            self._counters["expired"] += len(expired)
+
+        for server in expired:
+            LOG.debug("Deleting the idle instance %s.", server["id"])
+            self._destroy(server["id"])
+
+    def stats(self):
+        """Get the number of instances in every state and the counters.
+
+        :rtype: dict
+        """
+        with self._lock:
+            stats = dict.fromkeys(
+                ("hits", "misses", "created", "expired",
+                 "destroyed", "failed"), 0)
+            stats.update(self._counters)
+            stats["idle"] = sum(len(idle) for idle in self._idle.values())
+            stats["booting"] = sum(self._booting.values())
+            stats["busy"] = len(self._busy)
+            return stats
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Delete the idle instances and the key-pair of the pool.
+
+        The threads booting the other idle instances stop waiting for
+        them and delete them. The servers they created which are left
+        after `timeout` seconds are deleted by this call.
+        """
+        with self._lock:
+            self._closed = True
+            idle = [server for servers in self._idle.values()
+                    for server, _ in servers]
+            self._idle.clear()
+            keypair, self._keypair = self._keypair, None
+            threads = list(self._threads)
+
+        for server in idle:
+            self._destroy(server["id"])
+
+        deadline = time.time() + timeout
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+        with self._lock:
+            starting, self._starting = self._starting, set()
+        for server_id in starting:
+            LOG.warning("Deleting the instance %s, which is still booting.",
+                        server_id)
+            self._destroy(server_id)
+        if keypair is not None:
+            keypair.destroy()
+        LOG.info("Instance pool shut down: %s", self.stats())
+
+
+def get_instance_pool():
+    """Get the pool shared by the back-ends of this process.
+
+    The pool uses a manager from :func:`api_manager.get_manager`, so
+    its credentials are the shared ones if the ``share_credentials``
+    option is set. Otherwise, they are its own and they are removed
+    at exit.
+    """
+    global _POOL    # pylint: disable=global-statement
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = InstancePool(api_manager.get_manager())
+
+            def shutdown(pool=_POOL):
+                pool.shutdown()
+                pool.manager.cleanup_credentials()
+
+            atexit.register(shutdown)
+        return _POOL
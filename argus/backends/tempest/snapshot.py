@@ -0,0 +1,231 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache the images of instances which have Cloudbase-Init installed.
+
+Installing Cloudbase-Init and replacing its files and code gives the
+same result for every scenario which uses the same base image and the
+same installer, patch and git command. The first instance prepared
+this way is snapshotted before being configured and sysprepped, and
+the following instances are booted from that snapshot instead.
+
+The installer is told apart by the ETag or the modification time given
+by the server hosting it, so that a new build published under the same
+name isn't hidden by the snapshots of the previous one.
+
+The snapshots are regular images, tagged with the key of the
+preparation and the time they were last used, so that the least
+recently used ones can be evicted.
+"""
+
+import hashlib
+import threading
+import time
+
+import requests
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+from argus import retry
+from argus import util
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+KEY_PROPERTY = "argus_snapshot_key"
+LAST_USED_PROPERTY = "argus_last_used"
+# The number of seconds to wait for the server hosting the installer.
+INSTALLER_TIMEOUT = 30
+
+# The keys whose snapshots are being created by this process.
+_STORING = set()
+_STORING_LOCK = threading.Lock()
+
+
+def installer_version(build=None, arch=None):
+    """Get what identifies the Cloudbase-Init installer being used.
+
+    This is the ETag of the installer found under `installer_root_url`
+    or, if the server doesn't give one, its modification time.
+
+    :returns: ``None`` if the installer can't be identified.
+    """
+    url = "{}/{}".format(
+        CONFIG.argus.installer_root_url.rstrip("/"),
+        util.CBINIT_INSTALLER.format(build=build or CONFIG.argus.build,
+                                     arch=arch or CONFIG.argus.arch))
+    try:
+        response = requests.head(url, allow_redirects=True,
+                                 timeout=INSTALLER_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        LOG.warning("Could not identify the installer %s: %s", url, exc)
+        return None
+    version = (response.headers.get("ETag") or
+               response.headers.get("Last-Modified"))
+    if not version:
+        LOG.warning("The installer %s has neither an ETag nor a "
+                    "modification time.", url)
+    return version
+
+
+def snapshot_key(image_ref=None, build=None, arch=None, patch_install=None,
+                 git_command=None, git_repository=None, installer=None):
+    """Get the key of an instance prepared with the given parameters.
+
+    The parameters which are not given are taken from the
+    configuration file, the installer being identified by
+    :func:`installer_version`.
+
+    :returns:
+        ``None`` if the installer can't be identified, in which case
+        no snapshot should be used.
+    """
+    build = build or CONFIG.argus.build
+    arch = arch or CONFIG.argus.arch
+    installer = installer or installer_version(build, arch)
+    if not installer:
+        LOG.warning("The snapshots can't be used without knowing which "
+                    "installer they have.")
+        return None
+
+    parts = (
+        image_ref or CONFIG.openstack.image_ref,
+        build,
+        arch,
+        patch_install or CONFIG.argus.patch_install or "",
+        git_command or CONFIG.argus.git_command or "",
+        git_repository or CONFIG.argus.cbinit_git_repository or "",
+        installer,
+    )
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _parse_image_id(response):
+    image_id = response.get("image_id")
+    if image_id:
+        return image_id
+    # Older versions of the compute API give only the location.
+    return response.response["location"].rstrip("/").split("/")[-1]
+
+
+class SnapshotCache(object):
+    """A cache of prepared images, evicted in LRU order.
+
+    :param images_client:
+        The compute images client, as given by
+        :class:`argus.backends.tempest.manager.APIManager`.
+    :param size:
+        The maximum number of snapshots kept.
+    """
+
+    def __init__(self, images_client, size=None):
+        self._client = images_client
+        self._size = max(size or CONFIG.openstack.snapshot_cache_size, 1)
+
+    def _snapshots(self):
+        images = self._client.list_images(detail=True)["images"]
+        return [image for image in images
+                if KEY_PROPERTY in (image.get("metadata") or {})]
+
+    @staticmethod
+    def _last_used(image):
+        return float(image["metadata"].get(LAST_USED_PROPERTY) or 0)
+
+    def _touch(self, image_id):
+        now = "{:.3f}".format(time.time())
+        self._client.set_image_metadata_item(
+            image_id, LAST_USED_PROPERTY, {LAST_USED_PROPERTY: now})
+
+    def lookup(self, key):
+        """Get the id of the snapshot with the given key, if any.
+
+        The snapshot is marked as used.
+        """
+        snapshots = [image for image in self._snapshots()
+                     if image["metadata"][KEY_PROPERTY] == key and
+                     image.get("status") == "ACTIVE"]
+        if not snapshots:
+            LOG.debug("No snapshot for the key %s.", key)
+            return None
+
+        image = max(snapshots, key=self._last_used)
+        LOG.info("Using the snapshot %s for the key %s.", image["id"], key)
+        self._touch(image["id"])
+        return image["id"]
+
+    def _wait_active(self, image_id):
+        def active():
+            status = self._client.show_image(image_id)["image"]["status"]
+            if status.upper() in ("ERROR", "KILLED", "DELETED"):
+                raise exceptions.ArgusError(
+                    "The snapshot {} ended up {}.".format(image_id, status))
+            return status == "ACTIVE"
+
+        retry.poll(active, "snapshot_cache.store",
+                   delay=CONFIG.argus.retry_delay,
+                   deadline=CONFIG.openstack.snapshot_timeout,
+                   error="The snapshot {} is not active.".format(image_id))
+
+    def store(self, server_id, key):
+        """Snapshot the given server under the given key.
+
+        The call returns after the snapshot can be booted, so that
+        the server can be changed afterwards. If another snapshot
+        with the same key is being created by this process, nothing
+        is done.
+
+        :returns: The id of the snapshot or ``None``.
+        """
+        with _STORING_LOCK:
+            if key in _STORING:
+                LOG.debug("The snapshot for the key %s is already being "
+                          "created.", key)
+                return None
+            _STORING.add(key)
+
+        try:
+            LOG.info("Creating a snapshot of %s for the key %s.",
+                     server_id, key)
+            response = self._client.create_image(
+                server_id, name=util.rand_name("argus-snapshot"),
+                metadata={KEY_PROPERTY: key,
+                          LAST_USED_PROPERTY: "{:.3f}".format(time.time())})
+            image_id = _parse_image_id(response)
+            try:
+                self._wait_active(image_id)
+            except exceptions.ArgusError:
+                self._client.delete_image(image_id)
+                raise
+        finally:
+            with _STORING_LOCK:
+                _STORING.discard(key)
+
+        self.evict()
+        return image_id
+
+    def evict(self):
+        """Delete the least recently used snapshots over the size."""
+        snapshots = sorted(self._snapshots(), key=self._last_used,
+                           reverse=True)
+        for image in snapshots[self._size:]:
+            LOG.info("Evicting the snapshot %s for the key %s.",
+                     image["id"], image["metadata"][KEY_PROPERTY])
+            self._client.delete_image(image["id"])
@@ -15,14 +15,18 @@
 
 import abc
 import base64
+import functools
 
 import six
 
 from argus.backends import base as base_backend
 from argus.backends.tempest import manager as api_manager
+from argus.backends.tempest import pool
+from argus.backends.tempest import snapshot
 from argus.backends import windows
 from argus import config as argus_config
 from argus import log as argus_log
+from argus.recipes import pipeline
 from argus import util
 
 with util.restore_excepthook():
@@ -35,6 +39,45 @@ LOG = argus_log.LOG
 # Starting size as number of lines and tolerance.
 OUTPUT_SIZE = 128
 
+# The rules of the security group of every instance.
+SECURITY_GROUP_RULES = (
+    {
+        # HTTP RDP
+        'ip_protocol': 'tcp',
+        'from_port': 3389,
+        'to_port': 3389,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # HTTP WINRM
+        'ip_protocol': 'tcp',
+        'from_port': 5985,
+        'to_port': 5985,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # HTTPS WINRM
+        'ip_protocol': 'tcp',
+        'from_port': 5986,
+        'to_port': 5986,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # ssh
+        'ip_protocol': 'tcp',
+        'from_port': 22,
+        'to_port': 22,
+        'cidr': '0.0.0.0/0',
+    },
+    {
+        # ping
+        'ip_protocol': 'icmp',
+        'from_port': -1,
+        'to_port': -1,
+        'cidr': '0.0.0.0/0',
+    },
+)
+
 
 # pylint: disable=abstract-method
 @six.add_metaclass(abc.ABCMeta)
@@ -56,6 +99,14 @@ class BaseTempestBackend(base_backend.CloudBackend):
         The availability zone in which the underlying instance
         will be available.
     """
+
+    # Whether the instance can come from the shared instance pool.
+    use_instance_pool = True
+
+    # Whether the back-end needs credentials of its own, instead of
+    # the ones shared by the process.
+    isolated_credentials = False
+
     def __init__(self, name, userdata, metadata, availability_zone):
         if userdata:
             # NOTE(dtoncu): `encodestring` is a deprecated alias in Python 3.*;
@@ -70,6 +121,7 @@ class BaseTempestBackend(base_backend.CloudBackend):
         self._server = None
         self._keypair = None
         self._security_group = None
+        self._created_security_group = None
         self._security_groups_rules = []
         self._subnets = []
         self._routers = []
@@ -79,7 +131,36 @@ class BaseTempestBackend(base_backend.CloudBackend):
         # set some members from the configuration file needed by recipes
         self.image_ref = CONFIG.openstack.image_ref
         self.flavor_ref = CONFIG.openstack.flavor_ref
-        self._manager = api_manager.APIManager()
+        self._pool = None
+        if self.use_instance_pool and CONFIG.openstack.instance_pool_size:
+            self._pool = pool.get_instance_pool()
+            self._manager = self._pool.manager
+        else:
+            self._manager = api_manager.get_manager(
+                isolated=self.isolated_credentials)
+
+        self._snapshot_cache = None
+        self._snapshot_key = None
+        self._from_snapshot = False
+        if CONFIG.openstack.snapshot_cache:
+            self._snapshot_cache = snapshot.SnapshotCache(
+                self._manager.compute_images_client)
+
+    def _get_snapshot_key(self):
+        """Get the key of the snapshots usable by this instance.
+
+        The key needs a request to the server hosting the installer,
+        so it is computed only when the snapshots are first needed.
+        The snapshots aren't used if it can't be computed.
+        """
+        if self._snapshot_key is None and self._snapshot_cache:
+            try:
+                self._snapshot_key = snapshot.snapshot_key()
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG.warning("Could not compute the snapshot key: %r", exc)
+            if not self._snapshot_key:
+                self._snapshot_cache = None
+        return self._snapshot_key
 
     def _configure_networking(self):
         subnet_id = self._manager.primary_credentials().subnet["id"]
@@ -91,6 +172,10 @@ class BaseTempestBackend(base_backend.CloudBackend):
         for key, value in list(kwargs.items()):
             if not value:
                 del kwargs[key]
+        if self._pool and wait_until == 'ACTIVE':
+            return self._pool.acquire(self._name, imageRef=self.image_ref,
+                                      flavorRef=self.flavor_ref, **kwargs)
+
         server = self._manager.servers_client.create_server(
             name=util.rand_name(self._name) + "-instance",
             imageRef=self.image_ref,
@@ -100,13 +185,13 @@ class BaseTempestBackend(base_backend.CloudBackend):
             self._manager.servers_client, server['server']['id'], wait_until)
         return server['server']
 
-    def _assign_floating_ip(self):
+    def _create_floating_ip(self):
         floating_ip = self._manager.floating_ips_client.create_floating_ip()
-        floating_ip = floating_ip['floating_ip']
+        self._floating_ip = floating_ip['floating_ip']
 
+    def _assign_floating_ip(self):
         self._manager.floating_ips_client.associate_floating_ip_to_server(
-            floating_ip['ip'], self.internal_instance_id())
-        return floating_ip
+            self._floating_ip['ip'], self.internal_instance_id())
 
     def get_mtu(self):
         return self._manager.get_mtu()
@@ -117,63 +202,67 @@ class BaseTempestBackend(base_backend.CloudBackend):
         # need to specify the tenant network
         return self._manager.primary_credentials().network["id"]
 
-    def _add_security_group_exceptions(self, secgroup_id):
-        _client = self._manager.security_group_rules_client
-        rulesets = [
-            {
-                # HTTP RDP
-                'ip_protocol': 'tcp',
-                'from_port': 3389,
-                'to_port': 3389,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # HTTP WINRM
-                'ip_protocol': 'tcp',
-                'from_port': 5985,
-                'to_port': 5985,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # HTTPS WINRM
-                'ip_protocol': 'tcp',
-                'from_port': 5986,
-                'to_port': 5986,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # ssh
-                'ip_protocol': 'tcp',
-                'from_port': 22,
-                'to_port': 22,
-                'cidr': '0.0.0.0/0',
-            },
-            {
-                # ping
-                'ip_protocol': 'icmp',
-                'from_port': -1,
-                'to_port': -1,
-                'cidr': '0.0.0.0/0',
-            },
-        ]
-        for ruleset in rulesets:
-            sg_rule = _client.create_security_group_rule(
-                parent_group_id=secgroup_id, **ruleset)['security_group_rule']
-            yield sg_rule
-
-    def _create_security_groups(self):
+    def _create_security_group(self):
         sg_name = util.rand_name(self.__class__.__name__)
         sg_desc = sg_name + " description"
-        secgroup = self._manager.security_groups_client.create_security_group(
-            name=sg_name, description=sg_desc)['security_group']
+        self._created_security_group = (
+            self._manager.security_groups_client.create_security_group(
+                name=sg_name, description=sg_desc)['security_group'])
+
+    def _create_security_group_rule(self, ruleset):
+        _client = self._manager.security_group_rules_client
+        sg_rule = _client.create_security_group_rule(
+            parent_group_id=self._created_security_group['id'],
+            **ruleset)['security_group_rule']
+        self._security_groups_rules.append(sg_rule['id'])
 
-        # Add rules to the security group.
-        for rule in self._add_security_group_exceptions(secgroup['id']):
-            self._security_groups_rules.append(rule['id'])
+    def _add_security_group(self):
         self._manager.servers_client.add_security_group(
             server_id=self.internal_instance_id(),
-            name=secgroup['name'])
-        return secgroup
+            name=self._created_security_group['name'])
+        self._security_group = self._created_security_group
+
+    def _create_keypair(self):
+        if self._pool:
+            self._keypair = self._pool.keypair
+        else:
+            self._keypair = self._manager.create_keypair(
+                name=self.__class__.__name__)
+
+    def _boot_server(self):
+        if self._snapshot_cache and self._get_snapshot_key():
+            snapshot_id = self._snapshot_cache.lookup(self._snapshot_key)
+            if snapshot_id:
+                self.image_ref = snapshot_id
+                self._from_snapshot = True
+        self._server = self._create_server(
+            wait_until='ACTIVE',
+            key_name=self._keypair.name,
+            disk_config='AUTO',
+            user_data=self.userdata,
+            metadata=self.metadata,
+            networks=self._networks or ([
+                {"uuid": self.__get_id_tenant_network}]),
+            availability_zone=self._availability_zone)
+
+    def _delete_server(self):
+        if self._pool:
+            self._pool.release(self.internal_instance_id())
+            return
+        self._manager.servers_client.delete_server(
+            self.internal_instance_id())
+        waiters.wait_for_server_termination(
+            self._manager.servers_client,
+            self.internal_instance_id())
+
+    def _remove_security_group(self):
+        self._manager.servers_client.remove_security_group(
+            server_id=self.internal_instance_id(),
+            name=self._security_group['name'])
+
+    def _delete_security_group(self):
+        self._manager.security_groups_client.delete_security_group(
+            self._created_security_group['id'])
 
     def cleanup(self):
         """Cleanup the underlying instance.
@@ -181,54 +270,99 @@ class BaseTempestBackend(base_backend.CloudBackend):
         In order for the back-end to be useful again,
         call :meth:`setup_instance` method for preparing another
         underlying instance.
+
+        The resources are deleted at the same time, except for the
+        server, which is deleted after its security group is removed,
+        the security group, which is deleted after the server and its
+        rules, and the credentials, which are removed last. A failure
+        doesn't
+        keep the other resources from being deleted, the first
+        one being raised at the end.
         """
 
         LOG.info("Cleaning up...")
 
-        if self._security_groups_rules:
-            for rule in self._security_groups_rules:
-                (self._manager.security_group_rules_client.
-                 delete_security_group_rule(rule))
-
+        # The server takes the longest to delete, so it goes first.
+        steps = pipeline.Pipeline(workers=CONFIG.argus.api_workers,
+                                  best_effort=True)
         if self._security_group:
-            self._manager.servers_client.remove_security_group(
-                server_id=self.internal_instance_id(),
-                name=self._security_group['name'])
+            steps.add("remove_security_group", self._remove_security_group)
 
         if self._server:
-            self._manager.servers_client.delete_server(
-                self.internal_instance_id())
-            waiters.wait_for_server_termination(
-                self._manager.servers_client,
-                self.internal_instance_id())
+            steps.add("delete_server", self._delete_server,
+                      requires=["remove_security_group"]
+                      if self._security_group else ())
+
+        _client = self._manager.security_group_rules_client
+        group_requires = ["delete_server"] if self._server else []
+        for rule in self._security_groups_rules:
+            name = "delete_security_group_rule_{}".format(rule)
+            steps.add(name, functools.partial(
+                _client.delete_security_group_rule, rule))
+            group_requires.append(name)
+
+        # The group can't be deleted while the server still uses it.
+        if self._created_security_group:
+            if self._security_group and not self._server:
+                group_requires.append("remove_security_group")
+            steps.add("delete_security_group", self._delete_security_group,
+                      requires=group_requires)
 
         if self._floating_ip:
-            self._manager.floating_ips_client.delete_floating_ip(
-                self._floating_ip['id'])
+            steps.add("delete_floating_ip", functools.partial(
+                self._manager.floating_ips_client.delete_floating_ip,
+                self._floating_ip['id']))
 
-        if self._keypair:
-            self._keypair.destroy()
+        # The key-pair and the credentials of the pool are kept.
+        if self._keypair and not self._pool:
+            steps.add("destroy_keypair", self._keypair.destroy)
 
-        self._manager.cleanup_credentials()
+        try:
+            steps.run()
+        finally:
+            if not self._pool:
+                self._manager.cleanup_credentials()
 
     def setup_instance(self):
-        # pylint: disable=attribute-defined-outside-init
+        """Create the instance and the resources it needs.
+
+        The key-pair, the floating IP and the security group with its
+        rules are created at the same time, while the server boots
+        after the key-pair is created and the subnet is configured.
+        """
         LOG.info("Creating server...")
 
-        self._configure_networking()
-        self._keypair = self._manager.create_keypair(
-            name=self.__class__.__name__)
-        self._server = self._create_server(
-            wait_until='ACTIVE',
-            key_name=self._keypair.name,
-            disk_config='AUTO',
-            user_data=self.userdata,
-            metadata=self.metadata,
-            networks=self._networks or ([
-                {"uuid": self.__get_id_tenant_network}]),
-            availability_zone=self._availability_zone)
-        self._floating_ip = self._assign_floating_ip()
-        self._security_group = self._create_security_groups()
+        steps = pipeline.Pipeline(workers=CONFIG.argus.api_workers)
+        steps.add("configure_networking", self._configure_networking)
+        steps.add("create_keypair", self._create_keypair)
+        steps.add("create_server", self._boot_server,
+                  requires=["configure_networking", "create_keypair"])
+        steps.add("create_floating_ip", self._create_floating_ip)
+        steps.add("assign_floating_ip", self._assign_floating_ip,
+                  requires=["create_server", "create_floating_ip"])
+        steps.add("create_security_group", self._create_security_group)
+        rule_steps = []
+        for index, ruleset in enumerate(SECURITY_GROUP_RULES):
+            rule_steps.append("create_security_group_rule_{}".format(index))
+            steps.add(rule_steps[-1],
+                      functools.partial(self._create_security_group_rule,
+                                        ruleset),
+                      requires=["create_security_group"])
+        steps.add("add_security_group", self._add_security_group,
+                  requires=["create_server"] + rule_steps)
+        steps.run()
+        LOG.debug("Back-end setup steps, the critical path being "
+                  "marked:\n%s", steps.format_trace())
+
+    def booted_from_snapshot(self):
+        return self._from_snapshot
+
+    def snapshot_instance(self):
+        if (self._from_snapshot or not self._snapshot_cache or
+                not self._get_snapshot_key()):
+            return
+        self._snapshot_cache.store(self.internal_instance_id(),
+                                   self._snapshot_key)
 
     def reboot_instance(self):
         # Delegate to the manager to reboot the instance
@@ -248,6 +382,10 @@ class BaseTempestBackend(base_backend.CloudBackend):
             self.internal_instance_id(),
             limit)
 
+    def console_reader(self):
+        """Get the reader of the console output of the instance."""
+        return self._manager.console_reader(self.internal_instance_id())
+
     def instance_server(self):
         """Get the instance server object."""
         return self._manager.instance_server(self.internal_instance_id())
@@ -259,8 +397,7 @@ class BaseTempestBackend(base_backend.CloudBackend):
         return self._keypair.private_key
 
     def get_image_by_ref(self):
-        image = self._manager.compute_images_client.show_image(
-            CONFIG.openstack.image_ref)
+        image = self._manager.show_image(CONFIG.openstack.image_ref)
         return image['image']
 
     def floating_ip(self):
@@ -0,0 +1,254 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run several independent commands with a single remote invocation."""
+
+import base64
+import collections
+import re
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+from argus import retry
+from argus import util
+
+LOG = argus_log.LOG
+CONFIG = argus_config.CONFIG
+
+MARKER = "ARGUS-BATCH"
+
+# The script is sent UTF-16 and base64 encoded on the command line,
+# which can't be longer than 32K characters on Windows.
+MAX_SCRIPT_SIZE = 10000
+
+# Every item is run by this function, which prints a single line with
+# the index of the item, its exit code and its base64 encoded stdout
+# and stderr. The PowerShell items run in the same process, while the
+# CMD ones have their own cmd.exe, with stderr redirected to a file.
+# Since they share the process, a PowerShell item calling `exit` would
+# end the whole batch, so such items are refused by CommandBatch.add.
+SCRIPT_HEADER = """
+$ErrorActionPreference = "Continue"
+function Invoke-ArgusBatchItem($Index, $Type, $Encoded) {
+    $utf8 = [System.Text.Encoding]::UTF8
+    $command = $utf8.GetString([System.Convert]::FromBase64String($Encoded))
+    $stdout = ""
+    $stderr = ""
+    $code = 0
+    if ($Type -eq "cmd") {
+        $errorFile = [System.IO.Path]::GetTempFileName()
+        $info = New-Object System.Diagnostics.ProcessStartInfo
+        $info.FileName = "cmd.exe"
+        $info.Arguments = '/s /c "(' + $command + ') 2>"' + $errorFile + '""'
+        $info.UseShellExecute = $false
+        $info.RedirectStandardOutput = $true
+        $process = [System.Diagnostics.Process]::Start($info)
+        $stdout = $process.StandardOutput.ReadToEnd()
+        $process.WaitForExit()
+        $code = $process.ExitCode
+        $stderr = [System.IO.File]::ReadAllText($errorFile)
+        Remove-Item -Force $errorFile
+    } else {
+        $global:LASTEXITCODE = 0
+        $failed = $false
+        try {
+            $records = & ([ScriptBlock]::Create($command)) 2>&1
+        } catch {
+            $records = @($_)
+            $failed = $true
+        }
+        $output = @()
+        $errors = @()
+        foreach ($record in @($records)) {
+            if ($record -is [System.Management.Automation.ErrorRecord]) {
+                $errors += $record
+            } else {
+                $output += $record
+            }
+        }
+        $stdout = $output | Out-String
+        $stderr = $errors | Out-String
+        if ($LASTEXITCODE) {
+            $code = $LASTEXITCODE
+        } elseif ($failed -or $errors) {
+            $code = 1
+        }
+    }
+    $frame = "{0}|{1}|{2}|{3}|{4}" -f "%(marker)s", $Index, $code,
+        [System.Convert]::ToBase64String($utf8.GetBytes([string]$stdout)),
+        [System.Convert]::ToBase64String($utf8.GetBytes([string]$stderr))
+    [Console]::Out.WriteLine($frame)
+}
+""" % {"marker": MARKER}
+
+SCRIPT_ITEM = "Invoke-ArgusBatchItem {index} '{type}' '{command}'"
+# The failures are reported per item, not through the exit code.
+SCRIPT_FOOTER = "exit 0"
+
+# A PowerShell `exit` statement, but not e.g. $LASTEXITCODE or ExitCode.
+_EXIT = re.compile(r"(?<![\w$.-])exit(?![\w-])", re.IGNORECASE)
+
+CommandResult = collections.namedtuple("CommandResult",
+                                       "stdout stderr exit_code")
+
+
+def _encode(command):
+    encoded = base64.b64encode(command.encode("utf-8"))
+    return encoded.decode()
+
+
+def _decode(encoded):
+    return base64.b64decode(encoded).decode("utf-8", "ignore")
+
+
+def parse_output(output):
+    """Get the results of the batch items from the script output.
+
+    :rtype: dict
+    :returns: The :class:`CommandResult` of every item, by its index.
+    """
+    results = {}
+    for line in output.splitlines():
+        parts = line.strip().split("|")
+        if len(parts) != 5 or parts[0] != MARKER:
+            continue
+        _, index, exit_code, stdout, stderr = parts
+        results[int(index)] = CommandResult(
+            _decode(stdout).strip(),
+            _decode(stderr), int(exit_code))
+    return results
+
+
+class CommandBatch(object):
+    """A list of independent commands which are run together.
+
+    The commands are packed in as few PowerShell scripts as possible,
+    each of them being run with a single remote invocation. The output
+    of every command is framed, so that it can be split back and every
+    command gets its own stdout, stderr and exit code.
+
+    :param max_script_size:
+        The maximum number of characters of a script. The batch is
+        split in more scripts if the commands don't fit in one.
+    """
+
+    def __init__(self, max_script_size=MAX_SCRIPT_SIZE):
+        self._commands = []
+        self._max_script_size = max_script_size
+
+    def __len__(self):
+        return len(self._commands)
+
+    def add(self, command, command_type=util.POWERSHELL):
+        """Add a command to the batch and return its index.
+
+        Only PowerShell and CMD commands are supported. The PowerShell
+        commands can't call `exit`, since they run in the same process
+        as the rest of the batch, they should return or throw instead.
+        """
+        if command_type not in (util.POWERSHELL, util.CMD):
+            raise exceptions.ArgusError(
+                "Can't batch commands of type {!r}.".format(command_type))
+        if command_type == util.POWERSHELL and _EXIT.search(command):
+            raise exceptions.ArgusError(
+                "Can't batch the command {!r}, it calls exit.".format(
+                    command))
+        self._commands.append((command, command_type))
+        return len(self._commands) - 1
+
+    def scripts(self, indexes=None):
+        """Get the scripts which run the given commands.
+
+        :param indexes:
+            The indexes of the commands which should be run,
+            all of them by default.
+        :returns: Tuples of the indexes of the commands and the script.
+        """
+        if indexes is None:
+            indexes = range(len(self._commands))
+
+        base_size = len(SCRIPT_HEADER) + len(SCRIPT_FOOTER) + 1
+        current, lines = [], [SCRIPT_HEADER]
+        size = base_size
+        for index in indexes:
+            command, command_type = self._commands[index]
+            line = SCRIPT_ITEM.format(
+                index=index, command=_encode(command),
+                type="cmd" if command_type == util.CMD else "powershell")
+            if current and size + len(line) > self._max_script_size:
+                yield current, "\n".join(lines + [SCRIPT_FOOTER])
+                current, lines = [], [SCRIPT_HEADER]
+                size = base_size
+            current.append(index)
+            lines.append(line)
+            size += len(line) + 1
+        if current:
+            yield current, "\n".join(lines + [SCRIPT_FOOTER])
+
+    def run(self, execute_function, indexes=None):
+        """Run the commands once, with the given execute function.
+
+        :param execute_function:
+            A callable which runs a PowerShell command on the instance
+            and returns its standard output.
+        :rtype: dict
+        :returns: The :class:`CommandResult` of every command, by index.
+        """
+        results = {}
+        for script_indexes, script in self.scripts(indexes):
+            output = execute_function(script, command_type=util.POWERSHELL)
+            script_results = parse_output(output)
+            for index in script_indexes:
+                results[index] = script_results.get(
+                    index, CommandResult("", "No output was received.", 1))
+        return results
+
+    def execute(self, execute_function, count=CONFIG.argus.retry_count,
+                delay=CONFIG.argus.retry_delay):
+        """Run the commands until all of them succeed.
+
+        Only the commands which failed are run again, up to `count`
+        times, sleeping at most `delay` seconds between the attempts.
+
+        :raises:
+            `ArgusTimeoutError` if some commands are still failing
+            after `count` attempts.
+        :returns: A list with a :class:`CommandResult` for each command.
+        """
+        results = {}
+        pending = list(range(len(self._commands)))
+
+        def attempt():
+            try:
+                results.update(self.run(execute_function, pending))
+            except exceptions.ArgusError as exc:
+                # The script itself failed, every command is retried.
+                LOG.debug("Running the batch failed with %r.", exc)
+                return False
+            pending[:] = [index for index in pending
+                          if results[index].exit_code]
+            for index in pending:
+                LOG.debug("Batch command %r failed with %r.",
+                          self._commands[index][0], results[index])
+            return not pending
+
+        try:
+            retry.poll(attempt, "batch_execute", count=count, delay=delay)
+        except exceptions.ArgusTimeoutError:
+            raise exceptions.ArgusTimeoutError(
+                "Commands {!r} failed too many times.".format(
+                    [self._commands[index][0] for index in pending]))
+        return [results[index] for index in range(len(self._commands))]
@@ -0,0 +1,106 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A process wide executor for running calls with a timeout."""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+
+from multiprocessing import pool
+
+from argus import config as argus_config
+from argus import log as argus_log
+from argus import retry
+
+LOG = argus_log.LOG
+CONFIG = argus_config.CONFIG
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+# The number of seconds between two checks for aborting a call.
+ABORT_CHECK_INTERVAL = 5
+
+
+class TimeoutExecutor(object):
+    """Run callables in a bounded pool of worker threads.
+
+    The pool is created lazily and recreated if the process was
+    forked after its creation, since the worker threads are not
+    inherited by the child process.
+
+    :param workers:
+        The maximum number of calls which can run at the same time.
+        When all the workers are busy, the next calls are queued and
+        the time spent waiting counts towards their timeout.
+    """
+
+    def __init__(self, workers):
+        self._workers = max(workers, 1)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = pool.ThreadPool(processes=self._workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def call(self, func, args=(), kwargs=None, timeout=None):
+        """Call the given function in a worker and wait for its result.
+
+        :raises:
+            :class:`multiprocessing.TimeoutError` if the call didn't
+            finish in `timeout` seconds. The worker is not interrupted,
+            it is the caller's job to make the call finish, for instance
+            by cleaning up the remote command it waits for.
+            The exception raised by :func:`argus.retry.check_abort`,
+            if the waits of the scenario are aborted meanwhile.
+        """
+        result = self._get_pool().apply_async(func, args, kwargs or {})
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = ABORT_CHECK_INTERVAL
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.time(), 0))
+            try:
+                return result.get(timeout=wait)
+            except multiprocessing.TimeoutError:
+                if deadline is not None and time.time() >= deadline:
+                    raise
+            retry.check_abort()
+
+    def close(self):
+        """Stop the worker threads."""
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.terminate()
+            self._pool = None
+
+
+def get_executor():
+    """Get the executor shared by all the clients of this process."""
+    global _EXECUTOR    # pylint: disable=global-statement
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            LOG.debug("Creating a command executor with %d workers.",
+                      CONFIG.argus.command_workers)
+            _EXECUTOR = TimeoutExecutor(CONFIG.argus.command_workers)
+            atexit.register(_EXECUTOR.close)
+        return _EXECUTOR
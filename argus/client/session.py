@@ -0,0 +1,232 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pooling of WinRM protocol objects and remote shells."""
+
+import collections
+import contextlib
+import socket
+import threading
+import time
+
+import requests
+from winrm import exceptions as winrm_exceptions
+
+from argus import exceptions
+from argus import log as argus_log
+
+LOG = argus_log.LOG
+
+# Errors which tell us that the connection to the instance is gone,
+# usually because the instance rebooted. The shells opened before
+# are invalid after one of these and a new protocol is needed.
+# The SOAP faults (WinRMError and its subclasses) are answers from
+# a working connection, so they are not part of these.
+TRANSPORT_ERRORS = (
+    socket.error,
+    requests.ConnectionError,
+    requests.Timeout,
+    winrm_exceptions.WinRMTransportError,
+)
+
+# The WSMan fault code of a request for a shell which is not known
+# by the instance anymore, which happens after it rebooted.
+SHELL_NOT_FOUND_FAULT = 2150858843
+
+_Shell = collections.namedtuple("_Shell", "protocol shell_id generation "
+                                          "last_used")
+
+
+def _is_shell_gone(exc):
+    """Check if the given SOAP fault says that the shell is gone."""
+    if not isinstance(exc, winrm_exceptions.WinRMError):
+        return False
+    if getattr(exc, "wsman_fault_code", None) == SHELL_NOT_FOUND_FAULT:
+        return True
+    message = str(exc).lower()
+    return (str(SHELL_NOT_FOUND_FAULT) in message or
+            "shell was not found" in message)
+
+
+class SessionPool(object):
+    """Keep a WinRM protocol object and some opened shells alive.
+
+    Opening a shell and doing the HTTP authentication handshake for
+    each command costs more than a lot of the commands we are sending,
+    so the shells are kept open and reused between commands.
+
+    :param protocol_factory:
+        A callable which returns a new :class:`winrm.protocol.Protocol`.
+    :param shell_opener:
+        A callable which receives a protocol object and returns
+        the ID of a newly opened shell.
+    :param size:
+        The maximum number of idle shells which are kept open.
+    :param idle_timeout:
+        Number of seconds after which an idle shell is considered
+        expired and it is closed instead of being reused.
+    """
+
+    def __init__(self, protocol_factory, shell_opener, size=1,
+                 idle_timeout=None):
+        self._protocol_factory = protocol_factory
+        self._shell_opener = shell_opener
+        self._size = max(size, 0)
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._protocol = None
+        # Incremented each time the protocol is recreated, so that
+        # shells belonging to a previous connection can be recognized.
+        self._generation = 0
+        self._idle = []
+        self._stats = collections.Counter()
+
+    def stats(self):
+        """Return a dictionary with the usage counters of this pool.
+
+        * *hits*: how many times an already opened shell was reused.
+        * *misses*: how many times a new shell had to be opened.
+        * *reconnects*: how many times the protocol was recreated.
+        * *expired*: how many idle shells were dropped for being too old.
+        * *discarded*: how many shells were dropped after a failure.
+        """
+        with self._lock:
+            stats = dict.fromkeys(("hits", "misses", "reconnects",
+                                   "expired", "discarded"), 0)
+            stats.update(self._stats)
+            stats["idle"] = len(self._idle)
+            return stats
+
+    def _get_protocol(self):
+        with self._lock:
+            if self._protocol is None:
+                if self._generation:
+                    self._stats["reconnects"] += 1
+                self._generation += 1
+                self._protocol = self._protocol_factory()
+            return self._protocol, self._generation
+
+    def _is_expired(self, shell):
+        if not self._idle_timeout:
+            return False
+        return time.time() - shell.last_used > self._idle_timeout
+
+    def _pop_idle(self):
+        """Get a healthy idle shell, closing the expired ones."""
+        expired = []
+        found = None
+        with self._lock:
+            while self._idle:
+                shell = self._idle.pop()
+                if shell.generation != self._generation:
+                    self._stats["discarded"] += 1
+                elif self._is_expired(shell):
+                    self._stats["expired"] += 1
+                    expired.append(shell)
+                else:
+                    self._stats["hits"] += 1
+                    found = shell
+                    break
+
+        for shell in expired:
+            self._close(shell)
+        return found
+
+    def _acquire(self):
+        shell = self._pop_idle()
+        if shell is not None:
+            return shell
+
+        protocol_client, generation = self._get_protocol()
+        try:
+            shell_id = self._shell_opener(protocol_client)
+        except Exception:
+            # The connection could not be used for opening a shell,
+            # so don't rely on it for the next one.
+            self._invalidate(generation)
+            raise
+        with self._lock:
+            self._stats["misses"] += 1
+        return _Shell(protocol_client, shell_id, generation, time.time())
+
+    def _release(self, shell):
+        shell = shell._replace(last_used=time.time())
+        with self._lock:
+            if (shell.generation == self._generation and
+                    len(self._idle) < self._size):
+                self._idle.append(shell)
+                return
+        self._close(shell)
+
+    def _invalidate(self, generation):
+        """Drop the protocol object, if it is the given generation.
+
+        The idle shells were opened through the same connection, so
+        they are dropped as well, without trying to close them.
+        """
+        with self._lock:
+            if generation == self._generation:
+                self._protocol = None
+                self._generation += 1
+                self._stats["discarded"] += len(self._idle)
+                self._idle = []
+
+    @staticmethod
+    def _close(shell):
+        try:
+            shell.protocol.close_shell(shell.shell_id)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.debug("Could not close shell %s: %r", shell.shell_id, exc)
+
+    @contextlib.contextmanager
+    def shell(self):
+        """Get a tuple of a protocol object and an opened shell ID.
+
+        The shell is given back to the pool when the block finishes.
+        If a transport error occurs inside the block, or a SOAP fault
+        saying that the shell is gone, the shell is discarded and the
+        next request will reconnect to the instance. A shell on which
+        a command timed out is closed instead of being reused, since
+        it can still be busy with that command.
+        """
+        shell = self._acquire()
+        try:
+            yield shell.protocol, shell.shell_id
+        except Exception as exc:
+            if isinstance(exc, TRANSPORT_ERRORS) or _is_shell_gone(exc):
+                with self._lock:
+                    self._stats["discarded"] += 1
+                self._invalidate(shell.generation)
+            elif isinstance(exc, exceptions.ArgusTimeoutError):
+                with self._lock:
+                    self._stats["discarded"] += 1
+                self._close(shell)
+            else:
+                self._release(shell)
+            raise
+        else:
+            self._release(shell)
+
+    def reset(self):
+        """Close every idle shell and forget the current connection.
+
+        This should be called when the instance is known to reboot,
+        since none of the opened shells will be usable afterwards.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._protocol = None
+        for shell in idle:
+            self._close(shell)
@@ -0,0 +1,428 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Transfer files to and from a Windows instance over WinRM."""
+
+import base64
+import collections
+import hashlib
+import multiprocessing
+import os
+import time
+
+import six
+from winrm import protocol
+
+from argus.client import executor
+from argus import exceptions
+from argus import log as argus_log
+from argus import util
+
+LOG = argus_log.LOG
+
+# The space taken in a WinRM envelope by everything besides the
+# standard input, which is sent base64 encoded.
+ENVELOPE_OVERHEAD = 4096
+
+# The remote side reads one base64 encoded block per line from its
+# standard input and writes the raw bytes with a FileStream, while
+# computing the hash of what it received.
+UPLOAD_SCRIPT = """
+$ErrorActionPreference = "Stop"
+$path = '{path}'
+$mode = '{mode}'
+$sha = [System.Security.Cryptography.SHA256]::Create()
+$stream = New-Object System.IO.FileStream(
+    $path, [System.IO.FileMode]::$mode, [System.IO.FileAccess]::Write)
+$size = 0
+try {{
+    while (($line = [Console]::In.ReadLine()) -ne $null) {{
+        if (-not $line) {{ continue }}
+        $bytes = [System.Convert]::FromBase64String($line)
+        $stream.Write($bytes, 0, $bytes.Length)
+        $null = $sha.TransformBlock($bytes, 0, $bytes.Length, $null, 0)
+        $size += $bytes.Length
+    }}
+}} finally {{
+    $stream.Close()
+}}
+$null = $sha.TransformFinalBlock([byte[]]@(), 0, 0)
+$hash = [System.BitConverter]::ToString($sha.Hash).Replace("-", "")
+Write-Output ("{{0}} {{1}}" -f $size, $hash.ToLower())
+"""
+
+# How many bytes are read from the remote file with each command.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+FILE_INFO_SCRIPT = """
+$ErrorActionPreference = "Stop"
+$path = '{path}'
+$stream = [System.IO.File]::Open(
+    $path, [System.IO.FileMode]::Open, [System.IO.FileAccess]::Read,
+    [System.IO.FileShare]::ReadWrite)
+try {{
+    $sha = [System.Security.Cryptography.SHA256]::Create()
+    $hash = [System.BitConverter]::ToString($sha.ComputeHash($stream))
+    $hash = $hash.Replace("-", "").ToLower()
+    Write-Output ("{{0}} {{1}}" -f $stream.Length, $hash)
+}} finally {{
+    $stream.Close()
+}}
+"""
+
+READ_RANGE_SCRIPT = """
+$ErrorActionPreference = "Stop"
+$path = '{path}'
+$stream = [System.IO.File]::Open(
+    $path, [System.IO.FileMode]::Open, [System.IO.FileAccess]::Read,
+    [System.IO.FileShare]::ReadWrite)
+try {{
+    $null = $stream.Seek([long]{offset}, [System.IO.SeekOrigin]::Begin)
+    $buffer = New-Object byte[] ([int]{length})
+    $read = 0
+    while ($read -lt $buffer.Length) {{
+        $count = $stream.Read($buffer, $read, $buffer.Length - $read)
+        if ($count -eq 0) {{ break }}
+        $read += $count
+    }}
+    [Console]::Out.Write([System.Convert]::ToBase64String($buffer, 0, $read))
+}} finally {{
+    $stream.Close()
+}}
+"""
+
+# Several files are sent with a single upload, in a bundle, which is
+# split on the instance. Every file is written next to its destination
+# and checked against its hash, then all of them are moved into place
+# and the hashes of the files in place are written out.
+BUNDLE_SCRIPT = """
+$ErrorActionPreference = "Stop"
+$bundle = '{bundle}'
+$entries = @(
+    {entries}
+)
+$data = [System.IO.File]::ReadAllBytes($bundle)
+$sha = [System.Security.Cryptography.SHA256]::Create()
+function Get-Hash($bytes, $offset, $length) {{
+    $hash = $sha.ComputeHash($bytes, $offset, $length)
+    return [System.BitConverter]::ToString($hash).Replace("-", "").ToLower()
+}}
+foreach ($entry in $entries) {{
+    $offset, $length, $expected, $path = $entry.Split('|', 4)
+    if ((Get-Hash $data ([int]$offset) ([int]$length)) -ne $expected) {{
+        throw "The content of $path got corrupted."
+    }}
+    New-Item -ItemType Directory -Force -Path (Split-Path $path) | Out-Null
+    $stream = [System.IO.File]::Create($path + ".new")
+    try {{
+        $stream.Write($data, [int]$offset, [int]$length)
+    }} finally {{
+        $stream.Close()
+    }}
+}}
+foreach ($entry in $entries) {{
+    $path = $entry.Split('|', 4)[3]
+    if (Test-Path -LiteralPath $path) {{
+        [System.IO.File]::Replace($path + ".new", $path, $path + ".old")
+        Remove-Item -LiteralPath ($path + ".old")
+    }} else {{
+        [System.IO.File]::Move($path + ".new", $path)
+    }}
+    $bytes = [System.IO.File]::ReadAllBytes($path)
+    Write-Output (Get-Hash $bytes 0 $bytes.Length)
+}}
+Remove-Item -LiteralPath $bundle
+"""
+
+
+class TransferResult(collections.namedtuple(
+        "TransferResult", "path size sha256 elapsed")):
+    """The outcome of a file transfer."""
+
+    __slots__ = ()
+
+    @property
+    def throughput(self):
+        """The number of bytes transferred per second."""
+        if not self.elapsed:
+            return float(self.size)
+        return self.size / self.elapsed
+
+
+def get_chunk_size(max_envelope_size=protocol.Protocol.DEFAULT_MAX_ENV_SIZE):
+    """Get how many raw bytes fit in a single WinRM envelope.
+
+    The bytes are base64 encoded twice, once by us, so that the remote
+    side can read them as text lines, and then by WinRM for the
+    standard input of the command.
+    """
+    stdin_size = (max_envelope_size - ENVELOPE_OVERHEAD) * 3 // 4
+    # Leave room for the line terminator.
+    return (stdin_size - 2) // 4 * 3
+
+
+def quote(path):
+    """Quote a string for a single quoted PowerShell string."""
+    return path.replace("'", "''")
+
+
+def _log_result(action, result):
+    LOG.info("%s %r: %d bytes in %.2f seconds (%.1f KiB/s).",
+             action, result.path, result.size, result.elapsed,
+             result.throughput / 1024)
+
+
+def upload(protocol_client, shell_id, stream, remote_destination,
+           append=False, chunk_size=None, upper_timeout=None):
+    """Write the content of a binary stream to a remote file.
+
+    Everything is sent to a single remote PowerShell process, through
+    its standard input, with as much data in each request as a WinRM
+    envelope can hold.
+
+    :param stream: A file-like object opened in binary mode.
+    :param remote_destination: The path of the file on the instance.
+    :param append:
+        If true, the data is appended to the remote file,
+        otherwise the file is overwritten.
+    :param chunk_size:
+        The number of raw bytes sent with each request,
+        by default as many as fit in an envelope.
+    :param upper_timeout:
+        Number of seconds to wait for the remote process to finish
+        after all the data was sent.
+    :raises:
+        :class:`ArgusTransferError` if the remote process failed or
+        the hash of the received data doesn't match.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    command = get_upload_command(remote_destination, append=append)
+    digest = hashlib.sha256()
+    size = 0
+    start = time.time()
+
+    command_id = protocol_client.run_command(shell_id, command)
+    try:
+        chunk = stream.read(chunk_size)
+        while True:
+            next_chunk = stream.read(chunk_size)
+            digest.update(chunk)
+            size += len(chunk)
+            line = base64.b64encode(chunk) + b"\r\n" if chunk else b""
+            protocol_client.send_command_input(
+                shell_id, command_id, line, end=not next_chunk)
+            if not next_chunk:
+                break
+            chunk = next_chunk
+
+        stdout, stderr, exit_code = executor.get_executor().call(
+            protocol_client.get_command_output,
+            args=(shell_id, command_id), timeout=upper_timeout)
+    except multiprocessing.TimeoutError:
+        raise exceptions.ArgusTimeoutError(
+            "Uploading to {!r} has timed out.".format(remote_destination))
+    finally:
+        protocol_client.cleanup_command(shell_id, command_id)
+
+    return check_upload(remote_destination, (stdout, stderr, exit_code),
+                        size, digest, start)
+
+
+def get_upload_command(remote_destination, append=False):
+    """Get the command line which writes its standard input to a file.
+
+    The standard input is made of base64 encoded lines and the command
+    outputs the size and the SHA-256 of what it received.
+    """
+    script = UPLOAD_SCRIPT.format(path=quote(remote_destination),
+                                  mode="Append" if append else "Create")
+    return util.get_command(script, util.POWERSHELL)
+
+
+def check_upload(remote_destination, output, size, digest, start):
+    """Check the output of an upload command against what was sent.
+
+    :param output: The stdout, stderr and exit code of the command.
+    :param size: The number of bytes which were sent.
+    :param digest: The SHA-256 object of the bytes which were sent.
+    :param start: The time when the upload started.
+    :rtype: :class:`TransferResult`
+    """
+    stdout, stderr, exit_code = output
+    if exit_code:
+        raise exceptions.ArgusTransferError(
+            "Uploading to {!r} failed with exit code {!r}: {!r}"
+            .format(remote_destination, exit_code, stderr))
+
+    remote = util.sanitize_command_output(stdout).split()
+    expected = [str(size), digest.hexdigest()]
+    if remote != expected:
+        raise exceptions.ArgusTransferError(
+            "Uploading to {!r} got corrupted, expected size and hash {} "
+            "but the instance has {}.".format(remote_destination,
+                                              expected, remote))
+
+    result = TransferResult(remote_destination, size, digest.hexdigest(),
+                            time.time() - start)
+    _log_result("Uploaded", result)
+    return result
+
+
+def upload_data(protocol_client, shell_id, data, remote_destination,
+                **kwargs):
+    """Write the given string or bytes to a remote file.
+
+    Text is encoded as UTF-8. The keyword arguments are the same
+    as the ones of :func:`upload`.
+    """
+    if isinstance(data, six.text_type):
+        data = data.encode("utf-8")
+    return upload(protocol_client, shell_id, six.BytesIO(data),
+                  remote_destination, **kwargs)
+
+
+def get_remote_file_info(execute_function, remote_path):
+    """Get the size and the SHA-256 of a remote file.
+
+    :param execute_function:
+        A callable which runs a PowerShell command on the instance
+        and returns its standard output.
+    :rtype: tuple
+    """
+    stdout = execute_function(FILE_INFO_SCRIPT.format(
+        path=quote(remote_path)))
+    try:
+        size, sha256 = stdout.split()
+        return int(size), sha256
+    except ValueError:
+        raise exceptions.ArgusTransferError(
+            "Could not get the details of {!r}, got {!r} instead."
+            .format(remote_path, stdout))
+
+
+def _hash_file(path, digest):
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+
+def download(execute_function, remote_path, local_path, chunk_size=None):
+    """Download a remote file, writing it directly to a local file.
+
+    The file is read in ranges of `chunk_size` bytes, each with its own
+    command, so neither side has to hold the whole file in memory.
+    The data is written to ``local_path + '.part'`` first, which is
+    renamed when the download is complete and its hash was checked.
+    If a partial file is found, the download continues from its end.
+
+    :param execute_function:
+        A callable which runs a PowerShell command on the instance
+        and returns its standard output. It should retry on its own,
+        a range which failed is not retried here.
+    :raises:
+        :class:`ArgusTransferError` if the hash of the downloaded file
+        doesn't match the one of the remote file. The partial file is
+        removed in this case, so the next attempt starts from scratch.
+    """
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    size, sha256 = get_remote_file_info(execute_function, remote_path)
+    partial_path = local_path + ".part"
+    digest = hashlib.sha256()
+    start = time.time()
+
+    offset = 0
+    if os.path.exists(partial_path):
+        offset = os.path.getsize(partial_path)
+        if offset > size:
+            os.remove(partial_path)
+            offset = 0
+        else:
+            LOG.debug("Resuming the download of %r from byte %d.",
+                      remote_path, offset)
+            _hash_file(partial_path, digest)
+    resumed = offset
+
+    with open(partial_path, "ab") as stream:
+        while offset < size:
+            length = min(chunk_size, size - offset)
+            stdout = execute_function(READ_RANGE_SCRIPT.format(
+                path=quote(remote_path), offset=offset, length=length))
+            chunk = base64.b64decode(stdout)
+            if not chunk:
+                break
+            stream.write(chunk)
+            # Hand the chunk to the OS before asking for the next one,
+            # so it isn't lost if this process dies. The partial file
+            # is hashed again when resuming, so nothing else is needed.
+            stream.flush()
+            digest.update(chunk)
+            offset += len(chunk)
+
+    if digest.hexdigest() != sha256:
+        os.remove(partial_path)
+        raise exceptions.ArgusTransferError(
+            "Downloading {!r} got corrupted, expected SHA-256 {} but "
+            "got {}.".format(remote_path, sha256, digest.hexdigest()))
+
+    if os.path.exists(local_path):
+        os.remove(local_path)
+    os.rename(partial_path, local_path)
+
+    result = TransferResult(remote_path, size - resumed, sha256,
+                            time.time() - start)
+    _log_result("Downloaded", result)
+    return result
+
+
+def write_bundle(client, files, bundle_path):
+    """Write several files on the instance with a single upload.
+
+    The files are uploaded together to `bundle_path` and split on the
+    instance, an existing file being replaced only after all of them
+    reached the instance intact.
+
+    :param client:
+        A client connected to the instance, with the ``write_file``
+        and ``run_command_with_retry`` methods.
+    :param files:
+        A list of pairs of the remote path and the bytes of a file.
+    :returns: The SHA-256 digests of the files.
+    :raises:
+        :class:`ArgusTransferError` if the files in place don't
+        match the given ones.
+    """
+    chunks, entries, hashes = [], [], []
+    offset = 0
+    for remote_path, data in files:
+        sha256 = hashlib.sha256(data).hexdigest()
+        entries.append("'{}'".format(quote("|".join(
+            [str(offset), str(len(data)), sha256, remote_path]))))
+        chunks.append(data)
+        hashes.append(sha256)
+        offset += len(data)
+
+    client.write_file(data=b"".join(chunks),
+                      remote_destination=bundle_path, append=False)
+    stdout = client.run_command_with_retry(
+        BUNDLE_SCRIPT.format(bundle=quote(bundle_path),
+                             entries=",\n    ".join(entries)),
+        command_type=util.POWERSHELL)[0]
+
+    if stdout.split() != hashes:
+        raise exceptions.ArgusTransferError(
+            "The files written from {!r} don't match the sent ones, "
+            "expected the hashes {} but got {!r}.".format(
+                bundle_path, hashes, stdout))
+    return hashes
@@ -15,48 +15,26 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import base64
-import functools
-
-try:
-    import StringIO
-except ImportError:
-    import io as StringIO
-
 import multiprocessing
-from multiprocessing import pool
-import time
 
-import six
 from winrm import protocol
 
 from argus.action_manager.windows import get_windows_action_manager
 from argus.client import base
+from argus.client import batch as batch_module
+from argus.client import executor
+from argus.client import session
+from argus.client import transfer
 from argus import config as argus_config
 from argus import exceptions
 from argus import log as argus_log
+from argus import retry
 from argus import util
 
 
 LOG = argus_log.LOG
 CONFIG = argus_config.CONFIG
 CODEPAGE_UTF8 = 65001
-THREADS = 1
-
-
-def _encode(data):
-    encoded = base64.b64encode(data)
-    if six.PY3:
-        encoded = encoded.decode()
-    return encoded
-
-
-def _base64_read_file(filepath, size=2048):
-    with open(filepath, 'rb') as stream:
-        reader = functools.partial(stream.read, size)
-        for data in iter(reader, b''):
-            encoded = _encode(data)
-            yield encoded
 
 
 class WinRemoteClient(base.BaseClient):
@@ -82,6 +60,11 @@ class WinRemoteClient(base.BaseClient):
             protocol=transport_protocol,
             hostname=hostname,
             port=5985 if transport_protocol == 'http' else 5986)
+        self._sessions = session.SessionPool(
+            self._get_protocol, self._open_shell,
+            size=CONFIG.argus.winrm_pool_size,
+            idle_timeout=CONFIG.argus.winrm_shell_idle_timeout)
+        self.facts = util.FactCache()
         self.manager = get_windows_action_manager(self)
 
     @staticmethod
@@ -95,17 +78,15 @@ class WinRemoteClient(base.BaseClient):
                      upper_timeout=CONFIG.argus.upper_timeout):
         command_id = None
         bare_command = command
-        thread_pool = pool.ThreadPool(processes=THREADS)
 
         command = util.get_command(command, command_type)
 
         try:
             command_id = protocol_client.run_command(shell_id, command)
 
-            result = thread_pool.apply_async(
+            stdout, stderr, exit_code = executor.get_executor().call(
                 protocol_client.get_command_output,
-                args=(shell_id, command_id))
-            stdout, stderr, exit_code = result.get(
+                args=(shell_id, command_id),
                 timeout=upper_timeout)
             if exit_code:
                 output = "\n\n".join([out for out in (stdout, stderr) if out])
@@ -123,22 +104,30 @@ class WinRemoteClient(base.BaseClient):
             raise exceptions.ArgusTimeoutError(
                 "The command '{cmd}' has timed out.".format(cmd=bare_command))
         finally:
-            thread_pool.terminate()
+            # Cleaning up the command also makes a worker which is still
+            # waiting for its output fail and go back to the executor.
             protocol_client.cleanup_command(shell_id, command_id)
 
+    def _open_shell(self, protocol_client):
+        return self.exec_with_retry(lambda: (protocol_client.open_shell(
+            codepage=CODEPAGE_UTF8)))
+
     def _run_commands(self, commands, commands_type=util.POWERSHELL,
                       upper_timeout=CONFIG.argus.upper_timeout):
-        protocol_client = self._get_protocol()
-        shell_id = self.exec_with_retry(lambda: (protocol_client.open_shell(
-            codepage=CODEPAGE_UTF8)))
+        with self._sessions.shell() as (protocol_client, shell_id):
+            return [self._run_command(protocol_client, shell_id, command,
+                                      commands_type, upper_timeout)
+                    for command in commands]
 
-        try:
-            results = [self._run_command(protocol_client, shell_id, command,
-                                         commands_type, upper_timeout)
-                       for command in commands]
-        finally:
-            protocol_client.close_shell(shell_id)
-        return results
+    def session_stats(self):
+        """Get the usage counters of the underlying WinRM sessions."""
+        return self._sessions.stats()
+
+    def reset_sessions(self):
+        """Drop the opened WinRM shells, e.g. when the instance reboots."""
+        LOG.debug("Resetting the WinRM sessions, the stats were: %s",
+                  self._sessions.stats())
+        self._sessions.reset()
 
     def _get_protocol(self):
         protocol.Protocol.DEFAULT_TIMEOUT = "PT3600S"
@@ -165,49 +154,44 @@ class WinRemoteClient(base.BaseClient):
         """Copy the given file-path in the remote destination.
 
         The remote destination is the file name where the content
-        of file-path will be written.
+        of file-path will be written. It is overwritten if it exists.
+
+        :rtype: :class:`argus.client.transfer.TransferResult`
         """
+        with open(filepath, 'rb') as stream:
+            with self._sessions.shell() as (protocol_client, shell_id):
+                return transfer.upload(
+                    protocol_client, shell_id, stream, remote_destination,
+                    upper_timeout=CONFIG.argus.io_upper_timeout)
 
-        # TODO(cpopa): This powershell dance is a little complicated,
-        # find a simpler way to send a file over a remote server,
-        # without relying on OpenStack infra.
-        get_string_cmd = ("[System.Text.Encoding]::UTF8.GetString("
-                          "[System.Convert]::FromBase64String('{}'))")
-        commands = []
-        for command in _base64_read_file(filepath):
-            remote_command = (
-                "{content} >> '{remote_destination}'"
-                .format(content=get_string_cmd.format(command),
-                        remote_destination=remote_destination))
-
-            commands.append(remote_command)
-        self._run_commands(commands, commands_type=util.POWERSHELL)
-
-    def write_file(self, data, remote_destination):
+    def write_file(self, data, remote_destination, append=True):
         """Copy the given data in the remote destination.
 
-        The remote destination is the file name where the content
-        of file-path will be written.
+        The data is appended as it is to the remote destination,
+        text being encoded as UTF-8. If `append` is false, the
+        remote destination is overwritten instead.
+
+        :rtype: :class:`argus.client.transfer.TransferResult`
         """
-        # TODO(mmicu): This powershell dance is a little complicated,
-        # find a simpler way to send a file over a remote server,
-        # without relying on OpenStack infra.
-        get_string_cmd = ("[System.Text.Encoding]::UTF8.GetString("
-                          "[System.Convert]::FromBase64String('{}'))")
-        commands = []
-        data = StringIO.StringIO(data)
-        data.seek(0)
-        content = data.read(1024)
-        while content:
-            remote_command = (
-                "{content} >> '{remote_destination}'"
-                .format(content=get_string_cmd.format(_encode(content)),
-                        remote_destination=remote_destination))
-
-            commands.append(remote_command)
-            content = data.read(1024)
-        self._run_commands(commands, commands_type=util.POWERSHELL,
-                           upper_timeout=CONFIG.argus.io_upper_timeout)
+        with self._sessions.shell() as (protocol_client, shell_id):
+            return transfer.upload_data(
+                protocol_client, shell_id, data, remote_destination,
+                append=append, upper_timeout=CONFIG.argus.io_upper_timeout)
+
+    def download_file(self, remote_path, local_path):
+        """Download the given remote file to the local path.
+
+        A partially downloaded file is resumed and the hash of
+        the result is checked against the one of the remote file.
+
+        :rtype: :class:`argus.client.transfer.TransferResult`
+        """
+        def execute(cmd):
+            return self.run_command_with_retry(
+                cmd, command_type=util.POWERSHELL,
+                upper_timeout=CONFIG.argus.io_upper_timeout)[0]
+
+        return transfer.download(execute, remote_path, local_path)
 
     def read_file(self, filepath):
         """Get the content of the given file."""
@@ -255,31 +239,49 @@ class WinRemoteClient(base.BaseClient):
             The number of retries which this function has.
             If the value is ``None``, then the function will retry *forever*.
         :param delay:
-            The number of seconds to sleep when retrying a command.
+            The maximum number of seconds to sleep when retrying
+            a command. The first retries are made sooner.
 
         :rtype: tuple
         :returns: stdout, stderr, exit_code
         """
 
-        # Countdown normalization.
-        if not count or count < 0:
-            count = 0
+        return retry.call(
+            lambda: self.run_command(cmd, command_type=command_type,
+                                     upper_timeout=upper_timeout),
+            "run_command_with_retry", count=count, delay=delay,
+            error="Command {!r} failed too many times.".format(cmd))
 
-        while True:
-            try:
-                return self.run_command(cmd, command_type=command_type,
-                                        upper_timeout=upper_timeout)
-            except Exception as exc:  # pylint: disable=broad-except
-                LOG.debug("Command failed with %r.", exc)
-                # A negative `count` means no count at all.
-                if count >= 0:
-                    count -= 1
-                if count == 0:
-                    raise exceptions.ArgusTimeoutError(
-                        "Command {!r} failed too many times."
-                        .format(cmd))
-                LOG.debug("Retrying '%s'", cmd)
-                time.sleep(delay)
+    def run_batch(self, batch, count=CONFIG.argus.retry_count,
+                  delay=CONFIG.argus.retry_delay,
+                  upper_timeout=CONFIG.argus.upper_timeout):
+        """Run the commands of a batch with as few round trips as possible.
+
+        :param batch:
+            A :class:`argus.client.batch.CommandBatch` or a list of
+            PowerShell commands.
+        :param count:
+            The number of attempts for each command. Only the commands
+            which failed are retried, every script being run once per
+            attempt.
+        :param delay:
+            The number of seconds to sleep when retrying the commands.
+
+        :rtype: list
+        :returns: stdout, stderr, exit_code for each command
+        """
+        if not isinstance(batch, batch_module.CommandBatch):
+            commands, batch = batch, batch_module.CommandBatch()
+            for command in commands:
+                batch.add(command)
+
+        def execute(cmd, command_type):
+            # The batch retries by itself, only the failed commands.
+            return self.run_command_with_retry(
+                cmd, count=1, delay=delay, command_type=command_type,
+                upper_timeout=upper_timeout)[0]
+
+        return batch.execute(execute, count=count, delay=delay)
 
     def run_command_until_condition(self, cmd, cond,
                                     retry_count=CONFIG.argus.retry_count,
@@ -299,33 +301,25 @@ class WinRemoteClient(base.BaseClient):
         with an additional condition parameter.
         """
 
-        # countdown normalization
-        if not retry_count or retry_count < 0:
-            retry_count = 0
-
-        while True:
+        def condition():
             try:
                 stdout, stderr, exit_code = self.run_command(
                     cmd, command_type=command_type,
                     upper_timeout=upper_timeout)
             except Exception as exc:  # pylint: disable=broad-except
                 LOG.debug("Command failed with %r.", exc)
-            else:
-                if stderr and exit_code:
-                    raise exceptions.ArgusCLIError(
-                        ("Executing command {!r} failed with {!r}"
-                         " and exit code {}.")
-                        .format(cmd, stderr, exit_code))
-                elif cond(stdout):
-                    return
-                else:
-                    LOG.debug("Condition not met, retrying...")
-
-            if retry_count > 0:
-                retry_count -= 1
-                LOG.debug("Retrying '%s'", cmd)
-                time.sleep(delay)
-            else:
-                raise exceptions.ArgusTimeoutError(
-                    "Command {!r} failed too many times."
-                    .format(cmd))
+                return False
+            if stderr and exit_code:
+                raise exceptions.ArgusCLIError(
+                    ("Executing command {!r} failed with {!r}"
+                     " and exit code {}.")
+                    .format(cmd, stderr, exit_code))
+            if not cond(stdout):
+                LOG.debug("Condition not met, retrying...")
+                return False
+            return True
+
+        # The first attempt isn't counted as a retry.
+        retry.poll(condition, "run_command_until_condition",
+                   count=max(retry_count or 0, 0) + 1, delay=delay,
+                   error="Command {!r} failed too many times.".format(cmd))
@@ -0,0 +1,480 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""An asyncio client for the WinRM service of the Windows instances.
+
+The client speaks the same WS-Management protocol as pywinrm, with the
+envelopes of :mod:`argus.client.wsman`, over HTTP connections driven
+by the event loop, so a single thread can wait on the commands of many
+instances. The timeouts cancel the pending requests instead of leaving
+a thread behind.
+
+This module is opt-in: it needs Python 3.5 or newer and isn't imported
+by the rest of argus, which keeps using
+:class:`argus.client.windows.WinRemoteClient`. For the same reason, it
+is left out of the flake8 and pylint runs, see tox.ini and .pylintrc.
+"""
+
+import asyncio
+import base64
+import hashlib
+import ssl
+import time
+
+from argus.client import transfer
+from argus.client import wsman
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+from argus import retry
+from argus import util
+
+LOG = argus_log.LOG
+CONFIG = argus_config.CONFIG
+CODEPAGE_UTF8 = 65001
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("The connection was closed.")
+    status = int(status_line.split(None, 2)[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if not size:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        body = b"".join(chunks)
+    else:
+        body = await reader.readexactly(
+            int(headers.get("content-length", 0)))
+    return status, headers, body
+
+
+class HTTPTransport(object):
+    """Send WS-Management envelopes to a WinRM endpoint.
+
+    The connections are kept open between the requests and at most
+    `max_connections` requests are made at the same time. A request
+    which is cancelled closes its connection, since the response
+    might still come on it.
+
+    :param host: The address of the endpoint.
+    :param port: The port of the endpoint.
+    :param use_ssl:
+        Whether to use HTTPS. The certificate of the endpoint isn't
+        verified, like with the blocking client.
+    :param cert_pem:
+        Client authentication certificate file path in PEM format.
+    :param cert_key:
+        Client authentication certificate key file path in PEM format.
+    """
+
+    def __init__(self, host, port, username, password, use_ssl=False,
+                 cert_pem=None, cert_key=None, max_connections=4):
+        self._host = host
+        self._port = port
+        self._use_ssl = use_ssl
+        self._cert_pem = cert_pem
+        self._cert_key = cert_key
+        self._max_connections = max_connections
+        credentials = "{}:{}".format(username, password).encode("utf-8")
+        self._authorization = base64.b64encode(credentials).decode("ascii")
+        # Created on first use, inside the event loop.
+        self._semaphore = None
+        self._idle = []
+        self.requests = 0
+
+    def _ssl_context(self):
+        if not self._use_ssl:
+            return None
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        if self._cert_pem:
+            context.load_cert_chain(self._cert_pem, self._cert_key)
+        return context
+
+    def _headers(self, body):
+        return ("POST /wsman HTTP/1.1\r\n"
+                "Host: {}:{}\r\n"
+                "Authorization: Basic {}\r\n"
+                "Content-Type: application/soap+xml;charset=UTF-8\r\n"
+                "Content-Length: {}\r\n"
+                "Connection: keep-alive\r\n\r\n"
+                .format(self._host, self._port, self._authorization,
+                        len(body))).encode("latin-1")
+
+    async def _exchange(self, connection, body):
+        reader, writer = connection
+        try:
+            writer.write(self._headers(body) + body)
+            await writer.drain()
+            status, headers, response = await _read_response(reader)
+        except BaseException:
+            writer.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append(connection)
+        return status, response
+
+    async def _post(self, body):
+        # A kept connection might have been closed by the endpoint
+        # in the meantime, so it is given a second chance.
+        while self._idle:
+            connection = self._idle.pop()
+            try:
+                return await self._exchange(connection, body)
+            except (ConnectionError, asyncio.IncompleteReadError) as exc:
+                LOG.debug("Dropping a stale WinRM connection: %r", exc)
+        connection = await asyncio.open_connection(
+            self._host, self._port, ssl=self._ssl_context())
+        return await self._exchange(connection, body)
+
+    async def post(self, body):
+        """Send an envelope and get the body of the response.
+
+        :raises:
+            `ArgusWSManFault` if the endpoint answered with
+            an unexpected HTTP status.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_connections)
+        async with self._semaphore:
+            self.requests += 1
+            status, response = await self._post(body)
+
+        # The WS-Management faults come with a 500 status.
+        if status == 200 or (status == 500 and response):
+            return response
+        raise exceptions.ArgusWSManFault(
+            "The WinRM endpoint {}:{} answered with HTTP status {}."
+            .format(self._host, self._port, status))
+
+    def close(self):
+        """Close the connections kept for reuse."""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+async def _retry(attempt, site, backoff, error):
+    while True:
+        done, result = await attempt()
+        if done:
+            return result
+
+        retry.check_abort()
+        delay = backoff.next_delay()
+        if delay is None:
+            LOG.debug("%s gave up after %d attempts in %.1f seconds.",
+                      site, backoff.attempts, backoff.elapsed())
+            raise exceptions.ArgusTimeoutError(error)
+        LOG.debug("%s is retrying in %.1f seconds.", site, delay)
+        await asyncio.sleep(delay)
+
+
+class AsyncWinRemoteClient(object):
+    """Get an asyncio remote client to a Windows instance.
+
+    The methods are coroutines, with the same parameters and results
+    as the ones of :class:`argus.client.windows.WinRemoteClient`.
+    The client can be used as an asynchronous context manager, which
+    closes it at exit.
+
+    :param hostname: The IP where the client should be connected.
+    :param username: The username of the client.
+    :param password: The password of the remote client.
+    :param transport_protocol:
+        The transport for the WinRM protocol. Only HTTP and HTTPS makes
+        sense.
+    :param cert_pem:
+        Client authentication certificate file path in PEM format.
+    :param cert_key:
+        Client authentication certificate key file path in PEM format.
+    :param port:
+        The port of the WinRM service, by default the standard one
+        of the transport.
+    """
+
+    def __init__(self, hostname, username, password,
+                 transport_protocol='http', cert_pem=None, cert_key=None,
+                 port=None):
+        use_ssl = transport_protocol == 'https'
+        self._transport = HTTPTransport(
+            hostname, port or (5986 if use_ssl else 5985),
+            username, password, use_ssl=use_ssl,
+            cert_pem=cert_pem, cert_key=cert_key,
+            max_connections=max(CONFIG.argus.winrm_pool_size, 1) * 2)
+        self._shells = []
+        self._pool_size = CONFIG.argus.winrm_pool_size
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _request(self, message, parser=wsman.check_response):
+        return parser(await self._transport.post(message))
+
+    async def _acquire_shell(self):
+        if self._shells:
+            return self._shells.pop()
+        return await self._request(wsman.create_shell(CODEPAGE_UTF8),
+                                   wsman.parse_shell_id)
+
+    async def _close_shell(self, shell_id):
+        try:
+            await self._request(wsman.delete_shell(shell_id))
+        except (exceptions.ArgusError, OSError) as exc:
+            LOG.debug("Could not close the shell %s: %r", shell_id, exc)
+
+    async def _release_shell(self, shell_id):
+        if len(self._shells) < self._pool_size:
+            self._shells.append(shell_id)
+        else:
+            await self._close_shell(shell_id)
+
+    async def _send_input(self, shell_id, command_id, stdin):
+        chunks = iter(stdin)
+        chunk = next(chunks, b"")
+        while True:
+            next_chunk = next(chunks, None)
+            await self._request(wsman.send(shell_id, command_id, chunk,
+                                           end=next_chunk is None))
+            if next_chunk is None:
+                break
+            chunk = next_chunk
+
+    async def _receive(self, shell_id, command_id):
+        stdout, stderr = [], []
+        while True:
+            try:
+                out, err, exit_code, done = await self._request(
+                    wsman.receive(shell_id, command_id), wsman.parse_output)
+            except exceptions.ArgusWSManFault as exc:
+                if wsman.is_operation_timeout(exc):
+                    # The command is still running.
+                    continue
+                raise
+            stdout.append(out)
+            stderr.append(err)
+            if done:
+                return b"".join(stdout), b"".join(stderr), exit_code
+
+    async def _communicate(self, shell_id, command_id, stdin):
+        if stdin is not None:
+            await self._send_input(shell_id, command_id, stdin)
+        return await self._receive(shell_id, command_id)
+
+    async def _terminate(self, shell_id, command_id):
+        try:
+            await self._request(wsman.signal(shell_id, command_id))
+        except (exceptions.ArgusError, OSError) as exc:
+            LOG.debug("Could not terminate the command %s: %r",
+                      command_id, exc)
+
+    async def _execute(self, command_line, timeout, stdin=None):
+        """Run a command line and get its raw output.
+
+        :param stdin:
+            An iterable of bytes written to the standard input
+            of the command, which is closed after the last one.
+        """
+        shell_id = await self._acquire_shell()
+        try:
+            command_id = await self._request(
+                wsman.command(shell_id, command_line),
+                wsman.parse_command_id)
+            try:
+                output = await asyncio.wait_for(
+                    self._communicate(shell_id, command_id, stdin), timeout)
+            finally:
+                await self._terminate(shell_id, command_id)
+        except asyncio.TimeoutError:
+            await self._release_shell(shell_id)
+            raise exceptions.ArgusTimeoutError(
+                "The command {!r} has timed out.".format(command_line))
+        except BaseException:
+            # The shell might be broken, don't reuse it.
+            await self._close_shell(shell_id)
+            raise
+        await self._release_shell(shell_id)
+        return output
+
+    async def run_remote_cmd(self, cmd, command_type=util.POWERSHELL,
+                             upper_timeout=CONFIG.argus.upper_timeout):
+        """Run the given remote command.
+
+        :rtype: tuple
+        :returns: stdout, stderr, exit_code
+        :raises:
+            `ArgusError` if the command failed and
+            `ArgusTimeoutError` if it didn't finish in time.
+        """
+        command = util.get_command(cmd, command_type)
+        stdout, stderr, exit_code = await self._execute(
+            command, upper_timeout)
+        if exit_code:
+            output = "\n\n".join([out.decode("utf-8", "ignore")
+                                  for out in (stdout, stderr) if out])
+            raise exceptions.ArgusError(
+                "Executing command {command!r} with encoded Command"
+                "{encoded_command!r} failed with exit code {exit_code!r}"
+                " and output {output!r}."
+                .format(command=cmd, encoded_command=command,
+                        exit_code=exit_code, output=output))
+        return util.sanitize_command_output(stdout), stderr, exit_code
+
+    async def run_command(self, cmd, command_type=util.POWERSHELL,
+                          upper_timeout=CONFIG.argus.upper_timeout):
+        """Run the given command and return execution details.
+
+        :rtype: tuple
+        :returns: stdout, stderr, exit_code
+        """
+        return await self.run_remote_cmd(cmd, command_type=command_type,
+                                         upper_timeout=upper_timeout)
+
+    async def run_command_with_retry(self, cmd,
+                                     count=CONFIG.argus.retry_count,
+                                     delay=CONFIG.argus.retry_delay,
+                                     command_type=util.POWERSHELL,
+                                     upper_timeout=CONFIG.argus.upper_timeout):
+        """Run the given `cmd` until succeeds.
+
+        :param count:
+            The number of retries which this function has.
+            If the value is ``None``, then the function will retry *forever*.
+        :param delay:
+            The maximum number of seconds to sleep when retrying
+            a command. The first retries are made sooner.
+
+        :rtype: tuple
+        :returns: stdout, stderr, exit_code
+        """
+        site = "run_command_with_retry"
+
+        async def attempt():
+            try:
+                return True, await self.run_command(
+                    cmd, command_type=command_type,
+                    upper_timeout=upper_timeout)
+            # Before Python 3.8 a cancellation is an Exception too.
+            except asyncio.CancelledError:  # pylint: disable=try-except-raise
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG.debug("%s failed with %r.", site, exc)
+                return False, None
+
+        return await _retry(
+            attempt, site, retry.Backoff(count=count, max_delay=delay),
+            "Command {!r} failed too many times.".format(cmd))
+
+    async def run_command_until_condition(
+            self, cmd, cond, retry_count=CONFIG.argus.retry_count,
+            delay=CONFIG.argus.retry_delay, command_type=util.POWERSHELL,
+            upper_timeout=CONFIG.argus.upper_timeout):
+        """Run the given `cmd` until a condition `cond` occurs.
+
+        :param cond:
+            A callable which receives the standard output returned by
+            executing the command. It should return a boolean value,
+            which tells to this function to stop execution.
+        :raises:
+            `ArgusCLIError` if there is output found in the standard error.
+        """
+
+        async def attempt():
+            try:
+                stdout, stderr, exit_code = await self.run_command(
+                    cmd, command_type=command_type,
+                    upper_timeout=upper_timeout)
+            # Before Python 3.8 a cancellation is an Exception too.
+            except asyncio.CancelledError:  # pylint: disable=try-except-raise
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG.debug("Command failed with %r.", exc)
+                return False, None
+            if stderr and exit_code:
+                raise exceptions.ArgusCLIError(
+                    ("Executing command {!r} failed with {!r}"
+                     " and exit code {}.")
+                    .format(cmd, stderr, exit_code))
+            if not cond(stdout):
+                LOG.debug("Condition not met, retrying...")
+                return False, None
+            return True, None
+
+        # The first attempt isn't counted as a retry.
+        backoff = retry.Backoff(count=max(retry_count or 0, 0) + 1,
+                                max_delay=delay)
+        await _retry(attempt, "run_command_until_condition", backoff,
+                     "Command {!r} failed too many times.".format(cmd))
+
+    async def copy_file(self, filepath, remote_destination):
+        """Copy the given file-path in the remote destination.
+
+        The file is sent to the standard input of a single remote
+        command, like :func:`argus.client.transfer.upload` does.
+
+        :rtype: :class:`argus.client.transfer.TransferResult`
+        """
+        chunk_size = transfer.get_chunk_size(wsman.MAX_ENVELOPE_SIZE)
+        digest = hashlib.sha256()
+        start = time.time()
+        sizes = []
+
+        def lines(stream):
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                digest.update(chunk)
+                sizes.append(len(chunk))
+                yield base64.b64encode(chunk) + b"\r\n"
+
+        with open(filepath, 'rb') as stream:
+            output = await self._execute(
+                transfer.get_upload_command(remote_destination),
+                CONFIG.argus.io_upper_timeout, stdin=lines(stream))
+        return transfer.check_upload(remote_destination, output,
+                                     sum(sizes), digest, start)
+
+    async def read_file(self, filepath):
+        """Get the content of the given file."""
+        cmd = 'Get-Content "{}"'.format(filepath)
+        return (await self.run_command_with_retry(
+            cmd, command_type=util.POWERSHELL,
+            upper_timeout=CONFIG.argus.io_upper_timeout))[0]
+
+    async def close(self):
+        """Close the opened shells and the connections."""
+        while self._shells:
+            await self._close_shell(self._shells.pop())
+        self._transport.close()
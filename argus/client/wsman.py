@@ -0,0 +1,233 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Build and parse the WS-Management messages of the WinRM shells.
+
+These are the SOAP envelopes which :class:`winrm.protocol.Protocol`
+sends, without any transport attached, so that they can be sent by
+other clients than the blocking one of pywinrm. Every builder returns
+the envelope as bytes and every parser receives the body of the
+response, raising :class:`ArgusWSManFault` if it is a fault.
+"""
+
+import base64
+import uuid
+from xml.etree import ElementTree
+
+from argus import exceptions
+
+NAMESPACES = {
+    "env": "http://www.w3.org/2003/05/soap-envelope",
+    "a": "http://schemas.xmlsoap.org/ws/2004/08/addressing",
+    "w": "http://schemas.dmtf.org/wbem/wsman/1/wsman.xsd",
+    "p": "http://schemas.microsoft.com/wbem/wsman/1/wsman.xsd",
+    "rsp": "http://schemas.microsoft.com/wbem/wsman/1/windows/shell",
+    "x": "http://schemas.xmlsoap.org/ws/2004/09/transfer",
+    "f": "http://schemas.microsoft.com/wbem/wsman/1/wsmanfault",
+}
+
+RESOURCE_URI = NAMESPACES["rsp"] + "/cmd"
+ACTION_CREATE = NAMESPACES["x"] + "/Create"
+ACTION_DELETE = NAMESPACES["x"] + "/Delete"
+ACTION_COMMAND = NAMESPACES["rsp"] + "/Command"
+ACTION_SEND = NAMESPACES["rsp"] + "/Send"
+ACTION_RECEIVE = NAMESPACES["rsp"] + "/Receive"
+ACTION_SIGNAL = NAMESPACES["rsp"] + "/Signal"
+SIGNAL_TERMINATE = NAMESPACES["rsp"] + "/signal/terminate"
+COMMAND_DONE = NAMESPACES["rsp"] + "/CommandState/Done"
+ANONYMOUS = NAMESPACES["a"] + "/role/anonymous"
+
+# The fault code of a Receive which got no output in time,
+# the command is still running.
+OPERATION_TIMEOUT_CODE = "2150858793"
+# The number of seconds a Receive waits for output on the server.
+OPERATION_TIMEOUT = 20
+MAX_ENVELOPE_SIZE = 153600
+
+for _prefix, _uri in NAMESPACES.items():
+    ElementTree.register_namespace(_prefix, _uri)
+
+
+def _tag(name):
+    prefix, local = name.split(":")
+    return "{%s}%s" % (NAMESPACES[prefix], local)
+
+
+def _element(parent, name, text=None, **attributes):
+    element = ElementTree.SubElement(parent, _tag(name), attributes)
+    if text is not None:
+        element.text = text
+    return element
+
+
+def _envelope(action, shell_id=None, options=None):
+    envelope = ElementTree.Element(_tag("env:Envelope"))
+    header = _element(envelope, "env:Header")
+    _element(header, "a:To", "http://windows-host:5985/wsman")
+    reply_to = _element(header, "a:ReplyTo")
+    _element(reply_to, "a:Address", ANONYMOUS, mustUnderstand="true")
+    _element(header, "w:MaxEnvelopeSize", str(MAX_ENVELOPE_SIZE),
+             mustUnderstand="true")
+    _element(header, "a:MessageID", "uuid:{}".format(uuid.uuid4()))
+    _element(header, "w:OperationTimeout",
+             "PT{}S".format(OPERATION_TIMEOUT))
+    _element(header, "w:ResourceURI", RESOURCE_URI, mustUnderstand="true")
+    _element(header, "a:Action", action, mustUnderstand="true")
+    if shell_id is not None:
+        selectors = _element(header, "w:SelectorSet")
+        _element(selectors, "w:Selector", shell_id, Name="ShellId")
+    if options:
+        option_set = _element(header, "w:OptionSet")
+        for name, value in options:
+            _element(option_set, "w:Option", value, Name=name)
+    return envelope, _element(envelope, "env:Body")
+
+
+def _serialize(envelope):
+    return ElementTree.tostring(envelope, encoding="utf-8")
+
+
+def create_shell(codepage=None):
+    """Open a cmd shell, with the given code page."""
+    options = [("WINRS_NOPROFILE", "FALSE")]
+    if codepage is not None:
+        options.append(("WINRS_CODEPAGE", str(codepage)))
+    envelope, body = _envelope(ACTION_CREATE, options=options)
+    shell = _element(body, "rsp:Shell")
+    _element(shell, "rsp:InputStreams", "stdin")
+    _element(shell, "rsp:OutputStreams", "stdout stderr")
+    return _serialize(envelope)
+
+
+def delete_shell(shell_id):
+    """Close the given shell."""
+    envelope, _ = _envelope(ACTION_DELETE, shell_id=shell_id)
+    return _serialize(envelope)
+
+
+def command(shell_id, command_line):
+    """Start a command line in the given shell."""
+    envelope, body = _envelope(
+        ACTION_COMMAND, shell_id=shell_id,
+        options=[("WINRS_CONSOLEMODE_STDIN", "TRUE"),
+                 ("WINRS_SKIP_CMD_SHELL", "FALSE")])
+    command_line_element = _element(body, "rsp:CommandLine")
+    _element(command_line_element, "rsp:Command", command_line)
+    return _serialize(envelope)
+
+
+def send(shell_id, command_id, data, end=False):
+    """Write the given bytes to the standard input of a command."""
+    envelope, body = _envelope(ACTION_SEND, shell_id=shell_id)
+    send_element = _element(body, "rsp:Send")
+    _element(send_element, "rsp:Stream",
+             base64.b64encode(data).decode("ascii"),
+             Name="stdin", CommandId=command_id,
+             End="true" if end else "false")
+    return _serialize(envelope)
+
+
+def receive(shell_id, command_id):
+    """Ask for the output of a command."""
+    envelope, body = _envelope(ACTION_RECEIVE, shell_id=shell_id)
+    receive_element = _element(body, "rsp:Receive")
+    _element(receive_element, "rsp:DesiredStream", "stdout stderr",
+             CommandId=command_id)
+    return _serialize(envelope)
+
+
+def signal(shell_id, command_id):
+    """Terminate a command and release its resources."""
+    envelope, body = _envelope(ACTION_SIGNAL, shell_id=shell_id)
+    signal_element = _element(body, "rsp:Signal", CommandId=command_id)
+    _element(signal_element, "rsp:Code", SIGNAL_TERMINATE)
+    return _serialize(envelope)
+
+
+def _parse(response):
+    try:
+        root = ElementTree.fromstring(response)
+    except ElementTree.ParseError as exc:
+        raise exceptions.ArgusWSManFault(
+            "Invalid WS-Management response: {}".format(exc))
+
+    fault = root.find(".//" + _tag("env:Fault"))
+    if fault is not None:
+        code = None
+        message = None
+        wsman_fault = fault.find(".//" + _tag("f:WSManFault"))
+        if wsman_fault is not None:
+            code = wsman_fault.get("Code")
+            message = wsman_fault.findtext(".//" + _tag("f:Message"))
+        if not message:
+            message = fault.findtext(".//" + _tag("env:Text"))
+        raise exceptions.ArgusWSManFault(
+            "The WinRM endpoint answered with a fault: {}".format(
+                (message or "unknown error").strip()), code=code)
+    return root
+
+
+def parse_shell_id(response):
+    """Get the id of the shell opened by :func:`create_shell`."""
+    root = _parse(response)
+    for selector in root.iter(_tag("w:Selector")):
+        if selector.get("Name") == "ShellId":
+            return selector.text
+    raise exceptions.ArgusWSManFault("No shell id found in the response.")
+
+
+def parse_command_id(response):
+    """Get the id of the command started by :func:`command`."""
+    root = _parse(response)
+    command_id = root.findtext(".//" + _tag("rsp:CommandId"))
+    if not command_id:
+        raise exceptions.ArgusWSManFault(
+            "No command id found in the response.")
+    return command_id
+
+
+def parse_output(response):
+    """Get the output returned by :func:`receive`.
+
+    :rtype: tuple
+    :returns:
+        The stdout and stderr bytes, the exit code and whether the
+        command is done. The exit code is ``None`` until then.
+    """
+    root = _parse(response)
+    streams = {"stdout": [], "stderr": []}
+    for stream in root.iter(_tag("rsp:Stream")):
+        if stream.text and stream.get("Name") in streams:
+            streams[stream.get("Name")].append(
+                base64.b64decode(stream.text.encode("ascii")))
+
+    exit_code = None
+    state = root.find(".//" + _tag("rsp:CommandState"))
+    done = state is not None and state.get("State") == COMMAND_DONE
+    if done:
+        exit_code = int(state.findtext(_tag("rsp:ExitCode")) or -1)
+    return (b"".join(streams["stdout"]), b"".join(streams["stderr"]),
+            exit_code, done)
+
+
+def check_response(response):
+    """Raise if the response of any other request is a fault."""
+    _parse(response)
+
+
+def is_operation_timeout(exc):
+    """Check if a fault only means that a Receive got no output yet."""
+    return (isinstance(exc, exceptions.ArgusWSManFault) and
+            exc.code == OPERATION_TIMEOUT_CODE)
@@ -40,6 +40,16 @@ class ArgusOptions(conf_base.Options):
                 "resources", default=RESOURCES_LINK, required=True,
                 help="An url that holds the resources usually from "
                      "/argus/resources available on the web"),
+            cfg.BoolOpt(
+                "stage_resources", default=False,
+                help="Send the resources from the local package to a "
+                     "cache on the instance, instead of downloading them "
+                     "from `resources` every time they are used. The "
+                     "`resources` option is ignored when this is set."),
+            cfg.StrOpt(
+                "resources_cache", default=r"C:\argus\cache",
+                help="The directory of the instance where the resources "
+                     "are cached, each of them under its SHA-256 digest."),
             cfg.ListOpt(
                 "dns_nameservers", default=['8.8.8.8', '8.8.4.4'],
                 help="A comma separated list of DNS IPs, which will be used "
@@ -75,8 +85,56 @@ class ArgusOptions(conf_base.Options):
             cfg.IntOpt("retry_count", default=15,
                        help="The retry counts for a failing command."),
             cfg.IntOpt("retry_delay", default=10,
-                       help="The number of seconds between the retries "
-                            " of a failed command."),
+                       help="The maximum number of seconds between the "
+                            "retries of a failed command."),
+            cfg.FloatOpt("retry_initial_delay", default=0.5,
+                         help="The number of seconds before the first "
+                              "retry of a failed command. The delay "
+                              "grows with every retry, up to "
+                              "retry_delay."),
+            cfg.FloatOpt("retry_backoff_factor", default=2.0,
+                         help="How much the delay between the retries "
+                              "grows after each of them."),
+            cfg.FloatOpt("retry_jitter", default=0.2,
+                         help="The maximum fraction by which every delay "
+                              "between the retries is randomly reduced."),
+            cfg.IntOpt("cbinit_ready_timeout", default=600,
+                       help="The number of seconds to wait for the "
+                            "Cloudbase-Init service to write its "
+                            "heartbeat files and to stop."),
+            cfg.IntOpt("recipe_workers", default=3,
+                       help="The maximum number of recipe steps which "
+                            "are run at the same time, when they don't "
+                            "depend on each other."),
+            cfg.IntOpt("api_workers", default=4,
+                       help="The maximum number of cloud API calls which "
+                            "a back-end makes at the same time, while "
+                            "creating or deleting the resources of an "
+                            "instance."),
+            cfg.IntOpt("winrm_pool_size", default=2,
+                       help="The maximum number of idle WinRM shells which "
+                            "are kept open for reuse by a remote client."),
+            cfg.IntOpt("winrm_shell_idle_timeout", default=120,
+                       help="The number of seconds after which an idle "
+                            "WinRM shell is closed instead of reused."),
+            cfg.IntOpt("command_workers", default=16,
+                       help="The number of threads shared by all the remote "
+                            "clients for waiting on commands with a "
+                            "timeout."),
+            cfg.IntOpt("console_tail_interval", default=15,
+                       help="The number of seconds between two reads of "
+                            "the console output of an instance, while it "
+                            "is being prepared. The console isn't followed "
+                            "if this is 0."),
+            cfg.ListOpt("console_failure_patterns",
+                        default=[r"\*\*\* STOP: 0x",
+                                 r"Your PC ran into a problem",
+                                 r"CRITICAL cloudbase.?init"],
+                        help="Regular expressions which, when found in the "
+                             "console output of an instance being "
+                             "prepared, make the preparation fail right "
+                             "away, instead of waiting until it times "
+                             "out."),
             cfg.BoolOpt("log_each_scenario", default=False,
                         help="Create individual log files for each scenario."),
             cfg.StrOpt(
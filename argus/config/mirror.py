@@ -0,0 +1,70 @@
+# Copyright 2016 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for the local resource mirror."""
+
+from oslo_config import cfg
+
+from argus.config import base as config_base
+
+
+class MirrorOptions(config_base.Options):
+
+    """Config options available for the local resource mirror."""
+
+    def __init__(self, config):
+        super(MirrorOptions, self).__init__(config, group="mirror")
+        self._options = [
+            cfg.BoolOpt(
+                "enabled", default=False,
+                help="Serve the Argus resources and the Cloudbase-Init "
+                     "installers from this machine, and point the "
+                     "instances at it instead of the web."),
+            cfg.StrOpt(
+                "host", default="0.0.0.0",
+                help="The address on which the mirror listens."),
+            cfg.IntOpt(
+                "port", default=8095,
+                help="The port on which the mirror listens."),
+            cfg.StrOpt(
+                "base_url", default=None,
+                help="The URL of the mirror, as seen by the instances. "
+                     "By default it is built from the IP of this "
+                     "machine and the port."),
+            cfg.StrOpt(
+                "installers_upstream",
+                default="http://www.cloudbase.it/downloads",
+                help="The web resource from which the mirror fetches "
+                     "the installers it doesn't have yet."),
+            cfg.StrOpt(
+                "installers_cache", default="~/.cache/argus/installers",
+                help="The directory where the mirror keeps the "
+                     "installers, between the runs."),
+            cfg.IntOpt(
+                "installers_max_age", default=300,
+                help="The number of seconds for which a cached installer "
+                     "is served before checking again whether the "
+                     "upstream one changed. It is checked on every "
+                     "request if this is 0."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='Mirror Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
@@ -44,6 +44,42 @@ class OpenStackOptions(conf_base.Options):
                 "require_sysprep", default=True,
                 help="Specifies whether the provided image requires having "
                      "sysprep executed before starting to run tests."),
+            cfg.BoolOpt(
+                "share_credentials", default=False,
+                help="Create the credentials, with their project and "
+                     "network, only once per process and share them "
+                     "between the scenarios, instead of creating them "
+                     "for every scenario. The back-ends which create "
+                     "network resources still get their own."),
+            cfg.BoolOpt(
+                "snapshot_cache", default=False,
+                help="Snapshot the first instance which has Cloudbase-Init "
+                     "installed and boot the next ones from the snapshot, "
+                     "skipping the installation. The snapshots are visible "
+                     "only to their project, so the scenarios should share "
+                     "one, for instance with pre-provisioned credentials."),
+            cfg.IntOpt(
+                "snapshot_cache_size", default=5,
+                help="The maximum number of snapshots kept by the cache, "
+                     "the least recently used ones being deleted."),
+            cfg.IntOpt(
+                "snapshot_timeout", default=1800,
+                help="The number of seconds to wait for a snapshot "
+                     "to become active."),
+            cfg.IntOpt(
+                "instance_pool_size", default=0,
+                help="The number of instances booted ahead for every kind "
+                     "of instance requested more than once. The back-ends "
+                     "using the pool share its credentials. The pool is "
+                     "not used if this is 0."),
+            cfg.IntOpt(
+                "instance_pool_max_idle", default=1800,
+                help="The number of seconds after which an instance "
+                     "booted ahead and not used is deleted."),
+            cfg.IntOpt(
+                "instance_pool_boot_timeout", default=1200,
+                help="The number of seconds to wait for an instance "
+                     "of the pool to become active."),
         ]
 
     def register(self):
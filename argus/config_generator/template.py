@@ -0,0 +1,174 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config templates parsed once and shared by all the config objects.
+
+A template is parsed the first time it is needed and kept for the
+whole process. Every config object gets a :class:`ConfigOverlay` on
+top of it, which records only the values changed by the recipes, so
+creating a config is cheap and its changes are known at any time.
+"""
+
+import collections
+
+import six
+from six.moves import configparser
+
+from argus import util
+
+DEFAULT = "DEFAULT"
+
+_TEMPLATES = util.FactCache()
+
+
+def _parse(resource):
+    data = util.get_resource(resource)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    parser = configparser.RawConfigParser()
+    # pylint: disable=deprecated-method, maybe-no-member
+    if six.PY2:
+        parser.readfp(six.StringIO(data))
+    else:
+        parser.read_file(six.StringIO(data))
+
+    defaults = collections.OrderedDict(parser.defaults())
+    template = collections.OrderedDict([(DEFAULT, defaults)])
+    for section in parser.sections():
+        # The items of a section include the defaults.
+        template[section] = collections.OrderedDict(
+            (name, value) for name, value in parser.items(section)
+            if defaults.get(name) != value)
+    return template
+
+
+def get_template(resource):
+    """Get the parsed template from the given resource.
+
+    :returns:
+        An ordered dictionary of sections, each being an ordered
+        dictionary of values. It is shared and shouldn't be modified.
+    """
+    return _TEMPLATES.get(resource, lambda: _parse(resource))
+
+
+class ConfigOverlay(object):
+    """A config made of a shared template and of the changes to it.
+
+    It has the methods of :class:`ConfigParser.RawConfigParser` which
+    the config objects need, the values being looked up first in the
+    changes and then in the template, which is never modified.
+    """
+
+    def __init__(self, template):
+        self._template = template
+        self._changes = collections.OrderedDict()
+
+    @staticmethod
+    def optionxform(option):
+        return option.lower()
+
+    def sections(self):
+        sections = [section for section in self._template
+                    if section != DEFAULT]
+        sections.extend(section for section in self._changes
+                        if section != DEFAULT and section not in sections)
+        return sections
+
+    def has_section(self, section):
+        return section != DEFAULT and section in self.sections()
+
+    def add_section(self, section):
+        if section == DEFAULT:
+            raise ValueError("Invalid section name: %r" % section)
+        if self.has_section(section):
+            raise configparser.DuplicateSectionError(section)
+        self._changes[section] = collections.OrderedDict()
+
+    def _check_section(self, section):
+        if section != DEFAULT and not self.has_section(section):
+            raise configparser.NoSectionError(section)
+
+    def set(self, section, option, value=None):
+        self._check_section(section)
+        self._changes.setdefault(section, collections.OrderedDict())[
+            self.optionxform(option)] = value
+
+    def _own(self, section):
+        values = collections.OrderedDict(self._template.get(section, ()))
+        values.update(self._changes.get(section, ()))
+        return values
+
+    def defaults(self):
+        return self._own(DEFAULT)
+
+    def _values(self, section):
+        self._check_section(section)
+        values = self.defaults()
+        if section != DEFAULT:
+            values.update(self._own(section))
+        return values
+
+    def options(self, section):
+        return list(self._values(section))
+
+    def has_option(self, section, option):
+        if section != DEFAULT and not self.has_section(section):
+            return False
+        return self.optionxform(option) in self._values(section)
+
+    def get(self, section, option, **_):
+        values = self._values(section)
+        option = self.optionxform(option)
+        if option not in values:
+            raise configparser.NoOptionError(option, section)
+        return values[option]
+
+    def items(self, section, **_):
+        return list(self._values(section).items())
+
+    def write(self, fp):
+        """Write the config like :meth:`RawConfigParser.write` does."""
+        sections = [DEFAULT] + self.sections()
+        for section in sections:
+            values = self._own(section)
+            if section == DEFAULT and not values:
+                continue
+            fp.write("[%s]\n" % section)
+            for option, value in values.items():
+                if value is None:
+                    fp.write("%s\n" % option)
+                else:
+                    value = six.text_type(value).replace("\n", "\n\t")
+                    fp.write("%s = %s\n" % (option, value))
+            fp.write("\n")
+
+    def diff(self):
+        """Get the changes made to the template.
+
+        :rtype: list
+        :returns:
+            A tuple of section, option, template value and current
+            value for every changed option, the template value being
+            ``None`` for a new option.
+        """
+        changes = []
+        for section, values in self._changes.items():
+            template = self._template.get(section, {})
+            for option, value in values.items():
+                old_value = template.get(option)
+                if value != old_value:
+                    changes.append((section, option, old_value, value))
+        return changes
@@ -15,20 +15,99 @@
 
 import abc
 import ntpath
-import six
 
 try:
     from StringIO import StringIO
 except ImportError:
-    import io as StringIO
+    from io import StringIO
 
+from argus.client import transfer
 from argus.config_generator import base
+from argus.config_generator import template
 from argus import log as argus_log
 from argus import util
 
 
 LOG = argus_log.LOG
 
+HASH_SCRIPT = """
+$ErrorActionPreference = "Stop"
+$sha = [System.Security.Cryptography.SHA256]::Create()
+foreach ($path in @({paths})) {{
+    if (Test-Path -LiteralPath $path) {{
+        $hash = $sha.ComputeHash([System.IO.File]::ReadAllBytes($path))
+        Write-Output ([System.BitConverter]::ToString($hash).Replace("-", ""))
+    }} else {{
+        Write-Output "missing"
+    }}
+}}
+"""
+
+
+def _hashes_in_place(client, file_paths):
+    """Get the SHA-256 digests of the given files of the instance."""
+    paths = ", ".join("'{}'".format(transfer.quote(file_path))
+                      for file_path in file_paths)
+    stdout = client.run_command_with_retry(
+        HASH_SCRIPT.format(paths=paths), command_type=util.POWERSHELL)[0]
+    return [line.strip().lower() for line in stdout.splitlines()
+            if line.strip()]
+
+
+def deploy_configs(client, configs, path):
+    """Write the given configs in the directory `path` of the instance.
+
+    The configs are rendered locally and sent with a single upload.
+    An existing file is replaced only after all the configs reached
+    the instance intact, and the files in place are checked against
+    the hashes of the rendered configs. Nothing is written if the
+    configs didn't change since the last time they were written by
+    the same client and the files on the instance weren't changed
+    since then either.
+
+    :param client: A client connected to the instance.
+    :param configs: A list of :class:`BaseWindowsConfig` objects.
+    :raises:
+        :class:`ArgusTransferError` if the files in place
+        don't match the configs.
+    """
+    fingerprints = [(ntpath.join(path, config.config_name),
+                     (config.default_config, config.encoding,
+                      config.diff()))
+                    for config in configs]
+    # The fingerprints and the hashes of the configs written, by path.
+    # The fact is forgotten when Cloudbase-Init is removed or installed
+    # again.
+    deployed = client.facts.get("deployed_configs", dict)
+    if all(deployed.get(file_path, (None, ))[0] == fingerprint
+           for file_path, fingerprint in fingerprints):
+        # Something else could have changed the files in the meantime.
+        file_paths = [file_path for file_path, _ in fingerprints]
+        if (_hashes_in_place(client, file_paths) ==
+                [deployed[file_path][1] for file_path in file_paths]):
+            LOG.debug("The configs in '%s' didn't change since they "
+                      "were written, skipping them.", path)
+            return
+        LOG.debug("The configs in '%s' were changed on the instance, "
+                  "writing them again.", path)
+
+    files = []
+    for config in configs:
+        LOG.debug("The config %s differs from its template by %s.",
+                  config.config_name, config.diff())
+        files.append((ntpath.join(path, config.config_name),
+                      config.render()))
+
+    LOG.debug("Writing the configs %s in '%s'.",
+              [config.config_name for config in configs], path)
+    hashes = transfer.write_bundle(
+        client, files, ntpath.join(path, util.rand_name("argus-configs")))
+
+    deployed = dict(client.facts.get("deployed_configs", dict))
+    for (file_path, fingerprint), sha256 in zip(fingerprints, hashes):
+        deployed[file_path] = (fingerprint, sha256)
+    client.facts.set("deployed_configs", deployed)
+
 
 class BaseWindowsConfig(base.BaseConfig):
     """Class that abstract the config files for windows.
@@ -42,6 +121,8 @@ class BaseWindowsConfig(base.BaseConfig):
 
     default_config = None
     config_name = None
+    # The encoding of the file written on the instance.
+    encoding = "utf-8"
 
     """An object that holds the Cloudbase-Init config."""
 
@@ -57,31 +138,44 @@ class BaseWindowsConfig(base.BaseConfig):
 
     @property
     def conf(self):
-        """Return the ConfigParser object."""
+        """Return the ConfigParser like object."""
         return self._conf
 
     @staticmethod
     def _get_base_conf(config_name):
-        """Return a ConfigParser object with default values."""
-        base_conf = StringIO(
-            util.get_resource(config_name))
-        conf = six.moves.configparser.ConfigParser()
+        """Return a config overlay on top of the given template.
 
-        # NOTE(dtoncu): `readfp` is deprecated since Python 3.2,
-        # but it was replaced with `read_file`.
-        # pylint: disable=deprecated-method, maybe-no-member
-        if six.PY2:
-            conf.readfp(base_conf)
-        else:
-            conf.read_file(base_conf)
+        The template is parsed only once per process.
+        """
+        return template.ConfigOverlay(template.get_template(config_name))
 
-        return conf
+    def diff(self):
+        """Get the values changed against the template.
+
+        :rtype: list
+        :returns: section, option, template value and current value
+                  for every changed option.
+        """
+        return self._conf.diff()
 
     @abc.abstractmethod
     def _config_specific_paths(self):
         """Populate the ConfigParser object with instance specific values."""
         pass
 
+    def render(self):
+        """Get the content of the config file, as written on the instance.
+
+        :rtype: bytes
+        """
+        buff = StringIO()
+        self.conf.write(buff)
+        data = buff.getvalue()
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        content = "".join(line + "\r\n" for line in data.splitlines())
+        return content.encode(self.encoding, "replace")
+
     def apply_config(self, path):
         """Write the configuration values in the right place.
 
@@ -92,15 +186,4 @@ class BaseWindowsConfig(base.BaseConfig):
         :param path:
             Path to the directory in which the config file is created.
         """
-        file_path = ntpath.join(path, self.config_name)
-        if self._client.manager.is_file(file_path):
-            self._client.manager.remove(file_path)
-
-        buff = StringIO()
-        self.conf.write(buff)
-        buff.seek(0)
-        data = buff.read()
-
-        LOG.debug("Writing data in file '%s'.", file_path)
-        for line in data.splitlines():
-            self._client.write_file(data=line, remote_destination=file_path)
+        deploy_configs(self._client, [self], path)
@@ -19,7 +19,6 @@ from six.moves import configparser
 
 from argus import config as argus_config
 from argus.config_generator.windows import base
-from argus.introspection.cloud import windows as introspect
 from argus import util
 
 CONFIG = argus_config.CONFIG
@@ -36,6 +35,9 @@ class BasePopulatedCBInitConfig(base.BaseWindowsConfig):
         util.CLOUD_STACK_SERVICE: "cloudstack.CloudStack",
         util.MAAS_SERVICE: "maasservice.MaaSHttpService"
     }
+    # NOTE(mmicu): Because python2.x does not support UTF-8 we need to
+    #              write the config file as ASCII.
+    encoding = "ascii"
 
     def __init__(self, client):
         super(BasePopulatedCBInitConfig, self).__init__(client)
@@ -75,7 +77,7 @@ class BasePopulatedCBInitConfig(base.BaseWindowsConfig):
 
     def _config_specific_paths(self):
         """Populate the ConfigParser object with instance specific values."""
-        cbinit_dir = introspect.get_cbinit_dir(self._execute)
+        cbinit_dir = self._client.manager.get_cbinit_dir()
 
         self.set_conf_value("bsdtar_path",
                             ntpath.join(cbinit_dir, r'bin\bsdtar.exe'))
@@ -116,26 +118,6 @@ class BasePopulatedCBInitConfig(base.BaseWindowsConfig):
         conf_value = ",".join(service_type)
         self.set_conf_value("metadata_services", conf_value)
 
-    def apply_config(self, path):
-        """Write the configuration values in the right place.
-
-            Take the current state of the `self.conf` object and
-            write it to the specific path.The name of the file
-            will be `config_name`.
-
-        :param path:
-            Path to the directory in which the config file is created.
-        """
-        super(BasePopulatedCBInitConfig, self).apply_config(path)
-
-        # NOTE(mmicu): Because python2.x does not support UTF-8 we need to
-        #              convert the config file.
-        file_path = ntpath.join(path, self.config_name)
-        cmd = ("(get-content '{filename}')| "
-               "out-file '{filename}' -encoding ascii")
-        self._client.run_command_with_retry(cmd.format(filename=file_path),
-                                            command_type=util.POWERSHELL)
-
 
 class CBInitConfig(BasePopulatedCBInitConfig):
     """Config object for cloudbase-init.conf."""
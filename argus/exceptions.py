@@ -43,3 +43,21 @@ class ArgusEnvironmentError(ArgusError):
 class ArgusInvalidDecoratorError(ArgusError):
     """Exception triggered when a decorator has been improperly used."""
     pass
+
+
+class ArgusTransferError(ArgusError):
+    """Exception triggered when a file transfer failed or was corrupted."""
+    pass
+
+
+class ArgusConsoleFailure(ArgusError):
+    """Exception triggered when the console output shows a failure."""
+    pass
+
+
+class ArgusWSManFault(ArgusError):
+    """Exception triggered when a WinRM endpoint answered with a fault."""
+
+    def __init__(self, message, code=None):
+        super(ArgusWSManFault, self).__init__(message)
+        self.code = code
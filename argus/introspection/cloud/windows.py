@@ -16,6 +16,7 @@
 
 import collections
 import contextlib
+import json
 import ntpath
 import os
 import re
@@ -24,6 +25,7 @@ import tempfile
 
 import six
 
+from argus.client import batch
 from argus import config as argus_config
 from argus import exceptions
 from argus.introspection.cloud import base
@@ -37,6 +39,12 @@ SEP = "----"    # default separator for network details blocks
 
 NIC_KEYS = ["mac", "address", "gateway", "netmask", "dns", "dhcp"]
 Address = collections.namedtuple("Address", ["v4", "v6"])
+
+OS_FINGERPRINT_FIELDS = ["major", "minor", "build", "product_type",
+                         "nano_server", "architecture", "program_files",
+                         "program_files_x86", "powershell_version"]
+OSFingerprint = collections.namedtuple("OSFingerprint",
+                                       OS_FINGERPRINT_FIELDS)
 NICDetails = collections.namedtuple("NICDetails", NIC_KEYS)
 Interface = collections.namedtuple('Interface', ['name', 'mtu'])
 
@@ -131,28 +139,22 @@ def _get_nic_details(details):
 
 def get_cbinit_dir(execute_function):
     """Get the location of Cloudbase-Init from the instance."""
-    stdout = execute_function(
-        '$ENV:PROCESSOR_ARCHITECTURE', command_type=util.POWERSHELL)
-    architecture = stdout.strip()
-
-    locations = [execute_function('echo "$ENV:ProgramFiles"',
-                                  command_type=util.POWERSHELL)]
-    if architecture == 'AMD64':
-        location = execute_function(
-            'echo "${ENV:ProgramFiles(x86)}"',
-            command_type=util.POWERSHELL)
-        locations.append(location)
-
-    for location in locations:
-        location = location.strip()
-        _location = escape_path(location)
-        status = execute_function(
-            'Test-Path "{}\\Cloudbase` Solutions"'.format(
-                _location), command_type=util.POWERSHELL).strip().lower()
-
-        if status == "true":
+    commands = batch.CommandBatch()
+    commands.add('$ENV:PROCESSOR_ARCHITECTURE')
+    for variable in ('$ENV:ProgramFiles', '${ENV:ProgramFiles(x86)}'):
+        commands.add('echo "{}"'.format(variable))
+        commands.add('Test-Path "{}\\Cloudbase Solutions"'.format(variable))
+    results = commands.execute(execute_function)
+
+    architecture = results[0].stdout.strip()
+    checks = list(zip(results[1::2], results[2::2]))
+    if architecture != 'AMD64':
+        checks = checks[:1]
+
+    for location, status in checks:
+        if status.stdout.strip().lower() == "true":
             return ntpath.join(
-                location,
+                location.stdout.strip(),
                 "Cloudbase Solutions",
                 "Cloudbase-Init"
             )
@@ -173,9 +175,12 @@ def set_config_option(option, value, execute_function):
     execute_function(cmd, command_type=util.POWERSHELL)
 
 
-def get_python_dir(execute_function):
-    """Find python directory from the Cloudbase-Init installation."""
-    cbinit_dir = get_cbinit_dir(execute_function)
+def get_python_dir(execute_function, cbinit_dir=None):
+    """Find python directory from the Cloudbase-Init installation.
+
+    The Cloudbase-Init directory is looked up if it isn't given.
+    """
+    cbinit_dir = cbinit_dir or get_cbinit_dir(execute_function)
     command = 'dir "{}" /b'.format(cbinit_dir)
     stdout = execute_function(command,
                               command_type=util.CMD).strip()
@@ -198,16 +203,43 @@ def get_cbinit_key(execute_function):
     return key_x64
 
 
+def _probe_os_fingerprint(client):
+    script = util.get_resource("windows/get_os_fingerprint.ps1")
+    if isinstance(script, bytes):
+        script = script.decode()
+    stdout, _, _ = client.run_command_with_retry(
+        script, count=CONFIG.argus.retry_count,
+        delay=CONFIG.argus.retry_delay, command_type=util.POWERSHELL)
+    try:
+        details = json.loads(stdout.strip())
+        return OSFingerprint(*(details[field]
+                               for field in OS_FINGERPRINT_FIELDS))
+    except (ValueError, KeyError, TypeError):
+        raise exceptions.ArgusError(
+            "Could not get the OS details, got {!r} instead.".format(stdout))
+
+
+def get_os_fingerprint(client):
+    """Get the details of the OS which are known not to change.
+
+    They are gathered with a single command and cached on the client,
+    the version, the product type, whether it is a NanoServer or not,
+    the architecture, the Program Files directories and the version
+    of PowerShell.
+
+    :rtype: OSFingerprint
+    """
+    return client.facts.get("os_fingerprint",
+                            lambda: _probe_os_fingerprint(client))
+
+
 def get_os_version(client, field):
     """Gets the specified version from the OS.
 
     :param client: represents the client object on which to run the command.
-    :param field: the version type.
+    :param field: the version type, one of Major, Minor and Build.
     """
-    cmd = "[System.Environment]::OSVersion.Version.{}".format(field)
-    stdout, _, _ = client.run_command_with_retry(cmd,
-                                                 command_type=util.POWERSHELL)
-    return util.get_int_from_str(stdout.strip())
+    return getattr(get_os_fingerprint(client), field.lower())
 
 
 def parse_netsh_output(output):
@@ -359,9 +391,8 @@ class InstanceIntrospection(base.CloudInstanceIntrospection):
          Return a tuple of two elements, the major and the minor
          version.
         """
-        major_version = get_os_version(self.remote_client, 'Major')
-        minor_version = get_os_version(self.remote_client, 'Minor')
-        return (major_version, minor_version)
+        fingerprint = get_os_fingerprint(self.remote_client)
+        return (fingerprint.major, fingerprint.minor)
 
     def get_cloudconfig_executed_plugins(self):
         expected = {
@@ -369,12 +400,14 @@ class InstanceIntrospection(base.CloudInstanceIntrospection):
             'gzip', 'gzip_1',
             'gzip_base64', 'gzip_base64_1', 'gzip_base64_2'
         }
-        files = {}
-        for basefile in expected:
+        names = sorted(expected)
+        commands = batch.CommandBatch()
+        for basefile in names:
             path = ntpath.join("C:\\", basefile)
-            content = self.get_instance_file_content(path)
-            files[basefile] = content.strip()
-        return files
+            commands.add('[io.file]::ReadAllText("%s")' % path)
+        results = self.remote_client.run_batch(commands)
+        return {basefile: result.stdout.strip()
+                for basefile, result in zip(names, results)}
 
     def get_timezone(self):
         command = "tzutil /g"
@@ -393,10 +426,8 @@ class InstanceIntrospection(base.CloudInstanceIntrospection):
 
         If a value is an empty string, then that value is missing.
         """
-        location = r"C:\network_details.ps1"
-        self.remote_client.manager.download_resource(
-            resource_location="windows/network_details.ps1",
-            location=location)
+        location = self.remote_client.manager.get_resource_location(
+            "windows/network_details.ps1")
 
         # Run and parse the output, where each adapter details
         # block is separated by a specific separator.
@@ -467,8 +498,7 @@ class InstanceIntrospection(base.CloudInstanceIntrospection):
         swap_query = (r"HKLM:\SOFTWARE\Policies\Microsoft\Win"
                       r"dows NT\Terminal Services")
         query_properties = ["KeepAliveEnable", "KeepAliveInterval"]
-        stdout = []
-        for query in query_properties:
-            cmd = r"(Get-ItemProperty '{}').{}".format(swap_query, query)
-            stdout.append(self.remote_client.run_command_verbose(cmd))
-        return stdout
+        commands = [r"(Get-ItemProperty '{}').{}".format(swap_query, query)
+                    for query in query_properties]
+        results = self.remote_client.run_batch(commands)
+        return [result.stdout for result in results]
@@ -15,6 +15,7 @@
 
 import os
 import logging
+import threading
 
 from argus import config as argus_config
 
@@ -24,6 +25,35 @@ CONFIG = argus_config.CONFIG
 DEFAULT_FORMAT = ('%(scenario)s - %(os_type)s - %(asctime)s - %(name)s - '
                   '%(levelname)s - %(message)s')
 
+_CONTEXT = threading.local()
+
+
+class _ThreadScenarioFilter(logging.Filter):
+    """Tag the records with the scenario run by the current thread.
+
+    The scenario name kept by the logger adapter is shared by all the
+    threads, so it is overridden when the thread runs a scenario.
+    """
+
+    def filter(self, record):
+        scenario = getattr(_CONTEXT, "scenario", None)
+        if scenario:
+            record.scenario = scenario
+        return True
+
+
+class ScenarioFileHandler(logging.FileHandler):
+    """Write only the records of the given scenario to a file."""
+
+    def __init__(self, scenario, filename, format_string=DEFAULT_FORMAT):
+        super(ScenarioFileHandler, self).__init__(filename, delay=True)
+        self.scenario = scenario
+        self.setFormatter(logging.Formatter(format_string))
+
+    def emit(self, record):
+        if getattr(record, "scenario", None) == self.scenario:
+            super(ScenarioFileHandler, self).emit(record)
+
 
 def get_logger(name="argus",
                format_string=DEFAULT_FORMAT,
@@ -48,6 +78,10 @@ def get_logger(name="argus",
             file_handler.setFormatter(formatter)
             logger.addHandler(file_handler)
 
+    if not any(isinstance(item, _ThreadScenarioFilter)
+               for item in logger.filters):
+        logger.addFilter(_ThreadScenarioFilter())
+
     logger.setLevel(logging.DEBUG)
     logger_adapter = logging.LoggerAdapter(logger, extra)
     return logger_adapter
@@ -61,8 +95,30 @@ def set_scenario_name(log, name):
     log.extra["scenario"] = name
 
 
+def set_thread_scenario_name(name):
+    """Set the scenario name for the records logged by this thread.
+
+    :param name: The scenario name or ``None`` for using the one
+                 given to :func:`set_scenario_name`.
+    """
+    _CONTEXT.scenario = name
+
+
+def get_thread_scenario_name():
+    """Get the scenario name set for the records of this thread."""
+    return getattr(_CONTEXT, "scenario", None)
+
+
 def get_log_extra_item(log, item):
-    """Returns an extra item from the logging object."""
+    """Returns an extra item from the logging object.
+
+    The scenario name set for the current thread takes precedence over
+    the one shared by all the threads.
+    """
+    if item == "scenario":
+        scenario = get_thread_scenario_name()
+        if scenario:
+            return scenario
     return log.extra.get(item, 'unknown')
 
 
@@ -75,7 +131,8 @@ def add_new_handler(log, format_string=DEFAULT_FORMAT):
         directory = os.path.dirname(os.path.abspath(
             CONFIG.argus.argus_log_file))
         logging_file_name = "argus-{}-{}.log".format(
-            log.extra.get("scenario", ""), log.extra.get("os_type", ""))
+            get_log_extra_item(log, "scenario"),
+            log.extra.get("os_type", ""))
         logging_file = os.path.join(directory, logging_file_name)
 
         formatter = logging.Formatter(format_string)
@@ -16,12 +16,14 @@
 """Base recipe for preparing instances for Cloudbase-Init testing."""
 
 import abc
+import functools
 
 import six
 
 from argus import config as argus_config
 from argus import log as argus_log
 from argus.recipes import base
+from argus.recipes import pipeline
 from argus import util
 
 __all__ = ('BaseCloudbaseinitRecipe', )
@@ -63,6 +65,10 @@ class RecipeMetaClass(abc.ABCMeta):
         return cls
 
 
+def _skipped_step():
+    """A recipe step which has nothing to do."""
+
+
 @six.add_metaclass(RecipeMetaClass)
 class BaseCloudbaseinitRecipe(base.BaseRecipe):
     """Base recipe for testing an instance with Cloudbase-Init.
@@ -82,6 +88,7 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
         super(BaseCloudbaseinitRecipe, self).__init__(backend)
         self._cbinit_conf = None
         self._cbinit_unattend_conf = None
+        self.prepare_trace = []
 
     @abc.abstractmethod
     def wait_for_boot_completion(self):
@@ -170,6 +177,65 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
         """Delete the mocked metadata."""
         pass
 
+    def get_prepare_pipeline(self, service_type=None):
+        """Get the steps of :meth:`prepare` and their dependencies.
+
+        The steps which talk to the instance are chained, except for
+        the downloads done after setting the MTU, the configuration
+        which can be built while the installation is replaced, and
+        the logs and configs which are fetched together. The mocked
+        metadata doesn't need the instance at all.
+
+        If the back-end booted the instance from a snapshot taken
+        after a previous installation, the installation steps are
+        skipped. Otherwise, the back-end can snapshot the instance
+        before it is configured.
+        """
+        installation = {
+            "get_installation_script": self.get_installation_script,
+            "replace_install": self.replace_install,
+            "replace_code": self.replace_code,
+        }
+        if self._backend.booted_from_snapshot():
+            LOG.info("The instance was booted from a prepared snapshot, "
+                     "skipping the installation steps.")
+            installation = dict.fromkeys(installation, _skipped_step)
+
+        steps = pipeline.Pipeline()
+        steps.add("wait_for_boot_completion", self.wait_for_boot_completion)
+        steps.add("create_mock_metadata",
+                  functools.partial(self.create_mock_metadata, service_type))
+        steps.add("set_mtu", self.set_mtu,
+                  requires=["wait_for_boot_completion"])
+        steps.add("execution_prologue", self.execution_prologue,
+                  requires=["set_mtu"])
+        steps.add("get_installation_script",
+                  installation["get_installation_script"],
+                  requires=["set_mtu"])
+        steps.add("install_cbinit", self.install_cbinit,
+                  requires=["execution_prologue", "get_installation_script"])
+        steps.add("replace_install", installation["replace_install"],
+                  requires=["install_cbinit"])
+        steps.add("replace_code", installation["replace_code"],
+                  requires=["replace_install"])
+        steps.add("snapshot_instance", self._backend.snapshot_instance,
+                  requires=["replace_code"])
+        steps.add("prepare_cbinit_config",
+                  functools.partial(self.prepare_cbinit_config, service_type),
+                  requires=["install_cbinit", "create_mock_metadata"])
+        steps.add("inject_cbinit_config", self.inject_cbinit_config,
+                  requires=["prepare_cbinit_config", "snapshot_instance"])
+        steps.add("pre_sysprep", self.pre_sysprep,
+                  requires=["inject_cbinit_config"])
+        steps.add("sysprep", self.sysprep, requires=["pre_sysprep"])
+        steps.add("wait_cbinit_finalization", self.wait_cbinit_finalization,
+                  requires=["sysprep"])
+        steps.add("get_cb_init_logs", self.get_cb_init_logs,
+                  requires=["wait_cbinit_finalization"])
+        steps.add("get_cb_init_confs", self.get_cb_init_confs,
+                  requires=["wait_cbinit_finalization"])
+        return steps
+
     def prepare(self, service_type=None, **kwargs):
         """Prepare the underlying instance.
 
@@ -179,25 +245,19 @@ class BaseCloudbaseinitRecipe(base.BaseRecipe):
         * get an installation script for CloudbaseInit
         * install CloudbaseInit by running the previously downloaded file.
         * wait until the instance is up and running.
+
+        The steps which don't depend on each other are run at the same
+        time, see :meth:`get_prepare_pipeline`.
         """
         LOG.info("Preparing instance...")
-        self.wait_for_boot_completion()
-        self.create_mock_metadata(service_type)
-        self.set_mtu()
-        self.execution_prologue()
-        self.get_installation_script()
-        self.install_cbinit()
-        self.replace_install()
-        self.replace_code()
-        self.prepare_cbinit_config(service_type)
-        self.inject_cbinit_config()
-        self.pre_sysprep()
-
-        self.sysprep()
-        self.wait_cbinit_finalization()
+        steps = self.get_prepare_pipeline(service_type)
+        try:
+            steps.run()
+        finally:
+            self.prepare_trace = steps.trace
+            LOG.debug("Recipe steps, the critical path being marked:\n%s",
+                      steps.format_trace())
         LOG.info("Finished preparing instance.")
-        self.get_cb_init_logs()
-        self.get_cb_init_confs()
 
     def cleanup(self, **kwargs):
         """Cleanup the allocated resources."""
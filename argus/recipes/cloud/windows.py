@@ -15,12 +15,12 @@
 
 """Windows Cloudbase-Init recipes."""
 
-import base64
 import ntpath
 import os
 import zipfile
 
 from argus import config as argus_config
+from argus.config_generator.windows import base as base_config
 from argus.config_generator.windows import cb_init as cbinit_config
 from argus import exceptions
 from argus.introspection.cloud import windows as introspection
@@ -88,7 +88,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
     def install_cbinit(self):
         """Proceed on checking if Cloudbase-Init should be installed."""
         try:
-            introspection.get_cbinit_dir(self._execute)
+            self._backend.remote_client.manager.get_cbinit_dir()
         except exceptions.ArgusError:
             self._backend.remote_client.manager.install_cbinit()
             self._grab_cbinit_installation_log()
@@ -104,15 +104,10 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
             zip_ref.extractall(destination_path)
         os.remove(archive_path)
 
-    def transfer_encoded_file_b64(self, file_source, destination_path,
-                                  archive=False):
-        """Creates a new file to the path by decoding a base64 string."""
-        encoded_content = (self._backend.remote_client.manager.
-                           encode_file_to_base64_str(
-                               file_path=file_source))
-        file_64_decoded = base64.standard_b64decode(encoded_content[0])
-        with open(destination_path, 'wb') as file_result:
-            file_result.write(file_64_decoded)
+    def transfer_file(self, file_source, destination_path, archive=False):
+        """Download a file from the instance to the given local path."""
+        self._backend.remote_client.download_file(file_source,
+                                                  destination_path)
         if archive:
             self.extract_files_from_archive(destination_path,
                                             CONFIG.argus.output_directory)
@@ -138,7 +133,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
         log_template = "installation-{}.zip".format(
             self._backend.instance_server()['id'])
         path = os.path.join(CONFIG.argus.output_directory, log_template)
-        self.transfer_encoded_file_b64(zip_source, path, archive=True)
+        self.transfer_file(zip_source, path, archive=True)
 
     def replace_install(self):
         """Replace the Cloudbase-Init installed files with the downloaded ones.
@@ -170,7 +165,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
         self._execute(cmd, command_type=util.POWERSHELL)
 
         LOG.debug("Replace old files with the new ones.")
-        cbdir = introspection.get_cbinit_dir(self._execute)
+        cbdir = self._backend.remote_client.manager.get_cbinit_dir()
         self._execute('xcopy /y /e /q "C:\\install"'
                       ' "{}"'.format(cbdir), command_type=util.CMD)
 
@@ -190,7 +185,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
 
         LOG.debug("Getting Cloudbase-Init location...")
         # Get Cloudbase-Init python location.
-        python_dir = introspection.get_python_dir(self._execute)
+        python_dir = self._backend.remote_client.manager.get_python_dir()
 
         # Remove everything from the Cloudbase-Init installation.
         LOG.debug("Recursively removing Cloudbase-Init...")
@@ -240,7 +235,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
         # monitoring the service, because on some OSes, just checking
         # if the service is stopped leads to errors, due to the
         # fact that the service starts later on.
-        python_dir = introspection.get_python_dir(self._execute)
+        python_dir = self._backend.remote_client.manager.get_python_dir()
         cbinit = ntpath.join(python_dir, 'Lib', 'site-packages',
                              'cloudbaseinit')
 
@@ -261,13 +256,11 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
             r"C:\cloudbaseinit_unattended",
             r"C:\cloudbaseinit_normal"]
 
-        LOG.debug("Check the heartbeat patch ...")
-        self._backend.remote_client.manager.check_cbinit_service(
+        LOG.debug("Wait for the heartbeat patch and for the "
+                  "Cloudbase-Init service to stop ...")
+        self._backend.remote_client.manager.wait_cbinit_service(
             searched_paths=paths)
 
-        LOG.debug("Wait for the Cloudbase-Init service to stop ...")
-        self._backend.remote_client.manager.wait_cbinit_service()
-
     @staticmethod
     def _get_namespace(service_type):
         """Return the metadata namespace."""
@@ -335,7 +328,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
 
     def inject_cbinit_config(self):
         """Inject the Cloudbase-Init config in the right place."""
-        cbinit_dir = introspection.get_cbinit_dir(self._execute)
+        cbinit_dir = self._backend.remote_client.manager.get_cbinit_dir()
 
         conf_dir = ntpath.join(cbinit_dir, "conf")
         needed_directories = [
@@ -346,8 +339,9 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
         for directory in needed_directories:
             self._make_dir_if_needed(directory)
 
-        self._cbinit_conf.apply_config(conf_dir)
-        self._cbinit_unattend_conf.apply_config(conf_dir)
+        base_config.deploy_configs(
+            self._backend.remote_client,
+            [self._cbinit_conf, self._cbinit_unattend_conf], conf_dir)
 
     def get_cb_init_files(self, location, files):
         LOG.info("Obtaining Cloudbase-Init files from %s" % location)
@@ -358,7 +352,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
 
         instance_id = self._backend.instance_server()['id']
         scenario_name = argus_log.get_log_extra_item(LOG, 'scenario')
-        cbdir = introspection.get_cbinit_dir(self._execute)
+        cbdir = self._backend.remote_client.manager.get_cbinit_dir()
         cb_files = files
         renamed_cb_files = []
         cb_files_path = []
@@ -390,7 +384,7 @@ class CloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
                                       renamed_cb_files))
         for source, destination in source_destination:
             path = os.path.join(CONFIG.argus.output_directory, destination)
-            self.transfer_encoded_file_b64(source, path)
+            self.transfer_file(source, path)
 
     def get_cb_init_logs(self):
         self.get_cb_init_files(
@@ -802,18 +796,16 @@ class CloudbaseinitImageRecipe(CloudbaseinitRecipe):
     """Calibrate already sys-prepared Cloudbase-Init images."""
 
     def wait_cbinit_finalization(self):
-        cbdir = introspection.get_cbinit_dir(self._execute)
+        cbdir = self._backend.remote_client.manager.get_cbinit_dir()
         paths = [ntpath.join(cbdir, "log", name)
                  for name in ["cloudbase-init-unattend.log",
                               "cloudbase-init.log"]]
 
-        LOG.debug("Check the heartbeat patch ...")
-        self._backend.remote_client.manager.check_cbinit_service(
+        LOG.debug("Wait for the heartbeat patch and for the "
+                  "Cloudbase-Init service to stop ...")
+        self._backend.remote_client.manager.wait_cbinit_service(
             searched_paths=paths)
 
-        LOG.debug("Wait for the Cloudbase-Init service to stop ...")
-        self._backend.remote_client.manager.wait_cbinit_service()
-
     def prepare(self, service_type=None, **kwargs):
         LOG.info("Preparing already sysprepped instance...")
         self.execution_prologue()
@@ -0,0 +1,186 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run steps which depend on each other as soon as possible."""
+
+import collections
+import sys
+import time
+
+from multiprocessing import pool
+
+import six
+from six.moves import queue
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+
+class StepTiming(collections.namedtuple("StepTiming",
+                                        "name start end requires")):
+    """When a step started and finished, relative to the pipeline."""
+
+    __slots__ = ()
+
+    @property
+    def duration(self):
+        """The number of seconds the step took."""
+        return self.end - self.start
+
+
+class Pipeline(object):
+    """A set of steps which are run as soon as their dependencies are done.
+
+    The steps which don't depend on each other run at the same time,
+    in a bounded pool of worker threads. If a step fails, no other
+    step is started and the error is raised after the running ones
+    finish.
+
+    :param workers:
+        The maximum number of steps which run at the same time. With
+        a single worker, the steps run in the order they were added.
+    :param best_effort:
+        Run all the steps even if some of them fail, the steps which
+        require a failed one included, e.g. for cleaning up. The
+        failures are logged and the first one is raised at the end.
+    """
+
+    def __init__(self, workers=None, best_effort=False):
+        self._workers = max(workers or CONFIG.argus.recipe_workers, 1)
+        self._best_effort = best_effort
+        self._steps = collections.OrderedDict()
+        self.trace = []
+
+    def add(self, name, function, requires=()):
+        """Add a step which runs `function` after the `requires` steps.
+
+        The required steps have to be added first, which also keeps
+        the graph free of cycles.
+        """
+        if name in self._steps:
+            raise exceptions.ArgusError(
+                "The step {!r} was already added.".format(name))
+        unknown = [step for step in requires if step not in self._steps]
+        if unknown:
+            raise exceptions.ArgusError(
+                "The step {!r} requires the unknown steps {!r}."
+                .format(name, unknown))
+        self._steps[name] = (function, tuple(requires))
+
+    def _run_step(self, name, origin, scenario, results):
+        function, requires = self._steps[name]
+        # Keep the records of this step in the log of the scenario.
+        argus_log.set_thread_scenario_name(scenario)
+        start = time.time()
+        error = None
+        try:
+            function()
+        except Exception:    # pylint: disable=broad-except
+            error = sys.exc_info()
+        finally:
+            argus_log.set_thread_scenario_name(None)
+        timing = StepTiming(name, start - origin, time.time() - origin,
+                            requires)
+        results.put((timing, error))
+
+    def run(self):
+        """Run all the steps and wait for them to finish."""
+        self.trace = []
+        if not self._steps:
+            return
+
+        scenario = argus_log.get_thread_scenario_name()
+        results = queue.Queue()
+        origin = time.time()
+        pending = list(self._steps)
+        done = set()
+        running = 0
+        error = None
+
+        workers = pool.ThreadPool(processes=min(self._workers,
+                                                len(self._steps)))
+        try:
+            while True:
+                if error is None or self._best_effort:
+                    ready = [name for name in pending
+                             if done.issuperset(self._steps[name][1])]
+                    # The steps are started in the order they were
+                    # added, only when a worker is free to run them.
+                    for name in ready[:self._workers - running]:
+                        LOG.debug("Starting the step %s.", name)
+                        pending.remove(name)
+                        running += 1
+                        workers.apply_async(
+                            self._run_step,
+                            (name, origin, scenario, results))
+                if not running:
+                    break
+
+                timing, step_error = results.get()
+                running -= 1
+                self.trace.append(timing)
+                if step_error is not None:
+                    LOG.debug("The step %s failed after %.2f seconds.",
+                              timing.name, timing.duration)
+                    error = error or step_error
+                if step_error is None:
+                    done.add(timing.name)
+                elif self._best_effort:
+                    LOG.warning("The step %s failed with %r, running the "
+                                "other steps anyway.", timing.name,
+                                step_error[1])
+                    done.add(timing.name)
+        finally:
+            workers.close()
+            workers.join()
+
+        if error is not None:
+            six.reraise(*error)
+
+    def critical_path(self):
+        """Get the chain of steps which determined the total duration.
+
+        :returns: The names of the steps, from the first to the last.
+        """
+        timings = {timing.name: timing for timing in self.trace}
+        if not timings:
+            return []
+
+        current = max(timings.values(), key=lambda timing: timing.end)
+        path = [current.name]
+        while True:
+            requires = [timings[name] for name in current.requires
+                        if name in timings]
+            if not requires:
+                break
+            current = max(requires, key=lambda timing: timing.end)
+            path.append(current.name)
+        return path[::-1]
+
+    def format_trace(self):
+        """Get a human readable report of the timings of the steps."""
+        critical = set(self.critical_path())
+        lines = []
+        for timing in sorted(self.trace, key=lambda timing: timing.start):
+            lines.append("{marker} {name:<30} {start:>8.2f}s {end:>8.2f}s "
+                         "{duration:>8.2f}s".format(
+                             marker="*" if timing.name in critical else " ",
+                             name=timing.name, start=timing.start,
+                             end=timing.end, duration=timing.duration))
+        return "\n".join(lines)
@@ -0,0 +1,197 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The packaged Argus resources, loaded once and shared by everyone.
+
+A resource is read the first time it is asked for and its bytes are
+kept for the whole process, along with the variants computed from
+them (the SHA-256 digest, the gzipped and the base64 encoded data),
+which are computed on demand. The manifest of all the resources lets
+the callers find out which of them an instance already has.
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import os
+import pkgutil
+import posixpath
+import threading
+
+PACKAGE = "argus.resources"
+
+_IGNORED_FILES = ("__init__.py", )
+_IGNORED_EXTENSIONS = (".pyc", ".pyo")
+_IGNORED_DIRECTORIES = ("__pycache__", )
+
+
+def _gzip(data):
+    buff = io.BytesIO()
+    # A fixed mtime keeps the compressed data, and its digest, stable.
+    with gzip.GzipFile(fileobj=buff, mode="wb", mtime=0) as stream:
+        stream.write(data)
+    return buff.getvalue()
+
+
+class Resource(object):
+    """A packaged resource, with its variants computed on demand."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def _get(self, variant, compute):
+        with self._lock:
+            if variant in self._variants:
+                return self._variants[variant]
+
+        # The variants are computed from the data, which needs the lock.
+        value = compute()
+        with self._lock:
+            return self._variants.setdefault(variant, value)
+
+    @property
+    def data(self):
+        """The bytes of the resource."""
+        return self._get("data", lambda: self._loader(self.name))
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def sha256(self):
+        """The hex SHA-256 digest of the resource."""
+        return self._get(
+            "sha256", lambda: hashlib.sha256(self.data).hexdigest())
+
+    @property
+    def gzipped(self):
+        """The gzipped bytes of the resource."""
+        return self._get("gzip", lambda: _gzip(self.data))
+
+    @property
+    def b64encoded(self):
+        """The base64 encoded bytes of the resource."""
+        return self._get("base64", lambda: base64.b64encode(self.data))
+
+    def is_loaded(self):
+        with self._lock:
+            return "data" in self._variants
+
+
+class ResourceRegistry(object):
+    """Memoize the resources of a package.
+
+    :param package:
+        The name of the package holding the resources.
+    :param loader:
+        A callable receiving the name of a resource and returning its
+        bytes, :func:`pkgutil.get_data` on the package by default.
+    """
+
+    def __init__(self, package=PACKAGE, loader=None):
+        self._package = package
+        self._loader = loader or self._load
+        self._resources = {}
+        self._lock = threading.Lock()
+
+    def _load(self, name):
+        return pkgutil.get_data(self._package, name)
+
+    def get(self, name):
+        """Get the :class:`Resource` with the given name.
+
+        Nothing is read until the data of the resource is needed.
+        """
+        name = posixpath.normpath(name.replace("\\", "/"))
+        with self._lock:
+            resource = self._resources.get(name)
+            if resource is None:
+                resource = self._resources[name] = Resource(
+                    name, self._loader)
+            return resource
+
+    def data(self, name):
+        return self.get(name).data
+
+    def sha256(self, name):
+        return self.get(name).sha256
+
+    def gzipped(self, name):
+        return self.get(name).gzipped
+
+    def b64encoded(self, name):
+        return self.get(name).b64encoded
+
+    def directory(self):
+        """Get the directory of the package on disk."""
+        loader = pkgutil.get_loader(self._package)
+        path = loader.get_filename(self._package)
+        return os.path.dirname(os.path.abspath(path))
+
+    def names(self):
+        """Get the sorted names of all the resources of the package."""
+        root = self.directory()
+        names = []
+        for path, directories, files in os.walk(root):
+            directories[:] = sorted(
+                directory for directory in directories
+                if directory not in _IGNORED_DIRECTORIES)
+            relative = os.path.relpath(path, root)
+            for file_name in files:
+                if (file_name in _IGNORED_FILES or
+                        file_name.endswith(_IGNORED_EXTENSIONS)):
+                    continue
+                name = os.path.normpath(os.path.join(relative, file_name))
+                names.append(name.replace(os.sep, "/"))
+        return sorted(names)
+
+    def manifest(self):
+        """Get the manifest of the resources of the package.
+
+        :rtype: dict
+        :returns:
+            The size and the SHA-256 digest of every resource, by name.
+        """
+        manifest = {}
+        for name in self.names():
+            resource = self.get(name)
+            manifest[name] = {"size": resource.size,
+                              "sha256": resource.sha256}
+        return manifest
+
+    def missing(self, names, present):
+        """Get the resources which need to be sent to an instance.
+
+        :param names:
+            The names of the wanted resources.
+        :param present:
+            A dictionary of the SHA-256 digests of the resources the
+            instance already has, by name.
+        """
+        return [name for name in names
+                if present.get(name) != self.sha256(name)]
+
+    def clear(self):
+        """Forget all the loaded resources."""
+        with self._lock:
+            self._resources.clear()
+
+
+REGISTRY = ResourceRegistry()
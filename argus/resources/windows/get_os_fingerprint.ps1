@@ -0,0 +1,58 @@
+$ErrorActionPreference = "Stop"
+
+# Everything needed for selecting an action manager and for the usual
+# introspection is gathered here, so that it takes a single command.
+# The JSON is built by hand, since ConvertTo-Json isn't available
+# on PowerShell 2.0.
+
+function ConvertTo-JsonValue($Value) {
+    if ($Value -eq $null) {
+        return "null"
+    }
+    if ($Value -is [bool]) {
+        return ([string]$Value).ToLower()
+    }
+    if ($Value -is [int]) {
+        return [string]$Value
+    }
+    $escaped = ([string]$Value).Replace('\', '\\').Replace('"', '\"')
+    return '"' + $escaped + '"'
+}
+
+$version = [System.Environment]::OSVersion.Version
+
+if (Get-Command Get-CimInstance -ErrorAction SilentlyContinue) {
+    $os = Get-CimInstance -ClassName Win32_OperatingSystem
+} else {
+    $os = Get-WmiObject -Class Win32_OperatingSystem
+}
+
+$nanoServer = $false
+$serverLevels = ("HKLM:\Software\Microsoft\Windows NT\CurrentVersion" +
+                 "\Server\ServerLevels")
+if (Test-Path $serverLevels) {
+    $nanoServer = ((Get-ItemProperty $serverLevels).NanoServer -eq 1)
+}
+
+# The WinRM shell can be a 32-bit process on a 64-bit OS.
+$architecture = $ENV:PROCESSOR_ARCHITEW6432
+if (-not $architecture) {
+    $architecture = $ENV:PROCESSOR_ARCHITECTURE
+}
+
+$fields = @(
+    @("major", [int]$version.Major),
+    @("minor", [int]$version.Minor),
+    @("build", [int]$version.Build),
+    @("product_type", [int]$os.ProductType),
+    @("nano_server", [bool]$nanoServer),
+    @("architecture", $architecture),
+    @("program_files", $ENV:ProgramFiles),
+    @("program_files_x86", ${ENV:ProgramFiles(x86)}),
+    @("powershell_version", $PSVersionTable.PSVersion.ToString())
+)
+
+$pairs = foreach ($field in $fields) {
+    '"{0}": {1}' -f $field[0], (ConvertTo-JsonValue $field[1])
+}
+Write-Output ("{" + ($pairs -join ", ") + "}")
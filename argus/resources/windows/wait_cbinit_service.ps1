@@ -0,0 +1,71 @@
+# Wait on the instance until the given files exist and the services
+# matching $serviceName have the status $serviceStatus, for at most
+# $timeout seconds. The variables are set by the caller, before this
+# script. File creations are waited for with a FileSystemWatcher and
+# the service status with WaitForStatus, so that the caller needs a
+# single command instead of polling each condition.
+
+$ErrorActionPreference = "Stop"
+$deadline = [DateTime]::Now.AddSeconds($timeout)
+
+function Get-RemainingTime {
+    $remaining = ($deadline - [DateTime]::Now).TotalMilliseconds
+    return [int][Math]::Max($remaining, 0)
+}
+
+function Exit-TimedOut($Condition) {
+    Write-Output ("Timed out waiting for {0}." -f $Condition)
+    exit 1
+}
+
+foreach ($path in $paths) {
+    while (-not (Test-Path $path)) {
+        $remaining = Get-RemainingTime
+        if ($remaining -eq 0) {
+            Exit-TimedOut $path
+        }
+        $directory = Split-Path -Parent $path
+        if (-not (Test-Path $directory)) {
+            Start-Sleep -Milliseconds ([Math]::Min($remaining, 1000))
+            continue
+        }
+        $watcher = New-Object System.IO.FileSystemWatcher(
+            $directory, (Split-Path -Leaf $path))
+        try {
+            # The file could have been created before the watcher.
+            if (-not (Test-Path $path)) {
+                $null = $watcher.WaitForChanged(
+                    [System.IO.WatcherChangeTypes]::Created,
+                    [Math]::Min($remaining, 5000))
+            }
+        } finally {
+            $watcher.Dispose()
+        }
+    }
+}
+
+if ($serviceStatus) {
+    $services = @()
+    while (-not $services.Count) {
+        $services = @(Get-Service | Where-Object {
+            $_.Name -match $serviceName })
+        if (-not $services.Count) {
+            $remaining = Get-RemainingTime
+            if ($remaining -eq 0) {
+                Exit-TimedOut ("the {0} service" -f $serviceName)
+            }
+            Start-Sleep -Milliseconds ([Math]::Min($remaining, 1000))
+        }
+    }
+    foreach ($service in $services) {
+        $remaining = [TimeSpan]::FromMilliseconds((Get-RemainingTime))
+        try {
+            $service.WaitForStatus($serviceStatus, $remaining)
+        } catch {
+            Exit-TimedOut ("the {0} service to be {1}" -f $service.Name,
+                           $serviceStatus)
+        }
+    }
+}
+
+Write-Output "ready"
@@ -0,0 +1,244 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Retry calls with exponential backoff, jitter and a deadline."""
+
+import collections
+import random
+import threading
+import time
+
+from argus import config as argus_config
+from argus import exceptions
+from argus import log as argus_log
+
+LOG = argus_log.LOG
+CONFIG = argus_config.CONFIG
+
+_STATS = collections.defaultdict(collections.Counter)
+_STATS_LOCK = threading.Lock()
+# The checks which can abort the waits of a scenario.
+_ABORT_CHECKS = {}
+_ABORT_LOCK = threading.Lock()
+
+
+class Backoff(object):
+    """The delays between the attempts of a retry loop.
+
+    The first attempts are made after `initial_delay` seconds, the
+    delay growing by `factor` after each of them, up to `max_delay`.
+    Every delay is reduced by a random amount of at most `jitter` of
+    its value, so that the instances polled at the same time don't
+    stay in lockstep.
+
+    :param count:
+        The maximum number of attempts. If it is ``None`` or 0, the
+        attempts are limited only by the deadline.
+    :param max_delay:
+        The maximum number of seconds to sleep between two attempts.
+    :param deadline:
+        The number of seconds after which no other attempt is made,
+        ``None`` meaning no deadline.
+    """
+
+    def __init__(self, count=None, max_delay=None, deadline=None,
+                 initial_delay=None, factor=None, jitter=None):
+        if max_delay is None:
+            max_delay = CONFIG.argus.retry_delay
+        if initial_delay is None:
+            initial_delay = CONFIG.argus.retry_initial_delay
+        if factor is None:
+            factor = CONFIG.argus.retry_backoff_factor
+        if jitter is None:
+            jitter = CONFIG.argus.retry_jitter
+
+        self.count = count if count and count > 0 else None
+        self.max_delay = max(max_delay, 0)
+        self.initial_delay = min(max(initial_delay, 0), self.max_delay)
+        self.factor = max(factor, 1)
+        self.jitter = min(max(jitter, 0), 1)
+        self.deadline = deadline
+        self.attempts = 0
+        self._start = time.time()
+
+    def elapsed(self):
+        """The number of seconds since the first attempt."""
+        return time.time() - self._start
+
+    def next_delay(self):
+        """Get the delay before the next attempt.
+
+        :returns: The number of seconds to sleep or ``None``
+                  if no other attempt should be made.
+        """
+        self.attempts += 1
+        if self.count is not None and self.attempts >= self.count:
+            return None
+
+        delay = min(self.initial_delay * self.factor ** (self.attempts - 1),
+                    self.max_delay)
+        delay -= delay * self.jitter * random.random()
+        if self.deadline is not None:
+            remaining = self.deadline - self.elapsed()
+            if remaining <= 0:
+                return None
+            delay = min(delay, remaining)
+        return delay
+
+
+def _record(site, **values):
+    with _STATS_LOCK:
+        _STATS[site].update(values)
+
+
+def get_stats():
+    """Get the metrics of every call site which retried something.
+
+    :rtype: dict
+    :returns:
+        For every call site, the number of calls, attempts, failed
+        attempts, calls which gave up and seconds spent sleeping.
+    """
+    with _STATS_LOCK:
+        stats = {}
+        for site, counter in _STATS.items():
+            stats[site] = dict.fromkeys(
+                ("calls", "attempts", "failures", "exhausted", "waited"), 0)
+            stats[site].update(counter)
+        return stats
+
+
+def reset_stats():
+    """Forget the metrics collected so far."""
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+def _current_scenario():
+    return argus_log.get_log_extra_item(LOG, "scenario")
+
+
+def set_abort_check(check, scenario=None):
+    """Abort the waits of a scenario when `check` raises an exception.
+
+    :param check:
+        A callable which raises the exception which ends the waits,
+        or ``None`` for removing the check of the scenario.
+    :param scenario:
+        The name of the scenario, by default the one run by the
+        current thread.
+    """
+    scenario = scenario or _current_scenario()
+    with _ABORT_LOCK:
+        if check is None:
+            _ABORT_CHECKS.pop(scenario, None)
+        else:
+            _ABORT_CHECKS[scenario] = check
+
+
+def check_abort():
+    """Raise if the waits of the current scenario should be aborted.
+
+    This is called between the attempts of the retry loops and can
+    be called by anything else which waits for long.
+    """
+    with _ABORT_LOCK:
+        check = _ABORT_CHECKS.get(_current_scenario())
+    if check is not None:
+        check()
+
+
+def _retry(attempt, site, backoff, error):
+    _record(site, calls=1)
+    while True:
+        _record(site, attempts=1)
+        done, result = attempt()
+        if done:
+            return result
+
+        _record(site, failures=1)
+        check_abort()
+        delay = backoff.next_delay()
+        if delay is None:
+            _record(site, exhausted=1)
+            LOG.debug("%s gave up after %d attempts in %.1f seconds.",
+                      site, backoff.attempts, backoff.elapsed())
+            raise exceptions.ArgusTimeoutError(error)
+
+        LOG.debug("%s is retrying in %.1f seconds.", site, delay)
+        _record(site, waited=delay)
+        time.sleep(delay)
+
+
+def call(func, site, count=None, delay=None, deadline=None,
+         retryable=(Exception, ), fatal=(), on_failure=None, error=None):
+    """Call `func` until it doesn't raise a retryable exception.
+
+    :param site:
+        The name of the caller, used for logging and metrics.
+    :param count:
+        The maximum number of attempts, ``None`` or 0 meaning no limit.
+    :param delay:
+        The maximum number of seconds to sleep between the attempts.
+    :param deadline:
+        The number of seconds after which no other attempt is made.
+    :param retryable:
+        The exceptions which trigger another attempt. Anything
+        else is raised right away.
+    :param fatal:
+        Subclasses of the retryable exceptions which shouldn't be
+        retried nevertheless.
+    :param on_failure:
+        A callable which receives the exception of every failed
+        attempt, for cleaning up before the next one.
+    :param error:
+        The message of the error raised when giving up.
+    :raises:
+        `ArgusTimeoutError` if the attempts are exhausted.
+    """
+    backoff = Backoff(count=count, max_delay=delay, deadline=deadline)
+
+    def attempt():
+        try:
+            return True, func()
+        except fatal:
+            raise
+        except retryable as exc:
+            LOG.debug("%s failed with %r.", site, exc)
+            if on_failure is not None:
+                on_failure(exc)
+            return False, None
+
+    return _retry(attempt, site, backoff,
+                  error or "{} failed too many times.".format(site))
+
+
+def poll(condition, site, count=None, delay=None, deadline=None,
+         error=None):
+    """Call `condition` until it returns something true.
+
+    The exceptions raised by `condition` are not retried. The
+    parameters are the same as the ones of :func:`call`.
+
+    :returns: The value returned by `condition`.
+    """
+    backoff = Backoff(count=count, max_delay=delay, deadline=deadline)
+
+    def attempt():
+        result = condition()
+        return bool(result), result
+
+    return _retry(attempt, site, backoff,
+                  error or "{} wasn't met in time.".format(site))
@@ -0,0 +1,233 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run the scenarios in a pool of worker threads.
+
+The scenarios share the process, so the module which defines them is
+imported only once and everything computed while importing it, such
+as the availability zones, is shared by all the workers. Every
+scenario runs in its own worker, from building the instance and
+preparing it with the recipe to running its tests, and the results
+are written as a subunit v2 stream.
+"""
+
+from __future__ import print_function
+
+import argparse
+import importlib
+import inspect
+import os
+import re
+import sys
+import threading
+import time
+import unittest
+
+from multiprocessing import pool
+
+import six
+import subunit
+import testtools
+
+from argus import log as argus_log
+from argus.scenarios import base
+
+LOG = argus_log.LOG
+
+
+def _load_module(location):
+    """Import a module given by its dotted name or by its path."""
+    if not location.endswith(".py"):
+        return importlib.import_module(location)
+
+    name = os.path.splitext(os.path.basename(location))[0]
+    if six.PY2:
+        import imp    # pylint: disable=import-error
+        return imp.load_source(name, location)
+
+    from importlib import util as importlib_util
+    spec = importlib_util.spec_from_file_location(name, location)
+    module = importlib_util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def discover(locations, pattern=None):
+    """Find the final scenarios defined by the given modules.
+
+    :param locations: Dotted module names or paths to Python files.
+    :param pattern:
+        A regular expression which is searched in the id of the
+        scenarios, ``module.ScenarioName``, for selecting them.
+    :rtype: list
+    """
+    regex = re.compile(pattern) if pattern else None
+    scenarios = []
+    for location in locations:
+        module = _load_module(location)
+        for _, member in inspect.getmembers(module, inspect.isclass):
+            if (not issubclass(member, base.BaseScenario) or
+                    member.__module__ != module.__name__ or
+                    not member.is_final()):
+                continue
+            scenario_id = "{}.{}".format(module.__name__, member.__name__)
+            if regex and not regex.search(scenario_id):
+                continue
+            scenarios.append(member)
+    return scenarios
+
+
+class ScenarioResult(object):
+    """The outcome of running a scenario."""
+
+    def __init__(self, scenario, successful, elapsed):
+        self.scenario = scenario
+        self.successful = successful
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return "<ScenarioResult {} successful={} elapsed={:.1f}s>".format(
+            self.scenario.__name__, self.successful, self.elapsed)
+
+
+class ScenarioRunner(object):
+    """Run the scenarios in a bounded pool of workers.
+
+    :param workers: The number of scenarios which run at the same time.
+    :param stream:
+        A binary file-like object where the subunit v2 stream with the
+        results of the tests is written.
+    :param log_directory:
+        If given, the records logged by each scenario are also
+        written to ``argus-<scenario>.log`` in this directory.
+    """
+
+    def __init__(self, workers, stream=None, log_directory=None):
+        self._workers = max(workers, 1)
+        self._stream = stream
+        self._log_directory = log_directory
+        self._lock = threading.Lock()
+
+    def _write(self, data):
+        if self._stream is None:
+            return
+        # A whole scenario is written at once, so the packets of
+        # different scenarios don't get interleaved.
+        with self._lock:
+            self._stream.write(data)
+            self._stream.flush()
+
+    def run_scenario(self, scenario):
+        """Run the given scenario in the current thread.
+
+        :rtype: ScenarioResult
+        """
+        argus_log.set_thread_scenario_name(scenario.__name__)
+        handler = None
+        if self._log_directory:
+            handler = argus_log.ScenarioFileHandler(
+                scenario.__name__, os.path.join(
+                    self._log_directory,
+                    "argus-{}.log".format(scenario.__name__)))
+            LOG.logger.addHandler(handler)
+
+        buffer = six.BytesIO()
+        summary = testtools.StreamSummary()
+        result = testtools.ExtendedToStreamDecorator(
+            testtools.CopyStreamResult([
+                subunit.StreamResultToBytes(buffer), summary]))
+        suite = unittest.TestLoader().loadTestsFromTestCase(scenario)
+        start = time.time()
+        LOG.info("Starting scenario %s", scenario.__name__)
+        try:
+            result.startTestRun()
+            try:
+                suite.run(result)
+            finally:
+                result.stopTestRun()
+        finally:
+            if handler:
+                LOG.logger.removeHandler(handler)
+                handler.close()
+            argus_log.set_thread_scenario_name(None)
+
+        self._write(buffer.getvalue())
+        outcome = ScenarioResult(scenario, summary.wasSuccessful(),
+                                 time.time() - start)
+        LOG.info("Finished %r", outcome)
+        return outcome
+
+    def run(self, scenarios):
+        """Run all the given scenarios and wait for them to finish.
+
+        :rtype: list
+        :returns: A :class:`ScenarioResult` for each scenario.
+        """
+        if not scenarios:
+            return []
+        workers = pool.ThreadPool(processes=min(self._workers,
+                                                len(scenarios)))
+        try:
+            return workers.map(self.run_scenario, scenarios, chunksize=1)
+        finally:
+            workers.close()
+            workers.join()
+
+
+def _prepare_argument_parser():
+    parser = argparse.ArgumentParser(
+        description="Run the argus scenarios in parallel.")
+    parser.add_argument("locations", nargs="+",
+                        help="Modules or files which define the scenarios.")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="The number of scenarios run at the same time.")
+    parser.add_argument("-t", "--tests", default=None,
+                        help="Run only the scenarios whose id matches "
+                             "this regular expression.")
+    parser.add_argument("-o", "--subunit", default=None,
+                        help="Where to write the subunit v2 stream with "
+                             "the results.")
+    parser.add_argument("-l", "--log_directory", default=None,
+                        help="Write a log file for each scenario "
+                             "in this directory.")
+    return parser
+
+
+def main(argv=None):
+    """Run the scenarios given on the command line."""
+    args = _prepare_argument_parser().parse_args(argv)
+    scenarios = discover(args.locations, args.tests)
+    print("Running {} scenarios with {} workers.".format(
+        len(scenarios), args.workers))
+
+    stream = open(args.subunit, "wb") if args.subunit else None
+    try:
+        runner = ScenarioRunner(args.workers, stream=stream,
+                                log_directory=args.log_directory)
+        results = runner.run(scenarios)
+    finally:
+        if stream:
+            stream.close()
+
+    for result in results:
+        print("{:<60} {:<6} {:>8.1f}s".format(
+            result.scenario.__name__,
+            "OK" if result.successful else "FAILED", result.elapsed))
+    return 0 if all(result.successful for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
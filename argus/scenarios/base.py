@@ -159,7 +159,11 @@ class BaseScenario(unittest.TestCase):
         # so we're just disabling the errors for now.
         cls.recipe = cls.recipe_type(cls.backend)
 
-        cls.prepare_recipe()
+        cls.backend.start_console_tailer()
+        try:
+            cls.prepare_recipe()
+        finally:
+            cls.backend.stop_console_tailer()
         cls.backend.save_instance_output()
 
     @classmethod
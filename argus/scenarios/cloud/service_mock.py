@@ -13,22 +13,49 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import json
 import multiprocessing
+import os
+import posixpath
+import tempfile
 import textwrap
+import threading
 import time
 import warnings
 
 import cherrypy
+from cherrypy.lib import cptools
+from cherrypy.lib import httputil
+from cherrypy.lib import static
+import requests
 # pylint: disable=import-error
 from six.moves import http_client
 from six.moves import urllib
 
+from argus import config as argus_config
+from argus import log as argus_log
+from argus import resource_registry
 from argus import util
 
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
 
 CLOUDSTACK_EXPECTED_HEADER = "Domu-Request"
 STOP_LINK_RETRY_COUNT = 5
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+INSTALLER_TIMEOUT = 30
+
+
+class named(collections.namedtuple("service", "application script_name "
+                                              "host port")):
+
+    @property
+    def stop_link(self):
+        link = "http://{host}:{port}{script_name}/stop_me/"
+        return link.format(host=self.host,
+                           port=self.port,
+                           script_name=self.script_name)
 
 
 def _create_service_server(service, backend):
@@ -288,3 +315,176 @@ class HTTPKeysMetadataServiceApp(BaseServiceApp):
             # Handle invalid and password posting cases.
             raise cherrypy.HTTPError(404)
         return json.dumps(self._get_metadata)
+
+
+def _check_etag(etag):
+    """Answer the conditional requests for the given entity tag.
+
+    A request whose entity is still the same gets a *304 Not
+    Modified*, while a range of an entity which changed isn't served.
+    """
+    etag = '"{}"'.format(etag)
+    cherrypy.response.headers["ETag"] = etag
+    cherrypy.response.headers["Accept-Ranges"] = "bytes"
+    cptools.validate_etags()
+    if cherrypy.request.headers.get("If-Range", etag) != etag:
+        cherrypy.request.headers.pop("Range", None)
+
+
+def _serve_data(data):
+    """Serve the given bytes, or the range of them which was asked for."""
+    response = cherrypy.response
+    response.headers["Content-Type"] = "application/octet-stream"
+    header = cherrypy.request.headers.get("Range")
+    ranges = httputil.get_ranges(header, len(data)) if header else None
+    if ranges == []:
+        response.headers["Content-Range"] = "bytes */{}".format(len(data))
+        raise cherrypy.HTTPError(416)
+    if ranges and len(ranges) == 1:
+        # Several ranges are rare, they get the whole data instead.
+        start, stop = ranges[0]
+        response.status = 206
+        response.headers["Content-Range"] = "bytes {}-{}/{}".format(
+            start, stop - 1, len(data))
+        return data[start:stop]
+    return data
+
+
+class ResourceMirrorApp(BaseServiceApp):
+    """Serve the Argus resources and the installers to the instances.
+
+    The resources are the ones from the local package, under
+    ``/resources/``, while the installers are fetched from the
+    upstream location and kept in a local directory, under
+    ``/installers/``. A cached installer is checked again with a
+    conditional request once it is older than `installers_max_age`,
+    and replaced when the upstream one changed. Both support the
+    entity tags and the ranges.
+    """
+
+    _cp_config = {"tools.response_headers.on": False}
+
+    def __init__(self, backend, registry=None):
+        super(ResourceMirrorApp, self).__init__(backend)
+        self._registry = registry or resource_registry.REGISTRY
+        self._cache = os.path.expanduser(CONFIG.mirror.installers_cache)
+        self._locks = collections.defaultdict(threading.Lock)
+        # When each installer was last checked against the upstream one.
+        self._checked = {}
+
+    @cherrypy.expose
+    def resources(self, *parts):
+        name = posixpath.normpath("/".join(parts))
+        if not parts or name.startswith(".."):
+            raise cherrypy.HTTPError(404)
+        resource = self._registry.get(name)
+        try:
+            data = resource.data
+        except (IOError, OSError):
+            raise cherrypy.HTTPError(404)
+
+        _check_etag(resource.sha256)
+        return _serve_data(data)
+
+    def _validators_path(self, name):
+        # The leading dot keeps it from being served as an installer.
+        return os.path.join(self._cache, ".{}.validators".format(name))
+
+    def _read_validators(self, name):
+        try:
+            with open(self._validators_path(name)) as stream:
+                return json.load(stream)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write_validators(self, name, response):
+        validators = {"etag": response.headers.get("ETag"),
+                      "last_modified": response.headers.get("Last-Modified")}
+        with open(self._validators_path(name), "w") as stream:
+            json.dump(validators, stream)
+
+    def _download(self, response, path):
+        if not os.path.isdir(self._cache):
+            os.makedirs(self._cache)
+        # The installer shows up only when it is complete.
+        handle, partial_path = tempfile.mkstemp(dir=self._cache)
+        try:
+            with os.fdopen(handle, "wb") as stream:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    stream.write(chunk)
+            os.rename(partial_path, path)
+        except Exception:
+            os.remove(partial_path)
+            raise
+
+    def _fetch_installer(self, name):
+        path = os.path.join(self._cache, name)
+        with self._locks[name]:
+            cached = os.path.exists(path)
+            checked = self._checked.get(name)
+            if (cached and checked is not None and
+                    time.time() - checked < CONFIG.mirror.installers_max_age):
+                return path
+
+            url = "{}/{}".format(
+                CONFIG.mirror.installers_upstream.rstrip("/"), name)
+            headers = {}
+            if cached:
+                validators = self._read_validators(name)
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+            LOG.info("Fetching the installer %s for the mirror.", url)
+            try:
+                response = requests.get(url, stream=True, headers=headers,
+                                        timeout=INSTALLER_TIMEOUT)
+            except requests.RequestException as exc:
+                if not cached:
+                    raise
+                LOG.warning("Serving the cached installer %s, the upstream "
+                            "one couldn't be checked: %s", name, exc)
+                return path
+
+            try:
+                if cached and response.status_code == 304:
+                    LOG.debug("The cached installer %s is up to date.", name)
+                elif response.status_code == 404:
+                    raise cherrypy.HTTPError(404)
+                else:
+                    response.raise_for_status()
+                    self._download(response, path)
+                    self._write_validators(name, response)
+            finally:
+                response.close()
+            self._checked[name] = time.time()
+            return path
+
+    @cherrypy.expose
+    def installers(self, *parts):
+        if len(parts) != 1 or parts[0].startswith("."):
+            raise cherrypy.HTTPError(404)
+        path = self._fetch_installer(parts[0])
+
+        stat = os.stat(path)
+        _check_etag("{:x}-{:x}".format(int(stat.st_mtime), stat.st_size))
+        return static.serve_file(path, "application/octet-stream")
+
+
+def get_mirror_url():
+    """Get the URL of the mirror, as seen by the instances."""
+    if CONFIG.mirror.base_url:
+        return CONFIG.mirror.base_url.rstrip("/")
+    return "http://{}:{}".format(util.get_local_ip(), CONFIG.mirror.port)
+
+
+def start_mirror():
+    """Start the resource mirror in its own process.
+
+    :rtype: :class:`ServiceManager`
+    :returns: The manager which terminates the mirror.
+    """
+    service = named(application=ResourceMirrorApp, script_name="",
+                    host=CONFIG.mirror.host, port=CONFIG.mirror.port)
+    LOG.info("Serving the resources from %s.", get_mirror_url())
+    return ServiceManager([service], None)
@@ -13,7 +13,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import collections
 from six.moves import urllib
 
 from argus import config as argus_config
@@ -39,15 +38,7 @@ def get_port_number(url):
     return port_number
 
 
-class named(collections.namedtuple("service", "application script_name "
-                                              "host port")):
-
-    @property
-    def stop_link(self):
-        link = "http://{host}:{port}{script_name}/stop_me/"
-        return link.format(host=self.host,
-                           port=self.port,
-                           script_name=self.script_name)
+named = service_mock.named
 
 
 class BaseServiceMockMixin(object):
@@ -29,6 +29,8 @@ from argus.backends.tempest import manager
 from argus import config as argus_config
 from argus.config import ci
 from argus import exceptions
+from argus import retry
+from argus.scenarios.cloud import service_mock
 from os_testr import subunit2html
 
 CONFIG = argus_config.CONFIG
@@ -40,16 +42,23 @@ def _download_resource(url, location):
     :param url: The URL that points to the resource
     :param location: Where to save the resource
     """
-    for _ in range(CONFIG.argus.retry_count):
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except (requests.RequestException, requests.HTTPError) as ex:
-            raise exceptions.ArgusEnvironmentError(
-                "Download failed from %s to %s with %s .", url, location, ex)
+    def download():
+        response = requests.get(url)
+        response.raise_for_status()
+        return response
+
+    try:
+        response = retry.call(download, "download_resource",
+                              count=CONFIG.argus.retry_count,
+                              delay=CONFIG.argus.retry_delay,
+                              retryable=(requests.RequestException, ))
+    except exceptions.ArgusTimeoutError as ex:
+        raise exceptions.ArgusEnvironmentError(
+            "Download failed from {} to {} with {}.".format(
+                url, location, ex))
 
     with open(location, 'wb') as file_handle:
-        file_handle.write(response.text)
+        file_handle.write(response.content)
 
 
 def download_argus_resource(resource_path, location, resources_link):
@@ -71,9 +80,9 @@ def _get_image_name(image_ref):
     :param image_ref: The id of the image.
     """
     image_name = None
+    mng = manager.get_manager()
     try:
-        mng = manager.APIManager()
-        images = mng.image_client.list_images()["images"]
+        images = mng.list_images()
         for img_ref in images:
             if img_ref["id"].lower() == image_ref.lower():
                 image_name = img_ref["name"]
@@ -117,6 +126,10 @@ def _prepare_argument_parser():
                         help="URL to Argus resources.")
     parser.add_argument("-p", "--parallel", type=int,
                         help="many processes to use in parallel.")
+    parser.add_argument("-w", "--workers", type=int,
+                        help="Run the scenarios with the argus runner, "
+                             "using this many worker threads, instead "
+                             "of testr.")
     parser.add_argument("-l", "--local",
                         help="Local git repository with all the Argus files.")
     parser.add_argument("-s", "--separate", action="store_true",
@@ -134,6 +147,9 @@ def _prepare_argument_parser():
     parser.add_argument("--use_arestor", dest="use_arestor",
                         action='store_true',
                         help="Use arestor metadata.")
+    parser.add_argument("-m", "--mirror", action="store_true",
+                        help="Serve the resources and the installers to "
+                             "the instances from this machine.")
     return parser
 
 
@@ -169,8 +185,13 @@ def _prepare_environment(local, directory, resources_link, config_file):
 
 def _prepare_config(separate, resources, flavor_ref,
                     git_command, zip_patch,
-                    directory, image_ref, architecture, use_arestor):
-    """Prepare the Argus config file."""
+                    directory, image_ref, architecture, use_arestor,
+                    mirror_url=None):
+    """Prepare the Argus config file.
+
+    If a mirror is given, the instances get the resources and the
+    installers from it.
+    """
 
     conf = six.moves.configparser.SafeConfigParser()
     conf.add_section("argus")
@@ -185,6 +206,10 @@ def _prepare_config(separate, resources, flavor_ref,
     conf.set("argus", "use_arestor", str(use_arestor))
     conf.set("openstack", "image_ref", str(image_ref))
 
+    if mirror_url:
+        resources = "{}/resources".format(mirror_url)
+        conf.set("argus", "installer_root_url",
+                 "{}/installers".format(mirror_url))
     if resources:
         conf.set("argus", "resources", str(resources))
 
@@ -210,6 +235,21 @@ def _start_testr(parallel, tests, directory):
     return process
 
 
+def _start_runner(workers, tests, directory):
+    """Start running the scenarios with the argus runner."""
+
+    cmd = [sys.executable, "-m", "argus.runner",
+           "--workers", str(workers),
+           "--subunit", os.path.join(directory, "argus-results.subunit"),
+           "--log_directory", directory,
+           os.path.join("ci", "tests.py")]
+    if tests:
+        cmd.extend(["--tests", str(tests)])
+
+    process = subprocess.Popen(cmd, cwd=directory, close_fds=True)
+    return process
+
+
 def main():
     """The main entry point."""
     parser = _prepare_argument_parser()
@@ -224,18 +264,32 @@ def main():
     _prepare_environment(args.local, base_directory, args.resources,
                          args.config_file)
 
+    mirror = mirror_url = None
+    if args.mirror or CONFIG.mirror.enabled:
+        mirror = service_mock.start_mirror()
+        mirror_url = service_mock.get_mirror_url()
+
     _prepare_config(args.separate, args.resources,
                     args.flavor_ref, args.git_command,
                     args.zip_patch, base_directory,
                     args.image_ref, args.architecture,
-                    args.use_arestor)
+                    args.use_arestor, mirror_url)
 
-    process = _start_testr(args.parallel, args.tests, base_directory)
-    exit_code = process.wait()
+    try:
+        if args.workers:
+            process = _start_runner(args.workers, args.tests,
+                                    base_directory)
+            stream = os.path.join(base_directory, "argus-results.subunit")
+        else:
+            process = _start_testr(args.parallel, args.tests,
+                                   base_directory)
+            stream = os.path.join(base_directory, ".testrepository", "0")
+        exit_code = process.wait()
+    finally:
+        if mirror is not None:
+            mirror.terminate()
 
     # generate subunit
-    stream = os.path.join(base_directory,
-                          ".testrepository", "0")
     output = os.path.join(base_directory,
                           "argus-results-{}.html".format(image_name))
     sys.argv[1] = stream
@@ -0,0 +1,106 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+# pylint: disable=protected-access
+import hashlib
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.action_manager import staging
+from argus import exceptions
+from argus import resource_registry
+from argus import util
+
+RESOURCES = {
+    "windows/first.ps1": b"first",
+    "windows/second.py": b"second",
+    "windows/data.exe": b"data",
+}
+CACHE = r"C:\argus\cache"
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestResourceStage(unittest.TestCase):
+
+    def setUp(self):
+        self._registry = resource_registry.ResourceRegistry(
+            loader=RESOURCES.__getitem__)
+        self._client = mock.Mock()
+        self._client.facts = util.FactCache()
+        self._listing = ""
+        self._client.run_command_with_retry.side_effect = self._run
+        self._stage = staging.ResourceStage(
+            self._client, cache_dir=CACHE, registry=self._registry)
+
+    def _run(self, cmd, **_):
+        if cmd == staging.LIST_SCRIPT.format(cache=CACHE):
+            return self._listing, "", 0
+        # Answer the staging script with the expected hashes.
+        hashes = sorted((_sha256(data) for data in RESOURCES.values()
+                         if _sha256(data) in cmd), key=cmd.index)
+        return "\r\n".join(hashes), "", 0
+
+    def test_path(self):
+        self.assertEqual(
+            self._stage.path("windows/first.ps1"),
+            CACHE + "\\" + _sha256(b"first") + r"\first.ps1")
+
+    def test_stage_sends_the_missing_resources_once(self):
+        self._listing = _sha256(b"first").upper() + "\\first.ps1\r\n"
+
+        paths = self._stage.stage(["windows/first.ps1", "windows/second.py",
+                                   "windows/data.exe"])
+        # Everything is known to be staged now.
+        self._stage.stage(["windows/second.py", "windows/first.ps1"])
+
+        self.assertEqual(paths, [self._stage.path(name) for name in
+                                 ("windows/first.ps1", "windows/second.py",
+                                  "windows/data.exe")])
+        self._client.write_file.assert_called_once_with(
+            data=b"seconddata", remote_destination=mock.ANY, append=False)
+        # The cache was listed, then the bundle staged.
+        self.assertEqual(self._client.run_command_with_retry.call_count, 2)
+
+    def test_stage_lists_again_after_the_facts_change(self):
+        self._stage.stage(["windows/first.ps1"])
+        self._client.facts.invalidate()
+        self._listing = _sha256(b"first") + "\\first.ps1\r\n"
+
+        self._stage.stage(["windows/first.ps1"])
+
+        self.assertEqual(self._client.write_file.call_count, 1)
+        self.assertEqual(self._client.run_command_with_retry.call_count, 3)
+
+    def test_stage_corrupted(self):
+        self._client.run_command_with_retry.side_effect = [
+            ("", "", 0), ("wrong hash", "", 0)]
+
+        with self.assertRaises(exceptions.ArgusTransferError):
+            self._stage.stage(["windows/first.ps1"])
+
+        # Nothing is considered staged.
+        self.assertEqual(self._stage.present(), frozenset())
+
+    def test_get_scripts(self):
+        scripts = staging.get_scripts()
+        self.assertIn("windows/network_details.ps1", scripts)
+        self.assertIn("windows/argusagent.py", scripts)
+        self.assertNotIn("windows/test_exe64.exe", scripts)
@@ -46,10 +46,15 @@ class WindowsActionManagerTest(unittest.TestCase):
 
     def setUp(self):
         self._client = mock.MagicMock()
+        self._client.facts = util.FactCache()
         self._os_type = mock.sentinel.os_type
 
         self._action_manager = action_manager.WindowsActionManager(
             client=self._client, os_type=self._os_type)
+        # Some tests replace these functions, don't let them leak.
+        for name in ("get_cbinit_dir", "get_python_dir"):
+            self.addCleanup(setattr, introspection, name,
+                            getattr(introspection, name))
 
     def test_download_successful(self):
         self._action_manager.download(test_utils.URI, test_utils.LOCATION)
@@ -70,6 +75,7 @@ class WindowsActionManagerTest(unittest.TestCase):
         with self.assertRaises(exceptions.ArgusTimeoutError):
             self._action_manager.download(test_utils.URI, test_utils.LOCATION)
 
+    @test_utils.ConfPatcher('stage_resources', False, 'argus')
     @test_utils.ConfPatcher('resources', test_utils.BASE_RESOURCE, 'argus')
     @mock.patch('argus.action_manager.windows.WindowsActionManager.download')
     def _test_download_resource(self, mock_download, expected_uri, exc=None):
@@ -95,6 +101,7 @@ class WindowsActionManagerTest(unittest.TestCase):
             expected_uri=urlparse.urljoin(
                 test_utils.BASE_RESOURCE, test_utils.RESOURCE_LOCATION))
 
+    @test_utils.ConfPatcher('stage_resources', False, 'argus')
     @test_utils.ConfPatcher('resources', test_utils.BASE_RESOURCE[:-1],
                             'argus')
     @mock.patch('argus.action_manager.windows.WindowsActionManager.download')
@@ -108,6 +115,39 @@ class WindowsActionManagerTest(unittest.TestCase):
         mock_download.assert_called_once_with(
             expected_uri, test_utils.LOCATION)
 
+    @test_utils.ConfPatcher('stage_resources', True, 'argus')
+    @mock.patch('argus.action_manager.windows.WindowsActionManager.download')
+    def test_download_resource_staged(self, mock_download):
+        self._action_manager._stage = mock.Mock()
+        self._action_manager._stage.stage.return_value = [
+            test_utils.RESOURCE_LOCATION]
+
+        self._action_manager.download_resource(
+            "windows/resource.ps1", test_utils.LOCATION)
+
+        self.assertFalse(mock_download.called)
+        self._action_manager._stage.stage.assert_called_once_with(
+            ["windows/resource.ps1"])
+        self._client.run_command_with_retry.assert_called_once_with(
+            "Copy-Item -Force -LiteralPath '{}' -Destination '{}'".format(
+                test_utils.RESOURCE_LOCATION, test_utils.LOCATION),
+            command_type=util.POWERSHELL)
+
+    @test_utils.ConfPatcher('stage_resources', True, 'argus')
+    @mock.patch('argus.action_manager.windows.WindowsActionManager'
+                '.download_resource')
+    def test_get_resource_location_staged(self, mock_download_resource):
+        self._action_manager._stage = mock.Mock()
+        self._action_manager._stage.stage.return_value = [
+            test_utils.RESOURCE_LOCATION]
+
+        location = self._action_manager.get_resource_location(
+            "windows/resource.ps1")
+
+        self.assertEqual(location, test_utils.RESOURCE_LOCATION)
+        self.assertFalse(mock_download_resource.called)
+
+    @test_utils.ConfPatcher('stage_resources', False, 'argus')
     @mock.patch('argus.action_manager.windows.WindowsActionManager'
                 '.download_resource')
     def _test_execute_resource_script(self, mock_download_resource,
@@ -213,6 +253,7 @@ class WindowsActionManagerTest(unittest.TestCase):
     def test_get_installation_script_exception(self):
         self._test_get_installation_script(exc=exceptions.ArgusTimeoutError)
 
+    @test_utils.ConfPatcher('stage_resources', False, 'argus')
     @mock.patch('argus.action_manager.windows.WindowsActionManager'
                 '.wait_boot_completion')
     @mock.patch('argus.action_manager.windows.WindowsActionManager'
@@ -250,6 +291,7 @@ class WindowsActionManagerTest(unittest.TestCase):
 
         mock_download_resource.assert_called_once_with(
             test_utils.SYSPREP_RESOURCE_LOCATION, cmd)
+        self._client.reset_sessions.assert_called_once_with()
         mock_wait_boot_completion.assert_called_once_with()
 
     def test_sysprep_successful(self):
@@ -309,52 +351,58 @@ class WindowsActionManagerTest(unittest.TestCase):
                                              count=2)
         self.assertFalse(res)
 
-    def _test_wait_cbinit_service(self, run_command_exc=None):
-        if run_command_exc:
-            self._client.run_command_until_condition = mock.Mock(
-                side_effect=run_command_exc)
-            with self.assertRaises(run_command_exc):
-                self._action_manager.wait_cbinit_service()
-        else:
-            self._client.run_command_until_condition = mock.Mock()
-            self.assertIsNone(self._action_manager.wait_cbinit_service())
+    def _get_wait_cbinit_variables(self):
+        self.assertEqual(self._client.run_command.call_count, 1)
+        args, kwargs = self._client.run_command.call_args
+        self.assertEqual(kwargs["command_type"], util.POWERSHELL)
+        self.assertIn("FileSystemWatcher", args[0])
+        return args[0].split("\n")[:4]
 
-    def test_wait_cbinit_service_successful(self):
-        self._test_wait_cbinit_service()
+    def test_wait_cbinit_service(self):
+        self._client.run_command = mock.Mock()
 
-    def test_wait_cbinit_service_fail(self):
-        self._test_wait_cbinit_service(
-            run_command_exc=exceptions.ArgusTimeoutError)
+        self._action_manager.wait_cbinit_service(
+            searched_paths=[r"C:\fake\path", r"C:\fake's\path"])
 
-    def _test_check_cbinit_service(self, run_command_exc=None):
-        if run_command_exc:
-            self._client.run_command_until_condition = mock.Mock(
-                side_effect=run_command_exc)
-            with self.assertRaises(run_command_exc):
-                self._action_manager.check_cbinit_service(
-                    test_utils.SEARCHED_PATHS)
-        else:
-            self._client.run_command_until_condition = mock.Mock()
-            self.assertIsNone(
-                self._action_manager.check_cbinit_service(
-                    test_utils.SEARCHED_PATHS))
+        variables = self._get_wait_cbinit_variables()
+        self.assertEqual(variables[:3], [
+            r"$paths = @('C:\fake\path', 'C:\fake''s\path')",
+            "$serviceName = 'cloudbase-init'",
+            "$serviceStatus = 'Stopped'"])
+        self.assertTrue(variables[3].startswith("$timeout = "))
 
-    def test_check_cbinit_service_successful(self):
-        self._test_check_cbinit_service()
+    def test_check_cbinit_service(self):
+        self._client.run_command = mock.Mock()
 
-    def test_check_cbinit_service_fail(self):
-        self._test_check_cbinit_service(
-            run_command_exc=exceptions.ArgusTimeoutError)
+        self._action_manager.check_cbinit_service(test_utils.SEARCHED_PATHS)
+
+        variables = self._get_wait_cbinit_variables()
+        self.assertEqual(variables[2], "$serviceStatus = ''")
+
+    def test_check_cbinit_service_no_paths(self):
+        self._client.run_command = mock.Mock()
+        self._action_manager.check_cbinit_service()
+        self.assertFalse(self._client.run_command.called)
+
+    @mock.patch('time.sleep')
+    def test_wait_cbinit_service_retries(self, mock_sleep):
+        self._client.run_command = mock.Mock(
+            side_effect=[exceptions.ArgusError, None])
+
+        self._action_manager.wait_cbinit_service()
 
-    def test_check_cbinit_service_fail_clierror(self):
-        self._client.run_command_until_condition = mock.Mock(
-            side_effect=[None, exceptions.ArgusCLIError, None])
+        self.assertEqual(self._client.run_command.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
 
-        with self.assertRaises(exceptions.ArgusCLIError):
-            self._action_manager.check_cbinit_service(
+    @test_utils.ConfPatcher('cbinit_ready_timeout', 0, 'argus')
+    def test_wait_cbinit_service_fail(self):
+        self._client.run_command = mock.Mock(
+            side_effect=exceptions.ArgusError)
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            self._action_manager.wait_cbinit_service(
                 test_utils.SEARCHED_PATHS)
-        self.assertEqual(
-            self._client.run_command_until_condition.call_count, 2)
+        self.assertEqual(self._client.run_command.call_count, 1)
 
     @test_utils.ConfPatcher('image_username', test_utils.USERNAME, 'openstack')
     @mock.patch('argus.action_manager.windows.wait_boot_completion')
@@ -375,6 +423,7 @@ class WindowsActionManagerTest(unittest.TestCase):
     def test_wait_boot_completion_fail(self):
         self._test_wait_boot_completion(exc=exceptions.ArgusCLIError)
 
+    @test_utils.ConfPatcher('stage_resources', False, 'argus')
     @test_utils.ConfPatcher('resources', test_utils.BASE_RESOURCE, 'argus')
     def test_specific_prepare(self):
         resource = (test_utils.BASE_RESOURCE +
@@ -859,14 +908,14 @@ class WindowsActionManagerTest(unittest.TestCase):
     def _test_check_cbinit_installation(self, get_python_dir_exc=None,
                                         run_remote_cmd_exc=None):
         if get_python_dir_exc:
-            introspection.get_python_dir = mock.Mock(
+            self._action_manager.get_python_dir = mock.Mock(
                 side_effect=get_python_dir_exc)
             self.assertFalse(self._action_manager.check_cbinit_installation())
             return
 
         cmd = r'& "{}\python.exe" -c "import cloudbaseinit"'.format(
             test_utils.PYTHON_DIR)
-        introspection.get_python_dir = mock.Mock(
+        self._action_manager.get_python_dir = mock.Mock(
             return_value=test_utils.PYTHON_DIR)
         if run_remote_cmd_exc:
             self._client.run_remote_cmd = mock.Mock(
@@ -910,13 +959,50 @@ class WindowsActionManagerTest(unittest.TestCase):
 
     def test_cbinit_cleanup(self):
         self._test_cbinit_cleanup()
+        self.assertEqual(self._client.facts.stats()["size"], 0)
 
     def test_cbinit_cleanup_get_cbinit_dir_exc(self):
+        self._client.facts.set("deployed_configs", {"path": "config"})
         self._test_cbinit_cleanup(get_cbinit_dir_exc=exceptions.ArgusError)
+        # The configs are written again by the next installation.
+        self.assertEqual(self._client.facts.stats()["size"], 0)
 
     def test_cbinit_cleanup_rmdir_exc(self):
         self._test_cbinit_cleanup(rmdir_exc=exceptions.ArgusError)
 
+    @mock.patch('argus.introspection.cloud.windows.get_python_dir')
+    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
+    def test_get_dirs_are_cached(self, mock_get_cbinit_dir,
+                                 mock_get_python_dir):
+        for _ in range(3):
+            self._action_manager.get_agent_command("encode")
+            self.assertEqual(self._action_manager.get_cbinit_dir(),
+                             mock_get_cbinit_dir.return_value)
+
+        mock_get_cbinit_dir.assert_called_once_with(
+            self._action_manager._execute)
+        mock_get_python_dir.assert_called_once_with(
+            self._action_manager._execute, mock_get_cbinit_dir.return_value)
+
+        self._client.facts.invalidate()
+        self._action_manager.get_python_dir()
+        self.assertEqual(mock_get_cbinit_dir.call_count, 2)
+        self.assertEqual(mock_get_python_dir.call_count, 2)
+
+    @mock.patch('argus.action_manager.windows.WindowsActionManager'
+                '._run_installation_script')
+    def test_install_cbinit_invalidates_facts(self, mock_run):
+        self._client.facts.get("cbinit_dir", lambda: "old location")
+        self._client.facts.set("deployed_configs", {"path": "config"})
+        self._client.facts.get("os_fingerprint", lambda: "fingerprint")
+        mock_run.side_effect = lambda _: self.assertEqual(
+            self._client.facts.stats()["size"], 1)
+        self._action_manager.check_cbinit_installation = mock.Mock(
+            return_value=True)
+
+        self.assertTrue(self._action_manager.install_cbinit())
+        mock_run.assert_called_once_with(mock.ANY)
+
     @mock.patch('argus.action_manager.windows.WindowsActionManager'
                 '.cbinit_cleanup')
     @mock.patch('argus.action_manager.windows.WindowsActionManager'
@@ -1058,7 +1144,8 @@ class WindowsActionManagerTest(unittest.TestCase):
                 test_utils.INSTALLER)
             mock_execute_script.assert_called_once_with(
                 'windows/schedule_installer.ps1',
-                '{}'.format(test_utils.INSTALLER))
+                '-installer {} -MsiWebLocation {}'.format(
+                    test_utils.INSTALLER, CONFIG.argus.installer_root_url))
 
     def test_deploy_using_scheduled_task(self):
         self._test_deploy_using_scheduled_task()
@@ -1300,169 +1387,37 @@ class ActionManagerTest(unittest.TestCase):
         self._test_wait_boot_completion(
             run_command_exc=exceptions.ArgusTimeoutError)
 
-    def _test_is_nanoserver(self, run_command_test_exc=None, path_exists=True,
-                            run_command_get_exc=None, is_nanoserver=True):
-        client = mock.MagicMock()
-
-        if run_command_test_exc:
-            client.run_command_with_retry.side_effect = run_command_test_exc
-            with self.assertRaises(run_command_test_exc):
-                action_manager._is_nanoserver(client)
-            return
-
-        if not path_exists:
-            client.run_command_with_retry.side_effect = [
-                ("False", test_utils.STDERR, test_utils.EXIT_CODE)]
-            self.assertFalse(action_manager._is_nanoserver(client))
-            return
-
-        client.run_command_with_retry.side_effect = [
-            ("True", test_utils.STDERR, test_utils.EXIT_CODE)]
-
-        if run_command_get_exc:
-            client.run_command_with_retry.side_effect = run_command_get_exc
-            with self.assertRaises(run_command_get_exc):
-                action_manager._is_nanoserver(client)
-            return
-
-        if is_nanoserver:
-            client.run_command_with_retry.side_effect = [
-                ("True", test_utils.STDERR, test_utils.EXIT_CODE),
-                ("1", test_utils.STDERR, test_utils.EXIT_CODE)]
-        else:
-            client.run_command_with_retry.side_effect = [
-                ("True", test_utils.STDERR, test_utils.EXIT_CODE),
-                ("0", test_utils.STDERR, test_utils.EXIT_CODE)]
-
-        action_manager._is_nanoserver(client)
-
-        server_level_key = (r'HKLM:\Software\Microsoft\Windows NT'
-                            r'\CurrentVersion\Server\ServerLevels')
-        cmd1 = r'Test-Path "{}"'.format(server_level_key)
-        cmd2 = r'(Get-ItemProperty "{}").NanoServer'.format(server_level_key)
-
-        calls = [
-            mock.call(cmd1, count=CONFIG.argus.retry_count,
-                      delay=CONFIG.argus.retry_delay,
-                      command_type=util.POWERSHELL),
-            mock.call(cmd2, count=CONFIG.argus.retry_count,
-                      delay=CONFIG.argus.retry_delay,
-                      command_type=util.POWERSHELL)
-        ]
-
-        client.run_command_with_retry.assert_has_calls(calls)
-
-    def test_is_nanoserver(self):
-        self._test_is_nanoserver()
-
-    def test_is_nanoserver_run_command_test_exc(self):
-        self._test_is_nanoserver(
-            run_command_test_exc=exceptions.ArgusTimeoutError)
-
-    def test_is_nanoserver_path_not_exists(self):
-        self._test_is_nanoserver(path_exists=False)
-
-    def test_is_nanoserver_run_command_get_exc(self):
-        self._test_is_nanoserver(
-            run_command_get_exc=exceptions.ArgusTimeoutError)
-
-    def test_is_not_nanoserver(self):
-        self._test_is_nanoserver(is_nanoserver=False)
-
-    def _test_get_product_type(self, major_version, run_command_exc=None):
-        self._client.run_command_with_retry = mock.Mock()
-
-        if run_command_exc:
-            self._client.run_command_with_retry.side_effect = run_command_exc
-            with self.assertRaises(run_command_exc):
-                action_manager._get_product_type(self._client, major_version)
-            return
-
-        self._client.run_command_with_retry.side_effect = [
-            (test_utils.PRODUCT_TYPE_1, test_utils.STDERR,
-             test_utils.EXIT_CODE)
-        ]
-
-        cmdlet = action_manager.Windows8ActionManager.WINDOWS_MANAGEMENT_CMDLET
-        if major_version == 10:
-            cmdlet = (action_manager.Windows10ActionManager
-                      .WINDOWS_MANAGEMENT_CMDLET)
-        cmd = r"({} -Class Win32_OperatingSystem).producttype".format(cmdlet)
-
-        self.assertEqual(
-            action_manager._get_product_type(self._client, major_version),
-            int(test_utils.PRODUCT_TYPE_1))
-        self._client.run_command_with_retry.assert_called_once_with(
-            cmd, count=CONFIG.argus.retry_count,
-            delay=CONFIG.argus.retry_delay,
-            command_type=util.POWERSHELL)
-
-    def test_get_product_type_major_version_6(self):
-        self._test_get_product_type(major_version=test_utils.MAJOR_VERSION_6)
-
-    def test_get_product_type_major_version_10(self):
-        self._test_get_product_type(major_version=test_utils.MAJOR_VERSION_10)
-
-    def test_get_product_type_run_command_exc(self):
-        self._test_get_product_type(
-            major_version=test_utils.MAJOR_VERSION_6,
-            run_command_exc=exceptions.ArgusTimeoutError)
-
     @test_utils.ConfPatcher('image_username', test_utils.IMAGE_USERNAME,
                             'openstack')
+    @mock.patch('argus.introspection.cloud.windows.get_os_fingerprint')
     @mock.patch('argus.action_manager.windows.wait_boot_completion')
-    @mock.patch('argus.action_manager.windows._get_product_type')
-    @mock.patch('argus.action_manager.windows._is_nanoserver')
     def _test_get_windows_action_manager(
-            self, mock_is_nanoserver, mock_get_product_type,
-            mock_wait_boot_completion, major_version, minor_version,
-            product_type, is_nanoserver=False, is_nanoserver_exc=None,
-            get_product_type_exc=None, get_os_version_exc=None,
-            wait_boot_completion_exc=None):
+            self, mock_wait_boot_completion, mock_get_os_fingerprint,
+            major_version, minor_version, product_type, is_nanoserver=False,
+            get_os_fingerprint_exc=None, wait_boot_completion_exc=None):
 
         if wait_boot_completion_exc:
             mock_wait_boot_completion.side_effect = wait_boot_completion_exc
             with self.assertRaises(wait_boot_completion_exc):
                 action_manager.get_windows_action_manager(self._client)
+            self.assertFalse(mock_get_os_fingerprint.called)
             return
 
-        if get_os_version_exc is None:
-            get_os_version_exc = [None, None]
-        introspection.get_os_version = mock.Mock(
-            side_effect=get_os_version_exc)
-
-        if get_os_version_exc[0]:
-            with self.assertRaises(get_os_version_exc[0]):
-                action_manager.get_windows_action_manager(self._client)
-            return
-
-        if get_os_version_exc[1]:
-            with self.assertRaises(get_os_version_exc[1]):
-                action_manager.get_windows_action_manager(self._client)
-            return
-
-        introspection.get_os_version.side_effect = [major_version,
-                                                    minor_version]
-
-        if get_product_type_exc:
-            mock_get_product_type.side_effect = get_product_type_exc
-            with self.assertRaises(get_product_type_exc):
+        if get_os_fingerprint_exc:
+            mock_get_os_fingerprint.side_effect = get_os_fingerprint_exc
+            with self.assertRaises(get_os_fingerprint_exc):
                 action_manager.get_windows_action_manager(self._client)
             return
 
-        mock_get_product_type.return_value = product_type
+        mock_get_os_fingerprint.return_value = introspection.OSFingerprint(
+            major=major_version, minor=minor_version, build=14393,
+            product_type=product_type, nano_server=is_nanoserver,
+            architecture="AMD64", program_files="C:\\Program Files",
+            program_files_x86="C:\\Program Files (x86)",
+            powershell_version="5.1.14393.0")
 
         windows_type = util.WINDOWS_VERSION.get(
             (major_version, minor_version, product_type), util.WINDOWS)
-
-        if is_nanoserver_exc:
-            mock_is_nanoserver.side_effect = is_nanoserver_exc
-            with self.assertRaises(is_nanoserver_exc):
-                action_manager.get_windows_action_manager(self._client)
-            return
-
-        mock_is_nanoserver.return_value = is_nanoserver
-
         if isinstance(windows_type, dict):
             windows_type = windows_type[is_nanoserver]
 
@@ -1487,6 +1442,7 @@ class ActionManagerTest(unittest.TestCase):
                              [log_message_booting,
                               log_message_action_manager_type,
                               log_message_log_update])
+        mock_get_os_fingerprint.assert_called_once_with(self._client)
 
     def test_get_windows_action_manager_wait_boot_completion_exc(self):
         self._test_get_windows_action_manager(
@@ -1495,33 +1451,12 @@ class ActionManagerTest(unittest.TestCase):
             product_type=int(test_utils.PRODUCT_TYPE_1),
             wait_boot_completion_exc=exceptions.ArgusTimeoutError)
 
-    def test_get_windows_action_manager_get_major_version_exc(self):
-        self._test_get_windows_action_manager(
-            major_version=int(test_utils.MAJOR_VERSION_10),
-            minor_version=int(test_utils.MINOR_VERSION_0),
-            product_type=int(test_utils.PRODUCT_TYPE_1),
-            get_os_version_exc=[exceptions.ArgusTimeoutError, None])
-
-    def test_get_windows_action_manager_get_minor_version_exc(self):
-        self._test_get_windows_action_manager(
-            major_version=int(test_utils.MAJOR_VERSION_10),
-            minor_version=int(test_utils.MINOR_VERSION_0),
-            product_type=int(test_utils.PRODUCT_TYPE_1),
-            get_os_version_exc=[None, exceptions.ArgusTimeoutError])
-
-    def test_get_windows_action_manager_get_product_type_exc(self):
-        self._test_get_windows_action_manager(
-            major_version=int(test_utils.MAJOR_VERSION_10),
-            minor_version=int(test_utils.MINOR_VERSION_0),
-            product_type=int(test_utils.PRODUCT_TYPE_1),
-            get_product_type_exc=exceptions.ArgusTimeoutError)
-
-    def test_get_windows_action_manager_is_nanoserver_exc(self):
+    def test_get_windows_action_manager_get_os_fingerprint_exc(self):
         self._test_get_windows_action_manager(
             major_version=int(test_utils.MAJOR_VERSION_10),
             minor_version=int(test_utils.MINOR_VERSION_0),
             product_type=int(test_utils.PRODUCT_TYPE_1),
-            is_nanoserver_exc=exceptions.ArgusTimeoutError)
+            get_os_fingerprint_exc=exceptions.ArgusTimeoutError)
 
     def test_get_windows_10_action_manager(self):
         self._test_get_windows_action_manager(
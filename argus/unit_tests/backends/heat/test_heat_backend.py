@@ -20,7 +20,6 @@ import unittest
 
 from argus.backends.heat import heat_backend
 from argus import exceptions
-from heatclient import exc
 
 try:
     import unittest.mock as mock
@@ -138,12 +137,10 @@ class TestBaseHeatBackend(unittest.TestCase):
         mock_config.image_ref = mock.sentinel
         mock_config.flavor_ref = mock.sentinel
         mock_manager = mock.Mock()
-        mock_manager.image_client = mock.Mock()
-        mock_manager.image_client.get_image_meta.return_value = {
+        mock_manager.get_image_meta.return_value = {
             "name": mock.sentinel
         }
-        mock_manager.flavors_client = mock.Mock()
-        mock_manager.flavors_client.show_flavor.return_value = {
+        mock_manager.show_flavor.return_value = {
             "flavor": {
                 "name": mock.sentinel
             }
@@ -162,14 +159,16 @@ class TestBaseHeatBackend(unittest.TestCase):
         self._base_heat_backend._build_template = mock.Mock()
         self._base_heat_backend._build_template.return_value = mock.sentinel
         self._base_heat_backend._heat_client.stacks.create = mock.Mock()
+        (self._base_heat_backend._heat_client.stacks.create.
+         return_value) = {"stack": {"id": "fake id"}}
         mock_manager.primary_credentials.return_value = mock_credentials
         self._base_heat_backend._configure_networking = mock.Mock()
         self._base_heat_backend._manager = mock_manager
         self._base_heat_backend.setup_instance()
 
-        (mock_manager.image_client.get_image_meta.
+        (mock_manager.get_image_meta.
          assert_called_once_with(mock_config.image_ref))
-        (mock_manager.flavors_client.show_flavor.assert_called_once_with(
+        (mock_manager.show_flavor.assert_called_once_with(
             mock_config.flavor_ref))
         (mock_manager.create_keypair.assert_called_once_with(
             name=self._base_heat_backend.__class__.__name__))
@@ -192,20 +191,16 @@ class TestBaseHeatBackend(unittest.TestCase):
         }
         (self._base_heat_backend._heat_client.stacks.create.
          assert_called_once_with(**fields))
+        self.assertEqual(self._base_heat_backend._watcher.identifier,
+                         "{}/fake id".format(self._base_heat_backend._name))
 
-    def _test_cleanup(self, reduce_=True, fails=False):
+    def _test_cleanup(self, created=True, fails=False):
         if self._base_heat_backend._keypair:
             self._base_heat_backend._keypair = mock.Mock()
             self._base_heat_backend._keypair.destroy = mock.Mock()
 
-        self._base_heat_backend._heat_client.stacks.list = mock.Mock()
-        if reduce_ is False:
-            (self._base_heat_backend._heat_client.stacks.list.
-             return_value) = []
-        else:
-            (self._base_heat_backend._heat_client.stacks.list.
-             return_value) = [1]
-
+        if created:
+            self._base_heat_backend._watcher = mock.Mock()
         self._base_heat_backend._delete_floating_ip = mock.Mock()
         self._base_heat_backend._heat_client.stacks.delete = mock.Mock()
         if fails:
@@ -223,14 +218,16 @@ class TestBaseHeatBackend(unittest.TestCase):
         if self._base_heat_backend._keypair:
             (self._base_heat_backend._keypair.destroy.
              assert_called_once_with())
-        if reduce_ is False:
+        if not created:
             self.assertEqual(result, None)
+            self.assertFalse(
+                self._base_heat_backend._heat_client.stacks.delete.called)
         else:
             (self._base_heat_backend._delete_floating_ip.
              assert_called_once_with())
             (self._base_heat_backend._heat_client.stacks.delete.
              assert_called_once_with(
-                 stack_id=self._base_heat_backend._name))
+                 stack_id=self._base_heat_backend._watcher.identifier))
             count = 1
             if fails:
                 count = 0
@@ -239,9 +236,9 @@ class TestBaseHeatBackend(unittest.TestCase):
             (self._base_heat_backend._manager.cleanup_credentials.
              assert_called_once_with())
 
-    def test_cleanup_no_reduce_destroy_key(self):
+    def test_cleanup_no_stack_destroy_key(self):
         self._base_heat_backend._keypair = mock.sentinel
-        self._test_cleanup(reduce_=False)
+        self._test_cleanup(created=False)
 
     def test_cleanup_success(self):
         self._base_heat_backend._keypair = None
@@ -251,31 +248,13 @@ class TestBaseHeatBackend(unittest.TestCase):
         self._base_heat_backend._keypair = None
         self._test_cleanup(fails=True)
 
-    def test_get_stacks(self):
-        list_ = [1, 2, 3, 4, 5]
-        self._base_heat_backend._heat_client.stacks.list = mock.Mock()
-        (self._base_heat_backend._heat_client.stacks.list.
-         return_value) = list_
-        result = self._base_heat_backend._get_stacks()
-        self.assertEqual(result, len(list_))
-
-    def test_wait_stacks_fails(self):
-        raised_exception = exceptions.ArgusHeatTeardown(
-            "All stacks failed to be deleted in time!")
-        self._base_heat_backend._get_stacks = mock.Mock()
-        self._base_heat_backend._get_stacks.return_value = 0
-        with self.assertRaises(exceptions.ArgusHeatTeardown) as ex:
-            self._base_heat_backend._wait_stacks()
-        self.assertEqual(ex.exception.message, str(raised_exception))
-
-    @mock.patch("time.sleep", return_value=None)
-    def test_wait_stacks(self, _):
-        self._base_heat_backend._get_stacks = mock.Mock()
-        self._base_heat_backend._get_stacks.side_effect = [1, 1, 0]
+    def test_wait_stacks(self):
+        self._base_heat_backend._watcher = mock.Mock()
         result = self._base_heat_backend._wait_stacks(retry_delay=1,
                                                       retry_count=5)
         self.assertEqual(result, None)
-        self.assertEqual(self._base_heat_backend._get_stacks.call_count, 3)
+        (self._base_heat_backend._watcher.wait_deleted.
+         assert_called_once_with(delay=1, deadline=5))
 
     def test_delete_floating_ip_fails(self):
         (self._base_heat_backend._manager.floating_ips_client.
@@ -287,83 +266,36 @@ class TestBaseHeatBackend(unittest.TestCase):
 
         self._base_heat_backend._delete_floating_ip()
 
-    def test_search_resoutce_until_status_http_error(self):
+        (self._base_heat_backend._manager.floating_ips_client.
+         delete_floating_ip.assert_called_once_with(mock.sentinel))
+        (self._base_heat_backend._search_resource_until_status.
+         assert_called_once_with(
+             heat_backend.OS_NEUTRON_FLOATING_IP,
+             status=heat_backend.RESOURCE_DELETED_STATUS,
+             deadline=(heat_backend.HEAT_RESOURCE_LIMIT *
+                       heat_backend.HEAT_RESOURCE_TIMEOUT)))
+
+    def test_search_resource_until_status_no_stack(self):
         self._base_heat_backend._name = "fake name"
         raised_exception = exceptions.ArgusError('Stack not found: %s' %
                                                  self._base_heat_backend._name)
-        self._base_heat_backend._heat_client.resources.list = mock.Mock()
-        (self._base_heat_backend._heat_client.resources.list.
-         side_effect) = exc.HTTPNotFound()
         with self.assertRaises(exceptions.ArgusError) as ex:
             self._base_heat_backend._search_resource_until_status(
                 mock.sentinel)
-        self.assertEqual(ex.exception.message,
-                         str(raised_exception))
+        self.assertEqual(str(ex.exception), str(raised_exception))
+
+    def test_search_resource_until_status(self):
+        mock_watcher = mock.Mock()
+        self._base_heat_backend._watcher = mock_watcher
 
-    def test_search_resource_until_status_limit_exceded(self):
-        resource_name = "fake resource"
-        self._base_heat_backend._name = "fake name"
-        raised_exception = exceptions.ArgusError(
-            "No resource %s found with name %s"
-            % (resource_name, self._base_heat_backend._name))
-        self._base_heat_backend._name = "fake name"
-        (self._base_heat_backend._heat_client.resources.list.
-         side_effect) = raised_exception
-        with self.assertRaises(exceptions.ArgusError) as ex:
-            self._base_heat_backend._search_resource_until_status(
-                resource_name, 0)
-        self.assertEqual(ex.exception.message, str(raised_exception))
-
-    def test_search_resource_until_status_success(self):
-        resource_name = mock.sentinel
-        status_completed = mock.sentinel
-        mock_list = mock.Mock()
-        mock_resource = mock.Mock()
-        mock_resource.resource_type = resource_name
-        mock_resource.resource_status = status_completed
-        mock_resource.physical_resource_id = mock.sentinel
-        mock_list.return_value = [mock_resource]
-        self._base_heat_backend._heat_client.resources.list = mock_list
         result = self._base_heat_backend._search_resource_until_status(
-            resource_name, status=status_completed)
-        self.assertEqual(result, mock_resource.physical_resource_id)
-
-    @mock.patch("time.sleep", return_value=None)
-    def test_search_resource_until_status_timeout(self, _):
-        resource_name = "fake_resource"
-        status_completed = mock.sentinel
-        self._base_heat_backend._name = "fake_name"
-        exp = exceptions.ArgusError("No resource %s found with name %s"
-                                    % (resource_name,
-                                       self._base_heat_backend._name))
-        mock_list = mock.Mock()
-        mock_resource = mock.Mock()
-        mock_resource.resource_type = resource_name
-        mock_resource.resource_status = "fake status"
-        mock_resource.physical_resource_id = mock.sentinel
-        mock_list.return_value = [mock_resource]
-        self._base_heat_backend._heat_client.resources.list = mock_list
-        with self.assertRaises(exceptions.ArgusError) as ex:
-            self._base_heat_backend._search_resource_until_status(
-                resource_name, status=status_completed)
-        self.assertEqual(ex.exception.message, str(exp))
-
-    @mock.patch("time.sleep", return_value=None)
-    def test_search_resource_until_status_(self, _):
-        resource_name = mock.sentinel
-        status_completed = mock.sentinel
-        exp = exceptions.ArgusError("No resource %s found with name %s"
-                                    % (resource_name,
-                                       self._base_heat_backend._name))
-        mock_list = mock.Mock()
-        mock_resource = mock.Mock()
-        mock_resource.resource_type = "fake_resource"
-        mock_list.return_value = [mock_resource]
-        self._base_heat_backend._heat_client.resources.list = mock_list
-        with self.assertRaises(exceptions.ArgusError) as ex:
-            self._base_heat_backend._search_resource_until_status(
-                resource_name, status=status_completed)
-        self.assertEqual(ex.exception.message, str(exp))
+            mock.sentinel.resource, status=mock.sentinel.status)
+
+        self.assertEqual(result, mock_watcher.wait_resource.return_value)
+        mock_watcher.wait_resource.assert_called_once_with(
+            mock.sentinel.resource, mock.sentinel.status,
+            deadline=heat_backend.HEAT_RESOURCE_DEADLINE,
+            delay=heat_backend.HEAT_RESOURCE_TIMEOUT)
 
     def test_internal_id(self):
         def fake_function():
@@ -461,17 +393,16 @@ class TestBaseHeatBackend(unittest.TestCase):
 
     @mock.patch('argus.config.CONFIG.openstack')
     def test_get_image_by_ref(self, mock_config):
-        self._base_heat_backend._manager.compute_images_client = mock.Mock()
-        (self._base_heat_backend._manager.compute_images_client.
-         show_image.return_value) = mock.sentinel
+        self._base_heat_backend._manager.show_image = mock.Mock()
+        (self._base_heat_backend._manager.show_image.
+         return_value) = mock.sentinel
         mock_config.image_ref = mock.sentinel
 
         result = self._base_heat_backend.get_image_by_ref()
         self.assertEqual(
             result,
-            self._base_heat_backend._manager.compute_images_client.
-            show_image.return_value)
-        (self._base_heat_backend._manager.compute_images_client.show_image.
+            self._base_heat_backend._manager.show_image.return_value)
+        (self._base_heat_backend._manager.show_image.
          assert_called_once_with(mock_config.image_ref))
 
     def test_get_mtu(self):
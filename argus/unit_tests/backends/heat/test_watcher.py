@@ -0,0 +1,125 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.backends.heat import watcher
+from argus import exceptions
+from argus.unit_tests.fakes import heat as fake_heat
+
+
+TEMPLATE = {
+    "resources": {
+        "instance": {"type": "OS::Nova::Server"},
+        "server_floating_ip": {"type": "OS::Neutron::FloatingIP"},
+        "server_port": {"type": "OS::Neutron::Port"},
+    }
+}
+
+
+@mock.patch('time.sleep')
+class TestStackWatcher(unittest.TestCase):
+
+    def _create(self, **kwargs):
+        self._client = fake_heat.FakeHeatClient(**kwargs)
+        stack = self._client.stacks.create(stack_name="fake",
+                                           template=TEMPLATE)["stack"]
+        self._watcher = watcher.StackWatcher(
+            self._client, watcher.stack_identifier("fake", stack["id"]))
+
+    def test_stack_identifier(self, _):
+        self.assertEqual(watcher.stack_identifier("name"), "name")
+        self.assertEqual(watcher.stack_identifier("name", "id"), "name/id")
+
+    def test_wait_resource(self, _):
+        self._create()
+
+        server = self._watcher.wait_resource("OS::Nova::Server",
+                                             "CREATE_COMPLETE", deadline=60)
+        floating_ip = self._watcher.wait_resource(
+            "OS::Neutron::FloatingIP", "CREATE_COMPLETE", deadline=60)
+
+        self.assertEqual(server, "instance-stack-1")
+        self.assertEqual(floating_ip, "server_floating_ip-stack-1")
+        # No event was downloaded twice and the types were
+        # listed only until the resources appeared.
+        stack = self._client.stacks_data[0]
+        self.assertLessEqual(self._client.events_returned,
+                             len(stack["events"]))
+        self.assertEqual(self._client.requests["resources.list"], 2)
+        self.assertEqual(self._client.requests["stacks.list"], 0)
+
+    def test_nested_resources(self, _):
+        self._create()
+        self._client.resources.list = mock.Mock(
+            wraps=self._client.resources.list)
+        self._client.events.list = mock.Mock(wraps=self._client.events.list)
+
+        self._watcher.wait_resource("OS::Nova::Server", "CREATE_COMPLETE",
+                                    deadline=60, delay=0.5)
+
+        # The resources of the nested stacks are looked up as well.
+        for call in (self._client.resources.list.call_args_list +
+                     self._client.events.list.call_args_list):
+            self.assertEqual(call[1]["nested_depth"], 1)
+
+    def test_wait_resource_failed(self, _):
+        self._create(fail_resource="instance")
+
+        with self.assertRaises(exceptions.ArgusError) as ctx:
+            self._watcher.wait_resource("OS::Nova::Server",
+                                        "CREATE_COMPLETE", deadline=60)
+        self.assertIn("fake reason", str(ctx.exception))
+
+    def test_wait_resource_timeout(self, _):
+        self._create()
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            self._watcher.wait_resource("OS::Nova::Server",
+                                        "CREATE_COMPLETE", deadline=0)
+
+    def test_stack_not_found(self, _):
+        self._create()
+        self._watcher = watcher.StackWatcher(self._client, "other")
+
+        with self.assertRaises(exceptions.ArgusError):
+            self._watcher.poll()
+
+    def test_wait_deleted(self, _):
+        self._create(delete_polls=3)
+        self._client.stacks.delete(stack_id=self._watcher.identifier)
+
+        self._watcher.wait_deleted(delay=1, deadline=60)
+        self.assertEqual(self._client.requests["stacks.get"], 3)
+
+    def test_wait_deleted_failed(self, _):
+        self._create(delete_status="DELETE_FAILED")
+        self._client.stacks.delete(stack_id=self._watcher.identifier)
+
+        with self.assertRaises(exceptions.ArgusHeatTeardown):
+            self._watcher.wait_deleted(delay=1, deadline=60)
+
+    @mock.patch('argus.backends.heat.watcher.StackWatcher.is_deleted',
+                return_value=False)
+    def test_wait_deleted_timeout(self, *_):
+        self._create()
+
+        with self.assertRaises(exceptions.ArgusHeatTeardown):
+            self._watcher.wait_deleted(delay=1, deadline=0)
@@ -20,6 +20,7 @@ import unittest
 from argus.backends.tempest import cloud
 from argus import config as argus_config
 from argus import exceptions
+from argus.unit_tests.fakes import network as fake_network
 from argus import util
 
 try:
@@ -186,139 +187,74 @@ class TestNetworkWindowsBackend(unittest.TestCase):
          _get_networks.assert_called_once())
         mock_super_setup_instance.assert_called_once()
 
-    def test_find_ip_address(self):
-        fake_port = {
-            "fixed_ips": [
-                {
-                    "subnet_id": "1",
-                    "ip_address": "1.1.1.1"
-                },
-                {
-                    "subnet_id": "2",
-                    "ip_address": "2.2.2.2"
-                },
-                {
-                    "subnet_id": "3",
-                    "ip_address": "3.3.3.3"
-                }
-            ]
-        }
-
-        result = self._network_windows_backend._find_ip_address(fake_port, "2")
-        self.assertEqual(result, "2.2.2.2")
-
-    def test_find_ip_address_no_subnet_id(self):
-        fake_port = {
-            "fixed_ips": [
-                {
-                    "subnet_id": "1",
-                    "ip_address": "1.1.1.1"
-                },
-                {
-                    "subnet_id": "2",
-                    "ip_address": "2.2.2.2"
-                },
-                {
-                    "subnet_id": "3",
-                    "ip_address": "3.3.3.3"
-                }
-            ]
-        }
-
-        result = self._network_windows_backend._find_ip_address(fake_port, "4")
-        self.assertEqual(result, None)
-
-    @mock.patch('argus.util.cidr2netmask')
-    def _test_get_network_interfaces(self, mock_cidr2netmask, ip_address=None):
-        mock_ports_client = mock.Mock()
-        mock_ports_client.list_ports.return_value = {
-            "ports": [
-                {
-                    "device_owner": ["fake owner 1", "fake owner 2"],
-                },
-                {
-                    "device_owner": ["compute"],
-                    "mac_address": "fake mac"
-                },
-                {
-                    "device_owner": ["fake owner 1", "fake owner 2"]
-                },
-                {
-                    "device_owner": ["fake owner", "compute"],
-                    "mac_address": "fake mac"
-                }
-            ]
-        }
-        subnet = {
-            "ip_version": 6,
-            "enable_dhcp": "fake enable dhcp",
-            "dns_nameservers": "fake dns nameservers",
-            "gateway_ip": "fake gateway ip",
-            "cidr": "fake/cidr"
-        }
-        mock_networks_client = mock.Mock()
-        mock_networks_client.show_network.return_value = {
-            "network": {
-                "subnets": [subnet]
-            }
-        }
-        mock_subnet_clients = mock.Mock()
-        mock_subnet_clients.show_subnet.return_value = {
-            "subnet": subnet
-        }
-
-        mock_find_ip_address = mock.Mock()
-        if ip_address is None:
-            expected_ip_address_count = 4
-            mock_find_ip_address.return_value = None
-        else:
-            mock_find_ip_address.return_value = "1.2.3.4"
-            expected_ip_address_count = 2
+    def _add_instance_networks(self, neutron):
+        networks = []
+        for index in range(2):
+            network_id = neutron.add_network()
+            subnet_id = neutron.add_subnet(
+                network_id, "10.0.{}.0/24".format(index), enable_dhcp=True)
+            subnet6_id = neutron.add_subnet(network_id, "::ffff:a00:0/120",
+                                            ip_version=6)
+            neutron.add_port("fake id", [
+                (subnet_id, "10.0.{}.5".format(index)),
+                (subnet6_id, "::ffff:a00:{}".format(index))])
+            networks.append({"uuid": network_id})
+        return networks
 
-        self._network_windows_backend._manager.ports_client = mock_ports_client
-        (self._network_windows_backend._manager.
-         networks_client) = mock_networks_client
-        (self._network_windows_backend._manager.
-         subnets_client) = mock_subnet_clients
-        self._network_windows_backend._find_ip_address = mock_find_ip_address
-
-        expected_result = {
-            'netmask6': 'cidr',
-            'netmask': None,
-            'dns6': 'fake dns nameservers',
-            'gateway6': 'fake gateway ip',
-            'dns': None,
-            'address': None,
-            'dhcp': 'fake enable dhcp',
-            'gateway': None,
-            'address6': None,
-            'mac': None
-        }
-        if ip_address is not None:
-            expected_result['address6'] = ip_address
-            expected_result['mac'] = 'FAKE MAC'
+    def test_get_network_interfaces(self):
+        neutron = fake_network.FakeNeutron()
+        self._network_windows_backend._networks = (
+            self._add_instance_networks(neutron))
+        # Another instance, on the same subnet.
+        subnet_id = list(neutron.subnets)[0]
+        neutron.add_port("other id", [(subnet_id, "10.0.0.6")])
+        neutron.add_port("fake id", [(subnet_id, "10.0.0.7")],
+                         device_owner="network:dhcp")
+        self._network_windows_backend._manager.ports_client = neutron
+        self._network_windows_backend._manager.subnets_client = neutron
+        self._network_windows_backend._manager.networks_client = neutron
+        self._network_windows_backend.internal_instance_id = mock.Mock(
+            return_value="fake id")
 
-        self._network_windows_backend._networks = [
-            {
-                'uuid': 'fake uuid 1'
-            },
-            {
-                'uuid': 'fake uuid 2'
-            }
-        ]
         result = self._network_windows_backend.get_network_interfaces()
-        self.assertDictEqual(result[0], expected_result)
 
-        self.assertEqual(self._network_windows_backend._find_ip_address.
-                         call_count, expected_ip_address_count)
-        self.assertEqual(self._network_windows_backend._manager.
-                         networks_client.show_network.call_count, 2)
+        self.assertEqual(len(result), 2)
+        self.assertDictEqual(result[0], {
+            'mac': 'FA:16:3E:00:00:00',
+            'address': '10.0.0.5',
+            'netmask': '255.255.255.0',
+            'gateway': '10.0.0.0',
+            'dns': ['8.8.8.8'],
+            'address6': '::ffff:a00:0',
+            'netmask6': '120',
+            'gateway6': '::ffff:a00:0',
+            'dns6': ['8.8.8.8'],
+            'dhcp': False,
+        })
+        self.assertEqual(result[1]['address'], '10.0.1.5')
+        self.assertEqual(neutron.requests, {"list_subnets": 1,
+                                            "list_ports": 1})
+
+        # The details are fetched only once.
+        self._network_windows_backend.get_network_interfaces()
+        self.assertEqual(neutron.requests, {"list_subnets": 1,
+                                            "list_ports": 1})
+
+    def test_get_network_interfaces_no_port(self):
+        neutron = fake_network.FakeNeutron()
+        network_id = neutron.add_network()
+        neutron.add_subnet(network_id, "10.0.0.0/24")
+        self._network_windows_backend._networks = [{"uuid": network_id}]
+        self._network_windows_backend._manager.ports_client = neutron
+        self._network_windows_backend._manager.subnets_client = neutron
+        self._network_windows_backend.internal_instance_id = mock.Mock(
+            return_value="fake id")
 
-    def test_get_network_interfaces(self):
-        self._test_get_network_interfaces(ip_address="1.2.3.4")
+        result = self._network_windows_backend.get_network_interfaces()
 
-    def test_get_network_interfaces_no_ip(self):
-        self._test_get_network_interfaces(ip_address=None)
+        self.assertIsNone(result[0]['mac'])
+        self.assertIsNone(result[0]['address'])
+        self.assertEqual(result[0]['netmask'], '255.255.255.0')
 
 
 class TestRescueWindowsBackend(unittest.TestCase):
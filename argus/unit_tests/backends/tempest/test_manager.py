@@ -19,6 +19,7 @@
 import unittest
 from argus.backends.tempest import manager
 from argus import exceptions
+from argus.unit_tests import test_utils
 
 try:
     import unittest.mock as mock
@@ -41,6 +42,84 @@ class TestAPIManager(unittest.TestCase):
         self._api_manager.cleanup_credentials()
         mock_isolated_creds.clear_creds.assert_called_once()
 
+    def test_cleanup_credentials_shared(self):
+        self._api_manager.isolated_creds = mock.Mock()
+        self._api_manager.shared = True
+
+        self._api_manager.cleanup_credentials()
+        self.assertFalse(self._api_manager.isolated_creds.clear_creds.called)
+
+        self._api_manager.cleanup_credentials(force=True)
+        (self._api_manager.isolated_creds.clear_creds.
+         assert_called_once_with())
+
+    @mock.patch('argus.backends.tempest.manager.Keypair')
+    def test_create_key_pair_shared(self, mock_keypair):
+        self._api_manager.keypairs_client = mock.MagicMock()
+        self._api_manager.shared = True
+
+        self._api_manager.create_keypair("fake name")
+
+        name = (self._api_manager.keypairs_client.create_keypair.
+                call_args[1]["name"])
+        self.assertTrue(name.startswith("fake name-"))
+        self.assertTrue(name.endswith("-key"))
+
+    @mock.patch('argus.backends.tempest.manager._LOOKUPS',
+                new_callable=manager.util.FactCache)
+    def test_lookups_are_cached(self, _):
+        self._api_manager.flavors_client = mock.Mock()
+        self._api_manager.availability_zone_client = mock.Mock()
+        (self._api_manager.availability_zone_client.list_availability_zones.
+         return_value) = {"availabilityZoneInfo": [{"zoneName": "zone"}]}
+
+        self._api_manager.isolated_creds = mock.Mock()
+        credentials = (self._api_manager.isolated_creds.
+                       get_primary_creds.return_value)
+        credentials.project_id = "project"
+
+        for _ in range(2):
+            self._api_manager.show_flavor("fake flavor")
+            self.assertEqual(self._api_manager.availability_zones(),
+                             {"zone"})
+        # Another project sees its own flavors.
+        credentials.project_id = "other project"
+        self._api_manager.show_flavor("fake flavor")
+
+        self.assertEqual(
+            self._api_manager.flavors_client.show_flavor.call_args_list,
+            [mock.call("fake flavor")] * 2)
+        self.assertEqual(self._api_manager.availability_zone_client.
+                         list_availability_zones.call_count, 1)
+
+    def test_images_are_not_cached(self):
+        self._api_manager.compute_images_client = mock.Mock()
+
+        for _ in range(2):
+            self._api_manager.show_image("fake image")
+
+        self.assertEqual(self._api_manager.compute_images_client.
+                         show_image.call_count, 2)
+
+    @mock.patch('atexit.register')
+    @mock.patch('argus.backends.tempest.manager._SHARED_MANAGER', None)
+    @mock.patch('argus.backends.tempest.manager.APIManager')
+    def test_get_manager(self, mock_api_manager, mock_register):
+        with test_utils.ConfPatcher('share_credentials', True, 'openstack'):
+            shared = manager.get_manager()
+            self.assertIs(manager.get_manager(), shared)
+            isolated = manager.get_manager(isolated=True)
+        with test_utils.ConfPatcher('share_credentials', False, 'openstack'):
+            unshared = manager.get_manager()
+
+        self.assertEqual(mock_api_manager.call_args_list,
+                         [mock.call(shared=True), mock.call(),
+                          mock.call()])
+        self.assertIs(isolated, mock_api_manager.return_value)
+        self.assertIs(unshared, mock_api_manager.return_value)
+        mock_register.assert_called_once_with(
+            shared.cleanup_credentials, force=True)
+
     @mock.patch('argus.backends.tempest.manager.Keypair')
     def test_create_key_pair(self, mock_keypair):
         fake_keypair = {
@@ -104,6 +183,32 @@ class TestAPIManager(unittest.TestCase):
 
         self.assertEqual(2, mock__instance_output.call_count)
 
+    def test_instance_output_fetches_new_lines(self):
+        lines = ["line {}\n".format(index) for index in range(300)]
+        mock__instance_output = mock.Mock()
+        mock__instance_output.side_effect = (
+            lambda instance_id, limit: "".join(lines[-limit:]))
+        self._api_manager._instance_output = mock__instance_output
+
+        first = self._api_manager.instance_output(
+            instance_id="fake id", limit=manager.OUTPUT_SIZE)
+        lines.append("line 300\n")
+        mock__instance_output.reset_mock()
+        second = self._api_manager.instance_output(
+            instance_id="fake id", limit=manager.OUTPUT_SIZE)
+
+        self.assertEqual(first, "".join(lines[:-1]))
+        self.assertEqual(second, "".join(lines))
+        mock__instance_output.assert_called_once_with("fake id",
+                                                      manager.OUTPUT_SIZE)
+
+    def test_console_reader(self):
+        reader = self._api_manager.console_reader("fake id")
+
+        self.assertIs(self._api_manager.console_reader("fake id"), reader)
+        self.assertIsNot(self._api_manager.console_reader("other id"),
+                         reader)
+
     def test_instance_server(self):
         mock_servers_client = mock.Mock()
         mock_servers_client.show_server.return_value = {
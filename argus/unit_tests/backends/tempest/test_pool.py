@@ -0,0 +1,169 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import threading
+import time
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.backends.tempest import pool
+from argus import exceptions
+from argus.unit_tests.fakes import compute
+from argus.unit_tests import test_utils
+
+
+class TestInstancePool(unittest.TestCase):
+
+    def setUp(self):
+        patcher = test_utils.ConfPatcher('retry_delay', 0, 'argus')
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+        self._client = compute.FakeServersClient()
+        self._manager = mock.Mock(servers_client=self._client)
+        self._pool = pool.InstancePool(self._manager, size=2, max_idle=60)
+
+    def _wait_booted(self):
+        deadline = time.time() + 5
+        while self._pool.stats()["booting"]:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+    def test_freeze(self):
+        self.assertEqual(pool._freeze({"b": [1, {"c": 2}], "a": "x"}),
+                         pool._freeze({"a": "x", "b": [1, {"c": 2}]}))
+        self.assertNotEqual(pool._freeze({"a": 1}), pool._freeze({"a": 2}))
+
+    def test_acquire_boots_the_first_instance(self):
+        server = self._pool.acquire("name", imageRef="image")
+
+        self._wait_booted()
+        self.assertEqual(self._client.servers[server["id"]]["status"],
+                         "ACTIVE")
+        self.assertTrue(server["name"].startswith("name-"))
+        # An instance requested once is not booted ahead.
+        self.assertEqual(self._client.created, [server["id"]])
+        stats = self._pool.stats()
+        self.assertEqual((stats["misses"], stats["hits"], stats["busy"],
+                          stats["idle"]), (1, 0, 1, 0))
+
+    def test_acquire_boots_ahead_the_requested_again(self):
+        self._pool.acquire("name", imageRef="image")
+        self._pool.acquire("name", imageRef="image")
+        self._wait_booted()
+        self.assertEqual(self._pool.stats()["idle"], 1)
+
+        third = self._pool.acquire("name", imageRef="image")
+        self._wait_booted()
+
+        self.assertEqual(third["id"], self._client.created[2])
+        stats = self._pool.stats()
+        self.assertEqual((stats["misses"], stats["hits"], stats["busy"],
+                          stats["idle"]), (2, 1, 3, 2))
+
+    def test_acquire_different_specifications(self):
+        self._pool.acquire("name", imageRef="image")
+        self._pool.acquire("name", imageRef="image")
+        self._wait_booted()
+
+        self._pool.acquire("name", imageRef="other image")
+        self.assertEqual(self._pool.stats()["misses"], 3)
+
+    def test_acquire_failed_boot(self):
+        self._client = compute.FakeServersClient(fail_boot=True)
+        self._manager.servers_client = self._client
+        self._pool = pool.InstancePool(self._manager, size=2, max_idle=60)
+
+        self.assertRaises(exceptions.ArgusError,
+                          self._pool.acquire, "name", imageRef="image")
+        self.assertEqual(self._client.deleted, self._client.created)
+
+    def test_prewarm(self):
+        self._pool.prewarm(5, "name", imageRef="image")
+        self._wait_booted()
+        self.assertEqual(self._pool.stats()["idle"], 2)
+
+        self._pool.acquire("name", imageRef="image")
+        self.assertEqual(self._pool.stats()["hits"], 1)
+
+    def test_release(self):
+        server = self._pool.acquire("name", imageRef="image")
+        self._pool.release(server["id"])
+
+        self.assertNotIn(server["id"], self._client.servers)
+        self.assertEqual(self._pool.stats()["busy"], 0)
+
+    def test_reap(self):
+        self._pool.prewarm(1, "name", imageRef="image")
+        self._wait_booted()
+
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self._pool.reap()
+        self.assertEqual(self._client.deleted, self._client.created)
+        stats = self._pool.stats()
+        self.assertEqual((stats["idle"], stats["expired"]), (0, 1))
+
+    def test_shutdown(self):
+        keypair = self._pool.keypair
+        self.assertIs(keypair, self._pool.keypair)
+        self._manager.create_keypair.assert_called_once_with(
+            name=mock.ANY)
+
+        self._pool.prewarm(2, "name", imageRef="image")
+        self._wait_booted()
+        self._pool.shutdown()
+
+        self.assertEqual(sorted(self._client.deleted),
+                         sorted(self._client.created))
+        keypair.destroy.assert_called_once_with()
+        self._pool.prewarm(2, "name", imageRef="image")
+        self.assertEqual(self._pool.stats()["booting"], 0)
+
+    def test_shutdown_while_booting(self):
+        self._client = compute.FakeServersClient(boot_polls=10 ** 9)
+        self._manager.servers_client = self._client
+        self._pool = pool.InstancePool(self._manager, size=2, max_idle=60)
+        self._pool.prewarm(2, "name", imageRef="image")
+
+        self._pool.shutdown(timeout=5)
+
+        # The booting threads gave up and deleted their servers.
+        self.assertEqual(self._pool.stats()["booting"], 0)
+        self.assertEqual(self._pool.stats()["failed"], 2)
+        self.assertEqual(sorted(self._client.deleted),
+                         sorted(self._client.created))
+
+    def test_shutdown_deletes_the_stuck_servers(self):
+        resume = threading.Event()
+        self.addCleanup(resume.set)
+        wait_active = mock.patch.object(
+            self._pool, '_wait_active',
+            side_effect=lambda *_, **__: resume.wait(5))
+        wait_active.start()
+        self.addCleanup(wait_active.stop)
+        self._pool.prewarm(1, "name", imageRef="image")
+        deadline = time.time() + 5
+        while not self._pool._starting:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+        self._pool.shutdown(timeout=0)
+
+        self.assertEqual(self._client.deleted, self._client.created)
@@ -0,0 +1,185 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import requests
+
+from argus.backends.tempest import snapshot
+from argus import exceptions
+from argus.unit_tests.fakes import compute
+from argus.unit_tests import test_utils
+
+
+class TestSnapshotKey(unittest.TestCase):
+
+    def _key(self, **kwargs):
+        params = {
+            "image_ref": "image", "build": "Beta", "arch": "x64",
+            "patch_install": "http://patch", "git_command": "git pull",
+            "git_repository": "http://repo", "installer": '"etag"',
+        }
+        params.update(kwargs)
+        return snapshot.snapshot_key(**params)
+
+    def test_same_parameters(self):
+        self.assertEqual(self._key(), self._key())
+
+    def test_different_parameters(self):
+        keys = {self._key(), self._key(image_ref="other"),
+                self._key(arch="x86"), self._key(patch_install="other"),
+                self._key(git_command="git fetch"),
+                self._key(installer='"other etag"')}
+        self.assertEqual(len(keys), 6)
+
+    @mock.patch('argus.backends.tempest.snapshot.installer_version')
+    def test_unknown_installer(self, mock_installer_version):
+        mock_installer_version.return_value = None
+
+        self.assertIsNone(self._key(installer=None))
+        mock_installer_version.assert_called_once_with("Beta", "x64")
+
+    @test_utils.ConfPatcher('git_command', 'git pull', 'argus')
+    @test_utils.ConfPatcher('arch', 'x64', 'argus')
+    @test_utils.ConfPatcher('build', 'Beta', 'argus')
+    @mock.patch('argus.backends.tempest.snapshot.installer_version')
+    def test_defaults_from_config(self, mock_installer_version):
+        mock_installer_version.return_value = '"etag"'
+        with test_utils.ConfPatcher('image_ref', 'image', 'openstack'):
+            key = snapshot.snapshot_key(patch_install="http://patch",
+                                        git_repository="http://repo")
+        self.assertEqual(key, self._key())
+
+
+class TestInstallerVersion(unittest.TestCase):
+
+    @test_utils.ConfPatcher('installer_root_url', 'http://mirror/', 'argus')
+    @mock.patch('requests.head')
+    def _test_installer_version(self, headers, mock_head):
+        mock_head.return_value.headers = headers
+
+        version = snapshot.installer_version("Beta", "x64")
+
+        mock_head.assert_called_once_with(
+            "http://mirror/CloudbaseInitSetup_Beta_x64.msi",
+            allow_redirects=True, timeout=snapshot.INSTALLER_TIMEOUT)
+        return version
+
+    def test_etag(self):
+        version = self._test_installer_version(
+            {"ETag": '"etag"', "Last-Modified": "yesterday"})
+        self.assertEqual(version, '"etag"')
+
+    def test_last_modified(self):
+        version = self._test_installer_version({"Last-Modified": "yesterday"})
+        self.assertEqual(version, "yesterday")
+
+    def test_unknown(self):
+        self.assertIsNone(self._test_installer_version({}))
+
+    @mock.patch('requests.head')
+    def test_unreachable(self, mock_head):
+        mock_head.side_effect = requests.ConnectionError
+
+        self.assertIsNone(snapshot.installer_version())
+
+
+class TestSnapshotCache(unittest.TestCase):
+
+    def setUp(self):
+        patcher = test_utils.ConfPatcher('retry_delay', 0, 'argus')
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+        self._client = compute.FakeImagesClient()
+        self._client.add_image("base image")
+        self._cache = snapshot.SnapshotCache(self._client, size=2)
+
+    def _metadata(self, image_id):
+        return self._client.images[image_id]["metadata"]
+
+    def test_lookup_miss(self):
+        self.assertIsNone(self._cache.lookup("key"))
+
+    def test_store_and_lookup(self):
+        image_id = self._cache.store("server", "key")
+
+        self.assertEqual(self._client.snapshots, [("server", image_id)])
+        self.assertEqual(self._client.images[image_id]["status"], "ACTIVE")
+        self.assertEqual(self._metadata(image_id)[snapshot.KEY_PROPERTY],
+                         "key")
+        self.assertEqual(self._cache.lookup("key"), image_id)
+        self.assertIsNone(self._cache.lookup("other key"))
+
+    def test_lookup_ignores_inactive_snapshots(self):
+        self._client.add_image("saving", status="SAVING", metadata={
+            snapshot.KEY_PROPERTY: "key"})
+        self.assertIsNone(self._cache.lookup("key"))
+
+    @mock.patch('time.time')
+    def test_lookup_marks_the_snapshot_as_used(self, mock_time):
+        mock_time.return_value = 100
+        image_id = self._cache.store("server", "key")
+        mock_time.return_value = 200
+        self._cache.lookup("key")
+        self.assertEqual(
+            self._metadata(image_id)[snapshot.LAST_USED_PROPERTY],
+            "200.000")
+
+    @mock.patch('time.time')
+    def test_evicts_the_least_recently_used(self, mock_time):
+        mock_time.return_value = 100
+        first = self._cache.store("server 1", "first")
+        mock_time.return_value = 200
+        second = self._cache.store("server 2", "second")
+        mock_time.return_value = 300
+        self._cache.lookup("first")
+        mock_time.return_value = 400
+        third = self._cache.store("server 3", "third")
+
+        self.assertIn(first, self._client.images)
+        self.assertNotIn(second, self._client.images)
+        self.assertIn(third, self._client.images)
+        # The images which aren't snapshots are never evicted.
+        self.assertEqual(len(self._client.images), 3)
+
+    def test_store_failed_snapshot(self):
+        self._client = compute.FakeImagesClient(
+            snapshot_statuses=("SAVING", "ERROR"))
+        self._cache = snapshot.SnapshotCache(self._client)
+
+        self.assertRaises(exceptions.ArgusError,
+                          self._cache.store, "server", "key")
+        self.assertEqual(self._client.images, {})
+
+    def test_store_same_key_once(self):
+        snapshot._STORING.add("key")
+        try:
+            self.assertIsNone(self._cache.store("server", "key"))
+        finally:
+            snapshot._STORING.discard("key")
+        self.assertEqual(self._client.snapshots, [])
+
+    def test_parse_image_id_from_location(self):
+        response = mock.MagicMock()
+        response.get.return_value = None
+        response.response = {"location": "http://nova/images/fake-id"}
+        self.assertEqual(snapshot._parse_image_id(response), "fake-id")
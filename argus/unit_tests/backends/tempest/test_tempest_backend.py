@@ -19,6 +19,7 @@
 import copy
 import unittest
 from argus.backends.tempest import tempest_backend
+from argus import exceptions
 from argus.unit_tests import test_utils
 from argus import util
 
@@ -134,16 +135,65 @@ class TestBaseTempestBackend(unittest.TestCase):
         }
         self._test_create_server(kwargs=kwargs)
 
-    def test__assign_floating_ip(self):
-        mock_create_floating_ip = mock.Mock()
-        mock_create_floating_ip.return_value = {
+    def test_create_server_from_pool(self):
+        backend = self._base_tempest_backend
+        backend._pool = mock.Mock()
+        backend._pool.acquire.return_value = {"id": "fake id"}
+
+        result = backend._create_server(key_name="fake key", metadata=None)
+
+        self.assertEqual(result, {"id": "fake id"})
+        backend._pool.acquire.assert_called_once_with(
+            backend._name, imageRef=backend.image_ref,
+            flavorRef=backend.flavor_ref, key_name="fake key")
+
+    def test_cleanup_from_pool(self):
+        backend = self._base_tempest_backend
+        backend._pool = mock.Mock()
+        backend._server = {"id": "fake id"}
+        backend._keypair = mock.Mock()
+        backend._manager.cleanup_credentials = mock.Mock()
+
+        backend.cleanup()
+
+        backend._pool.release.assert_called_once_with("fake id")
+        self.assertFalse(backend._keypair.destroy.called)
+        self.assertFalse(backend._manager.cleanup_credentials.called)
+
+    def test_cleanup_from_pool_deletes_the_security_group(self):
+        backend = self._base_tempest_backend
+        backend._pool = mock.Mock()
+        backend._server = {"id": "fake id"}
+        backend._created_security_group = {"id": "group id",
+                                           "name": "group name"}
+        backend._security_group = backend._created_security_group
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+        calls = []
+        backend._pool.release.side_effect = calls.append
+        (backend._manager.security_groups_client.
+         delete_security_group.side_effect) = calls.append
+
+        backend.cleanup()
+
+        # The project of the pool is shared, so nothing is left there.
+        self.assertEqual(calls, ["fake id", "group id"])
+
+    def test__create_floating_ip(self):
+        mock_floating_ips_client = mock.Mock()
+        mock_floating_ips_client.create_floating_ip.return_value = {
             "floating_ip": {
                 "ip": "fake ip"
             }
         }
+        (self._base_tempest_backend._manager.
+         floating_ips_client) = mock_floating_ips_client
 
+        self._base_tempest_backend._create_floating_ip()
+        self.assertEqual(self._base_tempest_backend._floating_ip,
+                         {"ip": "fake ip"})
+
+    def test__assign_floating_ip(self):
         mock_floating_ips_client = mock.Mock()
-        mock_floating_ips_client.create_floating_ip = mock_create_floating_ip
         (mock_floating_ips_client.associate_floating_ip_to_server
          .return_value) = None
 
@@ -154,9 +204,9 @@ class TestBaseTempestBackend(unittest.TestCase):
          floating_ips_client) = mock_floating_ips_client
         (self._base_tempest_backend.
          internal_instance_id) = mock_internal_instance_id
+        self._base_tempest_backend._floating_ip = {"ip": "fake ip"}
 
-        result = self._base_tempest_backend._assign_floating_ip()
-        self.assertEqual(result, {"ip": "fake ip"})
+        self._base_tempest_backend._assign_floating_ip()
         (self._base_tempest_backend._manager.floating_ips_client.
          associate_floating_ip_to_server.assert_called_once_with(
              "fake ip", "fake id"))
@@ -170,56 +220,55 @@ class TestBaseTempestBackend(unittest.TestCase):
         self.assertEqual(result, "fake mtu")
         self._base_tempest_backend._manager.get_mtu.assert_called_once()
 
-    def test__add_security_group_exceptions(self):
-        mock_security_group_rules_client = mock.Mock()
-        (mock_security_group_rules_client.create_security_group_rule
-         .return_value) = {"security_group_rule": "fake sg_rule"}
-        (self._base_tempest_backend._manager
-         .security_group_rules_client) = mock_security_group_rules_client
-
-        result = (self._base_tempest_backend.
-                  _add_security_group_exceptions("fake secgroup_id"))
-        for item in result:
-            self.assertEqual(item, "fake sg_rule")
-
-    def test__create_security_groups(self):
-        fake_security_group = {
-            "security_group": {
-                "id": [
-                    {"id": 1},
-                    {"id": 2},
-                    {"id": 3},
-                    {"id": 4},
-                    {"id": 5}
-                ],
-                "name": "fake name"
-            }
-        }
-
+    def test__create_security_group(self):
+        fake_security_group = {"id": "fake id", "name": "fake name"}
         mock_security_groups_client = mock.Mock()
         (mock_security_groups_client.create_security_group
-         .return_value) = fake_security_group
+         .return_value) = {"security_group": fake_security_group}
         (self._base_tempest_backend._manager
          .security_groups_client) = mock_security_groups_client
+
+        self._base_tempest_backend._create_security_group()
+
+        self.assertEqual(self._base_tempest_backend._created_security_group,
+                         fake_security_group)
+        # It is not added to the server yet.
+        self.assertIsNone(self._base_tempest_backend._security_group)
+
+    def test__create_security_group_rule(self):
+        mock_security_group_rules_client = mock.Mock()
+        (mock_security_group_rules_client.create_security_group_rule
+         .return_value) = {"security_group_rule": {"id": "fake rule"}}
+        (self._base_tempest_backend._manager
+         .security_group_rules_client) = mock_security_group_rules_client
+        self._base_tempest_backend._created_security_group = {
+            "id": "fake secgroup_id"}
         self._base_tempest_backend._security_groups_rules = []
 
-        self._base_tempest_backend._add_security_group_exceptions = mock.Mock(
-            return_value=fake_security_group["security_group"]["id"])
+        ruleset = tempest_backend.SECURITY_GROUP_RULES[0]
+        self._base_tempest_backend._create_security_group_rule(ruleset)
 
+        (mock_security_group_rules_client.create_security_group_rule.
+         assert_called_once_with(parent_group_id="fake secgroup_id",
+                                 **ruleset))
+        self.assertEqual(self._base_tempest_backend._security_groups_rules,
+                         ["fake rule"])
+
+    def test__add_security_group(self):
+        fake_security_group = {"id": "fake id", "name": "fake name"}
+        self._base_tempest_backend._created_security_group = (
+            fake_security_group)
         self._base_tempest_backend._manager.servers_client = mock.Mock()
         self._base_tempest_backend.internal_instance_id = mock.Mock(
-            return_value="fake ip")
+            return_value="fake server id")
 
-        result = self._base_tempest_backend._create_security_groups()
+        self._base_tempest_backend._add_security_group()
 
-        self.assertEqual(result, fake_security_group["security_group"])
-        (self._base_tempest_backend._manager.security_groups_client.
-         create_security_group.assert_called_once())
-        self._base_tempest_backend.internal_instance_id.assert_called_once()
         (self._base_tempest_backend._manager.servers_client.add_security_group
-         .assert_called_once())
-        self.assertEqual(self._base_tempest_backend._security_groups_rules,
-                         [1, 2, 3, 4, 5])
+         .assert_called_once_with(server_id="fake server id",
+                                  name="fake name"))
+        self.assertEqual(self._base_tempest_backend._security_group,
+                         fake_security_group)
 
     @mock.patch('tempest.common.waiters.wait_for_server_termination')
     def _test_cleanup(self, mock_waiters, security_groups_rules=None,
@@ -295,7 +344,7 @@ class TestBaseTempestBackend(unittest.TestCase):
 
         (self._base_tempest_backend._manager.cleanup_credentials.
          assert_called_once())
-        self.assertEqual(expected_logging, snatcher.output)
+        self.assertEqual(expected_logging, snatcher.output[:1])
 
     def test_cleanup_security_groups_rules(self):
         fake_rules = ["rule 1", "rule 2", "rule 3", "rule 4"]
@@ -316,26 +365,165 @@ class TestBaseTempestBackend(unittest.TestCase):
     def test_cleanup_credentials(self):
         self._test_cleanup()
 
+    @mock.patch('tempest.common.waiters.wait_for_server_termination')
+    def test_cleanup_failure(self, _):
+        backend = self._base_tempest_backend
+        backend._pool = None
+        backend._security_group = {"name": "fake name"}
+        backend._server = "fake server"
+        backend._floating_ip = {"id": "fake floating ip id"}
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+        servers_client = backend._manager.servers_client
+        servers_client.remove_security_group.side_effect = (
+            exceptions.ArgusError("fake error"))
+        backend._manager.cleanup_credentials = mock.Mock()
+
+        with self.assertRaises(exceptions.ArgusError):
+            backend.cleanup()
+
+        # The other resources are deleted anyway.
+        servers_client.delete_server.assert_called_once_with("fake id")
+        (backend._manager.floating_ips_client.delete_floating_ip.
+         assert_called_once_with("fake floating ip id"))
+        backend._manager.cleanup_credentials.assert_called_once_with()
+
+    @mock.patch('tempest.common.waiters.wait_for_server_termination')
+    def test_cleanup_deletes_the_security_group(self, mock_waiters):
+        backend = self._base_tempest_backend
+        backend._pool = None
+        backend._created_security_group = {"id": "group id",
+                                           "name": "group name"}
+        backend._security_group = backend._created_security_group
+        backend._security_groups_rules = ["rule 1", "rule 2"]
+        backend._server = "fake server"
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+        backend._manager.cleanup_credentials = mock.Mock()
+        calls = []
+        mock_waiters.side_effect = lambda *_: calls.append("server")
+        (backend._manager.security_group_rules_client.
+         delete_security_group_rule.side_effect) = calls.append
+        (backend._manager.security_groups_client.
+         delete_security_group.side_effect) = calls.append
+
+        backend.cleanup()
+
+        # The group is deleted last, once nothing uses it anymore.
+        self.assertEqual(sorted(calls[:-1]), ["rule 1", "rule 2", "server"])
+        self.assertEqual(calls[-1], "group id")
+
+    def _mock_setup_steps(self):
+        backend = self._base_tempest_backend
+        calls = []
+
+        def record(step):
+            return lambda *args: calls.append(step)
+
+        for step in ("_configure_networking", "_create_keypair",
+                     "_boot_server", "_create_floating_ip",
+                     "_assign_floating_ip", "_create_security_group",
+                     "_create_security_group_rule", "_add_security_group"):
+            setattr(backend, step, mock.Mock(side_effect=record(step)))
+        return calls
+
     def test_instance_setup_create_server(self):
         expected_logging = ["Creating server..."]
-        self._base_tempest_backend._configure_networking = mock.Mock()
-        self._base_tempest_backend._manager.create_keypair = mock.Mock()
-        self._base_tempest_backend._create_server = mock.Mock(
-            return_value="fake server")
-        self._base_tempest_backend._assign_floating_ip = mock.Mock()
-        self._base_tempest_backend._create_security_groups = mock.Mock()
-        self._base_tempest_backend._availability_zone = mock.Mock()
-        self._base_tempest_backend.__get_id_tenant_network = mock.Mock()
+        calls = self._mock_setup_steps()
 
         with test_utils.LogSnatcher('argus.backends.base') as snatcher:
             self._base_tempest_backend.setup_instance()
 
-        self.assertEqual(expected_logging, snatcher.output)
-        self._base_tempest_backend._configure_networking.assert_called_once()
-        self._base_tempest_backend._manager.create_keypair.assert_called_once()
-        self._base_tempest_backend._create_server.assert_called_once()
-        self._base_tempest_backend._assign_floating_ip.assert_called_once()
-        self._base_tempest_backend._create_security_groups.assert_called_once()
+        self.assertEqual(expected_logging, snatcher.output[:1])
+        self.assertEqual(
+            calls.count("_create_security_group_rule"),
+            len(tempest_backend.SECURITY_GROUP_RULES))
+        self.assertLess(calls.index("_configure_networking"),
+                        calls.index("_boot_server"))
+        self.assertLess(calls.index("_create_keypair"),
+                        calls.index("_boot_server"))
+        self.assertLess(calls.index("_boot_server"),
+                        calls.index("_assign_floating_ip"))
+        self.assertLess(calls.index("_create_floating_ip"),
+                        calls.index("_assign_floating_ip"))
+        self.assertLess(calls.index("_create_security_group"),
+                        calls.index("_create_security_group_rule"))
+        self.assertEqual(calls[-1], "_add_security_group")
+
+    def test_instance_setup_failure(self):
+        calls = self._mock_setup_steps()
+        self._base_tempest_backend._create_keypair.side_effect = (
+            exceptions.ArgusError)
+
+        self.assertRaises(exceptions.ArgusError,
+                          self._base_tempest_backend.setup_instance)
+        self.assertNotIn("_boot_server", calls)
+        self.assertNotIn("_add_security_group", calls)
+
+    def test_boot_server_from_snapshot(self):
+        backend = self._base_tempest_backend
+        backend._keypair = mock.Mock()
+        backend._networks = [{"uuid": "fake network"}]
+        backend._create_server = mock.Mock(return_value="fake server")
+        backend._snapshot_cache = mock.Mock()
+        backend._snapshot_cache.lookup.return_value = "fake snapshot"
+        backend._snapshot_key = "fake key"
+
+        backend._boot_server()
+
+        backend._snapshot_cache.lookup.assert_called_once_with("fake key")
+        self.assertEqual(backend.image_ref, "fake snapshot")
+        self.assertEqual(backend._server, "fake server")
+        self.assertTrue(backend.booted_from_snapshot())
+
+        backend.snapshot_instance()
+        self.assertFalse(backend._snapshot_cache.store.called)
+
+    def test_snapshot_instance(self):
+        backend = self._base_tempest_backend
+        backend._snapshot_cache = mock.Mock()
+        backend._snapshot_key = "fake key"
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+
+        self.assertFalse(backend.booted_from_snapshot())
+        backend.snapshot_instance()
+        backend._snapshot_cache.store.assert_called_once_with(
+            "fake id", "fake key")
+
+    @mock.patch('argus.backends.tempest.snapshot.snapshot_key')
+    def test_snapshot_key_is_lazy(self, mock_snapshot_key):
+        backend = self._base_tempest_backend
+        backend._snapshot_cache = mock.Mock()
+        backend._snapshot_cache.lookup.return_value = None
+        backend._keypair = mock.Mock()
+        backend._networks = [{"uuid": "fake network"}]
+        backend._create_server = mock.Mock(return_value="fake server")
+        backend.internal_instance_id = mock.Mock(return_value="fake id")
+        mock_snapshot_key.return_value = "fake key"
+        self.assertFalse(mock_snapshot_key.called)
+
+        backend._boot_server()
+        backend.snapshot_instance()
+
+        mock_snapshot_key.assert_called_once_with()
+        backend._snapshot_cache.store.assert_called_once_with(
+            "fake id", "fake key")
+
+    @mock.patch('argus.backends.tempest.snapshot.snapshot_key')
+    def test_snapshot_key_failure(self, mock_snapshot_key):
+        backend = self._base_tempest_backend
+        backend._snapshot_cache = mock.Mock()
+        backend._keypair = mock.Mock()
+        backend._networks = [{"uuid": "fake network"}]
+        backend._create_server = mock.Mock(return_value="fake server")
+        mock_snapshot_key.side_effect = ValueError("fake error")
+
+        backend._boot_server()
+        backend.snapshot_instance()
+
+        # The instance is booted without the snapshots.
+        self.assertEqual(backend._server, "fake server")
+        self.assertFalse(backend.booted_from_snapshot())
+        self.assertIsNone(backend._snapshot_cache)
+        mock_snapshot_key.assert_called_once_with()
 
     def test_reboot_instance(self):
         self._base_tempest_backend._manager.reboot_instance = mock.Mock(
@@ -400,8 +588,8 @@ class TestBaseTempestBackend(unittest.TestCase):
         self.assertEqual(result, "fake private key")
 
     def test_get_image_by_ref(self):
-        (self._base_tempest_backend._manager.compute_images_client.
-         show_image) = mock.Mock(return_value={"image": "fake image"})
+        self._base_tempest_backend._manager.show_image = mock.Mock(
+            return_value={"image": "fake image"})
         self._base_tempest_backend._conf = mock.Mock()
         result = self._base_tempest_backend.get_image_by_ref()
         self.assertEqual(result, "fake image")
@@ -176,6 +176,75 @@ class TestCloudBackend(unittest.TestCase):
         self._test_save_instance_output(console_output=True,
                                         output_directory="fake directory")
 
+    @mock.patch('argus.unit_tests.backends.test_base.'
+                'FakeCloudBackend.console_reader')
+    @mock.patch('argus.config.CONFIG.argus')
+    def test_save_instance_output_reader(self, mock_config,
+                                         mock_console_reader):
+        mock_config.output_directory = "fake directory"
+        mock_reader = mock_console_reader.return_value
+        mock_reader.is_empty.return_value = False
+
+        with mock.patch('argus.backends.base.open') as mock_open_file:
+            self._cloud_backend.save_instance_output()
+
+        mock_reader.read.assert_called_once_with()
+        mock_reader.copy.assert_called_once_with(
+            mock_open_file.return_value.__enter__.return_value)
+
+    @mock.patch('argus.unit_tests.backends.test_base.'
+                'FakeCloudBackend.console_reader')
+    @mock.patch('argus.config.CONFIG.argus')
+    def test_save_instance_output_reader_empty(self, mock_config,
+                                               mock_console_reader):
+        mock_config.output_directory = "fake directory"
+        mock_console_reader.return_value.is_empty.return_value = True
+
+        with mock.patch('argus.backends.base.open') as mock_open_file:
+            with mock.patch('argus.backends.base.LOG') as mock_LOG:
+                self._cloud_backend.save_instance_output()
+
+        self.assertEqual(mock_open_file.call_count, 0)
+        mock_LOG.warning.assert_called_once_with(
+            "Empty console output; nothing to save.")
+
+    def test_start_console_tailer_no_reader(self):
+        self.assertIsNone(self._cloud_backend.start_console_tailer())
+
+    @mock.patch('argus.backends.base.retry')
+    @mock.patch('argus.backends.console.ConsoleTailer')
+    @mock.patch('argus.unit_tests.backends.test_base.'
+                'FakeCloudBackend.console_reader')
+    @mock.patch('argus.config.CONFIG.argus')
+    def test_console_tailer(self, mock_config, mock_console_reader,
+                            mock_tailer_class, mock_retry):
+        mock_config.output_directory = None
+        mock_config.console_tail_interval = 10
+        mock_tailer = mock_tailer_class.return_value
+
+        tailer = self._cloud_backend.start_console_tailer()
+        self._cloud_backend.stop_console_tailer()
+        self._cloud_backend.stop_console_tailer()
+
+        self.assertIs(tailer, mock_tailer)
+        mock_tailer_class.assert_called_once_with(
+            mock_console_reader.return_value, None)
+        mock_tailer.start.assert_called_once_with()
+        mock_tailer.stop.assert_called_once_with()
+        self.assertEqual(mock_retry.set_abort_check.call_args_list,
+                         [mock.call(mock_tailer.check), mock.call(None)])
+
+    @mock.patch('argus.config.CONFIG.argus')
+    def test_save_instance_output_tailer(self, mock_config):
+        mock_config.output_directory = "fake directory"
+        self._cloud_backend._console_tailer = mock.Mock()
+
+        with mock.patch('argus.backends.base.open') as mock_open_file:
+            self._cloud_backend.save_instance_output()
+
+        self._cloud_backend._console_tailer.poll.assert_called_once_with()
+        self.assertEqual(mock_open_file.call_count, 0)
+
     def test_instance_output(self):
         result = self._cloud_backend.instance_output()
         self.assertEqual(result, "fake output")
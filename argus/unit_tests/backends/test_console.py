@@ -0,0 +1,196 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import six
+
+from argus.backends import console
+from argus import exceptions
+
+
+class FakeConsole(object):
+    """A console output which gives its last lines, like the API."""
+
+    def __init__(self):
+        self.text = u""
+        self.requests = []
+        self.downloaded = 0
+
+    def write(self, text):
+        self.text += text
+
+    def fetch(self, limit):
+        self.requests.append(limit)
+        lines = self.text.splitlines(True)[-limit:]
+        self.downloaded += len(lines)
+        return u"".join(lines)
+
+
+def _lines(start, stop):
+    return u"".join(u"line {}\n".format(index)
+                    for index in range(start, stop))
+
+
+class TestConsoleReader(unittest.TestCase):
+
+    def setUp(self):
+        self._console = FakeConsole()
+        self._reader = console.ConsoleReader(self._console.fetch, limit=20,
+                                             tail_size=4)
+
+    def test_find_tail(self):
+        self.assertEqual(console._find_tail(["a", "b", "a", "b", "c"],
+                                            ["a", "b"]), 4)
+        self.assertIsNone(console._find_tail(["a", "b"], ["c"]))
+
+    def test_first_read_gets_the_whole_output(self):
+        self._console.write(_lines(0, 50))
+
+        self.assertEqual(self._reader.read(), _lines(0, 50))
+        self.assertEqual(self._console.requests, [20, 40, 80])
+        self.assertEqual(self._reader.lines, 50)
+
+    def test_read_only_new_lines(self):
+        self._console.write(_lines(0, 500))
+        self._reader.read()
+        self._console.requests = []
+        self._console.downloaded = 0
+
+        self._console.write(_lines(500, 505))
+        self.assertEqual(self._reader.read(), _lines(500, 505))
+        self.assertEqual(self._reader.read(), u"")
+        self.assertEqual(self._console.requests, [20, 20])
+        self.assertEqual(self._console.downloaded, 40)
+        self.assertEqual(self._reader.getvalue(), _lines(0, 505))
+
+    def test_window_grows_when_many_lines_are_new(self):
+        self._console.write(_lines(0, 10))
+        self._reader.read()
+        self._console.requests = []
+
+        self._console.write(_lines(10, 60))
+        self.assertEqual(self._reader.read(), _lines(10, 60))
+        self.assertEqual(self._console.requests, [20, 40, 80])
+
+    def test_partial_line(self):
+        self._console.write(u"line 0\nline")
+        self.assertEqual(self._reader.read(), u"line 0\n")
+        self.assertEqual(self._reader.getvalue(), u"line 0\nline")
+
+        self._console.write(u" 1\n")
+        self.assertEqual(self._reader.read(), u"line 1\n")
+        self.assertEqual(self._reader.getvalue(), u"line 0\nline 1\n")
+
+    def test_repeated_lines(self):
+        self._console.write(u"same\n" * 10)
+        self._reader.read()
+        self._console.write(u"other\n")
+
+        self.assertEqual(self._reader.read(), u"other\n")
+
+    def test_reset_output(self):
+        self._console.write(_lines(0, 5))
+        self._reader.read()
+        self._console.text = _lines(100, 103)
+
+        self.assertEqual(self._reader.read(), _lines(100, 103))
+        self.assertEqual(self._reader.getvalue(),
+                         _lines(0, 5) + _lines(100, 103))
+
+    def test_bytes_output(self):
+        self._reader = console.ConsoleReader(lambda limit: b"line\n")
+        self.assertEqual(self._reader.read(), u"line\n")
+
+    def test_is_empty(self):
+        self.assertTrue(self._reader.is_empty())
+        self._console.write(u"\n  \n")
+        self._reader.read()
+        self.assertTrue(self._reader.is_empty())
+        self._console.write(u"line\n")
+        self._reader.read()
+        self.assertFalse(self._reader.is_empty())
+
+    def test_copy(self):
+        self._console.write(_lines(0, 3))
+        self._reader.read()
+        stream = six.BytesIO()
+
+        self._reader.copy(stream)
+        self.assertEqual(stream.getvalue(), _lines(0, 3).encode("utf-8"))
+
+
+class TestConsoleTailer(unittest.TestCase):
+
+    def setUp(self):
+        self._console = FakeConsole()
+        self._reader = console.ConsoleReader(self._console.fetch, limit=20)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._path = os.path.join(directory, "console.log")
+        self._tailer = console.ConsoleTailer(
+            self._reader, self._path, interval=0.01,
+            patterns=[r"\*\*\* STOP: 0x", r"CRITICAL cloudbase-init"])
+
+    def _read_log(self):
+        with open(self._path, "rb") as stream:
+            return stream.read().decode("utf-8")
+
+    def test_poll_appends_complete_lines(self):
+        self._console.write(u"line 0\nline")
+        self._tailer.poll()
+        self.assertEqual(self._read_log(), u"line 0\n")
+
+        self._console.write(u" 1\nline 2\n")
+        self._tailer.poll()
+        self.assertEqual(self._read_log(), u"line 0\nline 1\nline 2\n")
+
+    def test_poll_follows_lines_read_elsewhere(self):
+        self._console.write(_lines(0, 3))
+        self._tailer.poll()
+        self._console.write(_lines(3, 6))
+        self._reader.read()
+
+        self._tailer.poll()
+        self.assertEqual(self._read_log(), _lines(0, 6))
+
+    def test_check(self):
+        self._console.write(_lines(0, 3))
+        self._tailer.poll()
+        self._tailer.check()
+
+        self._console.write(u"*** STOP: 0x0000007B\n")
+        self._tailer.poll()
+        self.assertEqual(self._tailer.failure, u"*** STOP: 0x0000007B")
+        with self.assertRaises(exceptions.ArgusConsoleFailure):
+            self._tailer.check()
+
+    def test_thread(self):
+        self._tailer.start()
+        self._console.write(u"2016 1234 CRITICAL cloudbase-init [-] error\n")
+        try:
+            for _ in range(500):
+                if self._tailer.failure:
+                    break
+                time.sleep(0.01)
+        finally:
+            self._tailer.stop()
+
+        self.assertIn(u"CRITICAL", self._tailer.failure)
+        self.assertIn(u"CRITICAL", self._read_log())
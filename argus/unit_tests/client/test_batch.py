@@ -0,0 +1,184 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import collections
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.client import batch
+from argus.client import windows
+from argus import exceptions
+from argus.unit_tests.fakes import winrm as fake_winrm
+from argus import util
+
+
+class TestCommandBatch(unittest.TestCase):
+
+    def setUp(self):
+        self._outputs = {}
+        self._calls = collections.Counter()
+        self._host = fake_winrm.FakeWindowsHost(fallback=self._answer)
+        self._scripts = []
+
+    def _answer(self, command, _):
+        self._calls[command] += 1
+        output = self._outputs.get(command, ("", "", 0))
+        if isinstance(output, list):
+            output = output.pop(0)
+        return output
+
+    def _execute(self, script, command_type):
+        self.assertEqual(command_type, util.POWERSHELL)
+        self._scripts.append(script)
+        return self._host(script, b"")[0].decode()
+
+    def test_add_unsupported_type(self):
+        with self.assertRaises(exceptions.ArgusError):
+            batch.CommandBatch().add("script.ps1", util.POWERSHELL_SCRIPT)
+
+    def test_add_exit(self):
+        commands = batch.CommandBatch()
+        with self.assertRaises(exceptions.ArgusError):
+            commands.add("if ($failed) { Exit 1 }")
+        # Only the PowerShell items share the process of the batch.
+        commands.add("exit /b 1", util.CMD)
+        commands.add("$LASTEXITCODE; $process.ExitCode")
+
+    def test_scripts_are_split(self):
+        commands = batch.CommandBatch(max_script_size=3000)
+        for index in range(10):
+            commands.add("x" * 200 + str(index))
+
+        scripts = list(commands.scripts())
+
+        self.assertGreater(len(scripts), 1)
+        self.assertEqual(sum((indexes for indexes, _ in scripts), []),
+                         list(range(10)))
+        for _, script in scripts:
+            self.assertTrue(script.rstrip().endswith(batch.SCRIPT_FOOTER))
+
+    def test_parse_output(self):
+        output = ("garbage\r\n"
+                  "ARGUS-BATCH|1|2|b3V0|ZXJy\r\n"
+                  "ARGUS-BATCH|0|0||\r\n")
+        results = batch.parse_output(output)
+        self.assertEqual(results, {
+            0: batch.CommandResult("", "", 0),
+            1: batch.CommandResult("out", "err", 2),
+        })
+
+    def test_run(self):
+        self._outputs = {"first": ("1\r\n", "", 0),
+                         "dir": ("a\r\nb", "", 0),
+                         "bad": ("", "error", 1)}
+        commands = batch.CommandBatch()
+        commands.add("first")
+        commands.add("dir", util.CMD)
+        commands.add("bad")
+
+        results = commands.run(self._execute)
+
+        self.assertEqual(len(self._scripts), 1)
+        self.assertEqual(results, {
+            0: batch.CommandResult("1", "", 0),
+            1: batch.CommandResult("a\r\nb", "", 0),
+            2: batch.CommandResult("", "error", 1),
+        })
+        self.assertIn("Invoke-ArgusBatchItem 1 'cmd'", self._scripts[0])
+
+    def test_run_missing_frame(self):
+        commands = batch.CommandBatch()
+        commands.add("first")
+        results = commands.run(lambda *_, **__: "")
+        self.assertEqual(results[0].exit_code, 1)
+
+    @mock.patch('time.sleep')
+    def test_execute_retries_only_failures(self, mock_sleep):
+        self._outputs = {"flaky": [("", "error", 1), ("ok", "", 0)]}
+        commands = batch.CommandBatch()
+        commands.add("stable")
+        commands.add("flaky")
+
+        results = commands.execute(self._execute, count=3, delay=5)
+
+        self.assertEqual([result.stdout for result in results], ["", "ok"])
+        self.assertEqual(self._calls, {"stable": 1, "flaky": 2})
+        self.assertEqual(len(self._scripts), 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertLessEqual(mock_sleep.call_args[0][0], 5)
+
+    @mock.patch('time.sleep')
+    def test_execute_gives_up(self, mock_sleep):
+        self._outputs = {"bad": [("", "error", 1)] * 3}
+        commands = batch.CommandBatch()
+        commands.add("bad")
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            commands.execute(self._execute, count=3, delay=0)
+        self.assertEqual(self._calls["bad"], 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @mock.patch('time.sleep')
+    def test_execute_retries_failed_scripts(self, _):
+        commands = batch.CommandBatch()
+        commands.add("first")
+        attempts = []
+
+        def flaky(script, command_type):
+            attempts.append(script)
+            if len(attempts) == 1:
+                raise exceptions.ArgusError("broken")
+            return self._execute(script, command_type)
+
+        results = commands.execute(flaky, count=2, delay=0)
+
+        self.assertEqual(results[0].exit_code, 0)
+        self.assertEqual(len(attempts), 2)
+
+
+class TestClientRunBatch(unittest.TestCase):
+
+    @mock.patch('argus.client.windows.get_windows_action_manager')
+    def setUp(self, _):
+        self._host = fake_winrm.FakeWindowsHost(
+            fallback=lambda command, _: (command.upper(), "", 0))
+        self._protocol = fake_winrm.FakeProtocol(self._host)
+        self._client = windows.WinRemoteClient("host", "user", "pass")
+        self._client._sessions._protocol_factory = lambda: self._protocol
+
+    def test_run_batch(self):
+        results = self._client.run_batch(["first", "second"])
+
+        self.assertEqual([result.stdout for result in results],
+                         ["FIRST", "SECOND"])
+        self.assertEqual(len(self._host.scripts), 1)
+
+    @mock.patch('time.sleep')
+    def test_run_batch_attempts(self, _):
+        self._host = fake_winrm.FakeWindowsHost(
+            fallback=lambda command, _: ("", "error", 1))
+        self._protocol = fake_winrm.FakeProtocol(self._host)
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            self._client.run_batch(["bad"], count=3, delay=0)
+
+        # A single script for every attempt of the batch.
+        self.assertEqual(len(self._host.scripts), 3)
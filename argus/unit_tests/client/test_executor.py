@@ -0,0 +1,103 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import multiprocessing
+import threading
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.client import executor
+from argus.client import windows
+from argus import exceptions
+from argus.unit_tests.fakes import winrm as fake_winrm
+
+
+class TestTimeoutExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self._executor = executor.TimeoutExecutor(2)
+        self.addCleanup(self._executor.close)
+
+    def test_call(self):
+        result = self._executor.call(lambda a, b: a + b, args=(1, 2))
+        self.assertEqual(result, 3)
+
+    def test_call_timeout(self):
+        event = threading.Event()
+        self.addCleanup(event.set)
+        with self.assertRaises(multiprocessing.TimeoutError):
+            self._executor.call(event.wait, timeout=0.01)
+
+    @mock.patch('argus.client.executor.ABORT_CHECK_INTERVAL', 0.01)
+    @mock.patch('argus.retry.check_abort')
+    def test_call_aborted(self, mock_check_abort):
+        event = threading.Event()
+        self.addCleanup(event.set)
+        mock_check_abort.side_effect = [None, exceptions.ArgusConsoleFailure]
+
+        with self.assertRaises(exceptions.ArgusConsoleFailure):
+            self._executor.call(event.wait, timeout=60)
+        self.assertEqual(mock_check_abort.call_count, 2)
+
+    def test_pool_is_reused(self):
+        self._executor.call(lambda: None)
+        first = self._executor._pool
+        self._executor.call(lambda: None)
+        self.assertIs(self._executor._pool, first)
+
+    @mock.patch('os.getpid')
+    def test_pool_recreated_after_fork(self, mock_getpid):
+        mock_getpid.return_value = 1
+        self._executor.call(lambda: None)
+        first = self._executor._pool
+
+        mock_getpid.return_value = 2
+        self._executor.call(lambda: None)
+        self.assertIsNot(self._executor._pool, first)
+        first.terminate()
+
+    def test_get_executor_is_shared(self):
+        self.assertIs(executor.get_executor(), executor.get_executor())
+
+
+class TestRunCommand(unittest.TestCase):
+
+    def setUp(self):
+        self._protocol = fake_winrm.FakeProtocol()
+        self._shell_id = self._protocol.open_shell()
+
+    def test_run_command(self):
+        self._protocol._handler = lambda command, stdin: (b"out", b"", 0)
+        stdout, _, exit_code = windows.WinRemoteClient._run_command(
+            self._protocol, self._shell_id, "echo out")
+        self.assertEqual(stdout, "out")
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(self._protocol.commands, {})
+
+    def test_run_command_timeout_cleans_up(self):
+        event = threading.Event()
+        self.addCleanup(event.set)
+        self._protocol.get_command_output = lambda *_: event.wait()
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            windows.WinRemoteClient._run_command(
+                self._protocol, self._shell_id, "sleep", upper_timeout=0.01)
+        self.assertEqual(self._protocol.commands, {})
@@ -0,0 +1,190 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import requests
+from winrm import exceptions as winrm_exceptions
+
+from argus.client import session
+from argus import exceptions
+
+
+class TestSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self._protocols = []
+        self._shell_ids = iter("shell-{}".format(i) for i in range(100))
+        self._pool = session.SessionPool(self._protocol_factory,
+                                         self._shell_opener,
+                                         size=2, idle_timeout=60)
+
+    def _protocol_factory(self):
+        protocol = mock.Mock()
+        self._protocols.append(protocol)
+        return protocol
+
+    def _shell_opener(self, _):
+        return next(self._shell_ids)
+
+    def test_shell_is_reused(self):
+        with self._pool.shell() as (protocol, shell_id):
+            pass
+        with self._pool.shell() as (other_protocol, other_shell_id):
+            pass
+
+        self.assertIs(protocol, other_protocol)
+        self.assertEqual(shell_id, other_shell_id)
+        self.assertEqual(len(self._protocols), 1)
+        stats = self._pool.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["idle"], 1)
+
+    def test_nested_shells_are_distinct(self):
+        with self._pool.shell() as (_, first):
+            with self._pool.shell() as (_, second):
+                self.assertNotEqual(first, second)
+        self.assertEqual(self._pool.stats()["idle"], 2)
+
+    def test_pool_size_is_bounded(self):
+        with self._pool.shell() as (protocol, shell_id):
+            with self._pool.shell():
+                with self._pool.shell():
+                    pass
+        self.assertEqual(self._pool.stats()["idle"], 2)
+        protocol.close_shell.assert_called_once_with(shell_id)
+
+    @mock.patch('time.time')
+    def test_expired_shell_is_closed(self, mock_time):
+        mock_time.return_value = 0
+        with self._pool.shell() as (protocol, shell_id):
+            pass
+
+        mock_time.return_value = 61
+        with self._pool.shell() as (_, new_shell_id):
+            pass
+
+        self.assertNotEqual(shell_id, new_shell_id)
+        protocol.close_shell.assert_called_once_with(shell_id)
+        self.assertEqual(self._pool.stats()["expired"], 1)
+
+    def test_transport_error_reconnects(self):
+        with self.assertRaises(requests.ConnectionError):
+            with self._pool.shell():
+                raise requests.ConnectionError()
+
+        with self._pool.shell():
+            pass
+
+        self.assertEqual(len(self._protocols), 2)
+        stats = self._pool.stats()
+        self.assertEqual(stats["discarded"], 1)
+        self.assertEqual(stats["reconnects"], 1)
+
+    def test_transport_error_drops_the_idle_shells(self):
+        with self._pool.shell() as (_, idle_shell_id):
+            with self._pool.shell():
+                pass
+
+        with self.assertRaises(requests.ConnectionError):
+            with self._pool.shell():
+                raise requests.ConnectionError()
+        self.assertEqual(self._pool.stats()["idle"], 0)
+
+        with self._pool.shell() as (_, shell_id):
+            pass
+        self.assertNotEqual(shell_id, idle_shell_id)
+        self.assertEqual(self._pool.stats()["reconnects"], 1)
+
+    def test_shell_not_found_fault_reconnects(self):
+        with self._pool.shell() as (_, old_shell_id):
+            pass
+
+        with self.assertRaises(winrm_exceptions.WinRMError):
+            with self._pool.shell():
+                raise winrm_exceptions.WinRMError(
+                    "The request for the Windows Remote Shell with ShellId "
+                    "{} failed because the shell was not found on the "
+                    "server.".format(old_shell_id))
+        with self._pool.shell() as (_, shell_id):
+            pass
+
+        self.assertNotEqual(shell_id, old_shell_id)
+        self.assertEqual(len(self._protocols), 2)
+        self.assertEqual(self._pool.stats()["discarded"], 1)
+
+    def test_timed_out_shell_is_closed(self):
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            with self._pool.shell() as (protocol, shell_id):
+                raise exceptions.ArgusTimeoutError()
+
+        protocol.close_shell.assert_called_once_with(shell_id)
+        stats = self._pool.stats()
+        self.assertEqual((stats["idle"], stats["discarded"]), (0, 1))
+        # The connection itself is still good.
+        with self._pool.shell() as (_, new_shell_id):
+            pass
+        self.assertNotEqual(shell_id, new_shell_id)
+        self.assertEqual(len(self._protocols), 1)
+
+    def test_other_errors_keep_the_shell(self):
+        with self.assertRaises(ValueError):
+            with self._pool.shell():
+                raise ValueError()
+
+        self.assertEqual(self._pool.stats()["idle"], 1)
+        self.assertEqual(len(self._protocols), 1)
+
+    def test_soap_fault_keeps_the_shell(self):
+        with self.assertRaises(winrm_exceptions.WinRMError):
+            with self._pool.shell():
+                raise winrm_exceptions.WinRMError("fault")
+
+        self.assertEqual(self._pool.stats()["idle"], 1)
+        self.assertEqual(self._pool.stats()["discarded"], 0)
+        self.assertEqual(len(self._protocols), 1)
+
+    def test_failed_shell_opening_drops_protocol(self):
+        self._pool._shell_opener = mock.Mock(side_effect=[
+            requests.Timeout(), "shell"])
+
+        with self.assertRaises(requests.Timeout):
+            with self._pool.shell():
+                pass
+        with self._pool.shell() as (_, shell_id):
+            pass
+
+        self.assertEqual(shell_id, "shell")
+        self.assertEqual(len(self._protocols), 2)
+
+    def test_reset(self):
+        with self._pool.shell() as (protocol, shell_id):
+            pass
+
+        self._pool.reset()
+
+        protocol.close_shell.assert_called_once_with(shell_id)
+        self.assertEqual(self._pool.stats()["idle"], 0)
+        with self._pool.shell():
+            pass
+        self.assertEqual(len(self._protocols), 2)
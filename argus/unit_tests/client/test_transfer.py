@@ -0,0 +1,265 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.client import transfer
+from argus.client import windows
+from argus import exceptions
+from argus.unit_tests.fakes import winrm as fake_winrm
+
+DATA = bytes(bytearray(range(256))) * 1000
+
+
+class TestUpload(unittest.TestCase):
+
+    def setUp(self):
+        self._host = fake_winrm.FakeWindowsHost()
+        self._protocol = fake_winrm.FakeProtocol(self._host)
+        self._shell_id = self._protocol.open_shell()
+
+    def _upload(self, data, path=r"C:\file", **kwargs):
+        return transfer.upload(self._protocol, self._shell_id,
+                               io.BytesIO(data), path, **kwargs)
+
+    def test_get_chunk_size(self):
+        chunk_size = transfer.get_chunk_size(153600)
+        self.assertEqual(chunk_size % 3, 0)
+        encoded = (chunk_size // 3 * 4 + 2) // 3 * 4
+        self.assertLessEqual(encoded, 153600 - transfer.ENVELOPE_OVERHEAD)
+
+    def test_upload_binary(self):
+        result = self._upload(DATA)
+
+        self.assertEqual(self._host.files[r"C:\file"], DATA)
+        self.assertEqual(result.size, len(DATA))
+        self.assertEqual(result.sha256, hashlib.sha256(DATA).hexdigest())
+        self.assertGreater(result.throughput, 0)
+        self.assertEqual(self._protocol.commands, {})
+
+    def test_upload_requests(self):
+        self._protocol.requests = 0
+        self._upload(DATA, chunk_size=len(DATA) // 4)
+        # run, four inputs, output and cleanup.
+        self.assertEqual(self._protocol.requests, 7)
+
+    def test_upload_empty(self):
+        result = self._upload(b"")
+        self.assertEqual(self._host.files[r"C:\file"], b"")
+        self.assertEqual(result.size, 0)
+
+    def test_upload_overwrites(self):
+        self._upload(b"old content")
+        self._upload(b"new")
+        self.assertEqual(self._host.files[r"C:\file"], b"new")
+
+    def test_upload_append(self):
+        self._upload(b"first")
+        self._upload(b"second", append=True)
+        self.assertEqual(self._host.files[r"C:\file"], b"firstsecond")
+
+    def test_upload_quotes_path(self):
+        self._upload(b"data", path=r"C:\it's")
+        self.assertEqual(self._host.files[r"C:\it's"], b"data")
+
+    def test_upload_data_text(self):
+        transfer.upload_data(self._protocol, self._shell_id,
+                             u"\u0103\u0219", r"C:\file")
+        self.assertEqual(self._host.files[r"C:\file"],
+                         u"\u0103\u0219".encode("utf-8"))
+
+    def test_upload_corrupted(self):
+        self._protocol._handler = lambda *_: (b"3 abc", b"", 0)
+        with self.assertRaises(exceptions.ArgusTransferError):
+            self._upload(b"data")
+
+    def test_upload_failed(self):
+        self._protocol._handler = lambda *_: (b"", b"denied", 1)
+        with self.assertRaises(exceptions.ArgusTransferError):
+            self._upload(b"data")
+        self.assertEqual(self._protocol.commands, {})
+
+
+class TestClientUpload(unittest.TestCase):
+
+    @mock.patch('argus.client.windows.get_windows_action_manager')
+    def setUp(self, _):
+        self._host = fake_winrm.FakeWindowsHost()
+        self._protocol = fake_winrm.FakeProtocol(self._host)
+        self._client = windows.WinRemoteClient("host", "user", "pass")
+        self._client._get_protocol = lambda: self._protocol
+        self._client._sessions._protocol_factory = self._client._get_protocol
+
+    def test_copy_file(self):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(DATA)
+
+        self._client.copy_file(path, r"C:\copy")
+
+        self.assertEqual(self._host.files[r"C:\copy"], DATA)
+
+    def test_download_file(self):
+        self._host.files[r"C:\remote"] = DATA
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        local = os.path.join(directory, "local")
+
+        self._client.download_file(r"C:\remote", local)
+
+        with open(local, "rb") as stream:
+            self.assertEqual(stream.read(), DATA)
+
+    def test_write_file_appends(self):
+        self._client.write_file("a\r\n", r"C:\conf")
+        self._client.write_file("b\r\n", r"C:\conf")
+
+        self.assertEqual(self._host.files[r"C:\conf"], b"a\r\nb\r\n")
+        self.assertEqual(len(self._protocol.shells), 1)
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self._host = fake_winrm.FakeWindowsHost()
+        self._host.files[r"C:\remote"] = DATA
+        self._commands = []
+        self._directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._directory)
+        self._local = os.path.join(self._directory, "local")
+
+    def _execute(self, script):
+        self._commands.append(script)
+        stdout, stderr, exit_code = self._host(script, b"")
+        if exit_code:
+            raise exceptions.ArgusError(stderr)
+        return stdout.decode()
+
+    def _read_local(self):
+        with open(self._local, "rb") as stream:
+            return stream.read()
+
+    def test_get_remote_file_info(self):
+        size, sha256 = transfer.get_remote_file_info(self._execute,
+                                                     r"C:\remote")
+        self.assertEqual(size, len(DATA))
+        self.assertEqual(sha256, hashlib.sha256(DATA).hexdigest())
+
+    def test_get_remote_file_info_invalid(self):
+        with self.assertRaises(exceptions.ArgusTransferError):
+            transfer.get_remote_file_info(lambda _: "garbage", r"C:\remote")
+
+    def test_download(self):
+        result = transfer.download(self._execute, r"C:\remote", self._local,
+                                   chunk_size=len(DATA) // 4)
+
+        self.assertEqual(self._read_local(), DATA)
+        self.assertEqual(result.size, len(DATA))
+        # The info and four ranges.
+        self.assertEqual(len(self._commands), 5)
+        self.assertFalse(os.path.exists(self._local + ".part"))
+
+    def test_download_empty(self):
+        self._host.files[r"C:\remote"] = b""
+        transfer.download(self._execute, r"C:\remote", self._local)
+        self.assertEqual(self._read_local(), b"")
+
+    def test_download_overwrites(self):
+        with open(self._local, "wb") as stream:
+            stream.write(b"old")
+        transfer.download(self._execute, r"C:\remote", self._local)
+        self.assertEqual(self._read_local(), DATA)
+
+    def test_download_resume(self):
+        calls = []
+
+        def flaky_execute(script):
+            calls.append(script)
+            if len(calls) == 3:
+                raise exceptions.ArgusTimeoutError("connection dropped")
+            return self._execute(script)
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            transfer.download(flaky_execute, r"C:\remote", self._local,
+                              chunk_size=len(DATA) // 2)
+        self.assertEqual(os.path.getsize(self._local + ".part"),
+                         len(DATA) // 2)
+
+        self._commands = []
+        result = transfer.download(self._execute, r"C:\remote", self._local,
+                                   chunk_size=len(DATA) // 2)
+
+        self.assertEqual(self._read_local(), DATA)
+        self.assertEqual(result.size, len(DATA) - len(DATA) // 2)
+        self.assertEqual(len(self._commands), 2)
+
+    def test_download_corrupted(self):
+        with open(self._local + ".part", "wb") as stream:
+            stream.write(b"x" * 10)
+
+        with self.assertRaises(exceptions.ArgusTransferError):
+            transfer.download(self._execute, r"C:\remote", self._local)
+        self.assertFalse(os.path.exists(self._local + ".part"))
+        self.assertFalse(os.path.exists(self._local))
+
+
+class TestWriteBundle(unittest.TestCase):
+
+    def setUp(self):
+        self._client = mock.Mock()
+        self._files = [(r"C:\dir\first", b"first"),
+                       (r"C:\it's\second", b"second")]
+        self._hashes = [hashlib.sha256(data).hexdigest()
+                        for _, data in self._files]
+
+    def test_write_bundle(self):
+        self._client.run_command_with_retry.return_value = (
+            "\r\n".join(self._hashes), "", 0)
+
+        hashes = transfer.write_bundle(self._client, self._files,
+                                       r"C:\dir\bundle")
+
+        self.assertEqual(hashes, self._hashes)
+        # A single upload and a single command.
+        self._client.write_file.assert_called_once_with(
+            data=b"firstsecond", remote_destination=r"C:\dir\bundle",
+            append=False)
+        script = self._client.run_command_with_retry.call_args[0][0]
+        self.assertIn(r"'C:\dir\bundle'", script)
+        self.assertIn(r"'0|5|{}|C:\dir\first'".format(self._hashes[0]),
+                      script)
+        self.assertIn(r"'5|6|{}|C:\it''s\second'".format(self._hashes[1]),
+                      script)
+
+    def test_write_bundle_mismatch(self):
+        self._client.run_command_with_retry.return_value = (
+            self._hashes[0], "", 0)
+
+        with self.assertRaises(exceptions.ArgusTransferError):
+            transfer.write_bundle(self._client, self._files,
+                                  r"C:\dir\bundle")
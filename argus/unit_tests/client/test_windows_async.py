@@ -0,0 +1,191 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from argus import exceptions
+from argus.unit_tests.fakes import winrm as fake_winrm
+
+try:
+    import asyncio
+
+    from argus.client import windows_async
+    from argus.unit_tests.fakes import wsman_async as fake_wsman
+except (ImportError, SyntaxError):
+    windows_async = None
+
+DATA = bytes(bytearray(range(256))) * 1000
+
+
+class FakeCommands(object):
+    """Answer the commands from a dictionary of scripts."""
+
+    def __init__(self, outputs=None):
+        self.outputs = outputs or {}
+        self.scripts = []
+
+    def __call__(self, command_line, stdin):
+        script = fake_winrm.decode_command(command_line)
+        self.scripts.append(script)
+        output = self.outputs.get(script, (b"", b"", 0))
+        if callable(output):
+            output = output()
+        return output
+
+
+@unittest.skipIf(windows_async is None,
+                 "The asyncio client needs Python 3.5 or newer.")
+class TestAsyncWinRemoteClient(unittest.TestCase):
+
+    def setUp(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self.addCleanup(self._loop.close)
+        self.addCleanup(asyncio.set_event_loop, None)
+        self._commands = FakeCommands()
+        self._host = fake_winrm.FakeWindowsHost(fallback=self._commands)
+        self._start()
+
+    def _start(self, **kwargs):
+        self._server = fake_wsman.FakeWSManServer(self._host, **kwargs)
+        self._run(self._server.start())
+        self.addCleanup(self._run, self._server.stop())
+        self._client = self._new_client()
+
+    def _new_client(self, password="password"):
+        client = windows_async.AsyncWinRemoteClient(
+            "127.0.0.1", "user", password, port=self._server.port)
+        self.addCleanup(self._run, client.close())
+        return client
+
+    def _run(self, coroutine):
+        return self._loop.run_until_complete(coroutine)
+
+    def test_run_command(self):
+        self._commands.outputs["hostname"] = (b"  instance-1\r\n", b"", 0)
+
+        stdout, stderr, exit_code = self._run(
+            self._client.run_command("hostname"))
+
+        self.assertEqual(stdout, "instance-1")
+        self.assertEqual(stderr, b"")
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(self._commands.scripts, ["hostname"])
+        # The command was cleaned up.
+        self.assertEqual(self._server.commands, {})
+
+    def test_run_command_failed(self):
+        self._commands.outputs["fail"] = (b"", b"fake error", 1)
+
+        with self.assertRaises(exceptions.ArgusError) as ctx:
+            self._run(self._client.run_command("fail"))
+        self.assertIn("fake error", str(ctx.exception))
+
+    def test_shells_and_connections_are_reused(self):
+        for _ in range(3):
+            self._run(self._client.run_command("hostname"))
+
+        self.assertEqual(self._server.requests["Create"], 1)
+        self.assertEqual(self._server.connections, 1)
+
+        self._run(self._client.close())
+        self.assertEqual(self._server.shells, set())
+
+    def test_commands_run_concurrently(self):
+        self._start(command_time=0.3)
+        commands = ["command {}".format(index) for index in range(8)]
+
+        start = time.time()
+        results = self._run(asyncio.gather(
+            *[self._client.run_command(command) for command in commands]))
+
+        self.assertLess(time.time() - start, 0.3 * len(commands) / 2)
+        self.assertEqual(len(results), len(commands))
+        self.assertEqual(sorted(self._commands.scripts), commands)
+
+    def test_long_commands_are_polled(self):
+        self._start(command_time=0.3, operation_timeout=0.1)
+
+        self._run(self._client.run_command("hostname"))
+        self.assertGreater(self._server.requests["Receive"], 1)
+
+    def test_timeout_cancels_the_command(self):
+        self._start(command_time=10, operation_timeout=0.1)
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            self._run(self._client.run_command("hostname",
+                                               upper_timeout=0.3))
+        self.assertEqual(len(self._server.signaled), 1)
+        self.assertEqual(self._server.commands, {})
+        # The shell is still usable.
+        self.assertEqual(len(self._server.shells), 1)
+
+    def test_run_command_with_retry(self):
+        outputs = [(b"", b"", 1), (b"", b"", 1), (b"done", b"", 0)]
+        self._commands.outputs["flaky"] = lambda: outputs.pop(0)
+
+        stdout, _, _ = self._run(self._client.run_command_with_retry(
+            "flaky", count=3, delay=0))
+        self.assertEqual(stdout, "done")
+
+        self._commands.outputs["flaky"] = (b"", b"", 1)
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            self._run(self._client.run_command_with_retry(
+                "flaky", count=2, delay=0))
+
+    def test_run_command_until_condition(self):
+        outputs = [(b"0", b"", 0), (b"1", b"", 0)]
+        self._commands.outputs["count"] = lambda: outputs.pop(0)
+
+        self._run(self._client.run_command_until_condition(
+            "count", lambda stdout: stdout == "1", retry_count=2, delay=0))
+        self.assertEqual(outputs, [])
+
+        self._commands.outputs["count"] = (b"0", b"", 0)
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            self._run(self._client.run_command_until_condition(
+                "count", lambda stdout: stdout == "1", retry_count=1,
+                delay=0))
+
+    def test_copy_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "file")
+        with open(path, "wb") as stream:
+            stream.write(DATA)
+
+        result = self._run(self._client.copy_file(path, r"C:\file"))
+
+        self.assertEqual(self._host.files[r"C:\file"], DATA)
+        self.assertEqual(result.size, len(DATA))
+        self.assertEqual(result.sha256, hashlib.sha256(DATA).hexdigest())
+
+    def test_read_file(self):
+        self._commands.outputs['Get-Content "C:\\file"'] = (
+            b"content\r\n", b"", 0)
+
+        self.assertEqual(self._run(self._client.read_file(r"C:\file")),
+                         "content")
+
+    def test_wrong_credentials(self):
+        client = self._new_client(password="wrong")
+
+        with self.assertRaises(exceptions.ArgusWSManFault):
+            self._run(client.run_command("hostname"))
@@ -0,0 +1,91 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import base64
+import unittest
+from xml.etree import ElementTree
+
+from argus.client import wsman
+from argus import exceptions
+
+RSP = wsman.NAMESPACES["rsp"]
+
+FAULT = """<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"
+    xmlns:f="http://schemas.microsoft.com/wbem/wsman/1/wsmanfault">
+  <s:Body><s:Fault>
+    <s:Reason><s:Text>The WS-Management service cannot complete the
+      operation within the time specified in OperationTimeout.</s:Text>
+    </s:Reason>
+    <s:Detail><f:WSManFault Code="2150858793">
+      <f:Message>Operation timed out.</f:Message>
+    </f:WSManFault></s:Detail>
+  </s:Fault></s:Body>
+</s:Envelope>"""
+
+OUTPUT = """<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"
+    xmlns:rsp="{rsp}">
+  <s:Body><rsp:ReceiveResponse>
+    <rsp:Stream Name="stdout" CommandId="1">{first}</rsp:Stream>
+    <rsp:Stream Name="stdout" CommandId="1">{second}</rsp:Stream>
+    <rsp:Stream Name="stderr" CommandId="1" End="true"></rsp:Stream>
+    <rsp:CommandState CommandId="1" State="{state}">
+      <rsp:ExitCode>3</rsp:ExitCode>
+    </rsp:CommandState>
+  </rsp:ReceiveResponse></s:Body>
+</s:Envelope>"""
+
+
+class TestWSMan(unittest.TestCase):
+
+    def _output(self, state):
+        return OUTPUT.format(rsp=RSP, state=state,
+                             first=base64.b64encode(b"hello ").decode(),
+                             second=base64.b64encode(b"world").decode())
+
+    def test_command(self):
+        root = ElementTree.fromstring(wsman.command("shell-1", "dir"))
+
+        text = ElementTree.tostring(root).decode()
+        self.assertIn(wsman.ACTION_COMMAND, text)
+        self.assertIn("shell-1", text)
+        self.assertEqual(
+            root.findtext(".//{%s}Command" % RSP), "dir")
+
+    def test_send(self):
+        root = ElementTree.fromstring(
+            wsman.send("shell-1", "command-1", b"data", end=True))
+
+        stream = root.find(".//{%s}Stream" % RSP)
+        self.assertEqual(base64.b64decode(stream.text), b"data")
+        self.assertEqual(stream.get("End"), "true")
+        self.assertEqual(stream.get("CommandId"), "command-1")
+
+    def test_parse_output(self):
+        self.assertEqual(wsman.parse_output(self._output(wsman.COMMAND_DONE)),
+                         (b"hello world", b"", 3, True))
+        self.assertEqual(wsman.parse_output(self._output(RSP + "/Running")),
+                         (b"hello world", b"", None, False))
+
+    def test_parse_fault(self):
+        with self.assertRaises(exceptions.ArgusWSManFault) as ctx:
+            wsman.parse_output(FAULT)
+
+        self.assertTrue(wsman.is_operation_timeout(ctx.exception))
+        self.assertIn("Operation timed out.", str(ctx.exception))
+
+    def test_parse_invalid(self):
+        with self.assertRaises(exceptions.ArgusWSManFault) as ctx:
+            wsman.parse_command_id("<html>")
+        self.assertFalse(wsman.is_operation_timeout(ctx.exception))
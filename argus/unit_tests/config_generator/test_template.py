@@ -0,0 +1,118 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=protected-access
+
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+import six
+from six.moves import configparser
+
+from argus.config_generator import template
+from argus import util
+
+TEMPLATE = b"""[DEFAULT]
+username=Admin
+verbose=true
+
+[section]
+verbose=false
+Name=value
+"""
+
+
+def _write(conf):
+    buff = six.StringIO()
+    conf.write(buff)
+    return buff.getvalue()
+
+
+class TestConfigOverlay(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('argus.util.get_resource',
+                             return_value=TEMPLATE)
+        self._get_resource = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('argus.config_generator.template._TEMPLATES',
+                             new_callable=util.FactCache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._overlay = template.ConfigOverlay(
+            template.get_template("fake template"))
+        self._parser = configparser.RawConfigParser()
+        # pylint: disable=deprecated-method, maybe-no-member
+        if six.PY2:
+            self._parser.readfp(six.StringIO(TEMPLATE.decode()))
+        else:
+            self._parser.read_file(six.StringIO(TEMPLATE.decode()))
+
+    def _apply(self, action, *args):
+        for conf in (self._overlay, self._parser):
+            getattr(conf, action)(*args)
+
+    def test_template_is_parsed_once(self):
+        overlay = template.ConfigOverlay(
+            template.get_template("fake template"))
+        overlay.set("DEFAULT", "username", "other")
+
+        self._get_resource.assert_called_once_with("fake template")
+        self.assertEqual(self._overlay.get("DEFAULT", "username"), "Admin")
+
+    def test_same_as_config_parser(self):
+        self._apply("set", "DEFAULT", "username", "other")
+        self._apply("set", "DEFAULT", "verbose", "maybe")
+        self._apply("add_section", "new")
+        self._apply("set", "new", "Option", "new value")
+
+        self.assertEqual(_write(self._overlay), _write(self._parser))
+        for section in ("DEFAULT", "section", "new"):
+            self.assertEqual(sorted(self._overlay.items(section)),
+                             sorted(self._parser.items(section)))
+        self.assertEqual(self._overlay.sections(), self._parser.sections())
+
+    def test_lookup(self):
+        self.assertEqual(self._overlay.get("section", "verbose"), "false")
+        self.assertEqual(self._overlay.get("section", "username"), "Admin")
+        self.assertEqual(self._overlay.get("section", "NAME"), "value")
+        self.assertTrue(self._overlay.has_option("section", "username"))
+        self.assertFalse(self._overlay.has_option("missing", "username"))
+
+        self._overlay.set("DEFAULT", "username", "other")
+        self.assertEqual(self._overlay.get("section", "username"), "other")
+
+    def test_errors(self):
+        with self.assertRaises(configparser.NoSectionError):
+            self._overlay.set("missing", "name", "value")
+        with self.assertRaises(configparser.NoOptionError):
+            self._overlay.get("section", "missing")
+        with self.assertRaises(configparser.DuplicateSectionError):
+            self._overlay.add_section("section")
+
+    def test_diff(self):
+        self._overlay.set("DEFAULT", "username", "Admin")
+        self._overlay.set("section", "verbose", "true")
+        self._overlay.add_section("new")
+        self._overlay.set("new", "name", "value")
+
+        self.assertEqual(self._overlay.diff(), [
+            ("section", "verbose", "false", "true"),
+            ("new", "name", None, "value"),
+        ])
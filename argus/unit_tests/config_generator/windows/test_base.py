@@ -16,9 +16,13 @@
 # pylint: disable=no-value-for-parameter, protected-access, arguments-differ
 # pylint: disable=bad-super-call
 
+import hashlib
 import unittest
+
+from argus.config_generator import template
 from argus.config_generator.windows import base
-import six
+from argus import exceptions
+from argus import util
 
 
 try:
@@ -53,79 +57,126 @@ class BaseWindowsConfig(unittest.TestCase):
         result = self._cbinit_config.conf
         self.assertEqual(result, self._cbinit_config._conf)
 
-    @mock.patch('six.moves.configparser.ConfigParser')
-    @mock.patch('argus.util.get_resource')
-    @mock.patch('argus.config_generator.windows.base.StringIO')
-    def _test_get_base_conf(self, mock_string_io, mock_get_resource,
-                            mock_configparser, py_version):
-        mock_string_io.return_value = mock.sentinel
-        mock_get_resource.return_value = mock.sentinel
-        mock_conf = mock.Mock()
-        mock_configparser.return_value = mock_conf
-        if py_version == 2:
-            six.PY2 = True
-        else:
-            six.PY2 = None
+    @mock.patch('argus.config_generator.template.get_template')
+    def test_get_base_conf(self, mock_get_template):
+        mock_get_template.return_value = {"DEFAULT": {"name": "value"}}
 
         result = self._cbinit_config._get_base_conf(mock.sentinel)
-        self.assertEqual(result, mock_conf)
-        mock_string_io.assert_called_once_with(mock_get_resource.return_value)
-        mock_get_resource.assert_called_once_with(mock.sentinel)
-        mock_configparser.assert_called_once_with()
-        if py_version == 2:
-            mock_conf.readfp.assert_called_once_with(
-                mock_string_io.return_value)
-        else:
-            mock_conf.read_file.assert_called_once_with(
-                mock_string_io.return_value)
-
-    def test_get_base_conf_py2(self):
-        self._test_get_base_conf(py_version=2)
-
-    def test_get_base_conf_py_not_2(self):
-        self._test_get_base_conf(py_version=3)
 
-    @mock.patch('argus.config_generator.windows.base.'
-                'BaseWindowsConfig.conf')
-    @mock.patch('argus.config_generator.windows.base.StringIO')
-    @mock.patch('ntpath.join')
-    def _test_apply_config(self, mock_join, mock_string_io, _, is_file):
-        mock_join.return_value = mock.sentinel
-        mock_manager = mock.Mock()
-        mock_manager.is_file.return_value = is_file
-        mock_buff = mock.Mock()
-        mock_data = mock.Mock()
-        mock_data.splitlines.return_value = [mock.Mock] * 5
-        mock_buff.read.return_value = mock_data
-        mock_string_io.return_value = mock_buff
-        mock_client = mock.Mock()
-        mock_client.mock_manager = mock_manager
-        self._cbinit_config._client = mock_client
-        self._cbinit_config.config_name = mock.sentinel
-
-        self._cbinit_config.apply_config(mock.sentinel)
-
-        mock_join.assert_called_once_with(mock.sentinel, mock.sentinel)
-        self._cbinit_config._client.manager.is_file.assert_called_once_with(
-            mock.sentinel)
-        if is_file:
-            self._cbinit_config._client.manager.remove.assert_called_once_with(
-                mock.sentinel)
-        mock_string_io.assert_called_once_with()
-        self._cbinit_config.conf.write.assert_called_once_with(
-            mock_string_io.return_value)
-        mock_buff.seek.assert_called_once_with(0)
-        mock_buff.read.assert_called_once_with()
-        mock_data.splitlines.assert_called_once_with()
-        self.assertEqual(self._cbinit_config._client.write_file.call_count, 5)
-
-    def test_apply_config_is_file(self):
-        self._test_apply_config(is_file=True)
-
-    def test_apply_config_is_no_file(self):
-        self._test_apply_config(is_file=None)
+        mock_get_template.assert_called_once_with(mock.sentinel)
+        self.assertEqual(result.get("DEFAULT", "name"), "value")
+
+    def test_diff(self):
+        self._cbinit_config._conf = mock.Mock()
+        self.assertEqual(self._cbinit_config.diff(),
+                         self._cbinit_config._conf.diff.return_value)
+
+    def test_render(self):
+        conf = template.ConfigOverlay({"DEFAULT": {}})
+        conf.add_section("section")
+        conf.set("section", "name", u"value \u0103")
+        self._cbinit_config._conf = conf
+
+        self.assertEqual(self._cbinit_config.render(),
+                         u"[section]\r\nname = value \u0103\r\n\r\n"
+                         .encode("utf-8"))
+
+        self._cbinit_config.encoding = "ascii"
+        self.assertEqual(self._cbinit_config.render(),
+                         b"[section]\r\nname = value ?\r\n\r\n")
+
+    @mock.patch('argus.config_generator.windows.base.deploy_configs')
+    def test_apply_config(self, mock_deploy_configs):
+        self._cbinit_config.apply_config(mock.sentinel.path)
+
+        mock_deploy_configs.assert_called_once_with(
+            self._cbinit_config._client, [self._cbinit_config],
+            mock.sentinel.path)
 
     def test_config_specific_paths(self):
         result = (super(FakeBaseWindowsConfig, self._cbinit_config).
                   _config_specific_paths())
         self.assertEqual(result, None)
+
+
+class TestDeployConfigs(unittest.TestCase):
+
+    def setUp(self):
+        self._client = mock.Mock()
+        self._client.facts = util.FactCache()
+        self._configs = []
+        for name, data in (("first.conf", b"first"),
+                           ("second.conf", b"second")):
+            config = mock.Mock(config_name=name, encoding="utf-8")
+            config.render.return_value = data
+            config.diff.return_value = [("DEFAULT", "name", None, name)]
+            self._configs.append(config)
+        self._hashes = [hashlib.sha256(data).hexdigest()
+                        for data in (b"first", b"second")]
+
+    def _deploy(self):
+        base.deploy_configs(self._client, self._configs, r"C:\conf")
+
+    def test_deploy_configs(self):
+        self._client.run_command_with_retry.return_value = (
+            "\r\n".join(self._hashes), "", 0)
+
+        self._deploy()
+
+        # A single upload and a single command.
+        self._client.write_file.assert_called_once_with(
+            data=b"firstsecond", remote_destination=mock.ANY, append=False)
+        bundle = self._client.write_file.call_args[1]["remote_destination"]
+        self.assertTrue(bundle.startswith("C:\\conf\\argus-configs-"))
+        script = self._client.run_command_with_retry.call_args[0][0]
+        self.assertIn("'{}'".format(bundle), script)
+        self.assertIn("'0|5|{}|C:\\conf\\first.conf'".format(
+            self._hashes[0]), script)
+        self.assertIn("'5|6|{}|C:\\conf\\second.conf'".format(
+            self._hashes[1]), script)
+
+    def test_deploy_configs_unchanged(self):
+        self._client.run_command_with_retry.return_value = (
+            "\r\n".join(self._hashes), "", 0)
+        self._deploy()
+        self._client.reset_mock()
+
+        self._client.run_command_with_retry.return_value = (
+            "\r\n".join(digest.upper() for digest in self._hashes), "", 0)
+
+        self._deploy()
+        # Only the files in place were checked.
+        self.assertFalse(self._client.write_file.called)
+        script = self._client.run_command_with_retry.call_args[0][0]
+        self.assertIn("'C:\\conf\\first.conf', 'C:\\conf\\second.conf'",
+                      script)
+
+        self._client.run_command_with_retry.return_value = (
+            "\r\n".join(self._hashes), "", 0)
+        self._configs[1].diff.return_value = []
+        self._deploy()
+        self.assertTrue(self._client.write_file.called)
+
+    def test_deploy_configs_changed_on_the_instance(self):
+        self._client.run_command_with_retry.return_value = (
+            "\r\n".join(self._hashes), "", 0)
+        self._deploy()
+        self._client.run_command_with_retry.side_effect = [
+            (self._hashes[0] + "\r\nmissing", "", 0),
+            ("\r\n".join(self._hashes), "", 0)]
+
+        self._deploy()
+
+        self.assertEqual(self._client.write_file.call_count, 2)
+
+    def test_deploy_configs_mismatch(self):
+        self._client.run_command_with_retry.return_value = (
+            self._hashes[0], "", 0)
+
+        with self.assertRaises(exceptions.ArgusTransferError):
+            self._deploy()
+        # The configs are written again by the next deployment.
+        self._client.run_command_with_retry.return_value = (
+            "\r\n".join(self._hashes), "", 0)
+        self._deploy()
+        self.assertEqual(self._client.write_file.call_count, 2)
@@ -73,12 +73,11 @@ class BasePopulatedCBInitConfig(unittest.TestCase):
     @mock.patch('ntpath.join')
     @mock.patch('argus.config_generator.windows.cb_init.'
                 'BasePopulatedCBInitConfig.set_conf_value')
-    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
-    def test_config_specific_paths(self, mock_get_cbinit_dir,
-                                   mock_set_conf_value, mock_join):
-        self._base._execute = mock.sentinel
+    def test_config_specific_paths(self, mock_set_conf_value, mock_join):
+        self._base._client = mock.Mock()
         self._base._config_specific_paths()
-        mock_get_cbinit_dir.assert_called_once_with(self._base._execute)
+        (self._base._client.manager.get_cbinit_dir.
+         assert_called_once_with())
         self.assertEqual(mock_set_conf_value.call_count, 4)
         self.assertEqual(mock_join.call_count, 4)
 
@@ -111,23 +110,6 @@ class BasePopulatedCBInitConfig(unittest.TestCase):
     def test_set_service_type_(self):
         self._test_set_service_type(None)
 
-    @mock.patch('ntpath.join')
-    @mock.patch('argus.config_generator.windows.base.'
-                'BaseWindowsConfig.apply_config')
-    def test_apply_config(self, mock_apply_config, mock_join):
-        path = "fake path"
-        self._base.config_name = mock.sentinel
-        mock_client = mock.Mock()
-        self._base._client = mock_client
-        argus.util.POWERSHELL = mock.sentinel
-        cmd = ("(get-content '{filename}')| "
-               "out-file '{filename}' -encoding ascii")
-        mock_join.return_value = "fake path"
-
-        self._base.apply_config(path)
-
-        mock_apply_config.assert_called_once_with(path)
-        mock_join.assert_called_once_with(path, self._base.config_name)
-        self._base._client.run_command_with_retry.assert_called_once_with(
-            cmd.format(filename=mock_join.return_value),
-            command_type=argus.util.POWERSHELL)
+    def test_encoding(self):
+        # The config files are written as ASCII on the instance.
+        self.assertEqual(self._base.encoding, "ascii")
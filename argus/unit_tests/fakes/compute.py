@@ -0,0 +1,272 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-memory stand-ins for the Tempest compute clients."""
+
+import collections
+import copy
+import functools
+import itertools
+import threading
+import time
+
+from tempest.lib import exceptions as lib_exceptions
+
+
+class FakeImagesClient(object):
+    """Keep the images in memory, with the API of the compute client.
+
+    The snapshots of the servers are created with the status given by
+    `snapshot_statuses`, one for every call of :meth:`show_image`,
+    the last one being kept afterwards.
+    """
+
+    def __init__(self, snapshot_statuses=("SAVING", "ACTIVE")):
+        self.images = {}
+        self.snapshots = []
+        self._statuses = {}
+        self._snapshot_statuses = tuple(snapshot_statuses)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_image(self, name, status="ACTIVE", metadata=None):
+        """Add an image directly, returning its id."""
+        with self._lock:
+            image_id = "image-{}".format(next(self._ids))
+            self.images[image_id] = {
+                "id": image_id,
+                "name": name,
+                "status": status,
+                "metadata": dict(metadata or {}),
+            }
+        return image_id
+
+    def _get(self, image_id):
+        try:
+            return self.images[image_id]
+        except KeyError:
+            raise lib_exceptions.NotFound(image_id)
+
+    def create_image(self, server_id, **kwargs):
+        image_id = self.add_image(kwargs.get("name"),
+                                  status=self._snapshot_statuses[0],
+                                  metadata=kwargs.get("metadata"))
+        with self._lock:
+            self._statuses[image_id] = list(self._snapshot_statuses[1:])
+            self.snapshots.append((server_id, image_id))
+        return {"image_id": image_id}
+
+    def list_images(self, detail=False, **params):
+        with self._lock:
+            images = copy.deepcopy(list(self.images.values()))
+        if not detail:
+            images = [{"id": image["id"], "name": image["name"]}
+                      for image in images]
+        return {"images": images}
+
+    def show_image(self, image_id):
+        with self._lock:
+            image = self._get(image_id)
+            statuses = self._statuses.get(image_id)
+            if statuses:
+                image["status"] = statuses.pop(0)
+            return {"image": copy.deepcopy(image)}
+
+    def delete_image(self, image_id):
+        with self._lock:
+            self._get(image_id)
+            del self.images[image_id]
+        return {}
+
+    def set_image_metadata_item(self, image_id, key, meta):
+        with self._lock:
+            self._get(image_id)["metadata"][key] = meta[key]
+        return {"meta": dict(meta)}
+
+
+class FakeServersClient(object):
+    """Keep the servers in memory, with the API of the compute client.
+
+    A server is active after `boot_polls` calls of :meth:`show_server`
+    and disappears after `delete_polls` calls once deleted. The
+    attributes used by the Tempest waiters are available.
+    """
+
+    build_interval = 0
+    build_timeout = 60
+
+    def __init__(self, boot_polls=1, delete_polls=1, fail_boot=False):
+        self.servers = {}
+        self.created = []
+        self.deleted = []
+        self._boot_polls = boot_polls
+        self._delete_polls = delete_polls
+        self._fail_boot = fail_boot
+        self._polls = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _get(self, server_id):
+        try:
+            return self.servers[server_id]
+        except KeyError:
+            raise lib_exceptions.NotFound(server_id)
+
+    def create_server(self, **kwargs):
+        with self._lock:
+            server_id = "server-{}".format(next(self._ids))
+            self.servers[server_id] = dict(kwargs, id=server_id,
+                                           status="BUILD")
+            self._polls[server_id] = self._boot_polls
+            self.created.append(server_id)
+            return {"server": {"id": server_id, "name": kwargs.get("name")}}
+
+    def show_server(self, server_id):
+        with self._lock:
+            server = self._get(server_id)
+            self._polls[server_id] -= 1
+            if self._polls[server_id] <= 0:
+                if server["status"] == "DELETING":
+                    del self.servers[server_id]
+                    raise lib_exceptions.NotFound(server_id)
+                if server["status"] == "BUILD":
+                    server["status"] = "ERROR" if self._fail_boot else "ACTIVE"
+            return {"server": copy.deepcopy(server)}
+
+    def delete_server(self, server_id):
+        with self._lock:
+            self._get(server_id)["status"] = "DELETING"
+            self._polls[server_id] = self._delete_polls
+            self.deleted.append(server_id)
+        return {}
+
+    def add_security_group(self, server_id, name):
+        with self._lock:
+            self._get(server_id).setdefault("security_groups", []).append(
+                {"name": name})
+        return {}
+
+    def remove_security_group(self, server_id, name):
+        with self._lock:
+            self._get(server_id)["security_groups"].remove({"name": name})
+        return {}
+
+
+class FakeResourcesClient(object):
+    """Create and delete any kind of resource, keeping them in memory.
+
+    The methods are named after the ones of the Tempest clients, such
+    as ``create_floating_ip`` or ``delete_security_group_rule``.
+    """
+
+    def __init__(self):
+        self.resources = collections.defaultdict(dict)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _create(self, kind, **kwargs):
+        with self._lock:
+            resource_id = "{}-{}".format(kind, next(self._ids))
+            resource = dict(kwargs, id=resource_id, ip=resource_id)
+            self.resources[kind][resource_id] = resource
+        return {kind: copy.deepcopy(resource)}
+
+    def _delete(self, kind, resource_id):
+        with self._lock:
+            try:
+                del self.resources[kind][resource_id]
+            except KeyError:
+                raise lib_exceptions.NotFound(resource_id)
+        return {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        action, _, kind = name.partition("_")
+        if action == "create":
+            return functools.partial(self._create, kind)
+        if action == "delete":
+            return functools.partial(self._delete, kind)
+        # Updates and associations have no visible effect.
+        return lambda *args, **kwargs: {}
+
+
+class _Slow(object):
+    """Sleep `latency` seconds before every call of a client method."""
+
+    def __init__(self, client, latency):
+        self._client = client
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            time.sleep(self._latency)
+            return attribute(*args, **kwargs)
+        return call
+
+
+class FakeKeypair(object):
+    """A key-pair whose destruction takes as long as an API call."""
+
+    def __init__(self, name, latency):
+        self.name = name
+        self.public_key = "fake public key"
+        self.private_key = "fake private key"
+        self.destroyed = False
+        self._latency = latency
+
+    def destroy(self):
+        time.sleep(self._latency)
+        self.destroyed = True
+
+
+class FakeAPIManager(object):
+    """A stand-in for :class:`argus.backends.tempest.manager.APIManager`.
+
+    Every API call takes `latency` seconds, so that the time spent by
+    a back-end talking to a real cloud can be approximated.
+    """
+
+    def __init__(self, latency=0, boot_polls=1):
+        self.latency = latency
+        self.servers = FakeServersClient(boot_polls=boot_polls,
+                                         delete_polls=boot_polls)
+        self.resources = FakeResourcesClient()
+        self.servers_client = _Slow(self.servers, latency)
+        self.floating_ips_client = _Slow(self.resources, latency)
+        self.security_groups_client = _Slow(self.resources, latency)
+        self.security_group_rules_client = _Slow(self.resources, latency)
+        self.subnets_client = _Slow(self.resources, latency)
+        self.keypairs = []
+        self.credentials_cleaned = False
+
+    def primary_credentials(self):
+        credentials = collections.namedtuple("Credentials",
+                                             "network subnet")
+        return credentials({"id": "network", "mtu": 1500}, {"id": "subnet"})
+
+    def create_keypair(self, name):
+        time.sleep(self.latency)
+        keypair = FakeKeypair(name + "-key", self.latency)
+        self.keypairs.append(keypair)
+        return keypair
+
+    def cleanup_credentials(self):
+        time.sleep(self.latency)
+        self.credentials_cleaned = True
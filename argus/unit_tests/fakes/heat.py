@@ -0,0 +1,174 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""An in-memory stand-in for the Heat client."""
+
+import collections
+import itertools
+
+from heatclient import exc
+
+
+class _Record(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _Stacks(object):
+
+    def __init__(self, heat):
+        self._heat = heat
+
+    def create(self, **fields):
+        return self._heat.create_stack(fields)
+
+    def list(self):
+        self._heat.request("stacks.list")
+        return [self._heat.show(stack) for stack in self._heat.stacks_data
+                if stack["status"] != "DELETE_COMPLETE"]
+
+    def get(self, stack_id):
+        self._heat.request("stacks.get")
+        stack = self._heat.find(stack_id)
+        if stack["status"] == "DELETE_IN_PROGRESS":
+            stack["polls"] -= 1
+            if stack["polls"] <= 0:
+                stack["status"] = self._heat.delete_status
+        return self._heat.show(stack)
+
+    def delete(self, stack_id):
+        self._heat.request("stacks.delete")
+        stack = self._heat.find(stack_id)
+        stack["status"] = "DELETE_IN_PROGRESS"
+        stack["polls"] = self._heat.delete_polls
+
+
+class _Resources(object):
+
+    def __init__(self, heat):
+        self._heat = heat
+
+    def list(self, stack_id, **kwargs):
+        self._heat.request("resources.list")
+        stack = self._heat.find(stack_id)
+        resources = collections.OrderedDict()
+        for event in stack["events"]:
+            resources[event.resource_name] = _Record(
+                resource_name=event.resource_name,
+                resource_type=stack["types"][event.resource_name],
+                resource_status=event.resource_status,
+                physical_resource_id=event.physical_resource_id)
+        return list(resources.values())
+
+
+class _Events(object):
+
+    def __init__(self, heat):
+        self._heat = heat
+
+    def list(self, stack_id, resource_name=None, marker=None,
+             sort_dir="asc", **kwargs):
+        self._heat.request("events.list")
+        stack = self._heat.find(stack_id)
+        events = stack["events"]
+        if marker is not None:
+            index = [event.id for event in events].index(marker)
+            events = events[index + 1:]
+        self._heat.events_returned += len(events)
+        return list(events)
+
+
+class FakeHeatClient(object):
+    """Keep the stacks in memory, with the API of the Heat client.
+
+    Every resource of a stack is created with two events. The events
+    happen `events_per_request` at a time, on every request. A deleted
+    stack disappears after `delete_polls` calls of ``stacks.get`` and
+    is found afterwards only by its ``name/id`` identifier, like in
+    Heat. The names of the stacks are resolved without any request.
+
+    :param fail_resource:
+        The name of a resource which fails to be created.
+    """
+
+    def __init__(self, events_per_request=1, delete_polls=1,
+                 fail_resource=None, delete_status="DELETE_COMPLETE"):
+        self.stacks = _Stacks(self)
+        self.resources = _Resources(self)
+        self.events = _Events(self)
+        self.stacks_data = []
+        self.requests = collections.Counter()
+        self.events_returned = 0
+        self.delete_polls = delete_polls
+        self.delete_status = delete_status
+        self._events_per_request = events_per_request
+        self._fail_resource = fail_resource
+        self._ids = itertools.count(1)
+
+    def create_stack(self, fields):
+        self.request("stacks.create")
+        stack_id = "stack-{}".format(next(self._ids))
+        pending = []
+        types = {}
+        for name, resource in sorted(fields["template"]["resources"].items()):
+            types[name] = resource["type"]
+            pending.append((name, "CREATE_IN_PROGRESS", None))
+            if name == self._fail_resource:
+                pending.append((name, "CREATE_FAILED", None))
+            else:
+                pending.append((name, "CREATE_COMPLETE",
+                                "{}-{}".format(name, stack_id)))
+        self.stacks_data.append({
+            "id": stack_id,
+            "name": fields["stack_name"],
+            "status": "CREATE_IN_PROGRESS",
+            "types": types,
+            "pending": pending,
+            "events": [],
+        })
+        return {"stack": {"id": stack_id, "links": []}}
+
+    def request(self, name):
+        self.requests[name] += 1
+        for stack in self.stacks_data:
+            for _ in range(self._events_per_request):
+                if not stack["pending"]:
+                    break
+                name, status, physical_id = stack["pending"].pop(0)
+                stack["events"].append(_Record(
+                    id="event-{}".format(next(self._ids)),
+                    resource_name=name,
+                    resource_status=status,
+                    resource_status_reason="fake reason",
+                    physical_resource_id=physical_id))
+            if (stack["status"] == "CREATE_IN_PROGRESS" and
+                    not stack["pending"]):
+                stack["status"] = "CREATE_COMPLETE"
+
+    def find(self, identifier):
+        for stack in self.stacks_data:
+            if identifier == "{}/{}".format(stack["name"], stack["id"]):
+                return stack
+            if (identifier in (stack["name"], stack["id"]) and
+                    stack["status"] != "DELETE_COMPLETE"):
+                return stack
+        raise exc.HTTPNotFound()
+
+    @staticmethod
+    def show(stack):
+        return _Record(id=stack["id"], stack_name=stack["name"],
+                       stack_status=stack["status"],
+                       stack_status_reason="fake reason")
@@ -0,0 +1,116 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""An in-memory stand-in for the Tempest network clients."""
+
+import collections
+import copy
+import itertools
+
+from tempest.lib import exceptions as lib_exceptions
+
+
+def _matches(resource, filters):
+    for key, value in filters.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        if resource.get(key) not in values:
+            return False
+    return True
+
+
+class FakeNeutron(object):
+    """Keep networks, subnets and ports in memory.
+
+    The methods are the ones of the Tempest networks, subnets and
+    ports clients, so it can stand for any of them. The requests and
+    the resources returned by them are counted, the latter being an
+    approximation of the size of the responses.
+    """
+
+    def __init__(self):
+        self.networks = collections.OrderedDict()
+        self.subnets = collections.OrderedDict()
+        self.ports = collections.OrderedDict()
+        self.requests = collections.Counter()
+        self.returned = 0
+        self._ids = itertools.count(1)
+
+    def _new_id(self, kind):
+        return "{}-{}".format(kind, next(self._ids))
+
+    def add_network(self):
+        network_id = self._new_id("network")
+        self.networks[network_id] = {"id": network_id, "subnets": [],
+                                     "router:external": False}
+        return network_id
+
+    def add_subnet(self, network_id, cidr, ip_version=4, enable_dhcp=False):
+        subnet_id = self._new_id("subnet")
+        self.subnets[subnet_id] = {
+            "id": subnet_id,
+            "network_id": network_id,
+            "cidr": cidr,
+            "ip_version": ip_version,
+            "enable_dhcp": enable_dhcp,
+            "dns_nameservers": ["8.8.8.8"],
+            "gateway_ip": cidr.split("/")[0],
+        }
+        self.networks[network_id]["subnets"].append(subnet_id)
+        return subnet_id
+
+    def add_port(self, device_id, fixed_ips, device_owner="compute:nova"):
+        port_id = self._new_id("port")
+        self.ports[port_id] = {
+            "id": port_id,
+            "device_id": device_id,
+            "device_owner": device_owner,
+            "mac_address": "fa:16:3e:{:02x}:{:02x}:{:02x}".format(
+                len(self.ports) // 65536 % 256,
+                len(self.ports) // 256 % 256, len(self.ports) % 256),
+            "fixed_ips": [{"subnet_id": subnet_id, "ip_address": address}
+                          for subnet_id, address in fixed_ips],
+        }
+        return port_id
+
+    def _show(self, kind, resources, resource_id):
+        self.requests["show_" + kind] += 1
+        try:
+            resource = resources[resource_id]
+        except KeyError:
+            raise lib_exceptions.NotFound(resource_id)
+        self.returned += 1
+        return {kind: copy.deepcopy(resource)}
+
+    def _list(self, kind, resources, filters):
+        self.requests["list_" + kind] += 1
+        found = [copy.deepcopy(resource) for resource in resources.values()
+                 if _matches(resource, filters)]
+        self.returned += len(found)
+        return {kind: found}
+
+    def show_network(self, network_id):
+        return self._show("network", self.networks, network_id)
+
+    def list_networks(self, **filters):
+        return self._list("networks", self.networks, filters)
+
+    def show_subnet(self, subnet_id):
+        return self._show("subnet", self.subnets, subnet_id)
+
+    def list_subnets(self, **filters):
+        return self._list("subnets", self.subnets, filters)
+
+    def list_ports(self, **filters):
+        return self._list("ports", self.ports, filters)
@@ -0,0 +1,212 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""An in-memory stand-in for :class:`winrm.protocol.Protocol`."""
+
+import base64
+import hashlib
+import itertools
+import re
+import threading
+import time
+
+from winrm import exceptions as winrm_exceptions
+
+from argus.client import transfer
+
+
+def decode_command(command_line):
+    """Get the PowerShell script from an encoded command line."""
+    match = re.search(r"-EncodedCommand (\S+)", command_line)
+    if not match:
+        return command_line
+    return base64.b64decode(match.group(1)).decode("UTF-16LE")
+
+
+_BATCH_ITEM = re.compile(r"^Invoke-ArgusBatchItem (\d+) '(\w+)' '([^']*)'$",
+                         re.MULTILINE)
+
+
+def _to_bytes(data):
+    if not isinstance(data, bytes):
+        data = data.encode("utf-8")
+    return data
+
+
+def _template_pattern(template, *fields):
+    """Get a pattern matching the scripts rendered from `template`.
+
+    Every field becomes a named group of the pattern.
+    """
+    markers = {field: "ARGUSFIELD{}".format(field.upper())
+               for field in fields}
+    pattern = re.escape(template.format(**markers))
+    for field, marker in markers.items():
+        pattern = pattern.replace(re.escape(marker),
+                                  "(?P<{}>.*?)".format(field))
+    return re.compile("^{}$".format(pattern), re.DOTALL)
+
+
+_UPLOAD = _template_pattern(transfer.UPLOAD_SCRIPT, "path", "mode")
+_FILE_INFO = _template_pattern(transfer.FILE_INFO_SCRIPT, "path")
+_READ_RANGE = _template_pattern(transfer.READ_RANGE_SCRIPT, "path",
+                                "offset", "length")
+
+
+def _unquote(path):
+    return path.replace("''", "'")
+
+
+class FakeWindowsHost(object):
+    """A command handler which keeps the files in memory.
+
+    It understands the scripts used by :mod:`argus.client.transfer`
+    and :mod:`argus.client.batch`. Every other command, including the
+    ones from a batch, is given to `fallback`, if any.
+    """
+
+    def __init__(self, fallback=None):
+        self.files = {}
+        self.scripts = []
+        self._fallback = fallback
+
+    def __call__(self, command_line, stdin):
+        script = decode_command(command_line)
+        self.scripts.append(script)
+        match = _UPLOAD.match(script)
+        if match:
+            return self._upload(_unquote(match.group("path")),
+                                match.group("mode"), stdin)
+        match = _FILE_INFO.match(script)
+        if match:
+            return self._file_info(_unquote(match.group("path")))
+        match = _READ_RANGE.match(script)
+        if match:
+            return self._read(_unquote(match.group("path")),
+                              int(match.group("offset")),
+                              int(match.group("length")))
+        items = _BATCH_ITEM.findall(script)
+        if items:
+            return self._batch(items)
+        return self._run(command_line, stdin)
+
+    def _run(self, command_line, stdin):
+        if self._fallback:
+            return self._fallback(command_line, stdin)
+        return b"", b"", 0
+
+    def _batch(self, items):
+        frames = []
+        for index, _, encoded in items:
+            command = base64.b64decode(encoded).decode("utf-8")
+            stdout, stderr, exit_code = self._run(command, b"")
+            frames.append("|".join([
+                "ARGUS-BATCH", index, str(exit_code),
+                base64.b64encode(_to_bytes(stdout)).decode(),
+                base64.b64encode(_to_bytes(stderr)).decode()]))
+        return "\r\n".join(frames).encode(), b"", 0
+
+    def _file_info(self, path):
+        if path not in self.files:
+            return b"", b"File not found.", 1
+        data = self.files[path]
+        output = "{} {}".format(len(data), hashlib.sha256(data).hexdigest())
+        return output.encode(), b"", 0
+
+    def _read(self, path, offset, length):
+        if path not in self.files:
+            return b"", b"File not found.", 1
+        data = self.files[path]
+        return base64.b64encode(data[offset:offset + length]), b"", 0
+
+    def _upload(self, path, mode, stdin):
+        data = b"".join(base64.b64decode(line)
+                        for line in stdin.splitlines() if line)
+        if mode == "Create":
+            self.files[path] = b""
+        self.files[path] = self.files.get(path, b"") + data
+        output = "{} {}".format(len(data), hashlib.sha256(data).hexdigest())
+        return output.encode(), b"", 0
+
+
+class FakeProtocol(object):
+    """Pretend to be a WinRM endpoint, without any network traffic.
+
+    :param handler:
+        A callable which receives the command line and the bytes
+        sent on its standard input and returns a tuple of
+        stdout, stderr and exit code. By default a
+        :class:`FakeWindowsHost` is used.
+    :param latency:
+        Number of seconds to sleep for each request, simulating
+        the network round trip.
+    """
+
+    def __init__(self, handler=None, latency=0):
+        self._handler = handler or FakeWindowsHost()
+        self._latency = latency
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.shells = set()
+        self.commands = {}
+        self.requests = 0
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        if self._latency:
+            time.sleep(self._latency)
+
+    def _new_id(self, prefix):
+        return "{}-{}".format(prefix, next(self._ids))
+
+    def open_shell(self, **_):
+        self._request()
+        shell_id = self._new_id("shell")
+        self.shells.add(shell_id)
+        return shell_id
+
+    def close_shell(self, shell_id, **_):
+        self._request()
+        self.shells.discard(shell_id)
+
+    def run_command(self, shell_id, command, arguments=(), **_):
+        self._request()
+        if shell_id not in self.shells:
+            raise winrm_exceptions.WSManFaultError(
+                500, "", "", "The shell was not found.")
+        command_id = self._new_id("command")
+        command_line = " ".join([command] + list(arguments))
+        self.commands[command_id] = [command_line, []]
+        return command_id
+
+    def send_command_input(self, shell_id, command_id, stdin_input,
+                           end=False):
+        self._request()
+        stdin_input = _to_bytes(stdin_input)
+        self.commands[command_id][1].append(stdin_input)
+
+    def get_command_output(self, shell_id, command_id):
+        self._request()
+        try:
+            command_line, stdin = self.commands[command_id]
+        except KeyError:
+            raise winrm_exceptions.WSManFaultError(
+                500, "", "", "The command was not found.")
+        return self._handler(command_line, b"".join(stdin))
+
+    def cleanup_command(self, shell_id, command_id):
+        self._request()
+        self.commands.pop(command_id, None)
@@ -0,0 +1,226 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""An in-process WinRM endpoint, speaking WS-Management over HTTP.
+
+It needs Python 3.5 or newer, like :mod:`argus.client.windows_async`,
+and it is left out of the flake8 and pylint runs for the same reason.
+"""
+
+import asyncio
+import base64
+import collections
+import itertools
+from xml.etree import ElementTree
+
+from argus.client import wsman
+from argus.unit_tests.fakes import winrm as fake_winrm
+
+REASONS = {200: "OK", 401: "Unauthorized", 500: "Internal Server Error"}
+
+
+def _tag(name):
+    prefix, local = name.split(":")
+    return "{%s}%s" % (wsman.NAMESPACES[prefix], local)
+
+
+def _element(parent, name, text=None, **attributes):
+    element = ElementTree.SubElement(parent, _tag(name), attributes)
+    if text is not None:
+        element.text = text
+    return element
+
+
+def _envelope():
+    envelope = ElementTree.Element(_tag("env:Envelope"))
+    _element(envelope, "env:Header")
+    return envelope, _element(envelope, "env:Body")
+
+
+def _fault(message, code="2150858778"):
+    envelope, body = _envelope()
+    fault = _element(body, "env:Fault")
+    _element(_element(fault, "env:Code"), "env:Value", "env:Receiver")
+    _element(_element(fault, "env:Reason"), "env:Text", message)
+    wsman_fault = _element(_element(fault, "env:Detail"), "f:WSManFault",
+                           Code=code)
+    _element(wsman_fault, "f:Message", message)
+    return 500, ElementTree.tostring(envelope)
+
+
+def _to_bytes(data):
+    if not isinstance(data, bytes):
+        data = data.encode("utf-8")
+    return data
+
+
+class FakeWSManServer(object):
+    """Serve the WinRM shells on a local port, keeping them in memory.
+
+    :param handler:
+        A callable which receives the command line and the bytes
+        sent on its standard input and returns a tuple of stdout,
+        stderr and exit code. By default a
+        :class:`argus.unit_tests.fakes.winrm.FakeWindowsHost` is used.
+    :param command_time:
+        The number of seconds every command runs.
+    :param operation_timeout:
+        The number of seconds a Receive waits for a running command,
+        before answering with an operation timeout fault.
+    """
+
+    def __init__(self, handler=None, command_time=0, operation_timeout=1,
+                 username="user", password="password"):
+        self.handler = handler or fake_winrm.FakeWindowsHost()
+        self._command_time = command_time
+        self._operation_timeout = operation_timeout
+        credentials = "{}:{}".format(username, password).encode("utf-8")
+        self._authorization = "Basic " + base64.b64encode(
+            credentials).decode("ascii")
+        self._ids = itertools.count()
+        self._server = None
+        self.port = None
+        self.shells = set()
+        self.commands = {}
+        self.signaled = []
+        self.requests = collections.Counter()
+        self.connections = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._serve, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _new_id(self, prefix):
+        return "{}-{}".format(prefix, next(self._ids))
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(
+                    int(headers.get("content-length", 0)))
+
+                status, response = await self._handle(headers, body)
+                writer.write("HTTP/1.1 {} {}\r\nContent-Length: {}\r\n"
+                             "Content-Type: application/soap+xml\r\n\r\n"
+                             .format(status, REASONS[status], len(response))
+                             .encode("latin-1") + response)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, headers, body):
+        # pylint: disable=too-many-return-statements
+        if headers.get("authorization") != self._authorization:
+            return 401, b""
+
+        root = ElementTree.fromstring(body)
+        action = root.findtext(".//" + _tag("a:Action"))
+        name = action.rsplit("/", 1)[1]
+        self.requests[name] += 1
+        if name == "Create":
+            return self._create()
+
+        shell_id = None
+        for selector in root.iter(_tag("w:Selector")):
+            if selector.get("Name") == "ShellId":
+                shell_id = selector.text
+        if shell_id not in self.shells:
+            return _fault("The shell was not found.")
+
+        if name == "Delete":
+            self.shells.discard(shell_id)
+            return 200, ElementTree.tostring(_envelope()[0])
+        if name == "Command":
+            return self._command(root)
+        if name == "Send":
+            stream = root.find(".//" + _tag("rsp:Stream"))
+            command = self.commands[stream.get("CommandId")]
+            command["stdin"].append(base64.b64decode(stream.text or ""))
+            return 200, ElementTree.tostring(_envelope()[0])
+        if name == "Receive":
+            stream = root.find(".//" + _tag("rsp:DesiredStream"))
+            return await self._receive(stream.get("CommandId"))
+        if name == "Signal":
+            command_id = root.find(".//" + _tag("rsp:Signal")).get(
+                "CommandId")
+            self.commands.pop(command_id, None)
+            self.signaled.append(command_id)
+            return 200, ElementTree.tostring(_envelope()[0])
+        return _fault("Unknown action {}.".format(action))
+
+    def _create(self):
+        shell_id = self._new_id("shell")
+        self.shells.add(shell_id)
+        envelope, body = _envelope()
+        created = _element(body, "x:ResourceCreated")
+        references = _element(created, "a:ReferenceParameters")
+        selectors = _element(references, "w:SelectorSet")
+        _element(selectors, "w:Selector", shell_id, Name="ShellId")
+        return 200, ElementTree.tostring(envelope)
+
+    def _command(self, root):
+        command_id = self._new_id("command")
+        self.commands[command_id] = {
+            "line": root.findtext(".//" + _tag("rsp:Command")),
+            "stdin": [],
+            "started": asyncio.get_event_loop().time(),
+        }
+        envelope, body = _envelope()
+        response = _element(body, "rsp:CommandResponse")
+        _element(response, "rsp:CommandId", command_id)
+        return 200, ElementTree.tostring(envelope)
+
+    async def _receive(self, command_id):
+        command = self.commands.get(command_id)
+        if command is None:
+            return _fault("The command was not found.")
+        remaining = (command["started"] + self._command_time -
+                     asyncio.get_event_loop().time())
+        if remaining > self._operation_timeout:
+            await asyncio.sleep(self._operation_timeout)
+            return _fault("The operation timed out.",
+                          code=wsman.OPERATION_TIMEOUT_CODE)
+        await asyncio.sleep(max(remaining, 0))
+
+        stdout, stderr, exit_code = self.handler(
+            command["line"], b"".join(command["stdin"]))
+        envelope, body = _envelope()
+        response = _element(body, "rsp:ReceiveResponse")
+        for stream, data in (("stdout", stdout), ("stderr", stderr)):
+            _element(response, "rsp:Stream",
+                     base64.b64encode(_to_bytes(data)).decode("ascii"),
+                     Name=stream, CommandId=command_id)
+        state = _element(response, "rsp:CommandState",
+                         CommandId=command_id, State=wsman.COMMAND_DONE)
+        _element(state, "rsp:ExitCode", str(exit_code))
+        return 200, ElementTree.tostring(envelope)
@@ -17,7 +17,11 @@
 # pylint: disable=no-self-use, unused-argument, redefined-variable-type
 
 import unittest
+
+from argus.client import batch
+from argus import exceptions
 from argus.introspection.cloud import windows
+from argus.unit_tests.fakes import winrm as fake_winrm
 from argus import util
 
 try:
@@ -128,46 +132,50 @@ class TestWindows(unittest.TestCase):
         )
         self.assertEqual(result, expected_result)
 
-    @mock.patch('argus.introspection.cloud.windows.ntpath')
-    @mock.patch('argus.introspection.cloud.windows.escape_path')
-    def _test_get_cbinit_dir(self, mock_escape_path, mock_ntpath,
-                             arch="None", no_error=True):
-        mock_excute_function = mock.Mock()
-        mock_location = mock.Mock()
-        mock_location.strip.return_value = "fake_location"
-        mock_escape_path.return_value = "fake location"
-        side_effect_list = [arch] + [mock_location]
-        if arch == "AMD64":
-            side_effect_list.append(mock_location)
-            side_effect_list.append("fake_status")
-        if no_error:
-            side_effect_list.append("true")
-        else:
-            side_effect_list.append("fake_status")
-        mock_excute_function.side_effect = side_effect_list
-
-        if no_error:
-            mock_ntpath.join.return_value = "fake path"
-            result = windows.get_cbinit_dir(mock_excute_function)
-            self.assertEqual(result, "fake path")
-            mock_ntpath.join.assert_called_once_with(
-                "fake_location", "Cloudbase Solutions", "Cloudbase-Init")
-        else:
-            from argus import exceptions
-            with self.assertRaises(exceptions.ArgusError) as ex:
-                result = windows.get_cbinit_dir(mock_excute_function)
-            self.assertEqual(ex.exception.message, 'Cloudbase-Init '
-                             'installation directory not found')
-
-    def ztest_get_cbinit_dir_amd64(self):
+    def _test_get_cbinit_dir(self, arch="x86", installed=None):
+        installed = installed or []
+        outputs = {
+            '$ENV:PROCESSOR_ARCHITECTURE': arch,
+            'echo "$ENV:ProgramFiles"': r"C:\Program Files",
+            'echo "${ENV:ProgramFiles(x86)}"': r"C:\Program Files (x86)",
+        }
+        for variable in ('$ENV:ProgramFiles', '${ENV:ProgramFiles(x86)}'):
+            command = 'Test-Path "{}\\Cloudbase Solutions"'.format(variable)
+            outputs[command] = str(variable in installed)
+        host = fake_winrm.FakeWindowsHost(
+            fallback=lambda command, _: (outputs[command], "", 0))
+        execute_function = mock.Mock(
+            side_effect=lambda cmd, command_type: host(cmd, b"")[0].decode())
+
+        if not installed or (arch != "AMD64" and
+                             '$ENV:ProgramFiles' not in installed):
+            with self.assertRaises(exceptions.ArgusError):
+                windows.get_cbinit_dir(execute_function)
+            return None
+
+        result = windows.get_cbinit_dir(execute_function)
+        execute_function.assert_called_once_with(
+            mock.ANY, command_type=util.POWERSHELL)
+        return result
+
+    def test_get_cbinit_dir(self):
+        result = self._test_get_cbinit_dir(installed=['$ENV:ProgramFiles'])
+        self.assertEqual(
+            result, r"C:\Program Files\Cloudbase Solutions\Cloudbase-Init")
+
+    def test_get_cbinit_dir_amd64_x86(self):
+        result = self._test_get_cbinit_dir(
+            arch='AMD64', installed=['${ENV:ProgramFiles(x86)}'])
+        self.assertEqual(
+            result,
+            r"C:\Program Files (x86)\Cloudbase Solutions\Cloudbase-Init")
+
+    def test_get_cbinit_dir_x86_ignores_wow64(self):
+        self._test_get_cbinit_dir(installed=['${ENV:ProgramFiles(x86)}'])
+
+    def test_get_cbinit_dir_error(self):
         self._test_get_cbinit_dir(arch='AMD64')
 
-    def ztest_get_cbinit_dir(self):
-        self._test_get_cbinit_dir()
-
-    def ztest_get_cbinit_dir_error(self):
-        self._test_get_cbinit_dir(no_error=False)
-
     @mock.patch('ntpath.join')
     @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
     def test_set_config_option(self, mock_cbinit_dir, mock_join):
@@ -254,23 +262,50 @@ class TestWindows(unittest.TestCase):
     def test_get_cbinit_key_x64(self):
         self._test_get_cbinit_key(x64=True)
 
-    @mock.patch('argus.introspection.cloud.windows.util')
-    def ztest_get_os_version(self, mock_util):
-        mock_util.get_int_from_str.return_value = mock.sentinel
-        mock_util.POWERSHELL = mock.sentinel
-        mock_stdout = mock.Mock()
-        mock_stdout.strip.return_value = mock.sentinel
+    def _get_fingerprint_client(self, stdout):
         mock_client = mock.Mock()
-        mock_client.run_command_with_retry.return_value = (mock_stdout,
-                                                           None, None)
-
-        result = windows.get_os_version(mock_client, "fake field")
-
-        self.assertEqual(result, mock_util.get_int_from_str.return_value)
-        cmd = "[System.Environment]::OSVersion.Version.{}".format("fake field")
-        mock_client.run_command_with_retry.assert_called_once_with(
-            cmd, command_type=mock_util.POWERSHELL)
-        mock_util.get_int_from_str.assert_called_once_with(mock.sentinel)
+        mock_client.facts = util.FactCache()
+        mock_client.run_command_with_retry.return_value = (stdout, "", 0)
+        return mock_client
+
+    def test_get_os_fingerprint(self):
+        mock_client = self._get_fingerprint_client(
+            '{"major": 10, "minor": 0, "build": 14393, "product_type": 3, '
+            '"nano_server": true, "architecture": "AMD64", '
+            '"program_files": "C:\\\\Program Files", '
+            '"program_files_x86": null, "powershell_version": "5.1"}\r\n')
+
+        for _ in range(3):
+            result = windows.get_os_fingerprint(mock_client)
+
+        self.assertEqual(result, windows.OSFingerprint(
+            major=10, minor=0, build=14393, product_type=3,
+            nano_server=True, architecture="AMD64",
+            program_files="C:\\Program Files", program_files_x86=None,
+            powershell_version="5.1"))
+        self.assertEqual(mock_client.run_command_with_retry.call_count, 1)
+        script = mock_client.run_command_with_retry.call_args[0][0]
+        self.assertIn("nano_server", script)
+        self.assertEqual(
+            mock_client.run_command_with_retry.call_args[1]["command_type"],
+            util.POWERSHELL)
+
+    def test_get_os_fingerprint_invalid_output(self):
+        mock_client = self._get_fingerprint_client("fake output")
+
+        with self.assertRaises(exceptions.ArgusError):
+            windows.get_os_fingerprint(mock_client)
+        self.assertEqual(mock_client.facts.stats()["size"], 0)
+
+    @mock.patch('argus.introspection.cloud.windows.get_os_fingerprint')
+    def test_get_os_version(self, mock_get_os_fingerprint):
+        mock_get_os_fingerprint.return_value.major = 6
+        mock_get_os_fingerprint.return_value.build = 9600
+
+        mock_client = mock.sentinel.client
+        self.assertEqual(windows.get_os_version(mock_client, "Major"), 6)
+        self.assertEqual(windows.get_os_version(mock_client, "Build"), 9600)
+        mock_get_os_fingerprint.assert_called_with(mock_client)
 
     @mock.patch('re.search')
     @mock.patch('re.split')
@@ -521,17 +556,19 @@ class TestInstanceIntrospection(unittest.TestCase):
     def test_get_service_triggers_error(self):
         self._test_get_service_triggers(no_error=False)
 
-    @mock.patch('argus.introspection.cloud.windows.get_os_version')
-    def test_get_instance_os_version(self, mock_get_os_version):
-        expected_result = ['major version', 'minor version']
-        mock_get_os_version.side_effect = expected_result
+    @mock.patch('argus.introspection.cloud.windows.get_os_fingerprint')
+    def test_get_instance_os_version(self, mock_get_os_fingerprint):
+        mock_get_os_fingerprint.return_value.major = 'major version'
+        mock_get_os_fingerprint.return_value.minor = 'minor version'
         result = self._introspect.get_instance_os_version()
-        self.assertEqual(result, tuple(expected_result))
-
-    @mock.patch('argus.introspection.cloud.windows.'
-                'InstanceIntrospection.get_instance_file_content')
-    def test_get_cloudconfig_executed_plugins(self, mock_get_file_content):
-        mock_get_file_content.return_value = "fake content"
+        self.assertEqual(result, ('major version', 'minor version'))
+        mock_get_os_fingerprint.assert_called_once_with(
+            self._introspect.remote_client)
+
+    def test_get_cloudconfig_executed_plugins(self):
+        self._introspect.remote_client.run_batch.side_effect = (
+            lambda commands: [batch.CommandResult(" fake content ", "", 0)] *
+            len(commands))
         result = self._introspect.get_cloudconfig_executed_plugins()
         files = {
             'b64': 'fake content',
@@ -542,8 +579,9 @@ class TestInstanceIntrospection(unittest.TestCase):
             'gzip_base64_1': 'fake content',
             'gzip_base64_2': 'fake content'
         }
+        self.assertEqual(
+            self._introspect.remote_client.run_batch.call_count, 1)
         self.assertEqual(result, files)
-        self.assertEqual(mock_get_file_content.call_count, 7)
 
     def test_get_timezone(self):
         (self._introspect.remote_client.run_command_verbose.
@@ -591,6 +629,9 @@ class TestInstanceIntrospection(unittest.TestCase):
 
     @mock.patch('argus.introspection.cloud.windows._get_nic_details')
     def test_get_network_interfaces(self, mock_get_nic_details):
+        location = r"C:\argus\cache\digest\network_details.ps1"
+        (self._introspect.remote_client.manager.get_resource_location.
+         return_value) = location
         (self._introspect.remote_client.run_command_verbose.
          return_value) = "fake result\n\n\n\n\nfake result\n" + \
                          windows.SEP + windows.SEP
@@ -598,12 +639,17 @@ class TestInstanceIntrospection(unittest.TestCase):
         for nic in result:
             for item in nic:
                 self.assertIsInstance(nic.get(item), mock.MagicMock)
-        location = r"C:\network_details.ps1"
-        (self._introspect.remote_client.manager.download_resource.
-         assert_called_once_with(
-             resource_location="windows/network_details.ps1",
-             location=location))
+        (self._introspect.remote_client.manager.get_resource_location.
+         assert_called_once_with("windows/network_details.ps1"))
         (self._introspect.remote_client.run_command_verbose.
          assert_called_once_with(location, command_type=util.POWERSHELL))
         mock_get_nic_details.assert_called_once_with(
             ['fake result', '', '', '', '', 'fake result'])
+
+    def test_get_rdp_settings(self):
+        self._introspect.remote_client.run_batch.return_value = [
+            batch.CommandResult("1", "", 0), batch.CommandResult("2", "", 0)]
+        result = self._introspect.get_rdp_settings()
+        self.assertEqual(result, ["1", "2"])
+        commands = self._introspect.remote_client.run_batch.call_args[0][0]
+        self.assertEqual(len(commands), 2)
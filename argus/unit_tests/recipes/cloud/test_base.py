@@ -18,6 +18,7 @@
 
 import unittest
 from argus import config as argus_config
+from argus import exceptions
 from argus.recipes.cloud import base
 from argus.unit_tests import test_utils
 from argus import util
@@ -79,7 +80,9 @@ class FakeBaseCloudbaseinitRecipe(base.BaseCloudbaseinitRecipe):
 
 class TestBaseCloudbaseinitRecipe(unittest.TestCase):
     def setUp(self):
-        self._base = FakeBaseCloudbaseinitRecipe(mock.Mock())
+        self._backend = mock.Mock()
+        self._backend.booted_from_snapshot.return_value = False
+        self._base = FakeBaseCloudbaseinitRecipe(self._backend)
 
     def test_prepare(self):
         expected_logging = [
@@ -89,4 +92,75 @@ class TestBaseCloudbaseinitRecipe(unittest.TestCase):
 
         with test_utils.LogSnatcher('argus.recipes.cloud.base') as snatcher:
             self._base.prepare(service_type="fake type")
-        self.assertEqual(expected_logging, snatcher.output)
+        self.assertEqual(expected_logging,
+                         [snatcher.output[0], snatcher.output[-1]])
+        self.assertEqual(len(self._base.prepare_trace), 16)
+
+    @test_utils.ConfPatcher('recipe_workers', 1, 'argus')
+    def test_prepare_order(self):
+        calls = []
+        steps = ("wait_for_boot_completion", "create_mock_metadata",
+                 "set_mtu", "execution_prologue", "get_installation_script",
+                 "install_cbinit", "replace_install", "replace_code",
+                 "snapshot_instance", "prepare_cbinit_config",
+                 "inject_cbinit_config", "pre_sysprep", "sysprep",
+                 "wait_cbinit_finalization", "get_cb_init_logs",
+                 "get_cb_init_confs")
+
+        def record(step):
+            return lambda *args: calls.append((step, args))
+
+        for step in steps:
+            setattr(self._base, step, mock.Mock(side_effect=record(step)))
+        self._backend.snapshot_instance.side_effect = record(
+            "snapshot_instance")
+
+        self._base.prepare(service_type="fake type")
+
+        self.assertEqual([step for step, _ in calls], list(steps))
+        self.assertEqual(dict(calls)["create_mock_metadata"], ("fake type", ))
+        self.assertEqual(dict(calls)["prepare_cbinit_config"],
+                         ("fake type", ))
+
+    def test_prepare_from_snapshot(self):
+        self._backend.booted_from_snapshot.return_value = True
+        skipped = ("get_installation_script", "replace_install",
+                   "replace_code")
+        for step in skipped + ("install_cbinit", ):
+            setattr(self._base, step, mock.Mock())
+
+        self._base.prepare(service_type="fake type")
+
+        for step in skipped:
+            self.assertFalse(getattr(self._base, step).called)
+        self._base.install_cbinit.assert_called_once_with()
+        self._backend.snapshot_instance.assert_called_once_with()
+
+    def test_prepare_failure(self):
+        self._base.install_cbinit = mock.Mock(
+            side_effect=exceptions.ArgusError)
+        self._base.sysprep = mock.Mock()
+
+        with self.assertRaises(exceptions.ArgusError):
+            self._base.prepare()
+        self.assertFalse(self._base.sysprep.called)
+        self.assertIn("install_cbinit",
+                      [timing.name for timing in self._base.prepare_trace])
+
+    @test_utils.ConfPatcher('delete_metadata', True, 'argus')
+    def test_cleanup(self):
+        self._base.delete_mock_metadata = mock.Mock()
+
+        self._base.cleanup()
+
+        self._base.delete_mock_metadata.assert_called_once_with()
+
+    @test_utils.ConfPatcher('delete_metadata', False, 'argus')
+    def test_cleanup_preserves_metadata(self):
+        self._base.delete_mock_metadata = mock.Mock()
+
+        with test_utils.LogSnatcher('argus.recipes.cloud.base') as snatcher:
+            self._base.cleanup()
+
+        self.assertFalse(self._base.delete_mock_metadata.called)
+        self.assertEqual(snatcher.output, ["The metadata was preserved."])
@@ -106,9 +106,9 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
 
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
                 '_grab_cbinit_installation_log')
-    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
-    def _test_install_cbinit(self, mock_get_cbinit_dir, mock_install_log,
-                             exception=False):
+    def _test_install_cbinit(self, mock_install_log, exception=False):
+        manager = self._recipe._backend.remote_client.manager
+        mock_get_cbinit_dir = manager.get_cbinit_dir
         expected_logging = [
             "Cloudbase-Init is already installed, skipping installation."
         ]
@@ -120,7 +120,7 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
         with test_utils.LogSnatcher('argus.recipes.cloud.'
                                     'windows') as snatcher:
             self._recipe.install_cbinit()
-        mock_get_cbinit_dir.assert_called_once_with(self._recipe._execute)
+        mock_get_cbinit_dir.assert_called_once_with()
         self.assertEqual(expected_logging, snatcher.output)
         if exception:
             (self._recipe._backend.remote_client.manager.install_cbinit.
@@ -145,43 +145,29 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
 
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
                 'extract_files_from_archive')
-    @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
-                '_grab_cbinit_installation_log')
-    @mock.patch('argus.recipes.cloud.windows.base64.standard_b64decode')
-    def _test_transfer_encoded_file_b64(self, mock_base64_decode,
-                                        mock_cbinit_install_log,
-                                        mock_extract_archive, archive=False):
-        file_source = mock.sentinel
-        destination_path = mock.sentinel
-        encoded_content = [mock.sentinel]
-        file_64_decoded = mock.sentinel
-        (self._recipe._backend.remote_client.manager.
-         encode_file_to_base64_str.return_value) = encoded_content
-        mock_base64_decode.return_value = file_64_decoded
+    def _test_transfer_file(self, mock_extract_archive, archive=False):
+        file_source = mock.sentinel.source
+        destination_path = mock.sentinel.destination
 
-        with mock.patch('argus.recipes.cloud.windows.open') as mock_open:
-            self._recipe.transfer_encoded_file_b64(
-                file_source, destination_path, archive)
+        self._recipe.transfer_file(file_source, destination_path, archive)
 
-        (self._recipe._backend.remote_client.manager.
-         encode_file_to_base64_str.assert_called_once_with(
-             file_path=file_source))
-        mock_base64_decode.assert_called_once_with(encoded_content[0])
-        mock_open.assert_called_once_with(destination_path, 'wb')
-        mock_open.write(file_64_decoded)
+        (self._recipe._backend.remote_client.download_file.
+         assert_called_once_with(file_source, destination_path))
         if archive is True:
             mock_extract_archive.assert_called_once_with(
                 destination_path, CONFIG.argus.output_directory)
+        else:
+            mock_extract_archive.assert_not_called()
 
-    def test_transfer_encoded_file_b64(self):
-        self._test_transfer_encoded_file_b64()
+    def test_transfer_file(self):
+        self._test_transfer_file()
 
-    def test_transfer_encoded_file_b64_archive(self):
-        self._test_transfer_encoded_file_b64(archive=True)
+    def test_transfer_file_archive(self):
+        self._test_transfer_file(archive=True)
 
     @mock.patch('argus.log.get_log_extra_item')
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
-                'transfer_encoded_file_b64')
+                'transfer_file')
     @mock.patch('argus.recipes.cloud.windows.os.path.join')
     def _test_grab_cbinit_installation_log(self, mock_join, mock_transfer_file,
                                            mock_get_extra_item,
@@ -226,11 +212,11 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
     def test_grab_cbinit_installation_logy(self):
         self._test_grab_cbinit_installation_log()
 
-    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
                 '_execute')
-    def _test_replace_install(self, mock_execute, mock_get_cbinit_dir,
-                              link="fake link"):
+    def _test_replace_install(self, mock_execute, link="fake link"):
+        manager = self._recipe._backend.remote_client.manager
+        mock_get_cbinit_dir = manager.get_cbinit_dir
         CONFIG.argus.patch_install = link
         expected_logging = []
         if link:
@@ -252,7 +238,7 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
                 (self._recipe._backend.remote_client.manager.download.
                  assert_called_once_with(uri=link, location=location))
             self.assertEqual(mock_execute.call_count, execute_count)
-            mock_get_cbinit_dir.assert_called_once_with(mock_execute)
+            mock_get_cbinit_dir.assert_called_once_with()
             resource_location = "windows/updateCbinit.ps1"
             (self._recipe._backend.remote_client.manager.
              execute_powershell_resource_script.assert_called_once_with(
@@ -270,9 +256,10 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
     @mock.patch('argus.recipes.cloud.windows.ntpath.join')
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
                 '_execute')
-    @mock.patch('argus.introspection.cloud.windows.get_python_dir')
-    def _test_replace_code(self, mock_get_python_dir, mock_execute,
-                           mock_join, git_command=True, exception=False):
+    def _test_replace_code(self, mock_execute, mock_join, git_command=True,
+                           exception=False):
+        manager = self._recipe._backend.remote_client.manager
+        mock_get_python_dir = manager.get_python_dir
         CONFIG.argus.git_command = git_command
         expected_logging = []
         if git_command:
@@ -301,7 +288,7 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
                 self._recipe.replace_code()
         self.assertEqual(expected_logging, snatcher.output)
         if git_command:
-            mock_get_python_dir.assert_called_once_with(mock_execute)
+            mock_get_python_dir.assert_called_once_with()
             (self._recipe._backend.remote_client.manager.git_clone.
              assert_called_once_with(
                  repo_url=windows._CBINIT_REPO,
@@ -325,8 +312,9 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
     def test_replace_code(self):
         self._test_replace_code()
 
-    @mock.patch('argus.introspection.cloud.windows.get_python_dir')
-    def test_pre_sysprep(self, mock_get_python_dir):
+    def test_pre_sysprep(self):
+        manager = self._recipe._backend.remote_client.manager
+        mock_get_python_dir = manager.get_python_dir
         mock_get_python_dir.return_value = "fake path"
         cbinit = ntpath.join(mock_get_python_dir.return_value, 'Lib',
                              'site-packages', 'cloudbaseinit')
@@ -353,16 +341,16 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
             r"C:\cloudbaseinit_normal"]
 
         expected_logging = [
-            "Check the heartbeat patch ...",
-            "Wait for the Cloudbase-Init service to stop ..."
+            "Wait for the heartbeat patch and for the "
+            "Cloudbase-Init service to stop ..."
         ]
         with test_utils.LogSnatcher('argus.recipes.cloud.windows') as snatcher:
             self._recipe.wait_cbinit_finalization()
         self.assertEqual(expected_logging, snatcher.output)
-        (self._recipe._backend.remote_client.manager.check_cbinit_service.
-         assert_called_once_with(searched_paths=paths))
         (self._recipe._backend.remote_client.manager.wait_cbinit_service.
-         assert_called_once_with())
+         assert_called_once_with(searched_paths=paths))
+        self.assertFalse(self._recipe._backend.remote_client.manager.
+                         check_cbinit_service.called)
 
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
                 '_make_dir_if_needed')
@@ -411,10 +399,12 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
     def test_make_dir_if_needed_no_create(self):
         self._test_make_dir_if_needed(is_dir=True)
 
+    @mock.patch('argus.config_generator.windows.base.deploy_configs')
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
                 '_make_dir_if_needed')
-    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
-    def test_inject_cbinit_config(self, mock_get_cbinit_dir, mock_make_dir):
+    def test_inject_cbinit_config(self, mock_make_dir, mock_deploy_configs):
+        manager = self._recipe._backend.remote_client.manager
+        mock_get_cbinit_dir = manager.get_cbinit_dir
         mock_get_cbinit_dir.return_value = "fake dir"
         self._recipe._cbinit_conf = mock.Mock()
         self._recipe._cbinit_unattend_conf = mock.Mock()
@@ -426,16 +416,17 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
         ]
         self._recipe.inject_cbinit_config()
         self.assertEqual(mock_make_dir.call_count, len(needed_directories))
-        (self._recipe._cbinit_conf.apply_config.
-         assert_called_once_with(conf_dir))
-        (self._recipe._cbinit_unattend_conf.apply_config.
-         assert_called_once_with(conf_dir))
+        mock_deploy_configs.assert_called_once_with(
+            self._recipe._backend.remote_client,
+            [self._recipe._cbinit_conf, self._recipe._cbinit_unattend_conf],
+            conf_dir)
 
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitRecipe.'
-                'transfer_encoded_file_b64')
-    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
-    def _test_get_cb_init_files(self, mock_get_dir, mock_encode_file,
+                'transfer_file')
+    def _test_get_cb_init_files(self, mock_encode_file,
                                 output_directory="fake_output_directory"):
+        manager = self._recipe._backend.remote_client.manager
+        mock_get_dir = manager.get_cbinit_dir
         CONFIG.argus.output_directory = output_directory
         fake_location = "fake_logs"
         cb_fake_files = []
@@ -458,7 +449,7 @@ class TestCloudbaseinitRecipe(unittest.TestCase):
         self.assertEqual(snatcher.output, expected_logging)
         if output_directory:
             self._recipe._backend.instance_server.assert_called_once_with()
-            mock_get_dir.assert_called_once_with(self._recipe._execute)
+            mock_get_dir.assert_called_once_with()
             self.assertEqual(
                 len(cb_fake_files),
                 (self._recipe._backend.remote_client.
@@ -678,11 +669,12 @@ class TestCloudbaseinitImageRecipe(unittest.TestCase):
     def setUp(self):
         self._recipe = windows.CloudbaseinitImageRecipe(mock.Mock())
 
-    @mock.patch('argus.introspection.cloud.windows.get_cbinit_dir')
-    def test_wait_cbinit_finalization(self, mock_get_cbinit_dir):
+    def test_wait_cbinit_finalization(self):
+        manager = self._recipe._backend.remote_client.manager
+        mock_get_cbinit_dir = manager.get_cbinit_dir
         expected_logging = [
-            "Check the heartbeat patch ...",
-            "Wait for the Cloudbase-Init service to stop ..."
+            "Wait for the heartbeat patch and for the "
+            "Cloudbase-Init service to stop ..."
         ]
         self._recipe._execute = mock.sentinel
         mock_get_cbinit_dir.return_value = "fake path"
@@ -692,11 +684,11 @@ class TestCloudbaseinitImageRecipe(unittest.TestCase):
         with test_utils.LogSnatcher('argus.recipes.cloud.windows') as snatcher:
             self._recipe.wait_cbinit_finalization()
         self.assertEqual(expected_logging, snatcher.output)
-        mock_get_cbinit_dir.assert_called_once_with(self._recipe._execute)
-        (self._recipe._backend.remote_client.manager.check_cbinit_service.
-         assert_called_once_with(searched_paths=paths))
+        mock_get_cbinit_dir.assert_called_once_with()
         (self._recipe._backend.remote_client.manager.wait_cbinit_service.
-         assert_called_once_with())
+         assert_called_once_with(searched_paths=paths))
+        self.assertFalse(self._recipe._backend.remote_client.manager.
+                         check_cbinit_service.called)
 
     @mock.patch('argus.recipes.cloud.windows.CloudbaseinitImageRecipe.'
                 'wait_cbinit_finalization')
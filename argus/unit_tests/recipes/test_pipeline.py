@@ -0,0 +1,126 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import unittest
+
+from argus import exceptions
+from argus.recipes import pipeline
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self._calls = []
+        self._lock = threading.Lock()
+
+    def _step(self, name):
+        def step():
+            with self._lock:
+                self._calls.append(name)
+        return step
+
+    def test_add_duplicate(self):
+        steps = pipeline.Pipeline(workers=1)
+        steps.add("a", self._step("a"))
+        self.assertRaises(exceptions.ArgusError,
+                          steps.add, "a", self._step("a"))
+
+    def test_add_unknown_requirement(self):
+        steps = pipeline.Pipeline(workers=1)
+        self.assertRaises(exceptions.ArgusError,
+                          steps.add, "a", self._step("a"), requires=["b"])
+
+    def test_run_empty(self):
+        steps = pipeline.Pipeline(workers=1)
+        steps.run()
+        self.assertEqual(steps.trace, [])
+        self.assertEqual(steps.critical_path(), [])
+
+    def test_single_worker_keeps_the_order(self):
+        steps = pipeline.Pipeline(workers=1)
+        steps.add("a", self._step("a"))
+        steps.add("b", self._step("b"))
+        steps.add("c", self._step("c"), requires=["a"])
+        steps.add("d", self._step("d"), requires=["c", "b"])
+        steps.run()
+        self.assertEqual(self._calls, ["a", "b", "c", "d"])
+
+    def test_independent_steps_overlap(self):
+        # "b" can finish only while "a" is still running.
+        a_started = threading.Event()
+
+        def step_a():
+            a_started.set()
+            self.assertTrue(b_finished.wait(5))
+            self._calls.append("a")
+
+        b_finished = threading.Event()
+
+        def step_b():
+            self.assertTrue(a_started.wait(5))
+            self._calls.append("b")
+            b_finished.set()
+
+        steps = pipeline.Pipeline(workers=2)
+        steps.add("a", step_a)
+        steps.add("b", step_b)
+        steps.add("c", self._step("c"), requires=["a", "b"])
+        steps.run()
+        self.assertEqual(self._calls, ["b", "a", "c"])
+
+    def test_failure_stops_the_other_steps(self):
+        def fail():
+            raise exceptions.ArgusCLIError("boom")
+
+        steps = pipeline.Pipeline(workers=1)
+        steps.add("a", fail)
+        steps.add("b", self._step("b"))
+        steps.add("c", self._step("c"), requires=["a"])
+        self.assertRaises(exceptions.ArgusCLIError, steps.run)
+        self.assertEqual(self._calls, [])
+        self.assertEqual([timing.name for timing in steps.trace], ["a"])
+
+    def test_best_effort_runs_all_the_steps(self):
+        def fail(error):
+            def step():
+                raise error
+            return step
+
+        steps = pipeline.Pipeline(workers=1, best_effort=True)
+        steps.add("a", fail(exceptions.ArgusCLIError("first")))
+        steps.add("b", fail(exceptions.ArgusError("second")))
+        steps.add("c", self._step("c"), requires=["a"])
+        with self.assertRaises(exceptions.ArgusCLIError):
+            steps.run()
+        self.assertEqual(self._calls, ["c"])
+        self.assertEqual([timing.name for timing in steps.trace],
+                         ["a", "b", "c"])
+
+    def test_critical_path_and_trace(self):
+        steps = pipeline.Pipeline(workers=1)
+        steps.add("a", self._step("a"))
+        steps.add("b", self._step("b"))
+        steps.add("c", self._step("c"), requires=["a", "b"])
+        steps.run()
+
+        # With one worker "b" finishes after "a", so it is the one
+        # which delayed "c".
+        self.assertEqual(steps.critical_path(), ["b", "c"])
+        lines = steps.format_trace().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("  a "))
+        self.assertTrue(lines[1].startswith("* b "))
+        self.assertTrue(lines[2].startswith("* c "))
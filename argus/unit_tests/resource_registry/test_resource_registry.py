@@ -0,0 +1,84 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+# pylint: disable=wrong-import-order
+import base64
+import gzip
+import hashlib
+import io
+import unittest
+
+from argus import resource_registry
+from argus import util
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class TestResourceRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self._loader = mock.Mock(return_value=b"fake data")
+        self._registry = resource_registry.ResourceRegistry(
+            loader=self._loader)
+
+    def test_data_is_loaded_once(self):
+        resource = self._registry.get("windows/fake.ps1")
+        self.assertFalse(resource.is_loaded())
+
+        for _ in range(3):
+            self.assertEqual(self._registry.data("windows/fake.ps1"),
+                             b"fake data")
+        # Both spellings name the same resource.
+        self.assertEqual(self._registry.data("windows\\fake.ps1"),
+                         b"fake data")
+
+        self.assertTrue(resource.is_loaded())
+        self._loader.assert_called_once_with("windows/fake.ps1")
+
+    def test_variants(self):
+        self.assertEqual(self._registry.sha256("fake"),
+                         hashlib.sha256(b"fake data").hexdigest())
+        self.assertEqual(self._registry.b64encoded("fake"),
+                         base64.b64encode(b"fake data"))
+        gzipped = self._registry.gzipped("fake")
+        with gzip.GzipFile(fileobj=io.BytesIO(gzipped)) as stream:
+            self.assertEqual(stream.read(), b"fake data")
+        # The gzipped data doesn't depend on the time.
+        self._registry.clear()
+        self.assertEqual(self._registry.gzipped("fake"), gzipped)
+
+    def test_missing(self):
+        digest = hashlib.sha256(b"fake data").hexdigest()
+
+        missing = self._registry.missing(
+            ["present", "changed", "absent"],
+            {"present": digest, "changed": "old digest"})
+
+        self.assertEqual(missing, ["changed", "absent"])
+
+    def test_manifest(self):
+        registry = resource_registry.ResourceRegistry()
+
+        manifest = registry.manifest()
+
+        self.assertIn("windows/test_heat.ps1", manifest)
+        self.assertNotIn("__init__.py", manifest)
+        self.assertFalse([name for name in manifest if name.endswith(".pyc")])
+        data = util.get_resource("windows/test_heat.ps1")
+        self.assertEqual(manifest["windows/test_heat.ps1"],
+                         {"size": len(data),
+                          "sha256": hashlib.sha256(data).hexdigest()})
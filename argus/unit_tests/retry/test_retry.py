@@ -0,0 +1,147 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus import exceptions
+from argus import retry
+
+
+class TestBackoff(unittest.TestCase):
+
+    def test_delays_grow_up_to_max_delay(self):
+        backoff = retry.Backoff(max_delay=10, initial_delay=1, factor=2,
+                                jitter=0)
+        delays = [backoff.next_delay() for _ in range(6)]
+        self.assertEqual(delays, [1, 2, 4, 8, 10, 10])
+
+    def test_count(self):
+        backoff = retry.Backoff(count=3, max_delay=1, initial_delay=1,
+                                jitter=0)
+        self.assertEqual(backoff.next_delay(), 1)
+        self.assertEqual(backoff.next_delay(), 1)
+        self.assertIsNone(backoff.next_delay())
+
+    @mock.patch('random.random', return_value=0.5)
+    def test_jitter(self, _):
+        backoff = retry.Backoff(max_delay=10, initial_delay=4, jitter=0.5)
+        self.assertEqual(backoff.next_delay(), 3)
+
+    @mock.patch('time.time')
+    def test_deadline(self, mock_time):
+        mock_time.return_value = 100
+        backoff = retry.Backoff(max_delay=10, initial_delay=10, jitter=0,
+                                deadline=15)
+
+        self.assertEqual(backoff.next_delay(), 10)
+        mock_time.return_value = 110
+        self.assertEqual(backoff.next_delay(), 5)
+        mock_time.return_value = 115
+        self.assertIsNone(backoff.next_delay())
+
+
+@mock.patch('time.sleep')
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        retry.reset_stats()
+        self.addCleanup(retry.reset_stats)
+
+    def test_call(self, mock_sleep):
+        func = mock.Mock(side_effect=[ValueError, ValueError, "result"])
+
+        result = retry.call(func, "site", count=3, delay=1)
+
+        self.assertEqual(result, "result")
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        stats = retry.get_stats()["site"]
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["attempts"], 3)
+        self.assertEqual(stats["failures"], 2)
+        self.assertEqual(stats["exhausted"], 0)
+
+    def test_call_gives_up(self, mock_sleep):
+        func = mock.Mock(side_effect=ValueError)
+        on_failure = mock.Mock()
+
+        with self.assertRaises(exceptions.ArgusTimeoutError) as ctx:
+            retry.call(func, "site", count=3, delay=1,
+                       on_failure=on_failure, error="fake error")
+
+        self.assertEqual(str(ctx.exception), "fake error")
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(on_failure.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(retry.get_stats()["site"]["exhausted"], 1)
+
+    def test_call_not_retryable(self, mock_sleep):
+        func = mock.Mock(side_effect=KeyError)
+        with self.assertRaises(KeyError):
+            retry.call(func, "site", count=3, retryable=(ValueError, ))
+        self.assertEqual(func.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+    def test_call_fatal(self, mock_sleep):
+        func = mock.Mock(side_effect=exceptions.ArgusCLIError)
+        with self.assertRaises(exceptions.ArgusCLIError):
+            retry.call(func, "site", count=3,
+                       fatal=(exceptions.ArgusCLIError, ))
+        self.assertEqual(func.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+    def test_poll(self, mock_sleep):
+        condition = mock.Mock(side_effect=[False, None, "done"])
+
+        self.assertEqual(retry.poll(condition, "site", count=5), "done")
+        self.assertEqual(condition.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_poll_gives_up(self, mock_sleep):
+        condition = mock.Mock(return_value=False)
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            retry.poll(condition, "site", count=2)
+        self.assertEqual(condition.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    def test_abort_check(self, mock_sleep):
+        condition = mock.Mock(return_value=False)
+        check = mock.Mock(side_effect=[None, exceptions.ArgusConsoleFailure])
+        retry.set_abort_check(check, scenario="fake scenario")
+        self.addCleanup(retry.set_abort_check, None, "fake scenario")
+
+        with mock.patch('argus.log.get_thread_scenario_name',
+                        return_value="fake scenario"):
+            with self.assertRaises(exceptions.ArgusConsoleFailure):
+                retry.poll(condition, "site", count=5)
+        self.assertEqual(condition.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    def test_abort_check_other_scenario(self, mock_sleep):
+        condition = mock.Mock(side_effect=[False, True])
+        check = mock.Mock(side_effect=exceptions.ArgusConsoleFailure)
+        retry.set_abort_check(check, scenario="other scenario")
+        self.addCleanup(retry.set_abort_check, None, "other scenario")
+
+        with mock.patch('argus.log.get_thread_scenario_name',
+                        return_value="fake scenario"):
+            self.assertTrue(retry.poll(condition, "site", count=5))
+        self.assertFalse(check.called)
@@ -0,0 +1,234 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# pylint: disable=no-self-use
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import six
+import subunit
+import testtools
+
+from argus import log as argus_log
+from argus import runner
+from argus.scenarios import base
+from argus.unit_tests import test_utils
+
+SCENARIOS_MODULE = """
+import unittest
+
+from argus.scenarios import base
+
+
+class FakeTest(unittest.TestCase):
+
+    def __init__(self, backend, recipe, introspection, test_name):
+        super(FakeTest, self).__init__(test_name)
+
+    def test_nothing(self):
+        pass
+
+
+class FakeScenario(base.BaseScenario):
+
+    backend_type = object
+    introspection_type = object
+    recipe_type = object
+    test_classes = (FakeTest, )
+
+
+class FakeOtherScenario(FakeScenario):
+    pass
+
+
+class NotFinalScenario(base.BaseScenario):
+    pass
+"""
+
+
+class FakeBackend(object):
+
+    remote_client = None
+    condition = threading.Condition()
+    started = []
+    overlapped = []
+    scenarios = []
+
+    def __init__(self, name, *_):
+        self.name = name
+
+    def setup_instance(self):
+        # Wait for the other scenario, so this works only if
+        # the scenarios are run at the same time.
+        with self.condition:
+            self.started.append(self.name)
+            self.condition.notify_all()
+            if len(self.started) < 2:
+                self.condition.wait(5)
+            self.overlapped.append(len(self.started) == 2)
+        # Both scenarios were set up, each thread still sees its own.
+        self.scenarios.append(
+            (self.name, argus_log.get_log_extra_item(base.LOG, "scenario")))
+
+    def start_console_tailer(self):
+        pass
+
+    def stop_console_tailer(self):
+        pass
+
+    def save_instance_output(self):
+        pass
+
+    def cleanup(self):
+        pass
+
+
+class FakeRecipe(object):
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def prepare(self):
+        base.LOG.info("Preparing %s", self.backend.name)
+
+    def cleanup(self):
+        pass
+
+
+class FakeIntrospection(object):
+
+    def __init__(self, remote_client):
+        self.remote_client = remote_client
+
+
+class FakeTests(unittest.TestCase):
+
+    __test__ = False
+
+    def __init__(self, backend, recipe, introspection, test_name):
+        super(FakeTests, self).__init__(test_name)
+        self.backend = backend
+
+    def test_success(self):
+        pass
+
+    def test_failure(self):
+        self.assertEqual(self.backend.name, "FakePassingScenario")
+
+
+class FakePassingScenario(base.BaseScenario):
+
+    __test__ = False
+
+    backend_type = FakeBackend
+    introspection_type = FakeIntrospection
+    recipe_type = FakeRecipe
+    test_classes = (FakeTests, )
+
+
+class FakeFailingScenario(FakePassingScenario):
+    pass
+
+
+class TestDiscover(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._path = os.path.join(directory, "fake_scenarios.py")
+        with open(self._path, "w") as stream:
+            stream.write(SCENARIOS_MODULE)
+
+    def test_discover(self):
+        scenarios = runner.discover([self._path])
+        self.assertEqual(sorted(scenario.__name__ for scenario in scenarios),
+                         ["FakeOtherScenario", "FakeScenario"])
+
+    def test_discover_pattern(self):
+        scenarios = runner.discover([self._path],
+                                    pattern=r"fake_scenarios\.FakeOther")
+        self.assertEqual([scenario.__name__ for scenario in scenarios],
+                         ["FakeOtherScenario"])
+
+
+class TestScenarioRunner(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._directory)
+        self._stream = six.BytesIO()
+        del FakeBackend.started[:]
+        del FakeBackend.overlapped[:]
+        del FakeBackend.scenarios[:]
+        # Other tests may leave an output directory in the config.
+        patcher = test_utils.ConfPatcher("output_directory", None, "argus")
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+
+    def _get_statuses(self):
+        statuses = {}
+
+        def on_test(test):
+            statuses[test["id"]] = test["status"]
+
+        self._stream.seek(0)
+        case = subunit.ByteStreamToStreamResult(self._stream)
+        result = testtools.StreamToDict(on_test)
+        result.startTestRun()
+        case.run(result)
+        result.stopTestRun()
+        return statuses
+
+    def test_run(self):
+        scenarios = [FakePassingScenario, FakeFailingScenario]
+        scenario_runner = runner.ScenarioRunner(
+            2, stream=self._stream, log_directory=self._directory)
+
+        results = scenario_runner.run(scenarios)
+
+        self.assertEqual(FakeBackend.overlapped, [True, True])
+        self.assertEqual(sorted(FakeBackend.scenarios),
+                         [("FakeFailingScenario", "FakeFailingScenario"),
+                          ("FakePassingScenario", "FakePassingScenario")])
+
+        self.assertEqual([(result.scenario, result.successful)
+                          for result in results],
+                         [(FakePassingScenario, True),
+                          (FakeFailingScenario, False)])
+        prefix = __name__ + "."
+        self.assertEqual(self._get_statuses(), {
+            prefix + "FakePassingScenario.test_success": "success",
+            prefix + "FakePassingScenario.test_failure": "success",
+            prefix + "FakeFailingScenario.test_success": "success",
+            prefix + "FakeFailingScenario.test_failure": "fail",
+        })
+
+        for scenario in scenarios:
+            path = os.path.join(self._directory,
+                                "argus-{}.log".format(scenario.__name__))
+            with open(path) as stream:
+                lines = stream.read().splitlines()
+            self.assertTrue(lines)
+            for line in lines:
+                self.assertTrue(line.startswith(scenario.__name__ + " - "))
+            self.assertTrue(any("Preparing " + scenario.__name__ in line
+                                for line in lines))
+
+    def test_run_nothing(self):
+        self.assertEqual(runner.ScenarioRunner(2).run([]), [])
@@ -0,0 +1,203 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+# pylint: disable=protected-access
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+import wsgiref.util
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import cherrypy
+import requests
+
+from argus import resource_registry
+from argus.scenarios.cloud import service_mock
+from argus.unit_tests import test_utils
+
+DATA = b"0123456789"
+
+
+def _load(name):
+    if name != "windows/script.ps1":
+        raise IOError("No such file: {}".format(name))
+    return DATA
+
+
+class TestResourceMirrorApp(unittest.TestCase):
+    """Send the requests to the mirror through its WSGI application."""
+
+    def setUp(self):
+        self._cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._cache)
+        patcher = test_utils.ConfPatcher("installers_cache", self._cache,
+                                         "mirror")
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+
+        registry = resource_registry.ResourceRegistry(loader=_load)
+        self._mirror = service_mock.ResourceMirrorApp(None, registry)
+        self._app = cherrypy.Application(self._mirror, "")
+
+    def _get(self, path, **headers):
+        environ = {"PATH_INFO": path, "SERVER_PROTOCOL": "HTTP/1.1"}
+        wsgiref.util.setup_testing_defaults(environ)
+        for name, value in headers.items():
+            environ["HTTP_" + name.upper()] = value
+        result = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            result["status"] = int(status.split()[0])
+            result["headers"] = {name.lower(): value
+                                 for name, value in response_headers}
+
+        body = b"".join(self._app(environ, start_response))
+        return result["status"], result["headers"], body
+
+    def test_resource(self):
+        status, headers, body = self._get("/resources/windows/script.ps1")
+
+        self.assertEqual((status, body), (200, DATA))
+        self.assertEqual(headers["etag"],
+                         '"{}"'.format(hashlib.sha256(DATA).hexdigest()))
+        self.assertEqual(headers["accept-ranges"], "bytes")
+
+    def test_resource_not_modified(self):
+        _, headers, _ = self._get("/resources/windows/script.ps1")
+
+        status, _, body = self._get("/resources/windows/script.ps1",
+                                    if_none_match=headers["etag"])
+
+        self.assertEqual((status, body), (304, b""))
+
+    def test_resource_range(self):
+        status, headers, body = self._get("/resources/windows/script.ps1",
+                                          range="bytes=2-4")
+
+        self.assertEqual((status, body), (206, b"234"))
+        self.assertEqual(headers["content-range"], "bytes 2-4/10")
+
+        # The range of a changed resource isn't served.
+        status, _, body = self._get("/resources/windows/script.ps1",
+                                    range="bytes=2-4", if_range='"old"')
+        self.assertEqual((status, body), (200, DATA))
+
+        status, _, _ = self._get("/resources/windows/script.ps1",
+                                 range="bytes=20-30")
+        self.assertEqual(status, 416)
+
+    def test_resource_not_found(self):
+        for path in ("/resources/windows/missing.ps1",
+                     "/resources/../setup.py", "/resources/"):
+            status, _, _ = self._get(path)
+            self.assertEqual(status, 404, path)
+
+    @test_utils.ConfPatcher("installers_upstream", "http://upstream/dl/",
+                            "mirror")
+    @mock.patch("requests.get")
+    def test_installer_is_fetched_once(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.headers = {"ETag": '"v1"'}
+        mock_get.return_value.iter_content.return_value = [DATA[:5], DATA[5:]]
+
+        for _ in range(2):
+            status, headers, body = self._get("/installers/setup.msi")
+            self.assertEqual((status, body), (200, DATA))
+
+        mock_get.assert_called_once_with(
+            "http://upstream/dl/setup.msi", stream=True, headers={},
+            timeout=service_mock.INSTALLER_TIMEOUT)
+        mock_get.return_value.close.assert_called_once_with()
+        self.assertEqual(sorted(os.listdir(self._cache)),
+                         [".setup.msi.validators", "setup.msi"])
+
+        status, _, body = self._get("/installers/setup.msi",
+                                    range="bytes=0-1")
+        self.assertEqual((status, body), (206, b"01"))
+        status, _, _ = self._get("/installers/setup.msi",
+                                 if_none_match=headers["etag"])
+        self.assertEqual(status, 304)
+
+    @test_utils.ConfPatcher("installers_max_age", 0, "mirror")
+    @mock.patch("requests.get")
+    def test_installer_is_revalidated(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.headers = {"ETag": '"v1"',
+                                         "Last-Modified": "yesterday"}
+        mock_get.return_value.iter_content.return_value = [DATA]
+        self._get("/installers/setup.msi")
+
+        # The upstream installer didn't change.
+        mock_get.return_value.status_code = 304
+        status, _, body = self._get("/installers/setup.msi")
+
+        self.assertEqual((status, body), (200, DATA))
+        self.assertEqual(mock_get.call_args[1]["headers"],
+                         {"If-None-Match": '"v1"',
+                          "If-Modified-Since": "yesterday"})
+
+        # The upstream installer changed.
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.headers = {"ETag": '"v2"'}
+        mock_get.return_value.iter_content.return_value = [b"new data"]
+        status, _, body = self._get("/installers/setup.msi")
+
+        self.assertEqual((status, body), (200, b"new data"))
+        self._get("/installers/setup.msi")
+        self.assertEqual(mock_get.call_args[1]["headers"],
+                         {"If-None-Match": '"v2"'})
+
+    @test_utils.ConfPatcher("installers_max_age", 0, "mirror")
+    @mock.patch("requests.get")
+    def test_installer_upstream_unreachable(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.headers = {}
+        mock_get.return_value.iter_content.return_value = [DATA]
+        self._get("/installers/setup.msi")
+        mock_get.side_effect = requests.ConnectionError
+
+        status, _, body = self._get("/installers/setup.msi")
+
+        self.assertEqual((status, body), (200, DATA))
+
+    @mock.patch("requests.get")
+    def test_installer_interrupted(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.iter_content.side_effect = IOError
+
+        status, _, _ = self._get("/installers/setup.msi")
+
+        self.assertEqual(status, 500)
+        self.assertEqual(os.listdir(self._cache), [])
+        mock_get.return_value.close.assert_called_once_with()
+
+    @mock.patch("requests.get")
+    def test_installer_not_found(self, mock_get):
+        mock_get.return_value.status_code = 404
+
+        status, _, _ = self._get("/installers/missing.msi")
+
+        self.assertEqual(status, 404)
+        self.assertEqual(os.listdir(self._cache), [])
+
+    @test_utils.ConfPatcher("base_url", "http://10.0.0.1:8095/", "mirror")
+    def test_get_mirror_url(self):
+        self.assertEqual(service_mock.get_mirror_url(),
+                         "http://10.0.0.1:8095")
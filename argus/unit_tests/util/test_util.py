@@ -15,6 +15,7 @@
 # pylint: disable=wrong-import-order
 import unittest
 
+from argus import exceptions
 from argus import util
 
 try:
@@ -41,3 +42,66 @@ class TestCreateTempFile(unittest.TestCase):
             "fd", content.encode.return_value)
         mock_close.assert_called_once_with("fd")
         mock_remove.assert_called_once_with("path")
+
+
+class TestExecWithRetry(unittest.TestCase):
+
+    @mock.patch('time.sleep')
+    @mock.patch('argus.retry.Backoff.elapsed')
+    def test_slow_attempts_are_all_made(self, mock_elapsed, _):
+        # The attempts took longer than all the delays together.
+        mock_elapsed.return_value = 1000
+        action = mock.Mock(side_effect=ValueError)
+
+        with self.assertRaises(exceptions.ArgusTimeoutError):
+            util.exec_with_retry(action, retry_count=5,
+                                 retry_count_interval=10)
+
+        self.assertEqual(action.call_count, 6)
+
+
+class TestFactCache(unittest.TestCase):
+
+    def setUp(self):
+        self._facts = util.FactCache()
+
+    def test_get_is_memoized(self):
+        compute = mock.Mock(return_value="value")
+
+        self.assertEqual(self._facts.get("fact", compute), "value")
+        self.assertEqual(self._facts.get("fact", compute), "value")
+
+        compute.assert_called_once_with()
+        self.assertEqual(self._facts.stats(), {
+            "hits": 1, "misses": 1, "invalidations": 0, "size": 1})
+
+    def test_failures_are_not_cached(self):
+        compute = mock.Mock(side_effect=[ValueError, "value"])
+
+        with self.assertRaises(ValueError):
+            self._facts.get("fact", compute)
+        self.assertEqual(self._facts.get("fact", compute), "value")
+
+    def test_set(self):
+        self._facts.get("fact", lambda: 1)
+        self._facts.set("fact", 2)
+
+        self.assertEqual(self._facts.get("fact", lambda: 3), 2)
+
+    def test_invalidate_some(self):
+        self._facts.get("first", lambda: 1)
+        self._facts.get("second", lambda: 2)
+
+        self._facts.invalidate("first")
+
+        self.assertEqual(self._facts.get("first", lambda: 3), 3)
+        self.assertEqual(self._facts.get("second", lambda: 4), 2)
+
+    def test_invalidate_all(self):
+        self._facts.get("first", lambda: 1)
+        self._facts.get("second", lambda: 2)
+
+        self._facts.invalidate()
+
+        self.assertEqual(self._facts.stats()["size"], 0)
+        self.assertEqual(self._facts.stats()["invalidations"], 1)
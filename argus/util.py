@@ -17,13 +17,12 @@ import base64
 import collections
 import contextlib
 import logging
-import pkgutil
 import random
 import socket
 import struct
 import subprocess
 import sys
-import time
+import threading
 import unittest
 import types
 import os
@@ -37,7 +36,9 @@ import gzip
 import six
 
 from argus import log as argus_log
+from argus import resource_registry
 from argus import exceptions
+from argus import retry
 
 LOG = argus_log.LOG
 
@@ -52,6 +53,8 @@ POWERSHELL_SCRIPT_UNRESTRICTED = "powershell_script_unrestricted"
 POWERSHELL_SCRIPT_BYPASS = "powershell_script_bypass"
 POWERSHELL_SCRIPT_UNDEFINED = "powershell_script_undefined"
 
+CBINIT_INSTALLER = "CloudbaseInitSetup_{build}_{arch}.msi"
+
 SERVICES_PREFIX = "cloudbaseinit.metadata.services"
 HTTP_SERVICE = 'http'
 CONFIG_DRIVE_SERVICE = 'configdrive'
@@ -86,6 +89,7 @@ __all__ = (
     'get_logger',
     'get_resource',
     'cached_property',
+    'FactCache',
     'run_once',
     'rand_name',
     'get_public_keys',
@@ -137,18 +141,11 @@ NETWORK_KEYS = [
 
 
 def exec_with_retry(action, retry_count, retry_count_interval):
-    i = 0
-    while True:
-        try:
-            return action()
-        except Exception:
-            if i < retry_count:
-                i += 1
-                time.sleep(retry_count_interval)
-            else:
-                raise exceptions.ArgusTimeoutError(
-                    "{!r} failed too many times."
-                    .format(action))
+    # The first attempt isn't counted as a retry.
+    return retry.call(action, "exec_with_retry",
+                      count=max(retry_count, 0) + 1,
+                      delay=retry_count_interval,
+                      error="{!r} failed too many times.".format(action))
 
 
 def get_int_from_str(content):
@@ -240,8 +237,12 @@ def run_once(func, state={}, errors={}):
 
 
 def get_resource(resource):
-    """Get the given resource from the list of known resources."""
-    return pkgutil.get_data('argus.resources', resource)
+    """Get the given resource from the list of known resources.
+
+    The resources are read once, see
+    :data:`argus.resource_registry.REGISTRY`.
+    """
+    return resource_registry.REGISTRY.data(resource)
 
 
 def gzip_data(data):
@@ -269,6 +270,56 @@ class cached_property(object):  # pylint: disable=invalid-name
         return result
 
 
+class FactCache(object):
+    """Memoize facts about an instance until they are invalidated.
+
+    The facts are computed on their first access, failures being
+    left uncached, and they stay valid until :meth:`invalidate` is
+    called, usually when the instance changes, e.g. after installing
+    something or rebooting it.
+    """
+
+    def __init__(self):
+        self._facts = {}
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def get(self, name, compute):
+        """Get the fact `name`, calling `compute` if it isn't known."""
+        with self._lock:
+            if name in self._facts:
+                self._stats["hits"] += 1
+                return self._facts[name]
+
+        value = compute()
+        with self._lock:
+            self._stats["misses"] += 1
+            self._facts[name] = value
+        return value
+
+    def set(self, name, value):
+        """Remember the fact `name`, which is known without computing it."""
+        with self._lock:
+            self._facts[name] = value
+
+    def invalidate(self, *names):
+        """Forget the given facts, or all of them if none is given."""
+        with self._lock:
+            self._stats["invalidations"] += 1
+            if not names:
+                names = list(self._facts)
+            for name in names:
+                self._facts.pop(name, None)
+
+    def stats(self):
+        """Return the hits, misses and invalidations of this cache."""
+        with self._lock:
+            stats = dict.fromkeys(("hits", "misses", "invalidations"), 0)
+            stats.update(self._stats)
+            stats["size"] = len(self._facts)
+            return stats
+
+
 def rand_name(name=''):
     """Generate a random name
 
@@ -22,6 +22,7 @@ from argus.backends.tempest import tempest_backend
 from argus import config as argus_config
 from argus.introspection.cloud import windows as introspection
 from argus.recipes.cloud import windows as recipe
+from argus import resource_registry
 from argus.scenarios.cloud import base as scenarios
 from argus.scenarios.cloud import windows as windows_scenarios
 from argus.tests.cloud import smoke
@@ -30,11 +31,9 @@ from argus import util
 
 
 def _availability_zones():
-    api_manager = manager.APIManager()
+    api_manager = manager.get_manager()
     try:
-        zones = api_manager.availability_zone_client.list_availability_zones()
-        info = zones['availabilityZoneInfo']
-        return {zone['zoneName'] for zone in info}
+        return api_manager.availability_zones()
     finally:
         api_manager.cleanup_credentials()
 
@@ -81,8 +80,8 @@ class ScenarioMultipartAdvancedSmoke(BaseWindowsScenario):
 
 
 class ScenarioMultipartGzipAdvancedSmoke(ScenarioMultipartAdvancedSmoke):
-    userdata = util.gzip_data(
-        util.get_resource('windows/multipart_userdata_part_two'))
+    userdata = resource_registry.REGISTRY.gzipped(
+        'windows/multipart_userdata_part_two')
 
 
 class ScenarioMultipartB64Smoke(ScenarioMultipartSmoke):
@@ -91,8 +90,8 @@ class ScenarioMultipartB64Smoke(ScenarioMultipartSmoke):
 
 
 class ScenarioMultipartB64GzipSmoke(ScenarioMultipartSmoke):
-    userdata = util.gzip_data(
-        util.get_resource('windows/multipart_userdata_b64'))
+    userdata = resource_registry.REGISTRY.gzipped(
+        'windows/multipart_userdata_b64')
 
 
 class ScenarioLongHostnameSmoke(BaseWindowsScenario):
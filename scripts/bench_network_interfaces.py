@@ -0,0 +1,132 @@
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the cost of getting the network interfaces of an instance.
+
+The network back-end talks to a fake Neutron holding the networks of
+the instance and many ports of other instances. The ``legacy`` run
+lists all the ports for every subnet and shows every network and
+subnet, as the back-end used to do, while ``bulk`` is the back-end as
+it is now. The number of requests, the number of resources returned
+by them and the time taken are reported.
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.backends.tempest import cloud
+from argus import util
+from argus.unit_tests.fakes import network as fake_network
+
+INSTANCE_ID = "instance"
+
+
+def _legacy(backend):
+    manager = backend._manager    # pylint: disable=protected-access
+    guest_nics = []
+    for network in backend._networks:    # pylint: disable=protected-access
+        details = manager.networks_client.show_network(
+            network["uuid"])["network"]
+        nic = dict.fromkeys(util.NETWORK_KEYS)
+        for subnet_id in details["subnets"]:
+            subnet = manager.subnets_client.show_subnet(subnet_id)["subnet"]
+            suffix = "6" if subnet["ip_version"] == 6 else ""
+            for port in manager.ports_client.list_ports()["ports"]:
+                if "compute" not in port["device_owner"]:
+                    continue
+                addresses = [fixed_ip["ip_address"]
+                             for fixed_ip in port["fixed_ips"]
+                             if fixed_ip["subnet_id"] == subnet_id]
+                if addresses:
+                    nic["mac"] = port["mac_address"].upper()
+                    nic["address" + suffix] = addresses[0]
+                    break
+        guest_nics.append(nic)
+    return guest_nics
+
+
+def _bulk(backend):
+    return backend.get_network_interfaces()
+
+
+def _neutron(nics, ports):
+    neutron = fake_network.FakeNeutron()
+    networks = []
+    subnets = []
+    for index in range(nics):
+        network_id = neutron.add_network()
+        subnet_id = neutron.add_subnet(network_id,
+                                       "10.{}.0.0/16".format(index))
+        subnet6_id = neutron.add_subnet(network_id, "::ffff:a00:0/120",
+                                        ip_version=6)
+        subnets.append(subnet_id)
+        networks.append({"uuid": network_id})
+
+    # The ports of the other instances of the tenant come first,
+    # so that they are all scanned.
+    for index in range(ports):
+        subnet_id = subnets[index % nics]
+        neutron.add_port("other-{}".format(index), [
+            (subnet_id, "10.{}.{}.{}".format(index % nics, index // 250 + 1,
+                                             index % 250 + 1))])
+    for index, network in enumerate(networks):
+        subnet_id, subnet6_id = neutron.networks[network["uuid"]]["subnets"]
+        neutron.add_port(INSTANCE_ID, [
+            (subnet_id, "10.{}.255.1".format(index)),
+            (subnet6_id, "::ffff:a00:{}".format(index + 1))])
+    return neutron, networks
+
+
+def _bench(function, nics, ports):
+    neutron, networks = _neutron(nics, ports)
+    manager = mock.Mock(networks_client=neutron, subnets_client=neutron,
+                        ports_client=neutron)
+    with mock.patch("argus.backends.tempest.manager.APIManager",
+                    return_value=manager):
+        backend = cloud.NetworkWindowsBackend("bench", None, None, None)
+    backend._networks = networks    # pylint: disable=protected-access
+    backend.internal_instance_id = lambda: INSTANCE_ID
+
+    start = time.time()
+    nics_found = function(backend)
+    elapsed = time.time() - start
+    assert all(nic["address"] and nic["address6"] for nic in nics_found)
+    return sum(neutron.requests.values()), neutron.returned, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nics", type=int, default=4,
+                        help="Networks attached to the instance.")
+    parser.add_argument("--ports", type=int, default=500,
+                        help="Ports of the other instances of the tenant.")
+    args = parser.parse_args()
+
+    for name, function in (("legacy", _legacy), ("bulk", _bulk)):
+        requests, returned, elapsed = _bench(function, args.nics,
+                                             args.ports)
+        print("{:<7} requests {:>4}  resources {:>6}  time {:>7.4f}s"
+              .format(name, requests, returned, elapsed))
+
+
+if __name__ == "__main__":
+    main()
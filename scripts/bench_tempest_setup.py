@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the time taken for creating and deleting an instance.
+
+The tempest back-end talks to a fake API manager, where every API call
+takes the given latency and the server becomes active, or is deleted,
+after the given number of polls. The ``serial`` run makes a single API
+call at a time, as the back-end used to do, while ``concurrent`` makes
+up to ``--workers`` calls at the same time.
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import time
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from argus.backends.tempest import manager as api_manager
+from argus.backends.tempest import tempest_backend
+from argus import config as argus_config
+from argus import log as argus_log
+from argus.unit_tests.fakes import compute
+
+CONFIG = argus_config.CONFIG
+LOG = argus_log.LOG
+
+
+class _Backend(tempest_backend.BaseTempestBackend):
+
+    def get_remote_client(self, **kwargs):
+        pass
+
+    @property
+    def remote_client(self):
+        pass
+
+
+def _bench(workers, latency, boot_polls):
+    CONFIG.set_override("api_workers", workers, group="argus")
+    manager = compute.FakeAPIManager(latency=latency, boot_polls=boot_polls)
+    with mock.patch.object(api_manager, "APIManager", return_value=manager):
+        backend = _Backend("bench", None, None, None)
+
+    start = time.time()
+    backend.setup_instance()
+    setup = time.time() - start
+
+    start = time.time()
+    backend.cleanup()
+    cleanup = time.time() - start
+    return setup, cleanup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Seconds taken by every API call.")
+    parser.add_argument("--boot-polls", type=int, default=5,
+                        help="Number of polls until the server is active.")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="API calls made at the same time.")
+    args = parser.parse_args()
+    # Every step is logged, which would bury the results.
+    LOG.logger.setLevel(logging.WARNING)
+
+    for name, workers in (("serial", 1), ("concurrent", args.workers)):
+        setup, cleanup = _bench(workers, args.latency, args.boot_polls)
+        print("{:<10} setup {:>6.2f}s  cleanup {:>6.2f}s  total {:>6.2f}s"
+              .format(name, setup, cleanup, setup + cleanup))
+
+
+if __name__ == "__main__":
+    main()
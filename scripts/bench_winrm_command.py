@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# Copyright 2016 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the overhead added by argus for each remote command.
+
+The commands are sent to a fake WinRM protocol object, so the numbers
+show only the cost of the client side machinery. The ``legacy`` run
+uses a new thread pool for each command, as the client used to do,
+while ``shared`` goes through the executor shared by all the clients.
+"""
+
+from __future__ import print_function
+
+import argparse
+import threading
+import time
+
+from multiprocessing import pool
+
+from argus.client import windows
+from argus.unit_tests.fakes import winrm as fake_winrm
+from argus import util
+
+
+def _legacy_run_command(protocol_client, shell_id, command):
+    thread_pool = pool.ThreadPool(processes=1)
+    command = util.get_command(command, util.POWERSHELL)
+    command_id = None
+    try:
+        command_id = protocol_client.run_command(shell_id, command)
+        result = thread_pool.apply_async(
+            protocol_client.get_command_output,
+            args=(shell_id, command_id))
+        return result.get(timeout=60)
+    finally:
+        thread_pool.terminate()
+        protocol_client.cleanup_command(shell_id, command_id)
+
+
+def _shared_run_command(protocol_client, shell_id, command):
+    return windows.WinRemoteClient._run_command(    # pylint: disable=W0212
+        protocol_client, shell_id, command, upper_timeout=60)
+
+
+def _bench(run_command, commands, threads):
+    protocol_client = fake_winrm.FakeProtocol(
+        handler=lambda command, stdin: (b"", b"", 0))
+
+    def worker():
+        shell_id = protocol_client.open_shell()
+        for _ in range(commands):
+            run_command(protocol_client, shell_id, "echo 1")
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.time()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.time() - start
+    return elapsed, threading.active_count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=500,
+                        help="Number of commands sent by each thread.")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="Number of threads sending commands, "
+                             "similar to parallel scenarios.")
+    args = parser.parse_args()
+
+    total = args.commands * args.threads
+    for name, run_command in (("legacy", _legacy_run_command),
+                              ("shared", _shared_run_command)):
+        elapsed, alive = _bench(run_command, args.commands, args.threads)
+        print("{:<7} {:>8.1f} us/command  {:>7.0f} commands/s  "
+              "{} threads alive".format(name, elapsed / total * 10 ** 6,
+                                        total / elapsed, alive))
+
+
+if __name__ == "__main__":
+    main()